@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+"""Fixtures of the vodf_schema benchmarks.
+
+The sizes of the synthetic event lists are set with the environment variable
+``VODF_BENCHMARK_ROWS``, a comma-separated list of row counts, e.g.
+``VODF_BENCHMARK_ROWS=1e5,1e6,1e7,1e9``. The files are written once per
+session into ``VODF_BENCHMARK_DATA`` (default: a pytest temporary directory)
+and reused if they already exist there.
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+from vodf_schema.synthetic import generate_eventlist
+
+#: row counts of the synthetic event lists
+ROWS = [int(float(n)) for n in os.getenv("VODF_BENCHMARK_ROWS", "1e5,1e6").split(",")]
+
+#: the whole table is only loaded into memory up to this number of rows
+MAX_IN_MEMORY_ROWS = 10_000_000
+
+#: RA and Dec of the pointing of the synthetic observations
+POINTING = (83.63, 22.01)
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory) -> Path:
+    """Directory of the generated benchmark files."""
+    path = os.getenv("VODF_BENCHMARK_DATA")
+    if path is None:
+        return tmp_path_factory.mktemp("vodf_benchmarks")
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+@pytest.fixture(scope="session", params=ROWS, ids=lambda n: f"{n:.0e}")
+def eventlist_file(request, data_dir) -> Path:
+    """Event list files of the sizes in ``VODF_BENCHMARK_ROWS``."""
+    path = data_dir / f"events_{request.param}.fits"
+    if not path.exists():
+        tmp = path.with_name(f".{path.name}.tmp")
+        generate_eventlist(tmp, request.param, pointing=POINTING, overwrite=True)
+        os.replace(tmp, path)
+    return path
+
+
+@pytest.fixture(scope="session")
+def compressed_eventlist_file(eventlist_file) -> Path:
+    """Tile-compressed (GZIP_2) copies of the event list files."""
+    from vodf_schema.compression import compress_table
+
+    path = eventlist_file.with_name(f"{eventlist_file.stem}.fits.fz")
+    if not path.exists():
+        tmp = path.with_name(f".{path.name}.tmp")
+        compress_table(eventlist_file, tmp, overwrite=True)
+        os.replace(tmp, path)
+    return path
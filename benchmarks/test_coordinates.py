@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the transformation of events to horizontal coordinates."""
+
+
+def test_horizontal_coordinates(benchmark, eventlist_file):
+    from vodf_schema.coordinates import horizontal_coordinates
+
+    alt, _ = benchmark.pedantic(
+        horizontal_coordinates, args=(eventlist_file,), rounds=3
+    )
+    assert len(alt) > 0
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the resolution of grouping table members."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.table import Table
+
+N_FILES = 20
+N_VERSIONS = 10
+N_MEMBERS = 10_000
+
+
+@pytest.fixture(scope="module")
+def grouping_file(tmp_path_factory):
+    path = tmp_path_factory.mktemp("grouping")
+    for i in range(N_FILES):
+        hdus = [fits.PrimaryHDU()]
+        for version in range(1, N_VERSIONS + 1):
+            table = Table({"x": np.arange(100.0)})
+            hdus.append(fits.BinTableHDU(table, name="EFFECTIVE-AREA", ver=version))
+        fits.HDUList(hdus).writeto(path / f"irf_{i}.fits")
+
+    rng = np.random.default_rng(0)
+    table = Table(
+        {
+            "MEMBER_NAME": ["EFFECTIVE-AREA"] * N_MEMBERS,
+            "MEMBER_VERSION": rng.integers(1, N_VERSIONS + 1, N_MEMBERS),
+            "MEMBER_LOCATION": [
+                f"irf_{i}.fits" for i in rng.integers(0, N_FILES, N_MEMBERS)
+            ],
+            "MEMBER_URI_TYPE": ["URL"] * N_MEMBERS,
+        }
+    )
+    fits.BinTableHDU(table, name="GROUPING").writeto(path / "grouping.fits")
+    return path / "grouping.fits"
+
+
+def test_resolve_table(benchmark, grouping_file):
+    from vodf_schema.grouping import MemberResolver
+
+    def run():
+        # a new resolver per round, so that the files are scanned every time
+        with MemberResolver() as resolver:
+            return resolver.resolve_table(grouping_file)
+
+    members = benchmark(run)
+    assert len(members) == N_MEMBERS
+
+
+def test_read_members(benchmark, grouping_file):
+    from vodf_schema.grouping import MemberResolver
+
+    with MemberResolver(max_open_files=N_FILES // 2) as resolver:
+        members = resolver.resolve_table(grouping_file)[:1000]
+        benchmark(lambda: [m.read_bytes() for m in members])
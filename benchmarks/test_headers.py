@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the validation of event list headers, one header per round."""
+
+import pytest
+from astropy.io import fits
+
+
+@pytest.fixture(scope="module")
+def header(tmp_path_factory):
+    from vodf_schema.synthetic import generate_eventlist
+
+    path = tmp_path_factory.mktemp("header") / "events.fits"
+    return fits.getheader(generate_eventlist(path, 1000), 1)
+
+
+def test_fits_schema_header(benchmark, header):
+    from vodf_schema.level1 import EventList
+
+    benchmark(EventList.__header__.validate_header, header)
+
+
+def test_compiled_header(benchmark, header):
+    from vodf_schema.compiled import compile_header
+    from vodf_schema.level1 import EventList
+
+    compiled = compile_header(EventList.__header__)
+    issues = benchmark(compiled.validate, header)
+    assert not issues
+
+
+def test_registry_header(benchmark, header):
+    from vodf_schema.registry import REGISTRY_PATH, load_registry
+
+    if not REGISTRY_PATH.exists():
+        pytest.skip("No schema registry, run 'python -m vodf_schema.registry'")
+
+    compiled = load_registry().tables["EventList"].header
+    issues = benchmark(compiled.validate, header)
+    assert not issues
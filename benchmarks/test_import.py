@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the cold-start import of the schemas.
+
+These replace a fixed import-time budget: in CI, a slower import than on the
+base branch, measured on the same runner, fails the comparison.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.mark.parametrize(
+    "statement",
+    [
+        "import vodf_schema.level1",
+        "from vodf_schema.level1 import EventList",
+        "from vodf_schema.registry import load_registry",
+    ],
+)
+def test_cold_import(benchmark, statement):
+    # a new interpreter for every round, so nothing is cached in sys.modules
+    benchmark.pedantic(
+        subprocess.run,
+        args=([sys.executable, "-c", statement],),
+        kwargs={"check": True},
+        rounds=10,
+        warmup_rounds=1,
+    )
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the time interval engine."""
+
+import numpy as np
+import pytest
+
+N_INTERVALS = 1_000_000
+
+
+@pytest.fixture(scope="module")
+def interval_sets():
+    from vodf_schema.intervals import TimeIntervals
+
+    rng = np.random.default_rng(0)
+    sets = []
+    for _ in range(2):
+        start = rng.uniform(0, 1e9, N_INTERVALS)
+        sets.append(TimeIntervals(start, start + rng.uniform(0, 300, N_INTERVALS)))
+    return sets
+
+
+@pytest.mark.parametrize("operation", ["union", "intersection", "difference"])
+def test_set_operation(benchmark, interval_sets, operation):
+    first, second = interval_sets
+    benchmark(getattr(first, operation), second)
+
+
+def test_filter_events(benchmark, eventlist_file):
+    from astropy.table import Table
+
+    from vodf_schema.intervals import TimeIntervals
+
+    times = Table.read(eventlist_file, memmap=True)["TIME"]
+    start = np.linspace(times.min(), times.max(), 10_000, endpoint=False)
+    gti = TimeIntervals(start, start + 0.5 * (start[1] - start[0]))
+    mask = benchmark(gti.contains, times)
+    assert 0 < mask.sum() < len(times)
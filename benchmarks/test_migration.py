@@ -0,0 +1,26 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the in-place header migration."""
+
+import shutil
+
+
+def test_migrate_file(benchmark, eventlist_file, tmp_path):
+    from astropy.io import fits
+
+    from vodf_schema.migration import HeaderMigration, migrate_file
+
+    path = shutil.copy(eventlist_file, tmp_path / eventlist_file.name)
+    version = fits.getval(path, "HDUVERS", ext=1)
+    # back and forth, so that every round has something to migrate
+    migrations = (
+        HeaderMigration(version, "next", renamed={"TREFPOS": "TIMEREF"}),
+        HeaderMigration("next", version, renamed={"TIMEREF": "TREFPOS"}),
+    )
+    versions = iter(["next", version] * 1000)
+
+    def migrate():
+        return migrate_file(path, next(versions), migrations)
+
+    results = benchmark(migrate)
+    assert all(r.in_place for r in results)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of event selection and checksum verification."""
+
+import pytest
+
+from .conftest import POINTING
+
+CONE = (*POINTING, 1.0)
+
+
+@pytest.fixture(scope="module")
+def sky_index_file(eventlist_file):
+    from vodf_schema.selection import SkyIndex
+
+    path = eventlist_file.with_suffix(".index.fits")
+    if not path.exists():
+        SkyIndex.build(eventlist_file).write(path)
+    return path
+
+
+@pytest.mark.parametrize("indexed", [False, True], ids=["scan", "index"])
+def test_cone_search(benchmark, eventlist_file, sky_index_file, indexed):
+    from vodf_schema.selection import select_events
+
+    sky_index = sky_index_file if indexed else None
+    benchmark.pedantic(
+        select_events,
+        args=(eventlist_file,),
+        kwargs={"cone": CONE, "sky_index": sky_index},
+        rounds=3,
+    )
+
+
+def test_time_range(benchmark, eventlist_file):
+    from vodf_schema.selection import select_events
+
+    benchmark(select_events, eventlist_file, time_range=(1000.0, 1010.0))
+
+
+def test_build_sky_index(benchmark, eventlist_file):
+    from vodf_schema.selection import SkyIndex
+
+    benchmark.pedantic(SkyIndex.build, args=(eventlist_file,), rounds=3)
+
+
+def test_verify_checksums(benchmark, eventlist_file):
+    from vodf_schema.fixity import verify_file
+
+    benchmark.pedantic(verify_file, args=(eventlist_file,), rounds=3)
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the latency of the validation service."""
+
+import asyncio
+
+import pytest
+
+
+@pytest.mark.parametrize("level", ["header", "full"])
+def test_request_latency(benchmark, eventlist_file, level):
+    from vodf_schema.service import ValidationService
+
+    target = f"POST /validate?path={eventlist_file}&level={level} HTTP/1.1\r\n\r\n"
+    loop = asyncio.new_event_loop()
+    service = ValidationService(n_jobs=1)
+    loop.run_until_complete(service.start(port=0))
+    connection = loop.run_until_complete(asyncio.open_connection(*service.address))
+
+    async def request():
+        reader, writer = connection
+        writer.write(target.encode())
+        length = 0
+        while (line := await reader.readline()) != b"\r\n":
+            if line.lower().startswith(b"content-length:"):
+                length = int(line.split(b":")[1])
+        return await reader.readexactly(length)
+
+    try:
+        body = benchmark(lambda: loop.run_until_complete(request()))
+        assert b'"valid": true' in body
+    finally:
+        connection[1].close()
+        loop.run_until_complete(service.close())
+        loop.close()
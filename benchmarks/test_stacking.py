@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the stacking of event lists."""
+
+import pytest
+
+
+@pytest.mark.parametrize("n_inputs", [4, 64])
+def test_stack_eventlists(benchmark, eventlist_file, tmp_path, n_inputs):
+    from astropy.io import fits
+
+    from vodf_schema.stacking import stack_eventlists
+
+    # the same observation over and over, so the merge interleaves all inputs
+    inputs = [eventlist_file] * n_inputs
+    output = tmp_path / "stacked.fits"
+
+    def stack():
+        return stack_eventlists(inputs, output, header={"OBS_ID": 0}, overwrite=True)
+
+    benchmark.pedantic(stack, rounds=3)
+    n_rows = fits.getheader(eventlist_file, 1)["NAXIS2"]
+    assert fits.getheader(output, 1)["NAXIS2"] == n_inputs * n_rows
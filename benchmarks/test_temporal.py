@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the conversion of event times."""
+
+import numpy as np
+import pytest
+
+
+@pytest.mark.parametrize("scale", ["TT", "UTC"])
+def test_to_datetime64(benchmark, scale):
+    from vodf_schema.temporal import time_reference
+
+    reference = time_reference(
+        {"MJDREFI": 51910, "MJDREFF": 7.428703703703703e-4, "TIMESYS": "TT"}
+    )
+    met = np.sort(np.random.default_rng(0).uniform(0, 1e9, 10_000_000))
+    benchmark(reference.to_datetime64, met, scale)
+
+
+def test_iter_event_times(benchmark, eventlist_file):
+    from vodf_schema.temporal import iter_event_times
+
+    def convert():
+        for _ in iter_event_times(eventlist_file, scale="UTC"):
+            pass
+
+    benchmark.pedantic(convert, rounds=3)
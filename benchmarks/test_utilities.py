@@ -0,0 +1,19 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the documentation tables of the schemas."""
+
+
+def test_columns_to_table(benchmark):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.utilities import columns_to_table
+
+    table = benchmark(columns_to_table, EventList)
+    assert len(table) == len(EventList.__columns__)
+
+
+def test_headers_to_table(benchmark):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.utilities import headers_to_table
+
+    table = benchmark(headers_to_table, EventList.__header__)
+    assert len(table) == len(EventList.__header__.__cards__)
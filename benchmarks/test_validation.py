@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+"""Benchmarks of the validation of event lists of increasing size."""
+
+import pytest
+from astropy.io import fits
+
+from .conftest import MAX_IN_MEMORY_ROWS
+
+
+def _n_rows(path) -> int:
+    return fits.getheader(path, 1)["NAXIS2"]
+
+
+def test_validate_table(benchmark, eventlist_file):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_table
+
+    if _n_rows(eventlist_file) > MAX_IN_MEMORY_ROWS:
+        pytest.skip("Event list too large to be loaded into memory")
+
+    def run():
+        with fits.open(eventlist_file) as hdus:
+            return validate_table(hdus[1], EventList)
+
+    report = benchmark.pedantic(run, rounds=3)
+    assert report.valid
+
+
+def test_validate_streaming(benchmark, eventlist_file):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_streaming
+
+    report = benchmark.pedantic(
+        validate_streaming, args=(eventlist_file, EventList), rounds=3
+    )
+    assert report.valid
+    benchmark.extra_info["n_rows"] = report.n_rows
+
+
+@pytest.mark.parametrize("n_jobs", [2, 4])
+def test_validate_sharded(benchmark, eventlist_file, n_jobs):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_streaming
+
+    report = benchmark.pedantic(
+        validate_streaming,
+        args=(eventlist_file, EventList),
+        kwargs={"n_jobs": n_jobs, "chunk_size": 100_000},
+        rounds=3,
+    )
+    assert report.valid
+    benchmark.extra_info["n_rows"] = report.n_rows
+
+
+def test_validate_arrow(benchmark, eventlist_file):
+    pytest.importorskip("pyarrow")
+    from vodf_schema.arrow import fits_to_arrow, validate_arrow
+
+    if _n_rows(eventlist_file) > MAX_IN_MEMORY_ROWS:
+        pytest.skip("Event list too large to be loaded into memory")
+
+    table = fits_to_arrow(eventlist_file)
+    report = benchmark.pedantic(validate_arrow, args=(table,), rounds=3)
+    assert report.valid
+    benchmark.extra_info["n_rows"] = report.n_rows
+
+
+def test_fits_to_arrow(benchmark, eventlist_file):
+    pytest.importorskip("pyarrow")
+    from vodf_schema.arrow import fits_to_arrow
+
+    if _n_rows(eventlist_file) > MAX_IN_MEMORY_ROWS:
+        pytest.skip("Event list too large to be loaded into memory")
+
+    table = benchmark.pedantic(fits_to_arrow, args=(eventlist_file,), rounds=3)
+    assert table.num_rows == _n_rows(eventlist_file)
+
+
+@pytest.mark.parametrize("n_jobs", [1, 4])
+def test_validate_compressed(benchmark, compressed_eventlist_file, n_jobs):
+    from vodf_schema.validation import validate_file
+
+    (report,) = benchmark.pedantic(
+        validate_file,
+        args=(compressed_eventlist_file,),
+        kwargs={"n_jobs": n_jobs},
+        rounds=3,
+    )
+    assert report.valid
+    benchmark.extra_info["n_rows"] = report.n_rows
+
+
+def test_validate_profiled(benchmark, eventlist_file):
+    from vodf_schema.instrumentation import Profiler
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_streaming
+
+    def run():
+        with Profiler():
+            return validate_streaming(eventlist_file, EventList)
+
+    report = benchmark.pedantic(run, rounds=3)
+    assert report.valid
@@ -1,5 +1,40 @@
-"""Example module of the python package vodf_schema."""
+"""Schemas and validation tools for the Very-high-energy Open Data Format (VODF).
 
-from .version import __version__
+Submodules and ``__version__`` are loaded lazily on first attribute access,
+e.g. ``vodf_schema.level1``, so that ``import vodf_schema`` does not import
+astropy or fits_schema.
+"""
 
-__all__ = ["__version__"]
+import importlib
+
+__all__ = [
+    "__version__",
+    "hdu",
+    "level1",
+    "level2",
+    "level3",
+    "metadata",
+    "utilities",
+]
+
+_SUBMODULES = frozenset(__all__) - {"__version__"}
+
+
+def __getattr__(name):
+    """Import submodules and the version on first access."""
+    if name == "__version__":
+        from .version import __version__
+
+        globals()["__version__"] = __version__
+        return __version__
+
+    if name in _SUBMODULES:
+        # importing sets the attribute, so this is only called once per module
+        return importlib.import_module(f".{name}", __name__)
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    """List the attributes including the not yet imported submodules."""
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+
+"""Validation and conversion of Apache Arrow tables.
+
+Event lists held as `pyarrow.Table` are validated against any
+`~fits_schema.binary_table.BinaryTable` schema without writing them to FITS
+first. The FITS metadata is stored as Arrow metadata:
+
+* the unit of a column is the ``unit`` entry of the field metadata,
+* header keywords are entries of the schema metadata with json encoded
+  values, e.g. ``OBS_ID`` maps to ``1`` and ``TIMESYS`` to ``"TT"``, quotes
+  included. Entries that are no valid FITS keywords (like the ``pandas``
+  metadata) are ignored.
+
+Numeric Arrow columns without nulls are validated through numpy views of
+their buffers, i.e. without copying. The rows of a FITS binary table are
+big-endian and interleaved, so converting between both layouts always costs
+exactly one copy of each column, which `fits_to_arrow` and `arrow_to_fits`
+do in chunks of rows. Logical columns (bit-packed in Arrow) and strings are
+always copied.
+
+Needs the optional dependency ``pyarrow``.
+"""
+
+import json
+import re
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+from astropy.io import fits
+
+from .fitsblocks import (
+    find_hdu,
+    memmap_rows,
+    padded_size,
+    scan_hdus,
+    table_columns,
+    table_dtype,
+)
+from .report import Issue, ValidationReport
+from .validation import (
+    DEFAULT_CHUNK_SIZE,
+    ValidationMode,
+    _budget_spent,
+    _check_required_columns,
+    _validate_chunks,
+    schema_for_header,
+    validate_header,
+)
+
+__all__ = [
+    "arrow_header",
+    "arrow_to_fits",
+    "fits_to_arrow",
+    "validate_arrow",
+]
+
+_KEYWORD_RE = re.compile(r"^[A-Z0-9_-]{1,8}$")
+# keywords describing the table layout, derived from the Arrow schema
+_STRUCTURAL_RE = re.compile(
+    r"^(XTENSION|BITPIX|NAXIS\d*|PCOUNT|GCOUNT|TFIELDS|THEAP|CHECKSUM|DATASUM"
+    r"|T(TYPE|FORM|UNIT|SCAL|ZERO|DIM|NULL|DISP)\d+)$"
+)
+# TFORM code and TZERO of the Arrow primitive types
+_FORMATS = {
+    "bool": ("L", None),
+    "uint8": ("B", None),
+    "int8": ("B", -(2**7)),
+    "int16": ("I", None),
+    "uint16": ("I", 2**15),
+    "int32": ("J", None),
+    "uint32": ("J", 2**31),
+    "int64": ("K", None),
+    "uint64": ("K", 2**63),
+    "float": ("E", None),
+    "double": ("D", None),
+}
+
+
+def _value_type(arrow_type) -> tuple[tuple[int, ...], object]:
+    # the cell shape of (nested) fixed-size lists and their value type
+    import pyarrow as pa
+
+    shape = []
+    while pa.types.is_fixed_size_list(arrow_type):
+        shape.append(arrow_type.list_size)
+        arrow_type = arrow_type.value_type
+    return tuple(shape), arrow_type
+
+
+def _is_string(arrow_type) -> bool:
+    import pyarrow as pa
+
+    return pa.types.is_string(arrow_type) or pa.types.is_large_string(arrow_type)
+
+
+def _field_unit(field) -> str | None:
+    unit = (field.metadata or {}).get(b"unit")
+    return None if unit is None else unit.decode()
+
+
+def _fits_column(field, column) -> fits.Column:
+    import pyarrow.compute as pc
+
+    shape, value_type = _value_type(field.type)
+    repeat = int(np.prod(shape, dtype=np.int64))
+    if _is_string(value_type):
+        lengths = pc.binary_length(column)
+        code, zero = f"{max(pc.max(lengths).as_py() or 0, 1)}A", None
+    elif str(value_type) in _FORMATS:
+        code, zero = _FORMATS[str(value_type)]
+    else:
+        raise TypeError(f"Column {field.name} has unsupported type {field.type}")
+
+    return fits.Column(
+        name=field.name,
+        format=code if repeat == 1 else f"{repeat}{code}",
+        unit=_field_unit(field),
+        dim=None if len(shape) < 2 else f"({','.join(map(str, reversed(shape)))})",
+        bzero=zero,
+    )
+
+
+def arrow_header(table) -> fits.Header:
+    """Return the FITS binary table header equivalent to an Arrow table.
+
+    The layout keywords (TFORMn, NAXIS1, ...) follow from the Arrow types
+    and the units from the field metadata, all other keywords are read from
+    the schema metadata.
+    """
+    columns = [_fits_column(f, table.column(f.name)) for f in table.schema]
+    header = fits.BinTableHDU.from_columns(columns, nrows=0).header
+    header["NAXIS2"] = table.num_rows
+
+    for key, value in (table.schema.metadata or {}).items():
+        keyword = key.decode()
+        if not _KEYWORD_RE.match(keyword) or _STRUCTURAL_RE.match(keyword):
+            continue
+        try:
+            header[keyword] = json.loads(value)
+        except ValueError:
+            header[keyword] = value.decode()
+    return header
+
+
+def _header_metadata(header: fits.Header) -> dict[str, str]:
+    return {
+        keyword: json.dumps(value)
+        for keyword, value in header.items()
+        if keyword
+        and keyword not in {"COMMENT", "HISTORY"}
+        and not _STRUCTURAL_RE.match(keyword)
+    }
+
+
+def _to_numpy(array) -> np.ndarray:
+    """Values of an Arrow array as numpy array, a view where the layout allows."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    n_rows = len(array)
+    shape, value_type = _value_type(array.type)
+    for _ in shape:
+        array = array.flatten()
+
+    if _is_string(value_type):
+        values = pc.fill_null(array, "").to_numpy(zero_copy_only=False).astype(str)
+    elif pa.types.is_boolean(value_type) or array.null_count > 0:
+        # bit-packed booleans and nulls (NaN for floats) need a copy
+        values = array.to_numpy(zero_copy_only=False)
+    else:
+        values = array.to_numpy(zero_copy_only=True)
+    return values.reshape(n_rows, *shape) if shape else values
+
+
+def validate_arrow(
+    table,
+    schema=None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    mode: ValidationMode | None = None,
+) -> ValidationReport:
+    """Validate an in-memory `pyarrow.Table` against a VODF table schema.
+
+    The header is built with `arrow_header` and the columns are validated
+    per record batch of at most ``chunk_size`` rows, like
+    `~vodf_schema.validation.validate_streaming` does for files.
+
+    Parameters
+    ----------
+    table : pyarrow.Table
+        The table, with units and header keywords as Arrow metadata.
+    schema : type[BinaryTable], optional
+        The schema, by default found from the EXTNAME keyword.
+    chunk_size : int
+        Maximum number of rows validated at once.
+    mode : ValidationMode, optional
+        Limits to stop early on broken tables.
+
+    Returns
+    -------
+    ValidationReport
+        All problems found, without path and HDU.
+    """
+    import pyarrow as pa
+
+    header = arrow_header(table)
+    if schema is None:
+        schema = schema_for_header(header)
+        if schema is None:
+            raise ValueError(f"No schema for EXTNAME {header.get('EXTNAME')!r}")
+
+    mode = mode or ValidationMode()
+    report = ValidationReport(schema=schema.__name__, n_rows=table.num_rows)
+    validate_header(schema.__header__, header, report)
+    _check_required_columns(schema, set(table.column_names), report)
+    for name in schema.__columns__:
+        if name not in table.column_names:
+            continue
+        _, value_type = _value_type(table.schema.field(name).type)
+        n_nulls = table.column(name).null_count
+        # null floats are validated as NaN, other types have no equivalent
+        if n_nulls > 0 and not pa.types.is_floating(value_type):
+            report.add(Issue("NullValues", f"{n_nulls} values are null", context=name))
+
+    if _budget_spent(mode, report, []):
+        report.truncated = True
+        return report
+
+    def chunks(names):
+        batches = table.select(sorted(names)).to_batches(max_chunksize=chunk_size)
+        if not batches:
+            # a zero-row table still gets one (empty) chunk, to check dtypes
+            fields = {n: table.schema.field(n) for n in names}
+            yield 0, {n: _to_numpy(pa.array([], f.type)) for n, f in fields.items()}
+        start = 0
+        for batch in batches:
+            yield start, {n: _to_numpy(batch.column(n)) for n in names}
+            start += batch.num_rows
+
+    units = {field.name: _field_unit(field) for field in table.schema}
+    checkers = _validate_chunks(schema, header, units, chunks, report, mode)
+    for checker in checkers:
+        report.add_rule_result(checker.result())
+    return report
+
+
+def fits_to_arrow(
+    path: str | PathLike,
+    hdu: int | str | tuple[str, int] = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+):
+    """Read a FITS binary table HDU as `pyarrow.Table`.
+
+    The rows are memory-mapped and converted in chunks of ``chunk_size``
+    rows, each becoming one record batch, so apart from the result only one
+    chunk is held in memory. TSCAL/TZERO are applied, and the units and
+    header keywords are stored as metadata, see `arrow_header`.
+    Variable-length array and bit columns are not supported.
+    """
+    import pyarrow as pa
+
+    location = find_hdu(scan_hdus(path), hdu)
+    header = location.header
+    columns = table_columns(header)
+    for column in columns:
+        if column.code in "PQX":
+            raise TypeError(
+                f"Column {column.name} with TFORM {column.code} is not supported"
+            )
+
+    batches = []
+    n_rows = header["NAXIS2"]
+    for start in range(0, max(n_rows, 1), chunk_size):
+        chunk = memmap_rows(path, location, start, start + chunk_size)
+        batches.append(
+            pa.record_batch(
+                [_to_arrow(column, chunk[column.name]) for column in columns],
+                names=[column.name for column in columns],
+            )
+        )
+        del chunk
+
+    fields = [
+        pa.field(
+            column.name,
+            batches[0].schema.field(column.name).type,
+            metadata=None if column.unit is None else {"unit": column.unit},
+        )
+        for column in columns
+    ]
+    schema = pa.schema(fields, metadata=_header_metadata(header))
+    return pa.Table.from_batches(batches, schema)
+
+
+def _to_arrow(column, raw: np.ndarray):
+    import pyarrow as pa
+
+    if column.code == "A":
+        # FITS strings are padded with spaces or nulls
+        values = np.char.rstrip(raw.astype(raw.dtype.base)).astype(str)
+    else:
+        values = column.physical(raw)
+        # the only copy: gathers the column and converts to native byte order
+        values = np.ascontiguousarray(values, values.dtype.newbyteorder("="))
+
+    shape = values.shape[1:]
+    array = pa.array(values.reshape(-1))
+    for size in reversed(shape):
+        array = pa.FixedSizeListArray.from_arrays(array, size)
+    return array
+
+
+def arrow_to_fits(
+    table,
+    path: str | PathLike,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    overwrite: bool = False,
+) -> Path:
+    """Write a `pyarrow.Table` as binary table HDU of a new FITS file.
+
+    The header is built with `arrow_header`, the rows are converted and
+    written in chunks of ``chunk_size`` rows. The file has an empty primary
+    HDU followed by the table.
+    """
+    path = Path(path)
+    if path.exists() and not overwrite:
+        raise FileExistsError(f"File {path} already exists")
+
+    header = arrow_header(table)
+    columns = table_columns(header)
+    dtype = table_dtype(header)
+
+    with open(path, "wb") as f:
+        f.write(fits.PrimaryHDU().header.tostring().encode("ascii"))
+        f.write(header.tostring().encode("ascii"))
+        size = 0
+        for batch in table.to_batches(max_chunksize=chunk_size):
+            rows = np.zeros(batch.num_rows, dtype=dtype)
+            for column in columns:
+                rows[column.name] = _to_raw(
+                    column, _to_numpy(batch.column(column.name))
+                )
+            f.write(rows.data)
+            size += rows.nbytes
+        f.write(bytes(padded_size(size) - size))
+    return path
+
+
+def _to_raw(column, values: np.ndarray) -> np.ndarray:
+    # inverse of TableColumn.physical for the formats of arrow_header
+    if column.code == "L":
+        return np.where(values, ord("T"), ord("F")).astype("i1")
+    if column.code == "A":
+        return np.char.encode(values, "ascii")
+    if column.zero:
+        size = values.dtype.itemsize
+        sign_bit = np.array(1 << (8 * size - 1), dtype=f"u{size}")
+        bits = values.view(f"u{size}") ^ sign_bit
+        return bits.view(column.dtype.base.newbyteorder("="))
+    return values
@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+
+"""Command-line tools of vodf_schema."""
+
+import argparse
+import glob
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .version import __version__
+
+__all__ = ["collect_paths", "main", "validate_paths"]
+
+#: file name patterns searched for when a directory is given
+DEFAULT_PATTERNS = ("*.fits", "*.fits.fz")
+
+
+class FileTimeoutError(Exception):
+    """Raised inside a worker when validating a single file took too long."""
+
+
+def collect_paths(
+    inputs: list[str], patterns: tuple[str, ...] = DEFAULT_PATTERNS
+) -> list[Path]:
+    """Expand files, directories (searched recursively) and glob patterns."""
+    paths = set()
+    for entry in inputs:
+        path = Path(entry)
+        if path.is_dir():
+            for pattern in patterns:
+                paths.update(p for p in path.rglob(pattern) if p.is_file())
+        elif path.is_file():
+            paths.add(path)
+        else:
+            paths.update(Path(p) for p in glob.glob(entry, recursive=True))
+    return sorted(paths)
+
+
+def _init_worker():
+    # import the schemas once per worker process, not once per file
+    from .validation import known_schemas
+
+    known_schemas()
+
+
+def _raise_timeout(signum, frame):
+    raise FileTimeoutError()
+
+
+def _validate_one(
+    path: Path,
+    chunk_size: int,
+    timeout: float | None,
+    mode=None,
+    compact: bool = False,
+    profile: bool = False,
+    n_jobs: int = 1,
+    headers_only: bool = False,
+) -> dict:
+    from contextlib import nullcontext
+
+    from .instrumentation import Profiler
+    from .validation import validate_file, validate_headers
+
+    result = {"path": str(path), "reports": [], "error": None}
+    profiler = Profiler() if profile else None
+    start = time.perf_counter()
+
+    # signal handlers can only be installed in the main thread
+    use_alarm = (
+        timeout is not None
+        and hasattr(signal, "setitimer")
+        and threading.current_thread() is threading.main_thread()
+    )
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    try:
+        with profiler or nullcontext():
+            if headers_only:
+                reports = validate_headers(path)
+            else:
+                reports = validate_file(path, chunk_size, n_jobs, mode)
+        result["reports"] = [r.to_dict(compact=compact) for r in reports]
+    except FileTimeoutError:
+        result["error"] = f"Timeout: validation took longer than {timeout} s"
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+    result["valid"] = result["error"] is None and all(
+        r["valid"] for r in result["reports"]
+    )
+    result["duration"] = time.perf_counter() - start
+    if profiler is not None:
+        result["profile"] = profiler.to_dict()
+    return result
+
+
+def validate_paths(
+    paths: list[Path],
+    n_jobs: int | None = None,
+    chunk_size: int | None = None,
+    timeout: float | None = None,
+    mode=None,
+    compact: bool = False,
+    profile: bool = False,
+) -> dict:
+    """Validate many files on a process pool and merge the results into one report.
+
+    Parameters
+    ----------
+    paths : list[Path]
+        The files to validate, see `collect_paths`.
+    n_jobs : int, optional
+        Number of worker processes, defaults to the number of CPUs.
+        With ``n_jobs=1``, files are validated in the calling process. A
+        single file is split into row ranges validated by the workers, see
+        `~vodf_schema.validation.validate_streaming`.
+    chunk_size : int, optional
+        Number of table rows validated at once in each worker.
+    timeout : float, optional
+        Maximum time in seconds spent on a single file. Files that take longer
+        are reported as failed. Only supported on platforms with ``SIGALRM``
+        and when called from the main thread.
+    mode : vodf_schema.validation.ValidationMode, optional
+        Limits to stop early on broken files, applied to each HDU.
+    compact : bool
+        Group identical issues of each report with their count, see
+        `~vodf_schema.report.ValidationReport.to_dict`.
+    profile : bool
+        Add the time, bytes read and rows of each HDU, header class and
+        column to the result of each file, see `vodf_schema.instrumentation`.
+
+    Returns
+    -------
+    dict
+        Summary counts and the per-file results, suitable for json output.
+    """
+    from .validation import DEFAULT_CHUNK_SIZE
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    args = [(path, chunk_size, timeout, mode, compact, profile) for path in paths]
+
+    start = time.perf_counter()
+    if n_jobs == 1 or len(paths) <= 1:
+        _init_worker()
+        files = [_validate_one(*a, n_jobs=n_jobs) for a in args]
+    else:
+        with ProcessPoolExecutor(n_jobs, initializer=_init_worker) as pool:
+            # small batches amortize the inter-process overhead for small files
+            batch = max(1, min(16, len(paths) // (4 * n_jobs)))
+            files = list(pool.map(_validate_one, *zip(*args), chunksize=batch))
+
+    return {
+        "vodf_schema_version": __version__,
+        "n_files": len(files),
+        "n_valid": sum(f["valid"] for f in files),
+        "n_invalid": sum(not f["valid"] and f["error"] is None for f in files),
+        "n_failed": sum(f["error"] is not None for f in files),
+        "duration": time.perf_counter() - start,
+        "files": files,
+    }
+
+
+def _build_validate_parser():
+    parser = argparse.ArgumentParser(
+        prog="vodf-validate",
+        description=(
+            "Validate all HDUs of FITS files that have a VODF schema "
+            "(e.g. event lists and grouping tables)."
+        ),
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="+",
+        help="Files, directories (searched recursively) or glob patterns",
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="Maximum seconds per file"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Number of table rows validated at once",
+    )
+    parser.add_argument(
+        "--max-errors",
+        type=int,
+        default=None,
+        help="Stop validating an HDU after this many errors (default: no limit)",
+    )
+    parser.add_argument(
+        "--first-error-per-rule",
+        action="store_true",
+        help="Stop checking each rule after its first violation",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="Group identical issues with their count in the report",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Add the time spent on each HDU, header class and column to the report",
+    )
+    parser.add_argument(
+        "--pattern",
+        action="append",
+        dest="patterns",
+        help=f"File name pattern used for directories (default: {DEFAULT_PATTERNS})",
+    )
+    parser.add_argument(
+        "-o", "--output", help="Write the json report to this file instead of stdout"
+    )
+    parser.add_argument("--version", action="version", version=__version__)
+    return parser
+
+
+def main(args=None):
+    """Entry point of ``vodf-validate``, returns 0 if all files are valid."""
+    parser = _build_validate_parser()
+    args = parser.parse_args(args)
+
+    patterns = tuple(args.patterns) if args.patterns else DEFAULT_PATTERNS
+    paths = collect_paths(args.inputs, patterns)
+    if not paths:
+        parser.error("No input files found")
+
+    from .validation import ValidationMode
+
+    mode = ValidationMode(
+        max_errors=args.max_errors, first_error_per_rule=args.first_error_per_rule
+    )
+    result = validate_paths(
+        paths,
+        args.jobs,
+        args.chunk_size,
+        args.timeout,
+        mode,
+        args.compact,
+        args.profile,
+    )
+
+    if args.output is None:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    return 0 if result["n_valid"] == result["n_files"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,462 @@
+#!/usr/bin/env python3
+
+"""Precompiled validators for header schemas.
+
+The ``HeaderCard`` definitions of a composed header class (e.g.
+``EventList.__header__``) are flattened once into a `CompiledHeader`: allowed
+values become frozensets, units are parsed and the class that defines each card
+is looked up. The result is cached on the header class, so that
+validating a header afterwards only needs dictionary and set lookups.
+
+The columns of a binary table schema are flattened in the same way into a
+`CompiledTable`, which checks the column definitions of a table header
+without reading any data. Compiled schemas only need fits_schema to be
+created from the schema classes, not to be used, see `vodf_schema.registry`.
+"""
+
+import math
+from dataclasses import dataclass
+from time import perf_counter_ns
+from typing import TYPE_CHECKING
+
+from astropy import units as u
+from astropy.io import fits
+
+from .report import Issue
+
+if TYPE_CHECKING:
+    from fits_schema import BinaryTable, Header, HeaderCard
+
+    from .storage import ColumnStorage
+
+__all__ = [
+    "CompiledCard",
+    "CompiledColumn",
+    "CompiledHeader",
+    "CompiledTable",
+    "compile_header",
+    "compile_table",
+]
+
+# table keywords are described by the columns, not by the header schema
+TABLE_KEYWORDS = frozenset(
+    {"TTYPE", "TUNIT", "TFORM", "TSCAL", "TZERO", "TDISP", "TDIM"}
+)
+
+_CACHE_ATTRIBUTE = "__compiled_header__"
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledCard:
+    """Flat, precomputed representation of a `fits_schema.HeaderCard`."""
+
+    keyword: str
+    required: bool
+    #: allowed python types of the value, or None if any type is allowed
+    types: tuple[type, ...] | None
+    #: allowed values (upper-cased if case insensitive), or None for any value
+    allowed: frozenset | None
+    case_insensitive: bool
+    position: int | None
+    empty: bool | None
+    unit: u.UnitBase | None
+    #: name of the header class that defines this card, e.g. one of the
+    #: mixins a table schema header is composed of
+    origin: str
+
+    def check(self, card: fits.Card, pos: int) -> list[Issue]:
+        """Return the issues of a single header card."""
+        issues = []
+        k = self.keyword
+        value = card.value
+
+        if self.position is not None and self.position != pos:
+            issues.append(
+                Issue(
+                    "WrongPosition",
+                    f"Expected card {k} at position {self.position} but found at {pos}",
+                    context=k,
+                )
+            )
+
+        if self.types is not None and not isinstance(value, self.types):
+            issues.append(
+                Issue(
+                    "WrongType",
+                    f"Header keyword {k} has wrong type {type(value)}"
+                    f", expected one of {self.types}",
+                    context=k,
+                )
+            )
+
+        if self.allowed is not None:
+            normed = (
+                value.upper()
+                if self.case_insensitive and isinstance(value, str)
+                else value
+            )
+            if normed not in self.allowed:
+                issues.append(
+                    Issue(
+                        "WrongValue",
+                        f"Possible values for {k!r} are {set(self.allowed)}"
+                        f", found {value!r}",
+                        context=k,
+                    )
+                )
+
+        if self.empty is not None:
+            has_value = not (value is None or isinstance(value, fits.card.Undefined))
+            if self.empty and has_value:
+                issues.append(
+                    Issue(
+                        "WrongValue",
+                        f"Card {k} is required to be empty but has value {value}",
+                        context=k,
+                    )
+                )
+            elif not self.empty and not has_value:
+                issues.append(
+                    Issue("WrongValue", f"Card {k} exists but has no value", context=k)
+                )
+
+        return issues
+
+
+def _types(card: "HeaderCard") -> tuple[type, ...] | None:
+    if card.type is None:
+        return None
+    if isinstance(card.type, type):
+        return (card.type,)
+    # sorted, so that compiling does not depend on the order of a set
+    return tuple(sorted(set(card.type), key=lambda t: t.__name__))
+
+
+def _unit(card: "HeaderCard") -> u.UnitBase | None:
+    unit = getattr(card, "unit", None)
+    return None if unit is None else u.Unit(unit)
+
+
+def _defining_classes(classes) -> dict[int, str]:
+    from fits_schema import HeaderCard
+
+    # the first of the classes defining each card object
+    defining = {}
+    for cls in classes:
+        if cls.__name__ == "__header__":
+            continue
+        for value in vars(cls).values():
+            if isinstance(value, HeaderCard):
+                defining.setdefault(id(value), cls.__name__)
+    return defining
+
+
+def _subclasses(root: type) -> list[type]:
+    classes, pending = [], [root]
+    while pending:
+        cls = pending.pop()
+        classes.append(cls)
+        pending.extend(cls.__subclasses__())
+    return classes
+
+
+def _origins(header_cls: type["Header"]) -> dict[str, str]:
+    from fits_schema import Header
+
+    # the class defining the card object itself, first searched in the MRO;
+    # the headers of table schemas are flat copies without the mixins their
+    # cards come from, these are found among all header classes
+    cards = header_cls.__cards__
+    defining = _defining_classes(header_cls.__mro__)
+    if any(id(card) not in defining for card in cards.values()):
+        defining = {**_defining_classes(_subclasses(Header)), **defining}
+    return {k: defining[id(c)] for k, c in cards.items() if id(c) in defining}
+
+
+class CompiledHeader:
+    """A header schema flattened into lookup tables for fast validation.
+
+    Use `compile_header` to get the cached instance for a header class.
+    """
+
+    def __init__(self, name: str, cards: dict[str, CompiledCard]):
+        self.name = name
+        self.cards = cards
+        self.required = frozenset(k for k, c in cards.items() if c.required)
+        self._factors = {}
+
+    @classmethod
+    def from_schema(cls, header_cls: type["Header"]) -> "CompiledHeader":
+        """Flatten the cards of a header schema class."""
+        origins = _origins(header_cls)
+        cards = {}
+        for keyword, card in header_cls.__cards__.items():
+            allowed = card.allowed_values
+            cards[keyword] = CompiledCard(
+                keyword=keyword,
+                required=card.required,
+                types=_types(card),
+                allowed=None if allowed is None else frozenset(allowed),
+                case_insensitive=card.case_insensitive,
+                position=card.position,
+                empty=card.empty,
+                unit=_unit(card),
+                origin=origins.get(keyword, header_cls.__name__),
+            )
+        return cls(header_cls.__name__, cards)
+
+    def validate(self, header: fits.Header, timings: dict | None = None) -> list[Issue]:
+        """Return all issues of ``header`` with respect to this schema.
+
+        If ``timings`` is given, the nanoseconds spent on the cards of each
+        header class and the number of cards are added to it, as
+        ``{origin: [duration, n_cards]}``, see `vodf_schema.instrumentation`.
+        Unknown cards count for the schema itself.
+        """
+        issues = []
+
+        missing = self.required.difference(header.keys())
+        if missing:
+            issues.append(
+                Issue(
+                    "RequiredMissing",
+                    f"Header is missing the following required keywords: {missing}",
+                )
+            )
+
+        cards = self.cards
+        for pos, card in enumerate(header.cards):
+            if timings is not None:
+                start = perf_counter_ns()
+            keyword = card.keyword
+            compiled = cards.get(keyword)
+            if compiled is not None:
+                issues.extend(compiled.check(card, pos))
+            elif keyword.rstrip("0123456789") not in TABLE_KEYWORDS:
+                issues.append(
+                    Issue(
+                        "AdditionalHeaderCard",
+                        f'Unexpected header card "{str(card).strip()}"',
+                        "warning",
+                        keyword,
+                    )
+                )
+            if timings is not None:
+                origin = self.name if compiled is None else compiled.origin
+                timing = timings.setdefault(origin, [0, 0])
+                timing[0] += perf_counter_ns() - start
+                timing[1] += 1
+
+        return issues
+
+    def quantity(
+        self, header: fits.Header, keyword: str, unit: u.UnitBase | str | None = None
+    ) -> u.Quantity:
+        """Return the value of a card as a quantity, optionally converted to ``unit``.
+
+        Conversion factors are computed once per (keyword, unit) and cached.
+        """
+        card_unit = self.cards[keyword].unit
+        if card_unit is None:
+            raise ValueError(f"Header card {keyword} has no unit")
+
+        value = header[keyword]
+        if unit is None:
+            return u.Quantity(value, card_unit)
+
+        key = (keyword, unit)
+        factor = self._factors.get(key)
+        if factor is None:
+            unit = u.Unit(unit)
+            factor = self._factors[key] = (card_unit.to(unit), unit)
+        return u.Quantity(value * factor[0], factor[1])
+
+
+def compile_header(header_cls: type["Header"], refresh: bool = False) -> CompiledHeader:
+    """Return the compiled validator of a header class, compiling it on first use.
+
+    The result is cached on the class itself. Pass ``refresh=True`` after the
+    cards of the class were modified, e.g. through ``Header.update``.
+    """
+    # look only at the class itself, subclasses have their own (extended) cards
+    compiled = vars(header_cls).get(_CACHE_ATTRIBUTE)
+    if compiled is None or refresh:
+        compiled = CompiledHeader.from_schema(header_cls)
+        setattr(header_cls, _CACHE_ATTRIBUTE, compiled)
+    return compiled
+
+
+@dataclass(frozen=True, slots=True)
+class CompiledColumn:
+    """Flat, precomputed representation of a `fits_schema` binary table column."""
+
+    name: str
+    required: bool
+    #: the TFORM type code, e.g. "D" for double, or None if any type is allowed
+    tform: str | None
+    unit: u.UnitBase | None
+    #: dimensionality of a single cell, 0 for scalars
+    ndim: int
+    shape: tuple[int, ...] | None
+    #: the representations of the column in the storage profiles of the
+    #: schema, as ``(profile name, ColumnStorage)`` pairs
+    storage: tuple[tuple[str, "ColumnStorage"], ...] = ()
+
+    def stored_as(self, header: fits.Header, i: int) -> str | None:
+        """Return the storage profile matching the format of column ``i``, if any.
+
+        The TFORM code, TSCALn and TZEROn of the header must be those of the
+        profile, TZEROn read from the header if the profile gives a keyword.
+        """
+        tform = _tform_code(header, i)
+        scale = header.get(f"TSCAL{i}", 1.0)
+        zero = header.get(f"TZERO{i}", 0.0)
+        for profile, storage in self.storage:
+            if storage.tform.lstrip("0123456789")[:1] != tform:
+                continue
+            try:
+                expected_zero = storage.zero_value(header)
+            except KeyError:
+                continue
+            if _same(storage.scale, scale, 1.0) and _same(expected_zero, zero, 0.0):
+                return profile
+        return None
+
+
+def _tform_code(header: fits.Header, i: int) -> str:
+    return header.get(f"TFORM{i}", "").strip().lstrip("0123456789")[:1]
+
+
+def _same(expected: float | None, value, default: float) -> bool:
+    if not isinstance(value, int | float):
+        return False
+    expected = default if expected is None else expected
+    return math.isclose(expected, value, rel_tol=1e-12)
+
+
+class CompiledTable:
+    """A binary table schema flattened into its compiled header and columns.
+
+    Use `compile_table` to get the cached instance for a table schema.
+    """
+
+    def __init__(
+        self, name: str, header: CompiledHeader, columns: dict[str, CompiledColumn]
+    ):
+        self.name = name
+        self.header = header
+        self.columns = columns
+        self.required = frozenset(k for k, c in columns.items() if c.required)
+
+    @property
+    def extnames(self) -> frozenset[str]:
+        """The allowed EXTNAME values, upper-cased."""
+        card = self.header.cards.get("EXTNAME")
+        if card is None or card.allowed is None:
+            return frozenset()
+        return frozenset(v.upper() for v in card.allowed)
+
+    @classmethod
+    def from_schema(cls, table_cls: type["BinaryTable"]) -> "CompiledTable":
+        """Flatten the header and columns of a binary table schema."""
+        profiles = getattr(table_cls, "__storage_profiles__", ())
+        columns = {}
+        for name, column in table_cls.__columns__.items():
+            columns[name] = CompiledColumn(
+                name=name,
+                required=column.required,
+                tform=getattr(column, "tform_code", None),
+                unit=None if column.unit is None else u.Unit(column.unit),
+                ndim=column.ndim,
+                shape=None if column.shape is None else tuple(column.shape),
+                storage=tuple(
+                    (p.name, p.columns[name]) for p in profiles if name in p.columns
+                ),
+            )
+        return cls(table_cls.__name__, compile_header(table_cls.__header__), columns)
+
+    def validate_header(self, header: fits.Header) -> list[Issue]:
+        """Return the issues of a table header, including its column definitions.
+
+        Only the header is checked: the header cards, the presence of the
+        required columns and the types and units of the columns. A column may
+        have the type of the schema or the format of one of its storage
+        profiles, see `vodf_schema.storage`.
+        """
+        issues = self.header.validate(header)
+
+        present = {}
+        for i in range(1, header.get("TFIELDS", 0) + 1):
+            present[header.get(f"TTYPE{i}", f"col{i}")] = i
+
+        missing = self.required.difference(present)
+        if missing:
+            issues.append(
+                Issue(
+                    "RequiredMissing",
+                    f"The following required columns are missing {set(missing)}",
+                )
+            )
+
+        for name, column in self.columns.items():
+            i = present.get(name)
+            if i is not None:
+                issues.extend(self._check_column(column, header, i))
+        return issues
+
+    @staticmethod
+    def _check_column(
+        column: CompiledColumn, header: fits.Header, i: int
+    ) -> list[Issue]:
+        issues = []
+        tform = _tform_code(header, i)
+        if (
+            column.tform is not None
+            and tform != column.tform
+            and column.stored_as(header, i) is None
+        ):
+            expected = repr(column.tform)
+            if column.storage:
+                profiles = ", ".join(
+                    f"{storage.tform!r} with TSCAL {storage.scale}"
+                    f" and TZERO {storage.zero} ({profile})"
+                    for profile, storage in column.storage
+                )
+                expected += f" or {profiles}"
+            issues.append(
+                Issue(
+                    "WrongType",
+                    f"Column {column.name} has TFORM code {tform!r}"
+                    f", expected {expected}",
+                    context=column.name,
+                )
+            )
+
+        unit = header.get(f"TUNIT{i}")
+        if column.unit is not None and unit is not None:
+            parsed = u.Unit(unit, format="fits", parse_strict="silent")
+            if isinstance(parsed, u.UnrecognizedUnit):
+                message = f"Unit {unit!r} is not a valid FITS unit"
+            elif not parsed.is_equivalent(column.unit):
+                message = f"{parsed} is not convertible to {column.unit}"
+            else:
+                message = None
+            if message is not None:
+                issues.append(Issue("WrongUnit", message, context=column.name))
+        return issues
+
+
+def compile_table(
+    table_cls: type["BinaryTable"], refresh: bool = False
+) -> CompiledTable:
+    """Return the compiled validator of a table schema, compiling it on first use.
+
+    The result is cached on the class like in `compile_header`.
+    """
+    compiled = vars(table_cls).get(_CACHE_ATTRIBUTE)
+    if compiled is None or refresh:
+        if refresh:
+            compile_header(table_cls.__header__, refresh=True)
+        compiled = CompiledTable.from_schema(table_cls)
+        setattr(table_cls, _CACHE_ATTRIBUTE, compiled)
+    return compiled
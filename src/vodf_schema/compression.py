@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+
+"""Tile-compressed binary tables (``.fits.fz``), see section 10.3 of the FITS standard.
+
+A compressed table stores groups of ``ZTILELEN`` rows (tiles) as one row of
+a binary table, with the values of each column of the tile compressed
+separately into a variable-length byte array in the heap. The keywords of the
+original table are kept (``TFORMn`` as ``ZFORMn``, ``NAXIS2`` as
+``ZNAXIS2``, ...), so the original header is restored by `uncompressed_header`
+without reading any data, and `iter_tiles` decompresses one tile at a time
+from a memory map of the heap. Tiles are independent, so they can be
+decompressed in parallel threads (zlib releases the GIL).
+
+The algorithms GZIP_1, GZIP_2 (gzip of the byte-shuffled values), RICE_1
+(for the 1, 2 and 4-byte integer columns, with the codec of astropy) and
+NOCOMPRESS are supported. Columns with other algorithms or variable-length
+arrays cannot be decompressed, `unsupported_columns` lists them so that only
+the header of such tables is validated.
+"""
+
+import gzip
+import re
+import zlib
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+from astropy.io import fits
+
+from .fitsblocks import (
+    HDULocation,
+    find_hdu,
+    memmap_rows,
+    padded_size,
+    scan_hdus,
+    table_columns,
+)
+
+__all__ = [
+    "ALGORITHMS",
+    "DEFAULT_TILE_LENGTH",
+    "compress_table",
+    "is_compressed_table",
+    "iter_tiles",
+    "uncompressed_header",
+    "unsupported_columns",
+]
+
+#: supported values of ZCTYPn
+ALGORITHMS = ("GZIP_1", "GZIP_2", "RICE_1", "NOCOMPRESS")
+
+#: default number of rows per tile of `compress_table`
+DEFAULT_TILE_LENGTH = 100_000
+
+# keywords describing the compression, removed from the original header
+_COMPRESSION_RE = re.compile(
+    r"^(ZTABLE|ZTILELEN|ZNAXIS[12]|ZPCOUNT|ZTHEAP|ZHECKSUM|ZDATASUM|Z(FORM|CTYP)\d+)$"
+)
+# the original cards of the compressed keywords
+_RESTORED = {
+    "ZNAXIS1": "NAXIS1",
+    "ZNAXIS2": "NAXIS2",
+    "ZPCOUNT": "PCOUNT",
+    "ZTHEAP": "THEAP",
+    "ZHECKSUM": "CHECKSUM",
+    "ZDATASUM": "DATASUM",
+}
+# size of the 1QB array descriptors of the compressed columns, 64-bit so
+# that the heap of archive-sized tables can exceed 2 GiB
+_DESCRIPTOR_SIZE = 16
+# the zlib default, level 9 is several times slower for little gain
+_GZIP_LEVEL = 6
+# RICE_1 codes the integers of a tile in blocks of 32 values
+_RICE_BLOCK_SIZE = 32
+# TFORM codes of the integer columns RICE_1 applies to
+_RICE_CODES = "BIJ"
+
+
+def _rice_codec():
+    # the RICE_1 codec of astropy is private and was moved in astropy 7
+    try:
+        from astropy.io.fits.hdu.compressed._codecs import Rice1
+    except ImportError:
+        try:
+            from astropy.io.fits._tiled_compression.codecs import Rice1
+        except ImportError:
+            return None
+    return Rice1
+
+
+def is_compressed_table(header: fits.Header) -> bool:
+    """Whether the header is the one of a tile-compressed binary table."""
+    return header.get("XTENSION") == "BINTABLE" and header.get("ZTABLE") is True
+
+
+def uncompressed_header(header: fits.Header) -> fits.Header:
+    """Restore the header of the original table from a compressed table header."""
+    original = header.copy()
+    for keyword in ("THEAP", "CHECKSUM", "DATASUM"):
+        original.remove(keyword, ignore_missing=True)
+    for compressed, keyword in _RESTORED.items():
+        if compressed in header:
+            original[keyword] = header[compressed]
+    for i in range(1, header["TFIELDS"] + 1):
+        original[f"TFORM{i}"] = header[f"ZFORM{i}"]
+
+    for keyword in list(original.keys()):
+        if _COMPRESSION_RE.match(keyword):
+            original.remove(keyword)
+    return original
+
+
+def unsupported_columns(
+    header: fits.Header, columns: Iterable[str] | None = None
+) -> dict[str, str]:
+    """Return the columns of a compressed table that cannot be decompressed.
+
+    Parameters
+    ----------
+    header : astropy.io.fits.Header
+        The header of the compressed table, see `is_compressed_table`.
+    columns : Iterable[str], optional
+        Names of the columns to check, by default all.
+
+    Returns
+    -------
+    dict[str, str]
+        The reason for each column that `iter_tiles` cannot decompress, e.g.
+        an unknown ZCTYPn.
+    """
+    original = {c.name: c for c in table_columns(uncompressed_header(header))}
+    names = set(original) if columns is None else set(columns)
+    unsupported = {}
+    for i in range(1, header["TFIELDS"] + 1):
+        name = header.get(f"TTYPE{i}", f"col{i}")
+        if name not in names:
+            continue
+        algorithm = header.get(f"ZCTYP{i}")
+        code = original[name].code
+        if code in "PQ":
+            reason = "is a variable-length array, which is not supported"
+        elif algorithm not in ALGORITHMS:
+            reason = f"uses the unsupported compression {algorithm!r}"
+        elif algorithm == "RICE_1" and code not in _RICE_CODES:
+            reason = f"uses RICE_1, which does not apply to TFORM {code}"
+        elif algorithm == "RICE_1" and _rice_codec() is None:
+            reason = "uses RICE_1, which needs the codec of astropy 5.3 or later"
+        else:
+            continue
+        unsupported[name] = f"Column {name} {reason}"
+    return unsupported
+
+
+def _ordered_map(func: Callable, items: Iterable, n_threads: int) -> Iterator:
+    # like ThreadPoolExecutor.map, but at most 2 * n_threads results pending
+    if n_threads <= 1:
+        yield from map(func, items)
+        return
+
+    with ThreadPoolExecutor(n_threads) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= 2 * n_threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _shuffle_width(dtype: np.dtype) -> int:
+    # GZIP_2 shuffles the bytes of each value, characters are single bytes
+    return 1 if dtype.base.kind == "S" else dtype.base.itemsize
+
+
+def _decompress(algorithm: str, data, dtype: np.dtype, n_rows: int) -> np.ndarray:
+    if algorithm == "RICE_1":
+        return _decompress_rice(data, dtype, n_rows)
+    if algorithm == "NOCOMPRESS":
+        raw = data
+    else:
+        # accepts both gzip and zlib streams
+        raw = zlib.decompress(data, wbits=zlib.MAX_WBITS | 32)
+
+    expected = n_rows * dtype.itemsize
+    if len(raw) != expected:
+        raise ValueError(f"Tile has {len(raw)} bytes, expected {expected}")
+
+    if algorithm == "GZIP_2":
+        width = _shuffle_width(dtype)
+        shuffled = np.frombuffer(raw, dtype="u1").reshape(width, -1)
+        raw = np.ascontiguousarray(shuffled.T)
+    return np.frombuffer(raw, dtype=dtype.base).reshape(n_rows, *dtype.shape)
+
+
+def _decompress_rice(data, dtype: np.dtype, n_rows: int) -> np.ndarray:
+    n_values = n_rows * int(np.prod(dtype.shape, dtype=int))
+    width = dtype.base.itemsize
+    codec = _rice_codec()(blocksize=_RICE_BLOCK_SIZE, bytepix=width, tilesize=n_values)
+    decoded = codec.decode(np.frombuffer(data, dtype="u1")) if n_values else []
+    if len(decoded) != n_values:
+        raise ValueError(f"Tile has {len(decoded)} values, expected {n_values}")
+    # the codec returns native signed integers, B columns are unsigned
+    values = np.asarray(decoded, dtype=f"i{width}").view(dtype.base.newbyteorder("="))
+    return values.astype(dtype.base).reshape(n_rows, *dtype.shape)
+
+
+def _compress(algorithm: str, values: np.ndarray) -> bytes:
+    if algorithm == "RICE_1":
+        codec = _rice_codec()(
+            blocksize=_RICE_BLOCK_SIZE, bytepix=values.dtype.base.itemsize, tilesize=0
+        )
+        return codec.encode(values.astype(values.dtype.base.newbyteorder("=")))
+    if algorithm == "NOCOMPRESS":
+        return values.tobytes()
+    if algorithm == "GZIP_2":
+        width = _shuffle_width(values.dtype)
+        values = np.frombuffer(values.tobytes(), dtype="u1").reshape(-1, width).T
+    # mtime=0 makes the output reproducible
+    data = np.ascontiguousarray(values).tobytes()
+    return gzip.compress(data, compresslevel=_GZIP_LEVEL, mtime=0)
+
+
+def iter_tiles(
+    path: str | PathLike,
+    location: HDULocation,
+    columns: Iterable[str] | None = None,
+    n_threads: int = 1,
+) -> Iterator[tuple[int, dict[str, np.ndarray]]]:
+    """Decompress the tiles of a compressed table one by one.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The FITS file.
+    location : HDULocation
+        The compressed table HDU, see `is_compressed_table`.
+    columns : Iterable[str], optional
+        Names of the columns to decompress, by default all.
+    n_threads : int
+        Number of threads decompressing tiles in parallel. At most two tiles
+        per thread are held in memory.
+
+    Yields
+    ------
+    tuple[int, dict[str, numpy.ndarray]]
+        The index of the first row of the tile and the raw (big-endian)
+        cell values of each column, like `~vodf_schema.fitsblocks.memmap_rows`
+        returns for uncompressed tables.
+
+    Raises
+    ------
+    ValueError
+        If one of the columns cannot be decompressed, see
+        `unsupported_columns`, or a tile is corrupt.
+    """
+    header = location.header
+    if not is_compressed_table(header):
+        raise ValueError(f"HDU {location.index} is not a compressed table")
+
+    original = {c.name: c for c in table_columns(uncompressed_header(header))}
+    names = list(original) if columns is None else list(columns)
+    unsupported = unsupported_columns(header, names)
+    if unsupported:
+        raise ValueError(", ".join(unsupported.values()))
+    algorithms = {}
+    for i in range(1, header["TFIELDS"] + 1):
+        name = header.get(f"TTYPE{i}", f"col{i}")
+        if name in names:
+            algorithms[name] = header[f"ZCTYP{i}"]
+
+    n_rows = header["ZNAXIS2"]
+    tile_length = header["ZTILELEN"]
+    descriptors = memmap_rows(path, location)
+    heap_offset = header.get("THEAP", header["NAXIS1"] * header["NAXIS2"])
+    heap_size = location.data_size - heap_offset
+    heap = None
+    if heap_size > 0:
+        heap = np.memmap(
+            path,
+            dtype="u1",
+            mode="r",
+            offset=location.data_offset + heap_offset,
+            shape=(heap_size,),
+        )
+
+    def decompress(tile: int) -> tuple[int, dict[str, np.ndarray]]:
+        start = tile * tile_length
+        n = min(tile_length, n_rows - start)
+        values = {}
+        for name, algorithm in algorithms.items():
+            size, offset = (int(v) for v in descriptors[name][tile])
+            data = heap[offset : offset + size] if size > 0 else b""
+            try:
+                values[name] = _decompress(algorithm, data, original[name].dtype, n)
+            except (ValueError, zlib.error) as e:
+                raise ValueError(f"Tile {tile} of column {name} is corrupt: {e}") from e
+        return start, values
+
+    yield from _ordered_map(decompress, range(len(descriptors)), n_threads)
+
+
+def compress_table(
+    path: str | PathLike,
+    output: str | PathLike,
+    hdu: int | str | tuple[str, int] = 1,
+    tile_length: int = DEFAULT_TILE_LENGTH,
+    algorithm: str = "GZIP_2",
+    n_threads: int = 1,
+    overwrite: bool = False,
+) -> Path:
+    """Write a binary table HDU as tile-compressed table into a new file.
+
+    The rows are read, compressed and written one tile at a time. The output
+    has an empty primary HDU followed by the compressed table.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The input FITS file.
+    output : str or PathLike
+        The output file, conventionally ending in ``.fits.fz``.
+    hdu : int, str or tuple
+        The table to compress.
+    tile_length : int
+        Number of rows per tile.
+    algorithm : str
+        One of `ALGORITHMS`, used for all columns. RICE_1 only applies to the
+        1, 2 and 4-byte integer columns, the others are compressed with
+        GZIP_2, like fpack does.
+    n_threads : int
+        Number of threads compressing tiles in parallel.
+    overwrite : bool
+        Whether to replace an existing file.
+    """
+    if algorithm not in ALGORITHMS:
+        raise ValueError(f"Unknown algorithm {algorithm!r}, use one of {ALGORITHMS}")
+    output = Path(output)
+    if output.exists() and not overwrite:
+        raise FileExistsError(f"File {output} already exists")
+
+    location = find_hdu(scan_hdus(path), hdu)
+    source = location.header
+    columns = table_columns(source)
+    if any(c.code in "PQ" for c in columns):
+        raise NotImplementedError("Variable-length array columns are not supported")
+
+    if algorithm == "RICE_1" and _rice_codec() is None:
+        raise ValueError("RICE_1 needs the codec of astropy 5.3 or later")
+    algorithms = [
+        "GZIP_2" if algorithm == "RICE_1" and c.code not in _RICE_CODES else algorithm
+        for c in columns
+    ]
+
+    n_rows = source["NAXIS2"]
+    n_tiles = -(-n_rows // tile_length)
+    header = _compressed_header(source, columns, n_tiles, tile_length, algorithms)
+    descriptors = np.zeros(n_tiles, dtype=[(c.name, ">i8", (2,)) for c in columns])
+
+    def compress(tile: int) -> list[bytes]:
+        start = tile * tile_length
+        rows = memmap_rows(path, location, start, start + tile_length)
+        return [_compress(a, rows[c.name]) for a, c in zip(algorithms, columns)]
+
+    with open(output, "wb") as f:
+        f.write(fits.PrimaryHDU().header.tostring().encode("ascii"))
+        header_offset = f.tell()
+        f.write(header.tostring().encode("ascii"))
+        # the descriptors are only known after compressing, the heap follows
+        f.write(descriptors.tobytes())
+
+        heap_size = 0
+        max_size = 0
+        for tile, data in enumerate(_ordered_map(compress, range(n_tiles), n_threads)):
+            for column, compressed in zip(columns, data):
+                descriptors[column.name][tile] = (len(compressed), heap_size)
+                f.write(compressed)
+                heap_size += len(compressed)
+                max_size = max(max_size, len(compressed))
+
+        size = descriptors.nbytes + heap_size
+        f.write(bytes(padded_size(size) - size))
+
+        header["PCOUNT"] = heap_size
+        for i in range(1, len(columns) + 1):
+            header[f"TFORM{i}"] = f"1QB({max_size})"
+        f.seek(header_offset)
+        f.write(header.tostring().encode("ascii"))
+        f.write(descriptors.tobytes())
+    return output
+
+
+def _compressed_header(
+    source: fits.Header, columns, n_tiles: int, tile_length: int, algorithms
+) -> fits.Header:
+    header = source.copy()
+    for keyword in ("THEAP", "CHECKSUM", "DATASUM"):
+        header.remove(keyword, ignore_missing=True)
+    header["NAXIS1"] = _DESCRIPTOR_SIZE * len(columns)
+    header["NAXIS2"] = n_tiles
+    for i in range(1, len(columns) + 1):
+        # the width of the maximum size is reserved, it is set after writing
+        header[f"TFORM{i}"] = f"1QB({2**63 - 1})"
+
+    header["ZTABLE"] = (True, "this is a compressed table")
+    header["ZTILELEN"] = (tile_length, "number of rows in each tile")
+    header["ZNAXIS1"] = (source["NAXIS1"], "original row width in bytes")
+    header["ZNAXIS2"] = (source["NAXIS2"], "original number of rows")
+    header["ZPCOUNT"] = (source["PCOUNT"], "original heap size")
+    for compressed, keyword in (("ZHECKSUM", "CHECKSUM"), ("ZDATASUM", "DATASUM")):
+        if keyword in source:
+            header[compressed] = (source[keyword], f"original {keyword}")
+    for i, (column, algorithm) in enumerate(zip(columns, algorithms), start=1):
+        header[f"ZFORM{i}"] = (source[f"TFORM{i}"], f"original format of {column.name}")
+        header[f"ZCTYP{i}"] = (algorithm, "compression algorithm")
+    return header
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+"""Fast transformation of event directions to horizontal coordinates.
+
+An exact transformation of ICRS directions to `~astropy.coordinates.AltAz`
+needs the astrometry context of ERFA (Earth position and velocity,
+precession-nutation, Earth rotation and polar motion) at the time of every
+event, whose computation dominates the cost for event lists. It changes
+smoothly with time, so `HorizontalTransform` computes it exactly with
+astropy on a coarse time grid only, interpolates it linearly to the time of
+each event and applies the per-direction part (light deflection, aberration,
+rotation to the observed frame) vectorized with ERFA.
+
+The interpolation error is largest halfway between grid points. On
+construction, the result at the midpoints of all grid intervals is compared
+with the exact astropy transformation for a set of directions covering the
+sky, and the grid is refined until the error is within the requested
+tolerance; the bound reached is `HorizontalTransform.max_error`.
+
+The observatory location is read from the OBSGEO-B/L/H keywords of the
+`~vodf_schema.metadata.SpatialReferenceHeader`, the event times with the
+`~vodf_schema.temporal.TimeReference` of the header. Refraction is not
+applied, like for an `~astropy.coordinates.AltAz` frame without pressure.
+Polar motion and UT1 come from the IERS tables of astropy.
+"""
+
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from os import PathLike
+
+import erfa
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import AltAz, EarthLocation, SkyCoord
+from astropy.coordinates.erfa_astrom import ErfaAstrom
+
+from .fitsblocks import HDULocation, find_hdu, memmap_rows, scan_hdus, table_columns
+from .selection import angular_distance
+from .temporal import time_reference
+
+__all__ = [
+    "DEFAULT_TIME_STEP",
+    "DEFAULT_TOLERANCE",
+    "HorizontalTransform",
+    "horizontal_coordinates",
+    "observatory_location",
+]
+
+#: initial spacing of the grid of exact transformations
+DEFAULT_TIME_STEP = 300 * u.s
+#: largest error of the interpolated directions
+DEFAULT_TOLERANCE = 1 * u.mas
+
+_CHUNK_SIZE = 1_000_000
+_MAX_REFINEMENTS = 8
+# directions used to measure the interpolation error
+_N_TEST_DIRECTIONS = 32
+
+
+@lru_cache(maxsize=64)
+def _location(lon: float, lat: float, height: float) -> EarthLocation:
+    return EarthLocation.from_geodetic(lon * u.deg, lat * u.deg, height * u.m)
+
+
+def observatory_location(header: Mapping) -> EarthLocation:
+    """Return the cached observatory location from the OBSGEO-L/B/H keywords."""
+    missing = [k for k in ("OBSGEO-L", "OBSGEO-B", "OBSGEO-H") if k not in header]
+    if missing:
+        raise KeyError(f"Header has no observatory location, missing {missing}")
+    return _location(
+        float(header["OBSGEO-L"]), float(header["OBSGEO-B"]), float(header["OBSGEO-H"])
+    )
+
+
+def _test_directions() -> tuple[np.ndarray, np.ndarray]:
+    # a Fibonacci lattice, evenly covering the sphere
+    i = np.arange(_N_TEST_DIRECTIONS) + 0.5
+    ra = np.rad2deg(np.pi * (1 + 5**0.5) * i) % 360
+    dec = np.rad2deg(np.arcsin(1 - 2 * i / _N_TEST_DIRECTIONS))
+    return ra, dec
+
+
+class HorizontalTransform:
+    """Interpolated transformation of ICRS directions to altitude and azimuth.
+
+    Parameters
+    ----------
+    header : Mapping
+        Header with the time reference (MJDREFI, MJDREFF, TIMESYS) and the
+        observatory location (OBSGEO-L/B/H), e.g. of an event list.
+    time_range : tuple[float, float], optional
+        First and last time to transform, in seconds since the reference
+        epoch. By default TSTART and TSTOP of the header.
+    time_step : astropy.units.Quantity
+        Initial spacing of the grid, halved while the error is too large.
+    tolerance : astropy.units.Quantity
+        Largest allowed interpolation error, as angle.
+    """
+
+    def __init__(
+        self,
+        header: Mapping,
+        time_range: tuple[float, float] | None = None,
+        time_step: u.Quantity = DEFAULT_TIME_STEP,
+        tolerance: u.Quantity = DEFAULT_TOLERANCE,
+    ):
+        self.reference = time_reference(header)
+        self.location = observatory_location(header)
+        if time_range is None:
+            time_range = (header["TSTART"], header["TSTOP"])
+        self.start, self.stop = (float(t) for t in time_range)
+        if self.stop < self.start:
+            raise ValueError(f"Invalid time range {time_range}")
+        self.tolerance = u.Quantity(tolerance, u.deg)
+
+        step = time_step.to_value(u.s)
+        for _ in range(_MAX_REFINEMENTS):
+            self._build_grid(step)
+            self.max_error = self._measure_error()
+            if self.max_error <= self.tolerance:
+                return
+            step /= 2
+        raise ValueError(
+            f"Interpolation error {self.max_error.to(u.mas):.3g} exceeds the"
+            f" tolerance {self.tolerance.to(u.mas):.3g} with a time step of {step} s"
+        )
+
+    @property
+    def time_step(self) -> u.Quantity:
+        """Spacing of the grid of exact transformations."""
+        return self._step * u.s
+
+    def _exact_astrom(self, met: np.ndarray) -> np.ndarray:
+        frame = AltAz(obstime=self.reference.to_time(met), location=self.location)
+        return ErfaAstrom.apco(frame)
+
+    def _build_grid(self, step: float):
+        n_steps = max(1, int(np.ceil((self.stop - self.start) / step)))
+        self._step = step
+        self._grid = self.start + step * np.arange(n_steps + 1)
+        astrom = self._exact_astrom(self._grid)
+        # the Earth rotation angle wraps around every sidereal day
+        astrom["eral"] = np.unwrap(astrom["eral"])
+        # all fields are doubles, so the records are interpolated as rows
+        self._dtype = astrom.dtype
+        self._values = np.ascontiguousarray(astrom).view(np.float64)
+        self._values = self._values.reshape(len(astrom), -1)
+        self._slopes = np.diff(self._values, axis=0)
+
+    def _measure_error(self) -> u.Quantity:
+        ra, dec = _test_directions()
+        met = np.repeat(self._grid[:-1] + self._step / 2, len(ra))
+        ra = np.tile(ra, len(self._grid) - 1)
+        dec = np.tile(dec, len(self._grid) - 1)
+
+        frame = AltAz(obstime=self.reference.to_time(met), location=self.location)
+        exact = SkyCoord(ra, dec, unit=u.deg).transform_to(frame)
+        alt, az = self.transform(ra, dec, met)
+        error = angular_distance(exact.az.deg, exact.alt.deg, az, alt)
+        return u.Quantity(error.max(), u.deg)
+
+    def _interpolated_astrom(self, met: np.ndarray) -> np.ndarray:
+        outside = (met < self.start) | (met > self.stop)
+        if np.any(outside):
+            raise ValueError(
+                f"{np.count_nonzero(outside)} times are outside of the time range"
+                f" [{self.start}, {self.stop}] of the transform"
+            )
+        position = (met - self._grid[0]) / self._step
+        index = np.minimum(position.astype(np.int64), len(self._grid) - 2)
+        weight = position - index
+
+        values = self._values[index]
+        values += weight[:, np.newaxis] * self._slopes[index]
+        return values.view(self._dtype).reshape(-1)
+
+    def transform(self, ra, dec, met) -> tuple[np.ndarray, np.ndarray]:
+        """Return altitude and azimuth (east of north) in degrees.
+
+        Parameters
+        ----------
+        ra, dec : array-like
+            ICRS directions in degrees.
+        met : array-like
+            Times in seconds since the reference epoch, within the time range.
+        """
+        ra, dec, met = np.broadcast_arrays(
+            *(np.asarray(v, dtype=np.float64) for v in (ra, dec, met))
+        )
+        shape = ra.shape
+        astrom = self._interpolated_astrom(met.reshape(-1))
+        cirs_ra, cirs_dec = erfa.atciqz(
+            np.deg2rad(ra.reshape(-1)), np.deg2rad(dec.reshape(-1)), astrom
+        )
+        az, zenith, _, _, _ = erfa.atioq(cirs_ra, cirs_dec, astrom)
+        alt = 90.0 - np.rad2deg(zenith)
+        return alt.reshape(shape), np.rad2deg(az).reshape(shape)
+
+
+def _column_values(path, location: HDULocation, start, stop, units) -> list:
+    rows = memmap_rows(path, location, start, stop)
+    columns = {c.name: c for c in table_columns(location.header)}
+    values = []
+    for name, unit in units.items():
+        column = columns[name]
+        factor = 1.0
+        if column.unit is not None:
+            factor = u.Unit(column.unit, format="fits").to(unit)
+        values.append(column.physical(rows[name]) * factor)
+    return values
+
+
+def _transform_rows(path, location, transform, start, stop, chunk_size):
+    alt = np.empty(stop - start)
+    az = np.empty(stop - start)
+    units = {"RA": u.deg, "DEC": u.deg, "TIME": u.s}
+    for chunk_start in range(start, stop, chunk_size):
+        chunk_stop = min(chunk_start + chunk_size, stop)
+        ra, dec, met = _column_values(path, location, chunk_start, chunk_stop, units)
+        rows = slice(chunk_start - start, chunk_stop - start)
+        alt[rows], az[rows] = transform.transform(ra, dec, met)
+    return alt, az
+
+
+def horizontal_coordinates(
+    path: str | PathLike,
+    hdu: int | str | tuple[str, int] = "EVENT-LIST",
+    n_jobs: int = 1,
+    chunk_size: int = _CHUNK_SIZE,
+    time_step: u.Quantity = DEFAULT_TIME_STEP,
+    tolerance: u.Quantity = DEFAULT_TOLERANCE,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return altitude and azimuth in degrees of all events of an event list.
+
+    The RA, DEC and TIME columns are memory-mapped and transformed in chunks
+    of ``chunk_size`` rows with a `HorizontalTransform` for TSTART to TSTOP,
+    with row ranges distributed over ``n_jobs`` processes.
+    """
+    location = find_hdu(scan_hdus(path), hdu)
+    transform = HorizontalTransform(
+        location.header, time_step=time_step, tolerance=tolerance
+    )
+    n_rows = location.header["NAXIS2"]
+    if n_jobs == 1 or n_rows <= chunk_size:
+        return _transform_rows(path, location, transform, 0, n_rows, chunk_size)
+
+    n_shards = min(4 * n_jobs, -(-n_rows // chunk_size))
+    bounds = np.linspace(0, n_rows, n_shards + 1).astype(np.int64).tolist()
+    with ProcessPoolExecutor(min(n_jobs, n_shards)) as pool:
+        args = (path, location, transform)
+        futures = [
+            pool.submit(_transform_rows, *args, start, stop, chunk_size)
+            for start, stop in zip(bounds[:-1], bounds[1:])
+        ]
+        results = [future.result() for future in futures]
+    alt = np.concatenate([alt for alt, _ in results])
+    az = np.concatenate([az for _, az in results])
+    return alt, az
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+
+"""Low-level access to the header and data blocks of FITS files.
+
+The helpers here locate HDUs by reading only their 2880-byte header blocks and
+describe the layout of binary tables, so that the (potentially very large) data
+units are only touched through memory maps of the rows that are needed.
+"""
+
+import re
+from dataclasses import dataclass
+from os import PathLike
+
+import numpy as np
+from astropy.io import fits
+
+__all__ = [
+    "BLOCK_SIZE",
+    "CARD_SIZE",
+    "HDULocation",
+    "TableColumn",
+    "data_size",
+    "find_hdu",
+    "iter_hdus",
+    "memmap_rows",
+    "padded_size",
+    "read_header_bytes",
+    "scan_hdus",
+    "table_columns",
+    "table_dtype",
+]
+
+BLOCK_SIZE = 2880
+CARD_SIZE = 80
+
+_END_CARD = b"END" + b" " * (CARD_SIZE - 3)
+
+_TFORM_RE = re.compile(r"^\s*(\d*)([LXBIJKAEDCMPQ])(.*)$")
+_TFORM_DTYPES = {
+    "L": "i1",
+    "B": "u1",
+    "I": ">i2",
+    "J": ">i4",
+    "K": ">i8",
+    "E": ">f4",
+    "D": ">f8",
+    "C": ">c8",
+    "M": ">c16",
+}
+# TZERO values that turn a signed integer column into an unsigned one (and
+# the reverse for bytes), see section 7.3.2 of the FITS standard
+_UNSIGNED_ZERO = {
+    "B": (-(2**7), "i1"),
+    "I": (2**15, "u2"),
+    "J": (2**31, "u4"),
+    "K": (2**63, "u8"),
+}
+
+
+def padded_size(size: int) -> int:
+    """Return ``size`` rounded up to a multiple of the FITS block size."""
+    return -(-size // BLOCK_SIZE) * BLOCK_SIZE
+
+
+@dataclass(frozen=True)
+class HDULocation:
+    """Position of one HDU inside a FITS file, as found by a header-only scan."""
+
+    #: index of the HDU in the file, 0 is the primary HDU
+    index: int
+    #: byte offset of the first header block
+    header_offset: int
+    #: byte offset of the first data block
+    data_offset: int
+    #: size of the data unit in bytes, excluding the padding
+    data_size: int
+    #: the parsed header
+    header: fits.Header
+
+    @property
+    def header_size(self) -> int:
+        """Size of the header in bytes, including the padding."""
+        return self.data_offset - self.header_offset
+
+    @property
+    def end_offset(self) -> int:
+        """Byte offset of the end of this HDU, including the data padding."""
+        return self.data_offset + padded_size(self.data_size)
+
+    @property
+    def extname(self) -> str | None:
+        """EXTNAME of the HDU, or None for HDUs without one."""
+        return self.header.get("EXTNAME")
+
+    @property
+    def extver(self) -> int:
+        """EXTVER of the HDU, defaulting to 1 as defined by the FITS standard."""
+        return self.header.get("EXTVER", 1)
+
+
+def read_header_bytes(fileobj) -> bytes:
+    """Read the raw header blocks of the HDU starting at the current position.
+
+    Returns an empty bytes object if the file ends before a new header starts.
+    """
+    blocks = []
+    while True:
+        block = fileobj.read(BLOCK_SIZE)
+        if not block:
+            if blocks:
+                raise ValueError("File ended before the END card of the header")
+            return b""
+
+        if len(block) < BLOCK_SIZE:
+            raise ValueError("Truncated FITS header block")
+
+        blocks.append(block)
+        for start in range(0, BLOCK_SIZE, CARD_SIZE):
+            if block[start : start + CARD_SIZE] == _END_CARD:
+                return b"".join(blocks)
+
+
+def data_size(header: fits.Header) -> int:
+    """Size in bytes of the data unit described by ``header``, without padding."""
+    naxis = header.get("NAXIS", 0)
+    if naxis == 0:
+        return 0
+
+    axes = [header[f"NAXIS{i}"] for i in range(1, naxis + 1)]
+    # random groups have NAXIS1 = 0, which is not part of the data size
+    if header.get("GROUPS", False) and axes[0] == 0:
+        axes = axes[1:]
+
+    n_values = int(np.prod(axes, dtype=np.int64))
+    n_values = (header.get("PCOUNT", 0) + n_values) * header.get("GCOUNT", 1)
+    return n_values * abs(header["BITPIX"]) // 8
+
+
+def iter_hdus(path: str | PathLike):
+    """Iterate over the HDUs of a FITS file, reading only their headers.
+
+    Yields
+    ------
+    HDULocation
+        Location and header of each HDU.
+    """
+    with open(path, "rb") as f:
+        index = 0
+        offset = 0
+        while True:
+            f.seek(offset)
+            raw = read_header_bytes(f)
+            if not raw:
+                return
+
+            header = fits.Header.fromstring(raw.decode("ascii"))
+            location = HDULocation(
+                index=index,
+                header_offset=offset,
+                data_offset=offset + len(raw),
+                data_size=data_size(header),
+                header=header,
+            )
+            yield location
+
+            index += 1
+            offset = location.end_offset
+
+
+def scan_hdus(path: str | PathLike) -> list[HDULocation]:
+    """Return the locations of all HDUs of a FITS file, see `iter_hdus`."""
+    return list(iter_hdus(path))
+
+
+def find_hdu(
+    locations: list[HDULocation], hdu: int | str | tuple[str, int]
+) -> HDULocation:
+    """Select an HDU by index, EXTNAME or (EXTNAME, EXTVER), like `astropy.io.fits`."""
+    if isinstance(hdu, int):
+        return locations[hdu]
+
+    if isinstance(hdu, tuple):
+        name, version = hdu
+    else:
+        name, version = hdu, None
+
+    for location in locations:
+        extname = location.extname
+        if extname is None or extname.upper() != name.upper():
+            continue
+        if version is None or location.extver == version:
+            return location
+
+    raise KeyError(f"No HDU matching {hdu!r}")
+
+
+@dataclass(frozen=True)
+class TableColumn:
+    """Layout and scaling of a single binary table column."""
+
+    name: str
+    #: the TFORM type code, e.g. "D" for double
+    code: str
+    #: the on-disk dtype of a single cell
+    dtype: np.dtype
+    unit: str | None = None
+    scale: float | None = None
+    zero: float | None = None
+
+    def physical(self, raw: np.ndarray) -> np.ndarray:
+        """Convert raw cell values to physical values, like astropy does when reading.
+
+        Applies TSCAL/TZERO, including the unsigned integer convention, and
+        converts logical columns to booleans.
+        """
+        if self.code == "L":
+            return raw == ord("T")
+
+        scale = 1 if self.scale is None else self.scale
+        zero = 0 if self.zero is None else self.zero
+        if scale == 1 and zero == 0:
+            return raw
+
+        unsigned = _UNSIGNED_ZERO.get(self.code)
+        if unsigned is not None and scale == 1 and zero == unsigned[0]:
+            size = raw.dtype.itemsize
+            bits = raw.astype(raw.dtype.newbyteorder("=")).view(f"u{size}")
+            sign_bit = np.array(1 << (8 * size - 1), dtype=f"u{size}")
+            return (bits ^ sign_bit).view(unsigned[1])
+
+        return raw * np.float64(scale) + np.float64(zero)
+
+
+def _cell_dtype(tform: str, tdim: str | None) -> tuple[str, np.dtype]:
+    match = _TFORM_RE.match(tform)
+    if match is None:
+        raise ValueError(f"Invalid TFORM {tform!r}")
+
+    repeat = int(match.group(1)) if match.group(1) else 1
+    code = match.group(2)
+
+    if code == "A":
+        return code, np.dtype(f"S{repeat}")
+    if code == "X":
+        return code, np.dtype(("u1", (-(-repeat // 8),)))
+    if code in "PQ":
+        # array descriptors (number of elements, heap offset)
+        base = ">i4" if code == "P" else ">i8"
+        return code, np.dtype((base, (2,)))
+
+    base = np.dtype(_TFORM_DTYPES[code])
+    if repeat == 1 and tdim is None:
+        return code, base
+
+    shape = (repeat,)
+    if tdim is not None:
+        # TDIM lists the fastest varying axis first
+        shape = tuple(int(d) for d in reversed(tdim.strip("() ").split(",")))
+    return code, np.dtype((base, shape))
+
+
+def table_columns(header: fits.Header) -> list[TableColumn]:
+    """Describe the columns of the binary table with the given header."""
+    columns = []
+    for i in range(1, header["TFIELDS"] + 1):
+        code, dtype = _cell_dtype(header[f"TFORM{i}"], header.get(f"TDIM{i}"))
+        columns.append(
+            TableColumn(
+                name=header.get(f"TTYPE{i}", f"col{i}"),
+                code=code,
+                dtype=dtype,
+                unit=header.get(f"TUNIT{i}"),
+                scale=header.get(f"TSCAL{i}"),
+                zero=header.get(f"TZERO{i}"),
+            )
+        )
+    return columns
+
+
+def table_dtype(header: fits.Header) -> np.dtype:
+    """Structured dtype of one row of the binary table with the given header."""
+    columns = table_columns(header)
+    offsets = np.cumsum([0] + [c.dtype.itemsize for c in columns[:-1]])
+    row_size = sum(c.dtype.itemsize for c in columns)
+    if row_size != header["NAXIS1"]:
+        raise ValueError(
+            f"Column sizes add up to {row_size} bytes, but NAXIS1 is {header['NAXIS1']}"
+        )
+
+    return np.dtype(
+        {
+            "names": [c.name for c in columns],
+            "formats": [c.dtype for c in columns],
+            "offsets": offsets.tolist(),
+            "itemsize": row_size,
+        }
+    )
+
+
+def memmap_rows(
+    path: str | PathLike,
+    location: HDULocation,
+    start: int = 0,
+    stop: int | None = None,
+) -> np.ndarray:
+    """Memory-map the rows ``[start, stop)`` of a binary table HDU read-only.
+
+    Only the byte range of the requested rows is mapped, so the pages touched
+    (and the resident memory) are bounded by the number of rows requested.
+    """
+    dtype = table_dtype(location.header)
+    n_rows = location.header["NAXIS2"]
+    stop = n_rows if stop is None else min(stop, n_rows)
+    start = min(start, stop)
+
+    if start == stop:
+        return np.empty(0, dtype=dtype)
+
+    return np.memmap(
+        path,
+        dtype=dtype,
+        mode="r",
+        offset=location.data_offset + start * dtype.itemsize,
+        shape=(stop - start,),
+    )
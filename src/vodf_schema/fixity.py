@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+
+"""Computation and verification of the FITS DATASUM and CHECKSUM keywords.
+
+The keywords of `~vodf_schema.metadata.FixityHeader` hold the 32-bit ones'
+complement checksums defined in the appendix J of the FITS standard. Here the
+checksums are accumulated with vectorized NumPy sums over memory-mapped blocks
+of the file, and the blocks of all HDUs of a file are summed in parallel
+threads (NumPy releases the GIL in reductions), so large files can be verified
+at close to disk bandwidth.
+"""
+
+import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from os import PathLike
+
+import numpy as np
+from astropy.io import fits
+
+from .fitsblocks import (
+    CARD_SIZE,
+    HDULocation,
+    padded_size,
+    read_header_bytes,
+    scan_hdus,
+)
+
+__all__ = [
+    "DEFAULT_BLOCK_SIZE",
+    "FixityResult",
+    "encode_checksum",
+    "ones_complement_sum",
+    "verify_file",
+    "write_checksums",
+]
+
+#: number of bytes summed at once, a multiple of the FITS block size
+DEFAULT_BLOCK_SIZE = 2880 * 16384
+
+_MASK = 0xFFFFFFFF
+# the uint64 accumulator cannot overflow when summing less than 2**32 words
+_MAX_WORDS = 1 << 31
+_END_CARD = b"END".ljust(CARD_SIZE)
+_BLANK_CARD = b" " * CARD_SIZE
+_ZERO_CHECKSUM = "0" * 16
+
+# punctuation characters avoided by the ASCII encoding of CHECKSUM
+_EXCLUDE = frozenset(b":;<=>?@[\\]^_`")
+
+
+def _fold(total: int) -> int:
+    # end-around carry of the ones' complement addition
+    while total > _MASK:
+        total = (total & _MASK) + (total >> 32)
+    return total
+
+
+def ones_complement_sum(buffer, initial: int = 0) -> int:
+    """Add the big-endian 32-bit words of ``buffer`` to a ones' complement sum.
+
+    Parameters
+    ----------
+    buffer : bytes-like or numpy.ndarray
+        The data, its size in bytes must be a multiple of 4.
+    initial : int
+        The sum of preceding data, e.g. the DATASUM when summing a header.
+    """
+    words = np.frombuffer(buffer, dtype=">u4")
+    total = initial
+    for start in range(0, len(words), _MAX_WORDS):
+        total += int(words[start : start + _MAX_WORDS].sum(dtype=np.uint64))
+    return _fold(total)
+
+
+def _encode_byte(byte: int) -> list[int]:
+    quotient = byte // 4 + ord("0")
+    remainder = byte % 4
+    chars = [quotient + remainder, quotient, quotient, quotient]
+
+    # shift pairs of characters away from punctuation, keeping their sum
+    changed = True
+    while changed:
+        changed = False
+        for j in (0, 2):
+            if chars[j] in _EXCLUDE or chars[j + 1] in _EXCLUDE:
+                chars[j] += 1
+                chars[j + 1] -= 1
+                changed = True
+    return chars
+
+
+_ENCODED_BYTES = [_encode_byte(byte) for byte in range(256)]
+
+
+def encode_checksum(value: int) -> str:
+    """Encode a 32-bit value as the 16 character string used for CHECKSUM.
+
+    The value to encode is the complement of the checksum of the HDU with
+    CHECKSUM set to sixteen zeros, see the appendix J of the FITS standard.
+    """
+    chars = [0] * 16
+    for i in range(4):
+        byte = (value >> (8 * (3 - i))) & 0xFF
+        for j, char in enumerate(_ENCODED_BYTES[byte]):
+            chars[4 * j + i] = char
+    # the characters are rotated right by one
+    return bytes(chars[-1:] + chars[:-1]).decode("ascii")
+
+
+@dataclass(frozen=True)
+class FixityResult:
+    """Checksums of a single HDU."""
+
+    #: index of the HDU in the file
+    index: int
+    extname: str | None
+    #: the computed checksum of the data unit
+    datasum: int
+    #: the ones' complement sum of the complete HDU including its header
+    hdu_sum: int
+    #: value of the DATASUM keyword, None if missing
+    stored_datasum: str | None = None
+    #: value of the CHECKSUM keyword, None if missing
+    stored_checksum: str | None = None
+
+    @property
+    def datasum_valid(self) -> bool | None:
+        """Whether DATASUM matches the data, None if the keyword is missing."""
+        if self.stored_datasum is None:
+            return None
+        try:
+            return int(self.stored_datasum) == self.datasum
+        except ValueError:
+            return False
+
+    @property
+    def checksum_valid(self) -> bool | None:
+        """Whether the HDU sums to negative zero, None if CHECKSUM is missing."""
+        if self.stored_checksum is None:
+            return None
+        return self.hdu_sum == _MASK
+
+    @property
+    def valid(self) -> bool:
+        """False if any of the present keywords does not match."""
+        return self.datasum_valid is not False and self.checksum_valid is not False
+
+
+def _read_header(path: str | PathLike, location: HDULocation) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(location.header_offset)
+        return read_header_bytes(f)
+
+
+def _block_sum(path: str | PathLike, offset: int, size: int) -> int:
+    block = np.memmap(path, dtype=">u4", mode="r", offset=offset, shape=(size // 4,))
+    try:
+        return ones_complement_sum(block)
+    finally:
+        del block
+
+
+def _datasums(
+    path: str | PathLike,
+    locations: list[HDULocation],
+    n_threads: int | None,
+    block_size: int,
+) -> list[int]:
+    blocks = []
+    for i, location in enumerate(locations):
+        # the padding consists of zeros, but it is part of the data unit
+        size = padded_size(location.data_size)
+        for start in range(0, size, block_size):
+            blocks.append(
+                (i, location.data_offset + start, min(block_size, size - start))
+            )
+
+    sums = [0] * len(locations)
+    with ThreadPoolExecutor(n_threads) as pool:
+        results = pool.map(lambda b: _block_sum(path, b[1], b[2]), blocks)
+        # the ones' complement sum does not depend on the order of the words
+        for (i, _, _), block_sum in zip(blocks, results):
+            sums[i] = _fold(sums[i] + block_sum)
+    return sums
+
+
+def _check_block_size(block_size: int):
+    if block_size <= 0 or block_size % 4 != 0:
+        raise ValueError(
+            f"block_size must be a positive multiple of 4, got {block_size}"
+        )
+
+
+def verify_file(
+    path: str | PathLike,
+    n_threads: int | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> list[FixityResult]:
+    """Compute the checksums of all HDUs of a file and compare them to the keywords.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The FITS file.
+    n_threads : int, optional
+        Number of threads summing data blocks, defaults to the
+        `~concurrent.futures.ThreadPoolExecutor` default.
+    block_size : int
+        Number of bytes summed at once by each thread.
+
+    Returns
+    -------
+    list[FixityResult]
+        One result per HDU.
+    """
+    _check_block_size(block_size)
+    locations = scan_hdus(path)
+    datasums = _datasums(path, locations, n_threads, block_size)
+
+    results = []
+    for location, datasum in zip(locations, datasums):
+        header = location.header
+        stored_datasum = header.get("DATASUM")
+        stored_checksum = header.get("CHECKSUM")
+        results.append(
+            FixityResult(
+                index=location.index,
+                extname=location.extname,
+                datasum=datasum,
+                hdu_sum=ones_complement_sum(_read_header(path, location), datasum),
+                stored_datasum=None if stored_datasum is None else str(stored_datasum),
+                stored_checksum=None
+                if stored_checksum is None
+                else str(stored_checksum),
+            )
+        )
+    return results
+
+
+def _find_card(raw: bytearray, keyword: str) -> tuple[int | None, int]:
+    # returns the offsets of the card (None if missing) and of the END card
+    key = keyword.encode("ascii").ljust(8)
+    found = None
+    for start in range(0, len(raw), CARD_SIZE):
+        card = raw[start : start + CARD_SIZE]
+        if card == _END_CARD:
+            return found, start
+        if found is None and card[:8] == key:
+            found = start
+    raise ValueError("Header has no END card")
+
+
+def _set_card(raw: bytearray, card: fits.Card, index: int):
+    image = card.image.encode("ascii")
+    if len(image) != CARD_SIZE:
+        raise ValueError(f"Card {card.keyword} does not fit into a single card image")
+
+    start, end = _find_card(raw, card.keyword)
+    if start is None:
+        # the card is added before END, which needs one free card of padding
+        if raw[end + CARD_SIZE : end + 2 * CARD_SIZE] != _BLANK_CARD:
+            raise ValueError(
+                f"No space left in the header of HDU {index} to add {card.keyword}"
+                " in place"
+            )
+        raw[end + CARD_SIZE : end + 2 * CARD_SIZE] = _END_CARD
+        start = end
+    raw[start : start + CARD_SIZE] = image
+
+
+def write_checksums(
+    path: str | PathLike,
+    hdus: list[int] | None = None,
+    n_threads: int | None = None,
+    block_size: int = DEFAULT_BLOCK_SIZE,
+) -> list[FixityResult]:
+    """Compute DATASUM and CHECKSUM and write them into the headers in place.
+
+    Only the header cards are rewritten, the file is neither copied nor
+    resized. Missing keywords are added before the END card, which fails with
+    a `ValueError` if the last header block has no free card left.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The FITS file, opened for writing.
+    hdus : list[int], optional
+        Indices of the HDUs to update, defaults to all.
+    n_threads : int, optional
+        Number of threads summing data blocks.
+    block_size : int
+        Number of bytes summed at once by each thread.
+
+    Returns
+    -------
+    list[FixityResult]
+        The new checksums of the updated HDUs.
+    """
+    _check_block_size(block_size)
+    locations = scan_hdus(path)
+    if hdus is not None:
+        locations = [locations[i] for i in hdus]
+    datasums = _datasums(path, locations, n_threads, block_size)
+
+    timestamp = datetime.datetime.now().isoformat(timespec="seconds")
+    results = []
+    with open(path, "r+b") as f:
+        for location, datasum in zip(locations, datasums):
+            f.seek(location.header_offset)
+            raw = bytearray(read_header_bytes(f))
+
+            _set_card(
+                raw,
+                fits.Card(
+                    "DATASUM", str(datasum), f"data unit checksum updated {timestamp}"
+                ),
+                location.index,
+            )
+            comment = f"HDU checksum updated {timestamp}"
+            _set_card(
+                raw, fits.Card("CHECKSUM", _ZERO_CHECKSUM, comment), location.index
+            )
+            checksum = encode_checksum(~ones_complement_sum(raw, datasum) & _MASK)
+            _set_card(raw, fits.Card("CHECKSUM", checksum, comment), location.index)
+
+            f.seek(location.header_offset)
+            f.write(raw)
+            results.append(
+                FixityResult(
+                    index=location.index,
+                    extname=location.extname,
+                    datasum=datasum,
+                    hdu_sum=ones_complement_sum(raw, datasum),
+                    stored_datasum=str(datasum),
+                    stored_checksum=checksum,
+                )
+            )
+    return results
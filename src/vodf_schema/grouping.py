@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+"""Resolution of the members of grouping tables into HDUs.
+
+The rows of a `~vodf_schema.hdu.GroupingTable` (e.g. an
+`~vodf_schema.level1.ObservationGroupingTable`) point to their member HDUs by
+file location, EXTNAME and EXTVER. `MemberResolver` scans the headers of each
+member file once, caches the byte offsets of all its HDUs keyed by
+(EXTNAME, EXTVER) and keeps a bounded pool of open file handles, so that
+resolving many members of the same files needs neither repeated scans nor
+repeated opening of the files.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from os import PathLike
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+import numpy as np
+from astropy.io import fits
+
+from .fitsblocks import HDULocation, iter_hdus, memmap_rows, padded_size
+
+__all__ = ["DEFAULT_MAX_OPEN_FILES", "MemberHDU", "MemberResolver"]
+
+#: default size of the pool of open member files
+DEFAULT_MAX_OPEN_FILES = 32
+
+_HDU_CLASSES = {
+    "BINTABLE": fits.BinTableHDU,
+    "TABLE": fits.TableHDU,
+    "IMAGE": fits.ImageHDU,
+}
+
+
+@dataclass(frozen=True)
+class MemberHDU:
+    """Handle of a resolved group member.
+
+    The header is available without any further I/O, the data are read
+    through the file handle pool of the resolver that created the handle.
+    """
+
+    path: Path
+    location: HDULocation
+    resolver: "MemberResolver"
+
+    @property
+    def header(self) -> fits.Header:
+        """The header of the member HDU."""
+        return self.location.header
+
+    def read_bytes(self) -> bytes:
+        """Read the raw header and data blocks of the member HDU."""
+        location = self.location
+        size = location.header_size + padded_size(location.data_size)
+        return self.resolver.read(self.path, location.header_offset, size)
+
+    def to_hdu(self) -> fits.hdu.base.ExtensionHDU | fits.PrimaryHDU:
+        """Read the member into an in-memory astropy HDU."""
+        xtension = self.header.get("XTENSION")
+        if xtension is None:
+            cls = fits.PrimaryHDU
+        else:
+            cls = _HDU_CLASSES.get(xtension.strip().upper())
+            if cls is None:
+                raise ValueError(f"Unsupported extension type {xtension!r}")
+        return cls.fromstring(self.read_bytes())
+
+    def memmap_rows(self, start: int = 0, stop: int | None = None) -> np.ndarray:
+        """Memory-map rows of a binary table member, see `~vodf_schema.fitsblocks.memmap_rows`."""
+        return memmap_rows(self.path, self.location, start, stop)
+
+
+class _FileIndex:
+    """HDU locations of one file, keyed by (EXTNAME, EXTVER)."""
+
+    def __init__(self, path: Path, stat: os.stat_result):
+        self.key = (stat.st_size, stat.st_mtime_ns)
+        self.locations = {}
+        self.first = {}
+        for location in iter_hdus(path):
+            extname = location.extname
+            if extname is None:
+                continue
+            extname = extname.upper()
+            self.locations.setdefault((extname, location.extver), location)
+            self.first.setdefault(extname, location)
+
+    def find(self, name: str, version: int | None) -> HDULocation | None:
+        if version is None:
+            return self.first.get(name.upper())
+        return self.locations.get((name.upper(), version))
+
+
+def _member_path(location: str, uri_type: str | None, base: Path | None) -> Path:
+    if uri_type and uri_type.strip().upper() not in {"URL", ""}:
+        raise ValueError(f"Unsupported MEMBER_URI_TYPE {uri_type!r}")
+
+    parsed = urlparse(location)
+    if parsed.scheme not in {"", "file"}:
+        raise ValueError(f"Only local file URLs are supported, got {location!r}")
+
+    path = Path(unquote(parsed.path))
+    # partial URLs are relative to the file containing the grouping table
+    if path.is_absolute() or base is None:
+        return path
+    return base.parent / path
+
+
+def _null_to_none(value):
+    if value is None or value is np.ma.masked:
+        return None
+    if isinstance(value, bytes):
+        value = value.decode("ascii")
+    if isinstance(value, str):
+        return value.strip() or None
+    return int(value)
+
+
+class MemberResolver:
+    """Resolves group members to `MemberHDU` handles.
+
+    Each member file is scanned once; its HDU offsets are cached until the
+    size or modification time of the file changes. At most
+    ``max_open_files`` files are kept open, the least recently used one is
+    closed when another file needs to be opened. Resolvers can be shared
+    between threads.
+
+    Parameters
+    ----------
+    max_open_files : int
+        Size of the pool of open file handles.
+    """
+
+    def __init__(self, max_open_files: int = DEFAULT_MAX_OPEN_FILES):
+        if max_open_files < 1:
+            raise ValueError("max_open_files must be at least 1")
+        self.max_open_files = max_open_files
+        self._indices = {}
+        self._handles = OrderedDict()
+        self._lock = threading.RLock()
+
+    def __enter__(self):
+        """Return the resolver, its files are closed on exit."""
+        return self
+
+    def __exit__(self, *exc):
+        """Close all open files."""
+        self.close()
+
+    def close(self):
+        """Close all open files, the cached HDU offsets are kept."""
+        with self._lock:
+            while self._handles:
+                _, handle = self._handles.popitem()
+                handle.close()
+
+    @property
+    def n_open_files(self) -> int:
+        """Number of currently open member files."""
+        return len(self._handles)
+
+    def _index(self, path: Path) -> _FileIndex:
+        stat = path.stat()
+        with self._lock:
+            index = self._indices.get(path)
+            if index is None or index.key != (stat.st_size, stat.st_mtime_ns):
+                index = self._indices[path] = _FileIndex(path, stat)
+                # the file changed, so an open handle may be outdated
+                handle = self._handles.pop(path, None)
+                if handle is not None:
+                    handle.close()
+            return index
+
+    def read(self, path: Path, offset: int, size: int) -> bytes:
+        """Read ``size`` bytes at ``offset`` of a file through the handle pool."""
+        with self._lock:
+            handle = self._handles.get(path)
+            if handle is None:
+                if len(self._handles) >= self.max_open_files:
+                    _, oldest = self._handles.popitem(last=False)
+                    oldest.close()
+                handle = self._handles[path] = open(path, "rb")
+            else:
+                self._handles.move_to_end(path)
+
+            handle.seek(offset)
+            data = handle.read(size)
+
+        if len(data) != size:
+            raise OSError(f"File {path} ended before the end of the HDU")
+        return data
+
+    def resolve(
+        self,
+        name: str,
+        version: int | None = None,
+        location: str | None = None,
+        uri_type: str | None = None,
+        base: str | PathLike | None = None,
+    ) -> MemberHDU:
+        """Resolve a single member.
+
+        Parameters
+        ----------
+        name : str
+            MEMBER_NAME, the EXTNAME of the member HDU.
+        version : int, optional
+            MEMBER_VERSION, the EXTVER of the member HDU. If None, the first
+            HDU with a matching EXTNAME is used.
+        location : str, optional
+            MEMBER_LOCATION, a path or file URL. Relative locations are
+            relative to the directory of ``base``. If None, the member is in
+            ``base`` itself.
+        uri_type : str, optional
+            MEMBER_URI_TYPE, only "URL" is supported.
+        base : str or PathLike, optional
+            Path of the file containing the grouping table.
+
+        Returns
+        -------
+        MemberHDU
+            Handle of the member HDU.
+        """
+        base = None if base is None else Path(base)
+        if location is None:
+            if base is None:
+                raise ValueError("Members without location need the grouping file")
+            path = base
+        else:
+            path = _member_path(location, uri_type, base)
+        path = path.resolve()
+
+        found = self._index(path).find(name, version)
+        if found is None:
+            raise KeyError(f"No HDU ({name!r}, {version}) in {path}")
+        return MemberHDU(path, found, self)
+
+    def resolve_table(
+        self, path: str | PathLike, hdu: int | str = "GROUPING"
+    ) -> list[MemberHDU]:
+        """Resolve all members of a grouping table HDU of a file.
+
+        Parameters
+        ----------
+        path : str or PathLike
+            File containing the grouping table.
+        hdu : int or str
+            Index or EXTNAME of the grouping table HDU.
+
+        Returns
+        -------
+        list[MemberHDU]
+            One handle per row, in table order.
+        """
+        from astropy.table import Table
+
+        path = Path(path)
+        table = Table.read(path, hdu=hdu)
+        columns = set(table.colnames)
+
+        def values(name):
+            if name not in columns:
+                return [None] * len(table)
+            return [_null_to_none(v) for v in table[name]]
+
+        return [
+            self.resolve(name, version, location, uri_type, base=path)
+            for name, version, location, uri_type in zip(
+                values("MEMBER_NAME"),
+                values("MEMBER_VERSION"),
+                values("MEMBER_LOCATION"),
+                values("MEMBER_URI_TYPE"),
+            )
+        ]
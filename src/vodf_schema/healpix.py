@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+
+"""Minimal vectorized HEALPix pixelization in the NESTED scheme.
+
+Only what is needed to index event positions is implemented: the conversion
+of sky coordinates to pixel numbers and of pixel numbers to the coordinates of
+their centers, following Górski et al. 2005, ApJ 622, 759 and the reference
+implementation in ``healpix_base``, so that pixel numbers are those of
+``healpy`` with ``nest=True`` without depending on it.
+"""
+
+import numpy as np
+
+__all__ = ["ang2pix_nested", "max_pixel_radius", "order_to_nside", "pix2ang_nested"]
+
+_JRLL = np.array([2, 2, 2, 2, 3, 3, 3, 3, 4, 4, 4, 4])
+_JPLL = np.array([1, 3, 5, 7, 0, 2, 4, 6, 1, 3, 5, 7])
+
+
+def order_to_nside(order: int) -> int:
+    """Return the NSIDE of a HEALPix order (NSIDE = 2**order)."""
+    if not 0 <= order <= 29:
+        raise ValueError(f"HEALPix order must be in [0, 29], got {order}")
+    return 1 << order
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    # move the bits of v to the even bit positions
+    v = v.astype(np.uint64)
+    result = np.zeros_like(v)
+    for bit in range(30):
+        result |= ((v >> np.uint64(bit)) & np.uint64(1)) << np.uint64(2 * bit)
+    return result
+
+
+def _compress_bits(v: np.ndarray) -> np.ndarray:
+    # the inverse of _spread_bits
+    v = v.astype(np.uint64)
+    result = np.zeros_like(v)
+    for bit in range(30):
+        result |= ((v >> np.uint64(2 * bit)) & np.uint64(1)) << np.uint64(bit)
+    return result
+
+
+def ang2pix_nested(order: int, lon, lat) -> np.ndarray:
+    """Return the NESTED pixel numbers of the given positions.
+
+    Parameters
+    ----------
+    order : int
+        HEALPix order, NSIDE = 2**order.
+    lon, lat : array-like
+        Longitude and latitude (e.g. RA and Dec) in degrees.
+
+    Returns
+    -------
+    numpy.ndarray
+        The pixel numbers as int64.
+    """
+    nside = order_to_nside(order)
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+
+    z = np.sin(np.deg2rad(lat))
+    za = np.abs(z)
+    # in [0, 4)
+    tt = np.mod(lon, 360.0) / 90.0
+    tt = np.where(tt >= 4.0, 0.0, tt)
+
+    # equatorial region
+    temp1 = nside * (0.5 + tt)
+    temp2 = nside * (z * 0.75)
+    jp = (temp1 - temp2).astype(np.int64)
+    jm = (temp1 + temp2).astype(np.int64)
+    ifp = jp >> order
+    ifm = jm >> order
+    face_eq = np.where(ifp == ifm, ifp | 4, np.where(ifp < ifm, ifp, ifm + 8))
+    ix_eq = jm & (nside - 1)
+    iy_eq = nside - (jp & (nside - 1)) - 1
+
+    # polar caps
+    ntt = np.minimum(tt.astype(np.int64), 3)
+    tp = tt - ntt
+    tmp = nside * np.sqrt(3.0 * (1.0 - za))
+    jp_pol = np.minimum((tp * tmp).astype(np.int64), nside - 1)
+    jm_pol = np.minimum(((1.0 - tp) * tmp).astype(np.int64), nside - 1)
+    north = z >= 0
+    face_pol = np.where(north, ntt, ntt + 8)
+    ix_pol = np.where(north, nside - jm_pol - 1, jp_pol)
+    iy_pol = np.where(north, nside - jp_pol - 1, jm_pol)
+
+    equatorial = za <= 2.0 / 3.0
+    face = np.where(equatorial, face_eq, face_pol)
+    ix = np.where(equatorial, ix_eq, ix_pol)
+    iy = np.where(equatorial, iy_eq, iy_pol)
+
+    xy = _spread_bits(ix) | (_spread_bits(iy) << np.uint64(1))
+    return (face.astype(np.int64) << (2 * order)) + xy.astype(np.int64)
+
+
+def pix2ang_nested(order: int, pixels) -> tuple[np.ndarray, np.ndarray]:
+    """Return longitude and latitude in degrees of the centers of NESTED pixels."""
+    nside = order_to_nside(order)
+    pixels = np.asarray(pixels, dtype=np.int64)
+    npix = 12 * nside * nside
+    if np.any((pixels < 0) | (pixels >= npix)):
+        raise ValueError(f"Pixel numbers must be in [0, {npix})")
+
+    face = pixels >> (2 * order)
+    xy = (pixels & (nside * nside - 1)).astype(np.uint64)
+    ix = _compress_bits(xy).astype(np.int64)
+    iy = _compress_bits(xy >> np.uint64(1)).astype(np.int64)
+
+    fact2 = 4.0 / npix
+    jr = _JRLL[face] * nside - ix - iy - 1
+
+    north = jr < nside
+    south = jr > 3 * nside
+    nr = np.where(north, jr, np.where(south, 4 * nside - jr, nside))
+    z = np.where(
+        north,
+        1.0 - nr * nr * fact2,
+        np.where(south, nr * nr * fact2 - 1.0, (2 * nside - jr) * 2.0 / (3.0 * nside)),
+    )
+    kshift = np.where(north | south, 0, (jr - nside) & 1)
+
+    jp = (_JPLL[face] * nr + ix - iy + 1 + kshift) // 2
+    jp = np.where(jp > 4 * nside, jp - 4 * nside, jp)
+    jp = np.where(jp < 1, jp + 4 * nside, jp)
+
+    lon = (jp - (kshift + 1) * 0.5) * (90.0 / nr)
+    lat = np.rad2deg(np.arcsin(np.clip(z, -1.0, 1.0)))
+    return lon, lat
+
+
+def max_pixel_radius(order: int) -> float:
+    """Return an upper bound in degrees of the distance of any point of a pixel to its center.
+
+    HEALPix pixels have equal areas and bounded distortion; twice the square
+    root of the pixel area is a safe bound for all orders.
+    """
+    nside = order_to_nside(order)
+    return 2.0 * np.rad2deg(np.sqrt(4.0 * np.pi / (12 * nside * nside)))
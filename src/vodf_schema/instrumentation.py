@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+"""Opt-in profiling of the validation.
+
+Validation is only instrumented while a `Profiler` is active::
+
+    with Profiler() as profiler:
+        validate_file("events.fits")
+    print(profiler.to_json())
+
+The validation functions of `vodf_schema.validation` open named spans for
+each file, HDU, header, header class, column, rule, unit parsing and read of
+rows. Spans with the same name below the same parent are aggregated, e.g. a
+column validated in 100 chunks is a single span with ``count=100``, so the
+profile of any file is a small tree. Each span records:
+
+* ``seconds``: the summed wall time,
+* ``bytes_read``: for files, HDUs and reads the bytes read from the file, for
+  columns the bytes of the values checked,
+* ``n_rows``: the number of table rows processed,
+* ``count``: how often the span was entered, for header classes the number
+  of cards checked.
+
+The tree is exported as json (`Profiler.to_dict`), in the Chrome trace event
+format (`Profiler.to_trace`, for chrome://tracing, Perfetto or speedscope) and
+as folded stacks of self times (`Profiler.to_folded`, for ``flamegraph.pl``).
+Callbacks registered with `Profiler.add_callback` are called with a
+`SpanEvent` at the end of every span.
+
+Without an active profiler, each instrumentation point costs a single
+context variable lookup. With ``n_jobs > 1``, the worker processes profile
+their shards and the results are merged below a ``shards`` span, whose
+children then sum up to more than its wall time.
+"""
+
+import json
+import os
+from collections.abc import Callable
+from contextlib import nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from time import perf_counter_ns
+
+__all__ = [
+    "Profiler",
+    "Span",
+    "SpanEvent",
+    "active_profiler",
+    "record_io",
+    "span",
+]
+
+_current: ContextVar["Profiler | None"] = ContextVar("vodf_profiler", default=None)
+
+# returned by `span` while not profiling, stateless and thus reusable
+_NO_SPAN = nullcontext()
+
+
+@dataclass
+class Span:
+    """Aggregated measurements of all entries of one span of a profile."""
+
+    #: e.g. "file", "hdu", "header", "header-class", "column", "rule" or "read"
+    category: str
+    name: str
+    #: `time.perf_counter_ns` of the first entry
+    start: int = 0
+    #: summed wall time of all entries in nanoseconds
+    duration: int = 0
+    count: int = 0
+    bytes_read: int = 0
+    n_rows: int = 0
+    children: dict[tuple[str, str], "Span"] = field(default_factory=dict)
+
+    @property
+    def seconds(self) -> float:
+        """The summed wall time in seconds."""
+        return self.duration * 1e-9
+
+    def child(self, category: str, name: str, start: int) -> "Span":
+        """Return the child span of the given name, creating it on first use."""
+        key = (category, name)
+        child = self.children.get(key)
+        if child is None:
+            child = self.children[key] = Span(category, name, start)
+        return child
+
+    def merge(self, other: "Span"):
+        """Add the measurements of ``other``, e.g. of another process."""
+        self.start = min(self.start, other.start) if self.count else other.start
+        self.duration += other.duration
+        self.count += other.count
+        self.bytes_read += other.bytes_read
+        self.n_rows += other.n_rows
+        for child in other.children.values():
+            self.child(child.category, child.name, child.start).merge(child)
+
+    def to_dict(self) -> dict:
+        """Convert to a dict of builtin types, e.g. for json serialization."""
+        return {
+            "category": self.category,
+            "name": self.name,
+            "seconds": self.seconds,
+            "count": self.count,
+            "bytes_read": self.bytes_read,
+            "n_rows": self.n_rows,
+            "children": [c.to_dict() for c in self.children.values()],
+        }
+
+
+@dataclass(frozen=True)
+class SpanEvent:
+    """A single finished span, as passed to the callbacks of a `Profiler`."""
+
+    #: names of the enclosing spans, outermost first
+    path: tuple[str, ...]
+    category: str
+    name: str
+    seconds: float
+    bytes_read: int
+    n_rows: int
+
+
+class _ActiveSpan:
+    __slots__ = (
+        "profiler",
+        "category",
+        "name",
+        "n_rows",
+        "bytes_read",
+        "node",
+        "start",
+    )
+
+    def __init__(self, profiler, category, name, n_rows, bytes_read):
+        self.profiler = profiler
+        self.category = category
+        self.name = name
+        self.n_rows = n_rows
+        self.bytes_read = bytes_read
+
+    def __enter__(self):
+        self.start = perf_counter_ns()
+        stack = self.profiler._stack
+        self.node = stack[-1].child(self.category, self.name, self.start)
+        self.node.n_rows += self.n_rows
+        self.node.bytes_read += self.bytes_read
+        stack.append(self.node)
+        return self.node
+
+    def __exit__(self, *exc):
+        elapsed = perf_counter_ns() - self.start
+        self.node.duration += elapsed
+        self.node.count += 1
+        self.profiler._stack.pop()
+        self.profiler._notify(self.node, elapsed, self.n_rows, self.bytes_read)
+
+
+class Profiler:
+    """Collects the spans of the validation while active, see the module docs.
+
+    Parameters
+    ----------
+    callbacks : list[Callable[[SpanEvent], None]], optional
+        Called at the end of each span, see `add_callback`.
+    """
+
+    def __init__(self, callbacks: list[Callable[[SpanEvent], None]] = ()):
+        self.root = Span("profile", "validation")
+        self.callbacks = list(callbacks)
+        self._stack = [self.root]
+        self._token = None
+
+    def __enter__(self) -> "Profiler":
+        """Activate the profiler in the current context."""
+        if self._token is not None:
+            raise RuntimeError("The profiler is already active")
+        self._token = _current.set(self)
+        self._start = perf_counter_ns()
+        if not self.root.count:
+            self.root.start = self._start
+        return self
+
+    def __exit__(self, *exc):
+        """Deactivate the profiler."""
+        self.root.duration += perf_counter_ns() - self._start
+        self.root.count += 1
+        _current.reset(self._token)
+        self._token = None
+
+    def add_callback(self, callback: Callable[[SpanEvent], None]):
+        """Call ``callback`` with a `SpanEvent` at the end of each span."""
+        self.callbacks.append(callback)
+
+    def span(self, category: str, name: str, n_rows: int = 0, bytes_read: int = 0):
+        """Return a context manager measuring a span below the current one."""
+        return _ActiveSpan(self, category, name, n_rows, bytes_read)
+
+    def add(
+        self,
+        category: str,
+        name: str,
+        duration: int,
+        count: int = 1,
+        n_rows: int = 0,
+        bytes_read: int = 0,
+    ):
+        """Record a span below the current one that was timed elsewhere.
+
+        ``duration`` is in nanoseconds, e.g. the time spent on the cards of
+        one header class, summed over the cards.
+        """
+        node = self._stack[-1].child(category, name, perf_counter_ns() - duration)
+        node.duration += duration
+        node.count += count
+        node.n_rows += n_rows
+        node.bytes_read += bytes_read
+        self._notify(node, duration, n_rows, bytes_read)
+
+    def record_io(self, n_bytes: int):
+        """Add bytes read from a file to the current span and all enclosing ones."""
+        for node in self._stack:
+            node.bytes_read += n_bytes
+
+    def merge(self, root: Span):
+        """Merge the spans of another profiler, e.g. of a worker process, below the current one."""
+        current = self._stack[-1]
+        for child in root.children.values():
+            current.child(child.category, child.name, child.start).merge(child)
+            for node in self._stack:
+                node.bytes_read += child.bytes_read
+
+    def _notify(self, node: Span, elapsed: int, n_rows: int, bytes_read: int):
+        if not self.callbacks:
+            return
+        event = SpanEvent(
+            path=tuple(s.name for s in self._stack[1:]),
+            category=node.category,
+            name=node.name,
+            seconds=elapsed * 1e-9,
+            bytes_read=bytes_read,
+            n_rows=n_rows,
+        )
+        for callback in self.callbacks:
+            callback(event)
+
+    def to_dict(self) -> dict:
+        """Return the span tree as a dict of builtin types."""
+        return self.root.to_dict()
+
+    def to_json(self, **kwargs) -> str:
+        """Return the span tree as json, ``kwargs`` are passed to `json.dumps`."""
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_trace(self) -> dict:
+        """Return the spans in the Chrome trace event format.
+
+        Aggregated spans are laid out one after the other from their first
+        start, as complete ("X") events with times in microseconds.
+        """
+        events = []
+        pid = os.getpid()
+
+        def add(node: Span, ts: float, end: float):
+            duration = min(node.duration / 1e3, end - ts)
+            events.append(
+                {
+                    "name": node.name,
+                    "cat": node.category,
+                    "ph": "X",
+                    "ts": ts,
+                    "dur": duration,
+                    "pid": pid,
+                    "tid": 0,
+                    "args": {
+                        "count": node.count,
+                        "bytes_read": node.bytes_read,
+                        "n_rows": node.n_rows,
+                    },
+                }
+            )
+            child_end = ts
+            for child in node.children.values():
+                child_ts = max((child.start - origin) / 1e3, child_end)
+                if child_ts >= ts + duration:
+                    child_ts = child_end
+                child_end = add(child, child_ts, ts + duration)
+            return ts + duration
+
+        origin = self.root.start
+        add(self.root, 0.0, self.root.duration / 1e3)
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def to_folded(self) -> str:
+        """Return the self times in microseconds as folded stacks, one per line."""
+        lines = []
+
+        def add(node: Span, stack: str):
+            children = node.children.values()
+            own = node.duration - sum(c.duration for c in children)
+            if own > 0:
+                lines.append(f"{stack} {round(own / 1e3)}")
+            for child in children:
+                add(child, f"{stack};{child.category}:{child.name}")
+
+        add(self.root, self.root.name)
+        return "\n".join(lines)
+
+
+def active_profiler() -> Profiler | None:
+    """Return the profiler active in the current context, if any."""
+    return _current.get()
+
+
+def span(category: str, name: str, n_rows: int = 0, bytes_read: int = 0):
+    """Measure a span if a profiler is active, otherwise do nothing.
+
+    Returns a context manager, see `Profiler.span`.
+    """
+    profiler = _current.get()
+    if profiler is None:
+        return _NO_SPAN
+    return _ActiveSpan(profiler, category, name, n_rows, bytes_read)
+
+
+def record_io(n_bytes: int):
+    """Record bytes read from a file if a profiler is active."""
+    profiler = _current.get()
+    if profiler is not None:
+        profiler.record_io(n_bytes)
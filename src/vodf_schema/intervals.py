@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+
+"""Vectorized set operations on time intervals, e.g. Good Time Intervals.
+
+`TimeIntervals` holds a normalized set of closed intervals: sorted by start,
+disjoint and with touching or overlapping intervals merged. All operations
+are NumPy sweeps over the sorted interval limits, O(n log n) for n
+intervals without Python loops, so millions of intervals are cheap:
+
+* normalizing sorts the intervals and merges those that overlap the running
+  maximum of the previous stops,
+* union, intersection and difference count, for each elementary segment
+  between consecutive limits, how many of the input sets cover it,
+* events are assigned to intervals by `numpy.searchsorted`.
+
+`check_exposure` compares the exposure keywords of an observation header
+(ONTIME, LIVETIME and DEADC, see `~vodf_schema.metadata.ObservationHeader`)
+with its GTIs; `vodf_schema.validation.validate_file` uses it for event
+lists stored together with a GTI HDU.
+"""
+
+from collections.abc import Mapping
+from os import PathLike
+
+import numpy as np
+
+from .compression import is_compressed_table, iter_tiles, uncompressed_header
+from .fitsblocks import HDULocation, find_hdu, memmap_rows, scan_hdus, table_columns
+from .report import Issue, ValidationReport
+
+__all__ = [
+    "EXPOSURE_TOLERANCE",
+    "TimeIntervals",
+    "check_exposure",
+]
+
+#: absolute tolerance in seconds of exposure keywords computed from GTIs
+EXPOSURE_TOLERANCE = 1e-3
+
+
+def _sweep(
+    starts: np.ndarray, stops: np.ndarray, weights: np.ndarray, target: int
+) -> tuple[np.ndarray, np.ndarray]:
+    # the segments between consecutive limits where the summed weights of the
+    # covering intervals equal ``target``
+    limits = np.concatenate([starts, stops])
+    steps = np.concatenate([weights, -weights])
+    order = np.argsort(limits, kind="stable")
+    limits, level = limits[order], np.cumsum(steps[order])
+    # the level after the last limit at the same position counts
+    selected = (level[:-1] == target) & (limits[1:] > limits[:-1])
+    index = np.flatnonzero(selected)
+    return limits[index], limits[index + 1]
+
+
+class TimeIntervals:
+    """A normalized set of closed time intervals ``[start, stop]``.
+
+    Parameters
+    ----------
+    start, stop : array-like
+        Limits of the intervals in any order, possibly overlapping, e.g. in
+        seconds of MET. Intervals with ``stop < start`` raise a `ValueError`.
+    """
+
+    def __init__(self, start, stop):
+        start = np.asarray(start, dtype=np.float64).reshape(-1)
+        stop = np.asarray(stop, dtype=np.float64).reshape(-1)
+        if start.shape != stop.shape:
+            raise ValueError("start and stop must have the same length")
+        invalid = ~(start <= stop)
+        if np.any(invalid):
+            raise ValueError(
+                f"{np.count_nonzero(invalid)} intervals stop before they start"
+            )
+
+        if len(start) > 1:
+            order = np.argsort(start, kind="stable")
+            start, stop = start[order], stop[order]
+            reach = np.maximum.accumulate(stop)
+            # an interval starts a new group unless it overlaps or touches
+            first = np.flatnonzero(np.r_[True, start[1:] > reach[:-1]])
+            start, stop = start[first], np.maximum.reduceat(stop, first)
+        self.start = start
+        self.stop = stop
+
+    @classmethod
+    def read(
+        cls,
+        path: str | PathLike,
+        hdu: int | str | tuple[str, int] | HDULocation = "GTI",
+    ) -> "TimeIntervals":
+        """Read the START and STOP columns of a GTI HDU.
+
+        ``hdu`` is an index, EXTNAME or (EXTNAME, EXTVER), or a location found
+        by `~vodf_schema.fitsblocks.scan_hdus`.
+        """
+        location = hdu
+        if not isinstance(location, HDULocation):
+            location = find_hdu(scan_hdus(path), hdu)
+
+        header, names = location.header, ("START", "STOP")
+        if is_compressed_table(header):
+            tiles = [values for _, values in iter_tiles(path, location, names)]
+            header = uncompressed_header(header)
+            raw = {n: np.concatenate([tile[n] for tile in tiles]) for n in names}
+        else:
+            raw = memmap_rows(path, location)
+        columns = {c.name: c for c in table_columns(header)}
+        start, stop = (columns[n].physical(raw[n]) for n in names)
+        return cls(start, stop)
+
+    def __len__(self) -> int:
+        """Return the number of disjoint intervals."""
+        return len(self.start)
+
+    def __repr__(self):
+        """Return the number of intervals and their total duration."""
+        return f"<TimeIntervals n={len(self)} duration={self.duration:g}>"
+
+    def __eq__(self, other):
+        """Return whether both sets cover the same times."""
+        if not isinstance(other, TimeIntervals):
+            return NotImplemented
+        return np.array_equal(self.start, other.start) and np.array_equal(
+            self.stop, other.stop
+        )
+
+    @property
+    def duration(self) -> float:
+        """The total duration of the intervals, e.g. the ONTIME of GTIs."""
+        return float(np.sum(self.stop - self.start))
+
+    def union(self, *others: "TimeIntervals") -> "TimeIntervals":
+        """Return the times covered by any of the sets."""
+        sets = (self, *others)
+        return TimeIntervals(
+            np.concatenate([s.start for s in sets]),
+            np.concatenate([s.stop for s in sets]),
+        )
+
+    def intersection(self, *others: "TimeIntervals") -> "TimeIntervals":
+        """Return the times covered by all of the sets."""
+        sets = (self, *others)
+        start, stop = _sweep(
+            np.concatenate([s.start for s in sets]),
+            np.concatenate([s.stop for s in sets]),
+            np.ones(sum(len(s) for s in sets), dtype=np.int64),
+            target=len(sets),
+        )
+        # segments of the sweep may touch, e.g. at the limits of one set
+        return TimeIntervals(start, stop)
+
+    def difference(self, other: "TimeIntervals") -> "TimeIntervals":
+        """Return the times covered by this set, but not by ``other``."""
+        weights = np.r_[
+            np.ones(len(self), dtype=np.int64), -np.ones(len(other), dtype=np.int64)
+        ]
+        start, stop = _sweep(
+            np.r_[self.start, other.start], np.r_[self.stop, other.stop], weights, 1
+        )
+        return TimeIntervals(start, stop)
+
+    def index(self, times) -> np.ndarray:
+        """Return the index of the interval containing each time, or -1.
+
+        Sorted times, e.g. of time-ordered event lists, are searched much
+        faster than random ones.
+        """
+        times = np.asarray(times)
+        if len(self) == 0:
+            return np.full(times.shape, -1, dtype=np.intp)
+        index = np.searchsorted(self.start, times, side="right")
+        index -= 1
+        outside = index < 0
+        outside |= times > self.stop[index]
+        index[outside] = -1
+        return index
+
+    def contains(self, times) -> np.ndarray:
+        """Return a mask of the times within any of the intervals."""
+        return self.index(times) >= 0
+
+
+def check_exposure(
+    header: Mapping,
+    gti: TimeIntervals,
+    report: ValidationReport,
+    tolerance: float = EXPOSURE_TOLERANCE,
+):
+    """Report exposure keywords of ``header`` that disagree with the GTIs.
+
+    ONTIME must equal the total duration of the GTIs. LIVETIME must not
+    exceed ONTIME, and equal ONTIME * DEADC if the dead time correction
+    DEADC is given. EXPOSURE may include further corrections, e.g. for
+    vignetting, so it must only not exceed the live time of the GTIs, their
+    duration times DEADC if given. It is not compared with LIVETIME, which
+    is checked on its own. Keywords that are missing are not checked.
+    """
+    ontime = gti.duration
+    if header.get("ONTIME") is not None and abs(header["ONTIME"] - ontime) > tolerance:
+        report.add(
+            Issue(
+                "ExposureMismatch",
+                f"ONTIME is {header['ONTIME']}, but the GTIs sum up to {ontime}",
+                context="ONTIME",
+            )
+        )
+
+    livetime = header.get("LIVETIME")
+    deadc = header.get("DEADC")
+    if livetime is not None and livetime > ontime + tolerance:
+        report.add(
+            Issue(
+                "ExposureMismatch",
+                f"LIVETIME {livetime} exceeds the ONTIME of the GTIs, {ontime}",
+                context="LIVETIME",
+            )
+        )
+    if (
+        livetime is not None
+        and deadc is not None
+        and abs(livetime - ontime * deadc) > tolerance
+    ):
+        report.add(
+            Issue(
+                "ExposureMismatch",
+                f"LIVETIME is {livetime}, but ONTIME of the GTIs * DEADC is"
+                f" {ontime * deadc}",
+                context="LIVETIME",
+            )
+        )
+
+    exposure = header.get("EXPOSURE")
+    gti_livetime = ontime if deadc is None else ontime * deadc
+    if exposure is not None and exposure > gti_livetime + tolerance:
+        report.add(
+            Issue(
+                "ExposureMismatch",
+                f"EXPOSURE {exposure} exceeds the live time of the GTIs,"
+                f" {gti_livetime}",
+                context="EXPOSURE",
+            )
+        )
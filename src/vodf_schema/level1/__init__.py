@@ -2,7 +2,35 @@
 
 """VODF Level 1."""
 
-from .eventlist import EventList
-from .groups import IRFGroupingTable, ObservationGroupingTable
+import importlib
 
-__all__ = ["ObservationGroupingTable", "IRFGroupingTable", "EventList"]
+__all__ = [
+    "ObservationGroupingTable",
+    "IRFGroupingTable",
+    "EventList",
+    "GoodTimeIntervals",
+]
+
+# the schemas are only imported when accessed, see vodf_schema.__getattr__
+_MODULES = {
+    "EventList": ".eventlist",
+    "GoodTimeIntervals": ".gti",
+    "IRFGroupingTable": ".groups",
+    "ObservationGroupingTable": ".groups",
+}
+
+
+def __getattr__(name):
+    """Import the schema classes on first access."""
+    module = _MODULES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """List the attributes including the not yet imported schemas."""
+    return sorted(set(globals()) | set(__all__))
@@ -2,6 +2,7 @@
 
 """VODF Level 1 EventList HDU Definition."""
 
+import numpy as np
 from astropy import units as u
 from fits_schema import (
     BinaryTable,
@@ -18,6 +19,8 @@ from ..metadata import (
     VODFFormatHeader,
 )
 from ..references import Ref
+from ..rules import InRange, Precision, SortedBy, Unique, WithinHeaderRange
+from ..storage import ColumnStorage, StorageProfile
 
 __all__ = ["EventList"]
 
@@ -51,6 +54,16 @@ class EventList(BinaryTable):
             description="event-list table",
             reference=Ref.ogip,
         )
+        TSORTKEY = HeaderCard(
+            type_=str,
+            required=False,
+            description=(
+                "Comma-separated list of the columns by which the rows are sorted. "
+                "Time-ordered event lists should set 'TIME', which allows to select "
+                "time ranges by binary search"
+            ),
+            reference=Ref.heasarc,
+        )
 
     # Mandatory Columns
     EVENT_ID = Int64(
@@ -80,3 +93,39 @@ class EventList(BinaryTable):
         ucd="phys.energy;stat.fit",
         reference=Ref.ogip_event_lists,
     )
+
+    # Semantic constraints on the column values, see vodf_schema.rules
+    __rules__ = (
+        Unique("EVENT_ID", description="EVENT_ID must be unique within an observation"),
+        WithinHeaderRange("TIME", "TSTART", "TSTOP"),
+        SortedBy("TIME"),
+        InRange("RA", 0.0, 360.0, high_inclusive=False),
+        InRange("DEC", -90.0, 90.0),
+        InRange(
+            "ENERGY",
+            0.0,
+            np.inf,
+            low_inclusive=False,
+            high_inclusive=False,
+            description="ENERGY must be positive and finite",
+        ),
+        Precision("TIME", atol=1e-5 * u.s),
+        Precision("RA", atol=1e-6 * u.deg),
+        Precision("DEC", atol=1e-6 * u.deg),
+        Precision("ENERGY", rtol=1e-6),
+    )
+
+    # Compact on-disk representations, see vodf_schema.storage
+    __storage_profiles__ = (
+        StorageProfile(
+            "compact",
+            {
+                # offsets from TSTART in steps of 10 µs, up to ±5.9 h
+                "TIME": ColumnStorage("J", scale=1e-5, zero="TSTART"),
+                "RA": ColumnStorage("J", scale=1e-7, zero=180.0),
+                "DEC": ColumnStorage("J", scale=1e-7),
+                "ENERGY": ColumnStorage("E"),
+            },
+            description="24 instead of 40 bytes per event",
+        ),
+    )
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+"""VODF Level 1 Good Time Interval HDU Definition."""
+
+from astropy import units as u
+from fits_schema import (
+    BinaryTable,
+    BinaryTableHeader,
+    Double,
+    HeaderCard,
+)
+
+from ..metadata import TemporalReferenceHeader, VODFFormatHeader
+from ..references import Ref
+from ..rules import OrderedIntervals, WithinHeaderRange
+
+__all__ = ["GoodTimeIntervals"]
+
+
+class GoodTimeIntervals(BinaryTable):
+    """VODF Level-1 Good Time Interval (GTI) HDU.
+
+    The time intervals of an observation during which the data are valid. The
+    ONTIME of the event list of the observation is the sum of their durations,
+    see `vodf_schema.intervals`.
+    """
+
+    class __header__(BinaryTableHeader, VODFFormatHeader, TemporalReferenceHeader):
+        EXTNAME = HeaderCard(allowed_values=["GTI"], type_=str)
+        HDUCLAS1 = HeaderCard(
+            allowed_values="GTI",
+            description="good time intervals",
+            reference=Ref.ogip,
+        )
+        HDUCLAS2 = HeaderCard(
+            allowed_values="STANDARD",
+            description="the intervals are valid for all events",
+            reference=Ref.ogip,
+        )
+        OBS_ID = HeaderCard(
+            required=False,
+            description="the observation the intervals belong to",
+        )
+        TSTART = HeaderCard(
+            type_=float,
+            required=False,
+            description="start time of the observation, no interval starts before",
+            reference=Ref.ogip,
+        )
+        TSTOP = HeaderCard(
+            type_=float,
+            required=False,
+            description="stop time of the observation, no interval stops after",
+            reference=Ref.ogip,
+        )
+
+    START = Double(
+        description="Start time of the interval, as an MET",
+        unit=u.s,
+        ucd="time.start",
+        reference=Ref.ogip_event_lists,
+    )
+    STOP = Double(
+        description="Stop time of the interval, as an MET",
+        unit=u.s,
+        ucd="time.end",
+        reference=Ref.ogip_event_lists,
+    )
+
+    __rules__ = (
+        OrderedIntervals("START", "STOP"),
+        WithinHeaderRange("START", "TSTART", "TSTOP"),
+        WithinHeaderRange("STOP", "TSTART", "TSTOP"),
+    )
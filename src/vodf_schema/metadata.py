@@ -248,7 +248,7 @@ class FixityHeader(Header):
     """Headers to ensure data integrity."""
 
     DATASUM = HeaderCard(
-        type_=int,
+        type_=str,
         description=(
             "unsigned-integer value of the 32-bit ones’ complement checksum of the "
             "data records in the HDU (i.e., excluding the header records)"
@@ -256,7 +256,7 @@ class FixityHeader(Header):
         reference=Ref.fits_v4,
     )
     CHECKSUM = HeaderCard(
-        type_=int,
+        type_=str,
         description=(
             "ASCII character string whose value forces the 32-bit ones’ "
             "complement checksum accumulated over the entire FITS HDU to equal negative 0. "
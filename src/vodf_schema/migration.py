@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+
+"""In-place migration of VODF headers between HDUVERS releases.
+
+Each release of the schemas that changes header keywords declares a
+`HeaderMigration` from the previous HDUVERS: renamed, added and removed cards
+and changed values (e.g. a new spelling of an allowed value). `migrate_file`
+chains the migrations from the HDUVERS of each VODF HDU to the target
+version and rewrites only the headers:
+
+* A FITS header is a sequence of 2880 byte blocks, padded with blank cards
+  after END. If the migrated header still fits into the blocks of the
+  original one, it is written over it in place and the file keeps its size.
+* Otherwise, the rest of the file is shifted by whole blocks to make room,
+  with ``reserve_cards`` additional blank cards for later migrations. This
+  is the only case in which data is moved.
+* The data units are never read: the CHECKSUM of an HDU that has one is
+  recomputed from the new header and the DATASUM keyword, or, without
+  DATASUM, the data sum implied by the previous (valid) CHECKSUM and header.
+  No CHECKSUM is added to HDUs without one. DATASUM stays valid, as the data
+  does not change.
+
+Migrating a file therefore takes the time to scan and rewrite its headers,
+independent of the size of the data.
+"""
+
+import datetime
+import os
+from collections.abc import Mapping, Sequence
+from dataclasses import dataclass, field
+from os import PathLike
+
+from astropy.io import fits
+
+from .fitsblocks import BLOCK_SIZE, CARD_SIZE, padded_size, scan_hdus
+from .fixity import _MASK, _ZERO_CHECKSUM, encode_checksum, ones_complement_sum
+from .version import __version__ as vodf_version
+
+__all__ = [
+    "MIGRATIONS",
+    "HeaderMigration",
+    "MigrationResult",
+    "migrate_file",
+    "migration_chain",
+]
+
+# number of bytes moved at once when a header grows
+_SHIFT_BUFFER = BLOCK_SIZE * 4096
+
+
+@dataclass(frozen=True)
+class HeaderMigration:
+    """Changes of the header keywords from one HDUVERS to the next.
+
+    Parameters
+    ----------
+    from_version, to_version : str
+        The HDUVERS before and after the migration.
+    extnames : frozenset[str], optional
+        Upper-case EXTNAMEs of the HDUs the changes apply to, by default all
+        VODF HDUs. HDUVERS is updated in all of them.
+    renamed : Mapping[str, str]
+        Old to new keyword, the card keeps its value, comment and position.
+    added : Mapping[str, object]
+        New keywords and their value, or (value, comment). Existing cards are
+        kept.
+    removed : Sequence[str]
+        Keywords to delete.
+    values : Mapping[str, Mapping]
+        Replaced values per keyword, e.g. ``{"TIMESYS": {"TDB": "TT"}}``
+        when an allowed value changed. Applied after renaming.
+    hdudoc : str, optional
+        New value of HDUDOC.
+    """
+
+    from_version: str
+    to_version: str
+    extnames: frozenset[str] | None = None
+    renamed: Mapping[str, str] = field(default_factory=dict)
+    added: Mapping[str, object] = field(default_factory=dict)
+    removed: Sequence[str] = ()
+    values: Mapping[str, Mapping] = field(default_factory=dict)
+    hdudoc: str | None = None
+
+    def apply(self, header: fits.Header) -> list[str]:
+        """Migrate ``header`` in place and return a description of the changes."""
+        changes = []
+        extname = str(header.get("EXTNAME", "")).upper()
+        if self.extnames is None or extname in self.extnames:
+            for old, new in self.renamed.items():
+                if old in header:
+                    header.rename_keyword(old, new)
+                    changes.append(f"renamed {old} to {new}")
+            for keyword, mapping in self.values.items():
+                if keyword in header and header[keyword] in mapping:
+                    old = header[keyword]
+                    header[keyword] = mapping[old]
+                    changes.append(f"{keyword}: {old!r} -> {mapping[old]!r}")
+            for keyword in self.removed:
+                if keyword in header:
+                    del header[keyword]
+                    changes.append(f"removed {keyword}")
+            for keyword, value in self.added.items():
+                if keyword not in header:
+                    header[keyword] = value
+                    changes.append(f"added {keyword}")
+
+        if self.hdudoc is not None:
+            header["HDUDOC"] = self.hdudoc
+        header["HDUVERS"] = self.to_version
+        changes.append(f"HDUVERS: {self.from_version!r} -> {self.to_version!r}")
+        return changes
+
+
+#: the migrations between the released versions, one per release that
+#: changed header keywords, appended when a release is made
+MIGRATIONS: tuple[HeaderMigration, ...] = ()
+
+
+def migration_chain(
+    from_version: str,
+    to_version: str,
+    migrations: Sequence[HeaderMigration] = MIGRATIONS,
+) -> list[HeaderMigration]:
+    """Return the migrations leading from ``from_version`` to ``to_version``."""
+    by_version = {m.from_version: m for m in migrations}
+    chain = []
+    version = from_version
+    while version != to_version:
+        migration = by_version.get(version)
+        if migration is None or len(chain) > len(migrations):
+            raise ValueError(
+                f"No migration from HDUVERS {from_version!r} to {to_version!r}"
+            )
+        chain.append(migration)
+        version = migration.to_version
+    return chain
+
+
+@dataclass
+class MigrationResult:
+    """The migration of the header of one HDU."""
+
+    index: int
+    extname: str | None
+    from_version: str
+    to_version: str
+    changes: list[str]
+    #: False if the header grew and the rest of the file was shifted
+    in_place: bool = True
+    #: True if CHECKSUM was recomputed, False if the HDU had none
+    checksum_updated: bool = False
+
+
+def _datasum(header: fits.Header, raw: bytes) -> int | None:
+    # the data sum to recompute CHECKSUM with, without reading the data; None
+    # if the HDU has no CHECKSUM to update
+    if header.get("CHECKSUM") is None:
+        return None
+    if header.get("DATASUM") is not None:
+        return int(header["DATASUM"])
+    # a valid CHECKSUM makes header + data sum up to -0 (all bits set)
+    return ~ones_complement_sum(raw) & _MASK
+
+
+def _header_bytes(header: fits.Header, size: int, datasum: int | None) -> bytes:
+    if datasum is not None:
+        timestamp = datetime.datetime.now().isoformat(timespec="seconds")
+        comment = f"HDU checksum updated {timestamp}"
+        header["CHECKSUM"] = (_ZERO_CHECKSUM, comment)
+        raw = header.tostring(padding=False).encode("ascii").ljust(size)
+        checksum = ~ones_complement_sum(raw, datasum) & _MASK
+        header["CHECKSUM"] = (encode_checksum(checksum), comment)
+    raw = header.tostring(padding=False).encode("ascii")
+    if len(raw) > size:
+        raise RuntimeError(
+            f"Migrated header needs {len(raw)} bytes, only {size} planned"
+        )
+    return raw.ljust(size)
+
+
+def _shift_tail(f, offset: int, delta: int):
+    # move the bytes from offset to the end of the file by delta, last first
+    end = f.seek(0, os.SEEK_END)
+    while end > offset:
+        start = max(offset, end - _SHIFT_BUFFER)
+        f.seek(start)
+        chunk = f.read(end - start)
+        f.seek(start + delta)
+        f.write(chunk)
+        end = start
+
+
+def migrate_file(
+    path: str | PathLike,
+    to_version: str = vodf_version,
+    migrations: Sequence[HeaderMigration] = MIGRATIONS,
+    reserve_cards: int = 36,
+    dry_run: bool = False,
+) -> list[MigrationResult]:
+    """Migrate the headers of all VODF HDUs of a file to ``to_version``.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The FITS file, modified in place.
+    to_version : str
+        The target HDUVERS, by default the version of this package.
+    migrations : Sequence[HeaderMigration]
+        The available migrations, by default `MIGRATIONS`.
+    reserve_cards : int
+        Free cards added to a header that has to grow, so that later
+        migrations fit in place.
+    dry_run : bool
+        Only compute the results, without writing.
+
+    Returns
+    -------
+    list[MigrationResult]
+        One result per migrated HDU. HDUs already at ``to_version`` and
+        other HDUs are skipped.
+    """
+    locations = scan_hdus(path)
+    planned = []
+    with open(path, "rb") as f:
+        for location in locations:
+            header = location.header
+            version = header.get("HDUVERS")
+            if header.get("HDUCLASS") != "VODF" or version in (None, to_version):
+                continue
+
+            f.seek(location.header_offset)
+            size = location.data_offset - location.header_offset
+            raw = f.read(size)
+            datasum = _datasum(header, raw)
+
+            header = header.copy()
+            changes = []
+            for migration in migration_chain(version, to_version, migrations):
+                changes.extend(migration.apply(header))
+
+            # long strings take several CONTINUE cards, one more for CHECKSUM
+            needed = len(header.tostring(padding=False)) + CARD_SIZE
+            in_place = needed <= size
+            if not in_place:
+                size = padded_size(needed + reserve_cards * CARD_SIZE)
+            result = MigrationResult(
+                index=location.index,
+                extname=location.extname,
+                from_version=version,
+                to_version=to_version,
+                changes=changes,
+                in_place=in_place,
+                checksum_updated=datasum is not None,
+            )
+            planned.append((location, _header_bytes(header, size, datasum), result))
+
+    if dry_run:
+        return [result for _, _, result in planned]
+
+    with open(path, "r+b") as f:
+        # from the last HDU on, so that shifting keeps the earlier offsets valid
+        for location, raw, result in reversed(planned):
+            old_size = location.data_offset - location.header_offset
+            if len(raw) % BLOCK_SIZE != 0:
+                raise RuntimeError("Migrated header does not fill whole FITS blocks")
+            if len(raw) > old_size:
+                _shift_tail(f, location.data_offset, len(raw) - old_size)
+            f.seek(location.header_offset)
+            f.write(raw)
+    return [result for _, _, result in planned]
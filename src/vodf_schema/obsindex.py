@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+
+"""Persistent index of observations, built from header-only scans of event lists.
+
+The index stores the keywords of the `~vodf_schema.metadata.ObservationHeader`,
+`~vodf_schema.metadata.TemporalReferenceHeader` and
+`~vodf_schema.metadata.SpatialReferenceHeader` of every event-list HDU as
+columns, keyed by file path, size and modification time. Only the header blocks
+of each file are read, and re-indexing skips files that did not change.
+"""
+
+import os
+from numbers import Integral, Real
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+from astropy.table import Table
+from astropy.time import Time
+from fits_schema import HeaderCard
+
+from .fitsblocks import iter_hdus
+from .metadata import ObservationHeader, SpatialReferenceHeader, TemporalReferenceHeader
+
+__all__ = ["INDEXED_HEADERS", "INT_NULL", "ObservationIndex"]
+
+#: header classes whose keywords are stored in the index
+INDEXED_HEADERS = (ObservationHeader, TemporalReferenceHeader, SpatialReferenceHeader)
+
+#: value stored in integer columns for missing keywords
+INT_NULL = np.iinfo(np.int64).min
+
+#: columns identifying the indexed file and HDU
+FILE_COLUMNS = ("PATH", "SIZE", "MTIME", "HDU")
+
+#: absolute start and stop of the observations, derived from TSTART/TSTOP and
+#: MJDREFI/MJDREFF, null (NaN) for headers without a time reference
+TIME_COLUMNS = ("MJD_START", "MJD_STOP")
+
+_EVENTLIST_EXTNAME = "EVENT-LIST"
+_SECONDS_PER_DAY = 86400.0
+
+
+def _indexed_cards() -> dict[str, HeaderCard]:
+    cards = {}
+    for header in INDEXED_HEADERS:
+        # only the cards defined by the class itself, not by generic bases
+        for attr, card in vars(header).items():
+            if isinstance(card, HeaderCard):
+                cards.setdefault(card.keyword or attr, card)
+    return cards
+
+
+def _infer_type(values: list):
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, Integral) and not isinstance(v, bool) for v in present):
+        return int
+    if all(isinstance(v, Real) and not isinstance(v, bool) for v in present):
+        return float
+    return str
+
+
+def _to_array(values: list, type_) -> np.ndarray:
+    if type_ is None or isinstance(type_, tuple):
+        type_ = _infer_type(values)
+
+    if type_ is int:
+        return np.array([INT_NULL if v is None else v for v in values], np.int64)
+    if type_ is float:
+        return np.array([np.nan if v is None else v for v in values], np.float64)
+    return np.array(["" if v is None else str(v) for v in values], dtype=str)
+
+
+def _to_str(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind == "i":
+        return np.where(values == INT_NULL, "", values.astype(str))
+    if values.dtype.kind == "f":
+        return np.where(np.isnan(values), "", values.astype(str))
+    return values.astype(str)
+
+
+def _concatenate(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    if old.dtype.kind == new.dtype.kind:
+        return np.concatenate([old, new])
+    if {old.dtype.kind, new.dtype.kind} == {"i", "f"}:
+        old, new = (
+            np.where(a == INT_NULL, np.nan, a) if a.dtype.kind == "i" else a
+            for a in (old, new)
+        )
+        return np.concatenate([old, new]).astype(np.float64)
+    return np.concatenate([_to_str(old), _to_str(new)])
+
+
+def _mjd(time: float | Time) -> float:
+    if isinstance(time, Time):
+        return time.mjd
+    return float(time)
+
+
+class ObservationIndex:
+    """Columnar index of the observation metadata of event-list files.
+
+    Create an empty index or read an existing one with `ObservationIndex.read`,
+    bring it up to date with `update` and persist it with `write`. The index
+    is kept sorted by observation start, so time-range queries only need a
+    binary search and one comparison per candidate.
+
+    Parameters
+    ----------
+    table : astropy.table.Table, optional
+        Rows of an existing index, e.g. as returned by the ``table`` property.
+    """
+
+    def __init__(self, table: Table | None = None):
+        self._cards = _indexed_cards()
+        self._columns = {}
+        if table is not None:
+            for name in table.colnames:
+                values = np.asarray(table[name])
+                if values.dtype.kind == "S":
+                    values = values.astype(str)
+                self._columns[name] = values
+        self._sort()
+
+    def __len__(self):
+        """Return the number of indexed observations."""
+        if not self._columns:
+            return 0
+        return len(self._columns["PATH"])
+
+    @property
+    def columns(self) -> list[str]:
+        """Names of all index columns."""
+        return list(self._columns)
+
+    @property
+    def table(self) -> Table:
+        """The full index as an astropy table."""
+        return Table(self._columns, copy=False)
+
+    @classmethod
+    def read(cls, path: str | PathLike) -> "ObservationIndex":
+        """Read an index written by `write` (FITS, or Parquet for .parquet files)."""
+        if Path(path).suffix != ".parquet":
+            return cls(Table.read(path, format="fits"))
+
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        return cls(Table({k: table[k].to_numpy() for k in table.column_names}))
+
+    def write(self, path: str | PathLike):
+        """Write the index as a FITS binary table, or as Parquet for .parquet files.
+
+        Parquet output needs the optional ``pyarrow`` dependency. The file is
+        replaced atomically, so readers never see a partial index.
+        """
+        path = Path(path)
+        tmp = path.with_name(f".{path.name}.tmp")
+        if path.suffix == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            pq.write_table(pa.table(self._columns), tmp)
+        else:
+            self.table.write(tmp, format="fits", overwrite=True)
+        os.replace(tmp, path)
+
+    def _sort(self):
+        if len(self) == 0:
+            return
+        order = np.argsort(self._columns["MJD_START"], kind="stable")
+        self._columns = {k: v[order] for k, v in self._columns.items()}
+        # precomputed for case-insensitive queries
+        self._telescop_upper = np.char.upper(self._columns["TELESCOP"].astype(str))
+
+    def _scan(self, path: Path, stat: os.stat_result) -> list[dict]:
+        records = []
+        for location in iter_hdus(path):
+            extname = location.extname
+            if extname is None or extname.upper() != _EVENTLIST_EXTNAME:
+                continue
+
+            header = location.header
+            record = {k: header.get(k) for k in self._cards}
+            record.update(
+                PATH=str(path),
+                SIZE=stat.st_size,
+                MTIME=stat.st_mtime_ns,
+                HDU=location.index,
+            )
+
+            # without a time reference, the MJDs are unknown (null)
+            mjdref = None
+            if header.get("MJDREFI") is not None and header.get("MJDREFF") is not None:
+                mjdref = header["MJDREFI"] + header["MJDREFF"]
+            for column, keyword in zip(TIME_COLUMNS, ("TSTART", "TSTOP")):
+                met = header.get(keyword)
+                record[column] = (
+                    None
+                    if met is None or mjdref is None
+                    else mjdref + met / _SECONDS_PER_DAY
+                )
+            records.append(record)
+        return records
+
+    def update(self, paths, prune: bool = False) -> dict[str, int]:
+        """Add new and re-scan changed files, skipping unchanged ones.
+
+        Parameters
+        ----------
+        paths : iterable of str or PathLike
+            The event-list files to index.
+        prune : bool
+            If True, also remove entries of files that no longer exist.
+
+        Returns
+        -------
+        dict[str, int]
+            Number of files that were "scanned", "skipped" and "removed".
+        """
+        indexed = {}
+        if len(self) > 0:
+            cols = self._columns
+            for p, size, mtime in zip(cols["PATH"], cols["SIZE"], cols["MTIME"]):
+                indexed[p] = (size, mtime)
+
+        records = []
+        outdated = set()
+        counts = {"scanned": 0, "skipped": 0, "removed": 0}
+        for path in paths:
+            path = Path(path).resolve()
+            key = str(path)
+            stat = path.stat()
+            if indexed.get(key) == (stat.st_size, stat.st_mtime_ns):
+                counts["skipped"] += 1
+                continue
+
+            outdated.add(key)
+            records.extend(self._scan(path, stat))
+            counts["scanned"] += 1
+
+        if prune:
+            missing = {p for p in indexed if not os.path.exists(p)}
+            outdated |= missing
+            counts["removed"] = len(missing)
+
+        if outdated and len(self) > 0:
+            keep = ~np.isin(self._columns["PATH"], list(outdated))
+            self._columns = {k: v[keep] for k, v in self._columns.items()}
+
+        if records:
+            self._append(records)
+        self._sort()
+        return counts
+
+    def _append(self, records: list[dict]):
+        names = [*FILE_COLUMNS, *self._cards, *TIME_COLUMNS]
+        types = {"PATH": str, "SIZE": int, "MTIME": int, "HDU": int}
+        types.update({k: c.type for k, c in self._cards.items()})
+        types.update(dict.fromkeys(TIME_COLUMNS, float))
+
+        for name in names:
+            new = _to_array([r[name] for r in records], types[name])
+            old = self._columns.get(name)
+            self._columns[name] = new if old is None else _concatenate(old, new)
+
+    def query(
+        self,
+        obs_id=None,
+        telescop: str | None = None,
+        time_range: tuple[float | Time, float | Time] | None = None,
+        date_obs: tuple[str, str] | None = None,
+    ) -> Table:
+        """Select observations, combining all given criteria.
+
+        Parameters
+        ----------
+        obs_id : scalar or list, optional
+            One or several OBS_ID values.
+        telescop : str, optional
+            Value of TELESCOP, compared case-insensitively.
+        time_range : tuple, optional
+            (start, stop) as MJD or `~astropy.time.Time`. Observations
+            overlapping this range are selected. MJD values are compared in
+            the time scale (TIMESYS) of each file.
+        date_obs : tuple[str, str], optional
+            Inclusive range of DATE-OBS values, compared as ISO strings.
+
+        Returns
+        -------
+        astropy.table.Table
+            The matching rows of the index.
+        """
+        n = len(self)
+        if n == 0:
+            return self.table
+
+        cols = self._columns
+        stop_row = n
+        if time_range is not None:
+            start, stop = (_mjd(t) for t in time_range)
+            # sorted by start, so only rows starting before ``stop`` are candidates
+            stop_row = np.searchsorted(cols["MJD_START"], stop, side="left")
+
+        mask = np.ones(stop_row, dtype=bool)
+        if time_range is not None:
+            mask &= cols["MJD_STOP"][:stop_row] > start
+
+        if obs_id is not None:
+            obs_ids = cols["OBS_ID"][:stop_row]
+            wanted = np.atleast_1d(np.asarray(obs_id))
+            if obs_ids.dtype.kind == "U":
+                wanted = wanted.astype(str)
+            mask &= np.isin(obs_ids, wanted)
+
+        if telescop is not None:
+            mask &= self._telescop_upper[:stop_row] == telescop.upper()
+
+        if date_obs is not None:
+            dates = cols["DATE-OBS"][:stop_row]
+            mask &= (dates >= date_obs[0]) & (dates <= date_obs[1])
+
+        rows = np.flatnonzero(mask)
+        return Table({k: v[rows] for k, v in cols.items()})
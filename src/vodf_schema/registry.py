@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+
+"""Serialized registry of all VODF schemas.
+
+Building the schema classes needs fits_schema and re-creates the whole class
+hierarchy in every process. The registry instead stores every schema, i.e. the
+table schemas with their columns and storage profiles and all header mixins with their cards,
+units, UCDs, allowed values and references, in a compact json file keyed by
+the HDUVERS the schemas belong to. `load_registry` rebuilds the compiled
+validators of `vodf_schema.compiled` from that file without importing
+fits_schema or the schema classes, and non-Python tools can read the json
+directly.
+
+The registry shipped with the package is generated at build time with::
+
+    python -m vodf_schema.registry
+
+which adds the schemas of the installed version to an existing registry file.
+"""
+
+import argparse
+import json
+import os
+from dataclasses import asdict
+from functools import lru_cache
+from os import PathLike
+from pathlib import Path
+
+from astropy import units as u
+from astropy.io import fits
+
+from .compiled import (
+    CompiledCard,
+    CompiledColumn,
+    CompiledHeader,
+    CompiledTable,
+    compile_header,
+    compile_table,
+)
+from .storage import ColumnStorage
+
+__all__ = [
+    "REGISTRY_FORMAT",
+    "REGISTRY_PATH",
+    "SchemaRegistry",
+    "build_registry",
+    "load_registry",
+    "main",
+    "write_registry",
+]
+
+#: version of the layout of the registry file, not of the schemas
+REGISTRY_FORMAT = 1
+
+#: location of the registry generated at build time
+REGISTRY_PATH = Path(__file__).with_name("registry.json")
+
+# header card value types that can be stored in the registry
+_TYPES = {t.__name__: t for t in (bool, int, float, str)}
+
+
+def _schema_classes():
+    from fits_schema import Header
+
+    from . import metadata
+    from .hdu import GroupingTable
+    from .level1 import (
+        EventList,
+        GoodTimeIntervals,
+        IRFGroupingTable,
+        ObservationGroupingTable,
+    )
+
+    tables = [
+        EventList,
+        GoodTimeIntervals,
+        GroupingTable,
+        ObservationGroupingTable,
+        IRFGroupingTable,
+    ]
+    headers = [
+        cls
+        for cls in (getattr(metadata, name) for name in metadata.__all__)
+        if isinstance(cls, type) and issubclass(cls, Header)
+    ]
+    return tables, headers
+
+
+def _sort_key(value):
+    return (type(value).__name__, value)
+
+
+def _documentation(element, references: dict[str, int]) -> dict:
+    reference = getattr(element, "reference", None)
+    return {
+        "description": getattr(element, "description", None) or None,
+        "ucd": getattr(element, "ucd", None),
+        "ivoa_name": getattr(element, "ivoa_name", None),
+        "examples": getattr(element, "examples", None),
+        "reference": None if reference is None else references[reference],
+    }
+
+
+def _card_entry(card: CompiledCard, schema_card, references: dict[str, int]) -> dict:
+    if card.types is not None:
+        unknown = [t for t in card.types if t.__name__ not in _TYPES]
+        if unknown:
+            raise ValueError(f"Type {unknown} of card {card.keyword} is not supported")
+
+    entry = {
+        "required": card.required,
+        "type": None if card.types is None else [t.__name__ for t in card.types],
+        "allowed": None
+        if card.allowed is None
+        else sorted(card.allowed, key=_sort_key),
+        "case_insensitive": card.case_insensitive,
+        "position": card.position,
+        "empty": card.empty,
+        "unit": None if card.unit is None else card.unit.to_string(),
+        "origin": card.origin,
+        **_documentation(schema_card, references),
+    }
+    return {k: v for k, v in entry.items() if v is not None}
+
+
+def _header_entry(header_cls, references: dict[str, int]) -> dict:
+    compiled = compile_header(header_cls)
+    return {
+        "name": header_cls.__name__,
+        "doc": header_cls.__doc__,
+        "cards": {
+            keyword: _card_entry(card, header_cls.__cards__[keyword], references)
+            for keyword, card in compiled.cards.items()
+        },
+    }
+
+
+def _column_entry(column: CompiledColumn, schema_column, references) -> dict:
+    entry = {
+        "required": column.required,
+        "tform": column.tform,
+        "unit": None if column.unit is None else column.unit.to_string(),
+        "ndim": column.ndim,
+        "shape": None if column.shape is None else list(column.shape),
+        "storage": [
+            {"profile": profile, **asdict(storage)}
+            for profile, storage in column.storage
+        ]
+        or None,
+        **_documentation(schema_column, references),
+    }
+    return {k: v for k, v in entry.items() if v is not None}
+
+
+def build_registry() -> dict:
+    """Serialize the schemas of the installed version into a json-compatible dict."""
+    from fits_schema.schema_element import _REFERENCE_SET
+
+    from .validation import known_schemas
+    from .version import __version__
+
+    tables, headers = _schema_classes()
+    # sorted, so that the registry does not depend on the hash seed
+    reference_list = sorted(_REFERENCE_SET)
+    references = {r: i for i, r in enumerate(reference_list)}
+
+    header_entries = {cls.__name__: _header_entry(cls, references) for cls in headers}
+    table_entries = {}
+    for table_cls in tables:
+        header_name = f"{table_cls.__name__}.__header__"
+        header_entries[header_name] = _header_entry(table_cls.__header__, references)
+        compiled = compile_table(table_cls)
+        table_entries[table_cls.__name__] = {
+            "doc": table_cls.__doc__,
+            "header": header_name,
+            "columns": {
+                name: _column_entry(column, table_cls.__columns__[name], references)
+                for name, column in compiled.columns.items()
+            },
+        }
+
+    entry = {
+        "references": reference_list,
+        "headers": header_entries,
+        "tables": table_entries,
+        "extnames": {k: v.__name__ for k, v in known_schemas().items()},
+    }
+    return {"format": REGISTRY_FORMAT, "versions": {__version__: entry}}
+
+
+def _read(path: Path) -> dict:
+    with open(path) as f:
+        data = json.load(f)
+    if data.get("format") != REGISTRY_FORMAT:
+        raise ValueError(
+            f"Registry {path} has format {data.get('format')}"
+            f", expected {REGISTRY_FORMAT}"
+        )
+    return data
+
+
+def write_registry(path: str | PathLike | None = None) -> Path:
+    """Add the schemas of the installed version to the registry at ``path``.
+
+    Schemas of other versions already stored in the file are kept, those of
+    the installed version are replaced. The file is replaced atomically.
+    """
+    path = REGISTRY_PATH if path is None else Path(path)
+    data = build_registry()
+    if path.exists():
+        existing = _read(path)
+        existing["versions"].update(data["versions"])
+        data = existing
+
+    tmp = path.with_name(f".{path.name}.tmp")
+    with open(tmp, "w") as f:
+        # e.g. examples may not be json types, they are only documentation
+        json.dump(data, f, separators=(",", ":"), sort_keys=True, default=str)
+    os.replace(tmp, path)
+    _load.cache_clear()
+    return path
+
+
+class SchemaRegistry:
+    """The compiled schemas of one HDUVERS, as loaded by `load_registry`."""
+
+    def __init__(
+        self,
+        hdu_version: str,
+        headers: dict[str, CompiledHeader],
+        tables: dict[str, CompiledTable],
+        extnames: dict[str, str],
+        references: list[str],
+    ):
+        self.hdu_version = hdu_version
+        self.headers = headers
+        self.tables = tables
+        self.extnames = extnames
+        self.references = references
+
+    def table_for_header(self, header: fits.Header) -> CompiledTable | None:
+        """Return the table schema for an HDU with the given header, if known."""
+        extname = header.get("EXTNAME")
+        if extname is None or header.get("XTENSION") != "BINTABLE":
+            return None
+        name = self.extnames.get(extname.upper())
+        return None if name is None else self.tables[name]
+
+
+def _compiled_card(keyword: str, entry: dict) -> CompiledCard:
+    types = entry.get("type")
+    allowed = entry.get("allowed")
+    unit = entry.get("unit")
+    return CompiledCard(
+        keyword=keyword,
+        required=entry["required"],
+        types=None if types is None else tuple(_TYPES[t] for t in types),
+        allowed=None if allowed is None else frozenset(allowed),
+        case_insensitive=entry["case_insensitive"],
+        position=entry.get("position"),
+        empty=entry.get("empty"),
+        unit=None if unit is None else u.Unit(unit),
+        origin=entry["origin"],
+    )
+
+
+def _compiled_column(name: str, entry: dict) -> CompiledColumn:
+    unit = entry.get("unit")
+    shape = entry.get("shape")
+    return CompiledColumn(
+        name=name,
+        required=entry["required"],
+        tform=entry.get("tform"),
+        unit=None if unit is None else u.Unit(unit),
+        ndim=entry["ndim"],
+        shape=None if shape is None else tuple(shape),
+        storage=tuple(
+            (s["profile"], ColumnStorage(s["tform"], s["scale"], s["zero"]))
+            for s in entry.get("storage", [])
+        ),
+    )
+
+
+@lru_cache
+def _load(path: Path, hdu_version: str) -> SchemaRegistry:
+    versions = _read(path)["versions"]
+    entry = versions.get(hdu_version)
+    if entry is None:
+        raise KeyError(
+            f"Registry {path} has no schemas for HDUVERS {hdu_version!r}"
+            f", available are {sorted(versions)}"
+        )
+
+    headers = {}
+    for name, header in entry["headers"].items():
+        cards = {k: _compiled_card(k, c) for k, c in header["cards"].items()}
+        headers[name] = CompiledHeader(header["name"], cards)
+
+    tables = {}
+    for name, table in entry["tables"].items():
+        columns = {k: _compiled_column(k, c) for k, c in table["columns"].items()}
+        tables[name] = CompiledTable(name, headers[table["header"]], columns)
+
+    return SchemaRegistry(
+        hdu_version, headers, tables, entry["extnames"], entry["references"]
+    )
+
+
+def load_registry(
+    hdu_version: str | None = None, path: str | PathLike | None = None
+) -> SchemaRegistry:
+    """Load the compiled schemas of one HDUVERS from the registry.
+
+    Parameters
+    ----------
+    hdu_version : str, optional
+        The HDUVERS, defaults to the version of this package.
+    path : str or PathLike, optional
+        The registry file, defaults to the one generated at build time.
+
+    Returns
+    -------
+    SchemaRegistry
+        The compiled schemas, cached per path and version.
+    """
+    path = REGISTRY_PATH if path is None else Path(path)
+    if not path.exists():
+        raise FileNotFoundError(
+            f"No schema registry at {path}, run 'python -m vodf_schema.registry'"
+        )
+    if hdu_version is None:
+        from .version import __version__ as hdu_version
+    return _load(path.resolve(), hdu_version)
+
+
+def main(args=None):
+    """Generate the schema registry, see `write_registry`."""
+    parser = argparse.ArgumentParser(
+        prog="python -m vodf_schema.registry",
+        description="Add the schemas of this version to the VODF schema registry.",
+    )
+    parser.add_argument(
+        "-o", "--output", default=None, help=f"Registry file (default: {REGISTRY_PATH})"
+    )
+    args = parser.parse_args(args)
+    print(f"Wrote schema registry to {write_registry(args.output)}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""Reports collecting the results of validating FITS files against VODF schemas."""
+
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+
+from .rules import RuleResult
+
+__all__ = ["Issue", "ValidationReport"]
+
+
+@dataclass(frozen=True)
+class Issue:
+    """A single problem found during validation."""
+
+    #: name of the fits_schema exception or warning class, e.g. "WrongType"
+    kind: str
+    message: str
+    #: "error" or "warning"
+    severity: str = "error"
+    #: the column or header keyword the issue refers to, if any
+    context: str | None = None
+
+    @classmethod
+    def from_exception(cls, exc: Exception, context: str | None = None) -> "Issue":
+        """Create an issue from a raised fits_schema exception or warning."""
+        severity = "warning" if isinstance(exc, Warning) else "error"
+        return cls(type(exc).__name__, str(exc), severity, context)
+
+
+@dataclass
+class ValidationReport:
+    """Collection of all issues found when validating one HDU against a schema."""
+
+    schema: str
+    path: str | None = None
+    hdu: int | None = None
+    n_rows: int = 0
+    issues: list[Issue] = field(default_factory=list)
+    #: results of the semantic rules of the schema, see `vodf_schema.rules`
+    rules: list[RuleResult] = field(default_factory=list)
+    #: True if the validation stopped before all rows were checked
+    truncated: bool = False
+    _seen: set[Issue] = field(
+        default_factory=set, init=False, repr=False, compare=False
+    )
+
+    @property
+    def errors(self) -> list[Issue]:
+        """Issues with severity "error"."""
+        return [i for i in self.issues if i.severity == "error"]
+
+    @property
+    def warnings(self) -> list[Issue]:
+        """Issues with severity "warning"."""
+        return [i for i in self.issues if i.severity == "warning"]
+
+    @property
+    def valid(self) -> bool:
+        """True if no errors were found, warnings are allowed."""
+        return not self.errors
+
+    @property
+    def n_errors(self) -> int:
+        """Number of errors, counting each row violating a rule."""
+        issues = [e for e in self.errors if e.kind != "RuleViolation"]
+        return len(issues) + sum(r.n_violations for r in self.rules)
+
+    def add(self, issue: Issue):
+        """Add an issue, ignoring exact duplicates (e.g. from several chunks)."""
+        if issue not in self._seen:
+            self._seen.add(issue)
+            self.issues.append(issue)
+
+    def add_rule_result(self, result: RuleResult):
+        """Add the result of a semantic rule, violated rules are also added as issue."""
+        self.rules.append(result)
+        if not result.ok:
+            self.add(
+                Issue(
+                    "RuleViolation",
+                    f"{result.n_violations} of {result.n_checked} rows violate the "
+                    f"rule {result.rule!r}: {result.description}",
+                    context=", ".join(result.columns),
+                )
+            )
+
+    def to_dict(self, compact: bool = False) -> dict:
+        """Convert to a dict of builtin types, e.g. for json serialization.
+
+        Parameters
+        ----------
+        compact : bool
+            If True, issues of the same kind, severity and context are
+            combined into one entry with their count and the first message,
+            so the size does not depend on the number of distinct messages.
+        """
+        result = asdict(self)
+        del result["_seen"]
+        result["valid"] = self.valid
+        if compact:
+            counts = Counter((i.kind, i.severity, i.context) for i in self.issues)
+            first = {}
+            for issue in self.issues:
+                first.setdefault((issue.kind, issue.severity, issue.context), issue)
+            result["issues"] = [
+                {**asdict(issue), "count": counts[key]} for key, issue in first.items()
+            ]
+        return result
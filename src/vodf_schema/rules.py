@@ -0,0 +1,733 @@
+#!/usr/bin/env python3
+
+"""Semantic rules for the values of binary table columns.
+
+The column schemas of ``fits_schema`` check data types, shapes and units.
+Rules defined here check physical constraints on the values, e.g. that
+coordinates are in their valid range or that IDs are unique. They are attached
+to a `~fits_schema.BinaryTable` as a ``__rules__`` tuple and evaluated with
+NumPy chunk by chunk, so they work on tables of any size.
+
+Each rule creates a `Checker` per validated table, which accumulates the
+results of all chunks. Checkers of consecutive row ranges can be merged, so
+that tables can also be checked in parallel.
+"""
+
+import shutil
+import tempfile
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass, field
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+
+from .fitsblocks import table_columns
+
+__all__ = [
+    "DEFAULT_MAX_SAMPLES",
+    "Checker",
+    "InRange",
+    "OrderedIntervals",
+    "Precision",
+    "Rule",
+    "RuleResult",
+    "SortedBy",
+    "Unique",
+    "WithinHeaderRange",
+    "sort_keys",
+]
+
+#: default number of offending row indices kept per rule
+DEFAULT_MAX_SAMPLES = 10
+
+
+@dataclass
+class RuleResult:
+    """Outcome of checking one rule on a table."""
+
+    rule: str
+    description: str
+    columns: tuple[str, ...]
+    n_checked: int = 0
+    n_violations: int = 0
+    #: indices of some of the offending rows
+    samples: list[int] = field(default_factory=list)
+    #: reason why the rule could not be checked, if any
+    skipped: str | None = None
+    #: True if checking stopped early, ``n_violations`` is then a lower bound
+    truncated: bool = False
+
+    @property
+    def ok(self) -> bool:
+        """True if no row violates the rule."""
+        return self.n_violations == 0
+
+    def to_dict(self) -> dict:
+        """Convert to a dict of builtin types, e.g. for json serialization."""
+        result = asdict(self)
+        result["columns"] = list(self.columns)
+        return result
+
+
+class Checker:
+    """Accumulates the result of one rule over the chunks of a table.
+
+    Chunks must be given in row order. Checkers of consecutive row ranges of
+    the same table are combined with `merge`.
+
+    By default, the first ``max_samples`` offending rows are kept, after
+    `use_reservoir` a uniform random sample of all of them.
+    """
+
+    def __init__(self, rule: "Rule", max_samples: int = DEFAULT_MAX_SAMPLES):
+        self.rule = rule
+        self.max_samples = max_samples
+        self.n_checked = 0
+        self.n_violations = 0
+        self.samples = []
+        #: stop checking at the first violation, see `finished`
+        self.stop_at_first = False
+        #: set when rows were left unchecked
+        self.truncated = False
+        self._rng = None
+
+    @property
+    def finished(self) -> bool:
+        """True if further rows need not be checked, see ``stop_at_first``.
+
+        Checkers that only find violations in `result`, like the one of
+        `Unique`, never finish early.
+        """
+        return self.stop_at_first and self.n_violations > 0
+
+    def use_reservoir(self, rng: np.random.Generator):
+        """Keep a uniform random sample of the offending rows (reservoir sampling)."""
+        self._rng = rng
+
+    def _add_violations(self, rows: np.ndarray):
+        n_before = self.n_violations
+        self.n_violations += len(rows)
+        missing = self.max_samples - len(self.samples)
+        if missing > 0:
+            self.samples.extend(rows[:missing].tolist())
+        if self._rng is None or len(rows) <= missing:
+            return
+
+        # algorithm R: the i-th violation replaces a random sample with
+        # probability max_samples / i, later rows overwrite earlier ones
+        rest = np.asarray(rows[max(missing, 0) :])
+        seen = n_before + max(missing, 0) + np.arange(1, len(rest) + 1)
+        slots = self._rng.integers(0, seen)
+        keep = slots < self.max_samples
+        samples = np.array(self.samples, dtype=np.int64)
+        samples[slots[keep]] = rest[keep]
+        self.samples = samples.tolist()
+
+    def _merge_reservoir(self, other: "Checker"):
+        # a uniform sample of the union: the number of samples from each side
+        # follows the hypergeometric distribution of their violation counts
+        total = self.n_violations + other.n_violations
+        size = min(self.max_samples, total)
+        if other.n_violations == 0:
+            n_self = size
+        elif self.n_violations == 0:
+            n_self = 0
+        else:
+            n_self = self._rng.hypergeometric(
+                self.n_violations, other.n_violations, size
+            )
+        mine = self._rng.choice(self.samples, n_self, replace=False)
+        theirs = self._rng.choice(other.samples, size - n_self, replace=False)
+        self.samples = [*mine.tolist(), *theirs.tolist()]
+        self.n_violations = total
+
+    def update(self, chunk: Mapping[str, np.ndarray], start: int):
+        """Check a chunk of rows, ``start`` is the index of its first row."""
+        raise NotImplementedError
+
+    def cleanup(self):
+        """Release the resources of a checker whose result is not needed.
+
+        E.g. the temporary files of a shard that is not merged.
+        """
+
+    def detach(self):
+        """Prepare the checker to be sent to another process.
+
+        Called before the checker of a shard is returned by a worker, e.g. to
+        move buffered data to disk instead of pickling it.
+        """
+
+    def merge(self, other: "Checker"):
+        """Add the results of a checker of the rows following this one's."""
+        self.n_checked += other.n_checked
+        self.truncated |= other.truncated
+        if self._rng is not None:
+            self._merge_reservoir(other)
+            return
+        self._add_violations(np.asarray(other.samples, dtype=np.int64))
+        # the samples only stand for part of the other's violations
+        self.n_violations += other.n_violations - len(other.samples)
+
+    def result(self) -> RuleResult:
+        """Return the result for all rows checked so far."""
+        return RuleResult(
+            rule=self.rule.name,
+            description=self.rule.description,
+            columns=self.rule.columns,
+            n_checked=self.n_checked,
+            n_violations=self.n_violations,
+            samples=sorted(self.samples),
+            truncated=self.truncated,
+        )
+
+
+class _SkippedChecker(Checker):
+    def __init__(self, rule, reason):
+        super().__init__(rule, 0)
+        self.reason = reason
+
+    def update(self, chunk, start):
+        pass
+
+    def result(self):
+        result = super().result()
+        result.skipped = self.reason
+        return result
+
+
+class Rule:
+    """Base class for semantic rules on one or more columns.
+
+    Parameters
+    ----------
+    description : str
+        Human-readable statement of the rule, used in reports.
+    name : str, optional
+        Short identifier of the rule, defaults to a name derived from the
+        rule type and its columns.
+    """
+
+    columns: tuple[str, ...] = ()
+
+    def __init__(self, description: str, name: str | None = None):
+        self.description = description
+        self.name = name or f"{type(self).__name__}({', '.join(self.columns)})"
+
+    def __repr__(self):
+        """Return the rule type and name."""
+        return f"<{type(self).__name__} {self.name!r}>"
+
+    def checker(
+        self, header: fits.Header, max_samples: int = DEFAULT_MAX_SAMPLES
+    ) -> Checker:
+        """Create a checker for a table with the given header."""
+        raise NotImplementedError
+
+
+class _ElementChecker(Checker):
+    def __init__(self, rule, max_samples, bounds):
+        super().__init__(rule, max_samples)
+        self.bounds = bounds
+
+    def update(self, chunk, start):
+        values = chunk[self.rule.columns[0]]
+        low, high, low_inclusive, high_inclusive = self.bounds
+
+        # written such that NaN never passes
+        ok = (values >= low) if low_inclusive else (values > low)
+        ok &= (values <= high) if high_inclusive else (values < high)
+        if values.ndim > 1:
+            ok = ok.reshape(len(ok), -1).all(axis=1)
+
+        self.n_checked += len(values)
+        self._add_violations(np.flatnonzero(~ok) + start)
+
+
+class InRange(Rule):
+    """All values of a column must lie in a fixed interval; NaN always violates.
+
+    Parameters
+    ----------
+    column : str
+        Name of the column.
+    low, high : float
+        Interval limits, use ``np.inf`` for open ends. An infinite limit with
+        ``*_inclusive=False`` also excludes infinite values.
+    low_inclusive, high_inclusive : bool
+        Whether the limits are part of the interval.
+    """
+
+    def __init__(
+        self,
+        column: str,
+        low: float = -np.inf,
+        high: float = np.inf,
+        *,
+        low_inclusive: bool = True,
+        high_inclusive: bool = True,
+        description: str | None = None,
+        name: str | None = None,
+    ):
+        self.columns = (column,)
+        self.bounds = (low, high, low_inclusive, high_inclusive)
+        if description is None:
+            left = "[" if low_inclusive else "("
+            right = "]" if high_inclusive else ")"
+            description = f"{column} must be in {left}{low}, {high}{right}"
+        super().__init__(description, name)
+
+    def checker(self, header, max_samples=DEFAULT_MAX_SAMPLES):
+        """Create a checker for a table with the given header."""
+        return _ElementChecker(self, max_samples, self.bounds)
+
+
+class WithinHeaderRange(Rule):
+    """All values of a column must lie within limits given by header keywords.
+
+    E.g. event times must lie within [TSTART, TSTOP].
+    """
+
+    def __init__(
+        self,
+        column: str,
+        low_keyword: str,
+        high_keyword: str,
+        *,
+        description: str | None = None,
+        name: str | None = None,
+    ):
+        self.columns = (column,)
+        self.keywords = (low_keyword, high_keyword)
+        if description is None:
+            description = f"{column} must be in [{low_keyword}, {high_keyword}]"
+        super().__init__(description, name)
+
+    def checker(self, header, max_samples=DEFAULT_MAX_SAMPLES):
+        """Create a checker using the limits from ``header``."""
+        missing = [k for k in self.keywords if header.get(k) is None]
+        if missing:
+            return _SkippedChecker(self, f"Header keywords {missing} are missing")
+
+        low, high = (header[k] for k in self.keywords)
+        return _ElementChecker(self, max_samples, (low, high, True, True))
+
+
+class _IntervalsChecker(Checker):
+    def __init__(self, rule, max_samples):
+        super().__init__(rule, max_samples)
+        # first start and last stop of the rows checked so far
+        self.first = None
+        self.last = None
+        self.first_row = None
+
+    def update(self, chunk, start):
+        starts, stops = (np.asarray(chunk[c]) for c in self.rule.columns)
+        if len(starts) == 0:
+            return
+
+        # written such that NaN never passes
+        ok = starts <= stops
+        ok[1:] &= starts[1:] >= stops[:-1]
+        if self.last is not None:
+            ok[0] &= starts[0] >= self.last
+        if self.first is None:
+            self.first, self.first_row = starts[0], start
+
+        self.n_checked += len(starts)
+        self.last = stops[-1]
+        self._add_violations(np.flatnonzero(~ok) + start)
+
+    def merge(self, other):
+        boundary = (
+            self.last is not None
+            and other.first is not None
+            and not other.first >= self.last
+        )
+        if boundary:
+            self._add_violations(np.array([other.first_row]))
+        super().merge(other)
+        if self.first is None:
+            self.first, self.first_row = other.first, other.first_row
+        if other.last is not None:
+            self.last = other.last
+
+
+class OrderedIntervals(Rule):
+    """Each row is an interval that starts after the one of the previous row ends.
+
+    I.e. ``start <= stop`` within each row and ``stop <= start`` of the next
+    row, as needed for Good Time Intervals: sorted and not overlapping.
+    """
+
+    def __init__(
+        self,
+        start_column: str,
+        stop_column: str,
+        *,
+        description: str | None = None,
+        name: str | None = None,
+    ):
+        self.columns = (start_column, stop_column)
+        if description is None:
+            description = (
+                f"Rows must be disjoint intervals [{start_column}, {stop_column}]"
+                " in increasing order"
+            )
+        super().__init__(description, name)
+
+    def checker(self, header, max_samples=DEFAULT_MAX_SAMPLES):
+        """Create a checker for a table with the given header."""
+        return _IntervalsChecker(self, max_samples)
+
+
+class _PrecisionChecker(Checker):
+    def __init__(self, rule, max_samples, absolute, relative):
+        super().__init__(rule, max_samples)
+        # the representable error is absolute + relative * |value|
+        self.absolute = absolute
+        self.relative = relative
+
+    def update(self, chunk, start):
+        values = np.abs(chunk[self.rule.columns[0]])
+        error = self.absolute + self.relative * values
+        # NaN values never violate, they are stored exactly
+        bad = error > self.rule.atol + self.rule.rtol * values
+        if values.ndim > 1:
+            bad = bad.reshape(len(bad), -1).any(axis=1)
+
+        self.n_checked += len(values)
+        self._add_violations(np.flatnonzero(bad) + start)
+
+
+class Precision(Rule):
+    """The storage format of a column must resolve its values within a tolerance.
+
+    The largest rounding error of the on-disk format (e.g. half of TSCALn for
+    scaled integers, or the relative precision of single-precision floats)
+    must not exceed ``atol + rtol * |value|``. This allows compact storage,
+    e.g. RA as a scaled 32-bit integer, while guaranteeing the precision the
+    analysis needs, see `vodf_schema.storage`.
+
+    Parameters
+    ----------
+    column : str
+        Name of the column.
+    atol : astropy.units.Quantity
+        Absolute tolerance, in units convertible to the unit of the column.
+    rtol : float
+        Relative tolerance.
+    """
+
+    # relative rounding errors of the floating point formats
+    _RELATIVE = {"E": 2.0**-24, "C": 2.0**-24, "D": 2.0**-53, "M": 2.0**-53}
+
+    def __init__(
+        self,
+        column: str,
+        atol: u.Quantity | float = 0.0,
+        rtol: float = 0.0,
+        *,
+        description: str | None = None,
+        name: str | None = None,
+    ):
+        self.columns = (column,)
+        self.atol_quantity = u.Quantity(atol)
+        self.rtol = rtol
+        if description is None:
+            parts = []
+            if self.atol != 0:
+                parts.append(f"{self.atol_quantity:g}")
+            if rtol != 0:
+                parts.append(f"{rtol:g} relative")
+            tolerance = " + ".join(parts) or "0"
+            description = f"{column} must be stored with a precision of {tolerance}"
+        super().__init__(description, name)
+
+    @property
+    def atol(self) -> float:
+        """The absolute tolerance in the unit of ``atol``."""
+        return self.atol_quantity.value
+
+    def checker(self, header, max_samples=DEFAULT_MAX_SAMPLES):
+        """Create a checker for the column format declared in ``header``."""
+        columns = {c.name: c for c in table_columns(header)}
+        column = columns.get(self.columns[0])
+        if column is None:
+            return _SkippedChecker(self, f"Column {self.columns[0]} is missing")
+
+        if column.code in self._RELATIVE:
+            return _PrecisionChecker(
+                self, max_samples, 0.0, self._RELATIVE[column.code]
+            )
+        if column.code not in "BIJK":
+            return _SkippedChecker(self, f"TFORM {column.code} has no precision")
+
+        # integers round to half of their scale, given in the unit of the column
+        step = 1.0 if column.scale is None else abs(column.scale)
+        unit = self.atol_quantity.unit
+        if column.unit is not None and unit != u.dimensionless_unscaled:
+            column_unit = u.Unit(column.unit, format="fits", parse_strict="silent")
+            try:
+                step = (step * column_unit).to_value(unit)
+            except u.UnitConversionError:
+                return _SkippedChecker(
+                    self, f"Unit {column.unit} is not convertible to {unit}"
+                )
+        return _PrecisionChecker(self, max_samples, step / 2, 0.0)
+
+
+class _SortedChecker(Checker):
+    def __init__(self, rule, max_samples):
+        super().__init__(rule, max_samples)
+        # first and last value of the rows checked so far
+        self.first = None
+        self.last = None
+        self.first_row = None
+
+    def update(self, chunk, start):
+        values = np.asarray(chunk[self.rule.columns[0]])
+        if len(values) == 0:
+            return
+
+        # a row violates the rule if it is smaller than the one before
+        decreasing = np.flatnonzero(values[1:] < values[:-1]) + 1
+        if self.last is not None and values[0] < self.last:
+            decreasing = np.concatenate([[0], decreasing])
+        if self.first is None:
+            self.first, self.first_row = values[0], start
+
+        self.n_checked += len(values)
+        self.last = values[-1]
+        self._add_violations(decreasing + start)
+
+    def merge(self, other):
+        boundary = (
+            self.last is not None
+            and other.first is not None
+            and other.first < self.last
+        )
+        if boundary:
+            self._add_violations(np.array([other.first_row]))
+        super().merge(other)
+        if self.first is None:
+            self.first, self.first_row = other.first, other.first_row
+        if other.last is not None:
+            self.last = other.last
+
+
+class SortedBy(Rule):
+    """The rows must be sorted by a column, if the header declares so.
+
+    The rule only applies if the first column listed in the header keyword
+    ``keyword`` (by default TSORTKEY, see the FITS standard) is ``column``,
+    so that readers relying on the declared order, e.g. for a binary search,
+    get correct results.
+    """
+
+    def __init__(
+        self,
+        column: str,
+        keyword: str = "TSORTKEY",
+        *,
+        description: str | None = None,
+        name: str | None = None,
+    ):
+        self.columns = (column,)
+        self.keyword = keyword
+        if description is None:
+            description = f"Rows must be sorted by {column} if {keyword} says so"
+        super().__init__(description, name)
+
+    def checker(self, header, max_samples=DEFAULT_MAX_SAMPLES):
+        """Create a checker, which is skipped unless the header declares the order."""
+        if sort_keys(header, self.keyword)[:1] != [self.columns[0].upper()]:
+            return _SkippedChecker(
+                self, f"Rows are not declared sorted by {self.keyword}"
+            )
+        return _SortedChecker(self, max_samples)
+
+
+def sort_keys(header: fits.Header, keyword: str = "TSORTKEY") -> list[str]:
+    """Return the upper-cased column names the rows are declared to be sorted by."""
+    value = header.get(keyword)
+    if not isinstance(value, str):
+        return []
+    # a leading minus sign denotes a descending order
+    return [key.strip().upper() for key in value.split(",") if key.strip()]
+
+
+class _UniqueChecker(Checker):
+    def __init__(self, rule, max_samples, max_in_memory, block_size, tmpdir):
+        super().__init__(rule, max_samples)
+        self.max_in_memory = max_in_memory
+        self.block_size = block_size
+        self.tmpdir = tmpdir
+        # sorted runs of (values, rows), either arrays or paths of spilled .npy files
+        self._runs = []
+        self._n_in_memory = 0
+        self._spill_dirs = []
+        self._result = None
+
+    def update(self, chunk, start):
+        values = np.asarray(chunk[self.rule.columns[0]])
+        values = values.astype(values.dtype.newbyteorder("="), copy=False)
+        rows = np.arange(start, start + len(values), dtype=np.int64)
+        order = np.lexsort((rows, values))
+
+        self.n_checked += len(values)
+        self._runs.append((values[order], rows[order]))
+        self._n_in_memory += len(values)
+        if self._n_in_memory > self.max_in_memory:
+            self._spill()
+
+    def _spill(self):
+        if not self._spill_dirs:
+            self._spill_dirs.append(
+                tempfile.mkdtemp(prefix="vodf_unique_", dir=self.tmpdir)
+            )
+
+        for i, run in enumerate(self._runs):
+            if isinstance(run[0], str):
+                continue
+            base = f"{self._spill_dirs[0]}/run_{self.n_checked}_{i}"
+            paths = (f"{base}_values.npy", f"{base}_rows.npy")
+            np.save(paths[0], run[0])
+            np.save(paths[1], run[1])
+            self._runs[i] = paths
+        self._n_in_memory = 0
+
+    def cleanup(self):
+        for directory in self._spill_dirs:
+            shutil.rmtree(directory, ignore_errors=True)
+        self._spill_dirs = []
+
+    def detach(self):
+        # only the paths of the spilled runs are pickled
+        if self._n_in_memory:
+            self._spill()
+
+    def merge(self, other):
+        self.n_checked += other.n_checked
+        self.truncated |= other.truncated
+        self._runs.extend(other._runs)
+        self._n_in_memory += other._n_in_memory
+        # this checker now owns the spilled runs of the other one
+        self._spill_dirs.extend(other._spill_dirs)
+        other._runs, other._spill_dirs = [], []
+        if self._n_in_memory > self.max_in_memory:
+            self._spill()
+
+    def _open_runs(self):
+        for run in self._runs:
+            if isinstance(run[0], str):
+                yield tuple(np.load(p, mmap_mode="r") for p in run)
+            else:
+                yield run
+
+    def _merged_blocks(self):
+        """Yield blocks of (values, rows) that together are globally sorted.
+
+        Runs are merged block-wise with a read-ahead of ``block_size / n_runs``
+        values per run, so a block holds at most ``max(block_size, n_runs)``
+        values: all values up to the smallest last value of the read-ahead
+        of the unfinished runs can safely be emitted, since no run can
+        contain smaller values later on.
+        """
+        runs = [run for run in self._open_runs() if len(run[0])]
+        read_ahead = max(1, self.block_size // max(1, len(runs)))
+        positions = [0] * len(runs)
+        while runs:
+            threshold = None
+            for (values, _), pos in zip(runs, positions):
+                stop = pos + read_ahead
+                if stop < len(values):
+                    last = values[stop - 1]
+                    threshold = last if threshold is None else min(threshold, last)
+
+            taken_values, taken_rows = [], []
+            for i, (values, rows) in enumerate(runs):
+                pos = positions[i]
+                block = values[pos : pos + read_ahead]
+                n = len(block)
+                if threshold is not None:
+                    n = np.searchsorted(block, threshold, side="right")
+                taken_values.append(block[:n])
+                taken_rows.append(rows[pos : pos + n])
+                positions[i] += n
+
+            unfinished = [i for i, (v, _) in enumerate(runs) if positions[i] < len(v)]
+            runs = [runs[i] for i in unfinished]
+            positions = [positions[i] for i in unfinished]
+
+            values = np.concatenate(taken_values)
+            rows = np.concatenate(taken_rows)
+            order = np.lexsort((rows, values))
+            yield values[order], rows[order]
+
+    def result(self):
+        # merging consumes the runs, so the result is only computed once
+        if self._result is not None:
+            return self._result
+
+        try:
+            previous = None
+            for values, rows in self._merged_blocks():
+                if len(values) == 0:
+                    continue
+                # equal values may continue in the next block
+                duplicate = np.zeros(len(values), dtype=bool)
+                duplicate[1:] = values[1:] == values[:-1]
+                duplicate[0] = previous is not None and values[0] == previous
+                self._add_violations(rows[duplicate])
+                previous = values[-1]
+        finally:
+            self._runs = []
+            self.cleanup()
+
+        self._result = super().result()
+        return self._result
+
+
+class Unique(Rule):
+    """All values of a column must be unique.
+
+    Each chunk is sorted and kept as a sorted run. When more than
+    ``max_in_memory`` values are buffered, the runs are spilled to temporary
+    files, and in the end all runs are merged block by block (sort-merge), so
+    the column never needs to fit into memory at once.
+
+    Parameters
+    ----------
+    column : str
+        Name of the column.
+    max_in_memory : int
+        Maximum number of values kept in memory before spilling to disk.
+    block_size : int
+        Number of values read from all runs together per merge step.
+    tmpdir : str, optional
+        Directory for the spilled runs, defaults to the system temp directory.
+    """
+
+    def __init__(
+        self,
+        column: str,
+        *,
+        max_in_memory: int = 10_000_000,
+        block_size: int = 1_000_000,
+        tmpdir: str | None = None,
+        description: str | None = None,
+        name: str | None = None,
+    ):
+        self.columns = (column,)
+        self.max_in_memory = max_in_memory
+        self.block_size = block_size
+        self.tmpdir = tmpdir
+        super().__init__(description or f"{column} must be unique", name)
+
+    def checker(self, header, max_samples=DEFAULT_MAX_SAMPLES):
+        """Create a checker for a table with the given header."""
+        return _UniqueChecker(
+            self, max_samples, self.max_in_memory, self.block_size, self.tmpdir
+        )
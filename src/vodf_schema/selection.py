@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+
+"""Fast selection of events by time range and sky region.
+
+Two optional index structures avoid full scans of an event list:
+
+* Event lists declared as time-ordered by ``TSORTKEY = 'TIME'`` (checked by
+  the `~vodf_schema.rules.SortedBy` rule of
+  `~vodf_schema.level1.EventList`) are searched by bisection of the
+  memory-mapped TIME column, which reads O(log n) values.
+* A `SkyIndex`, stored in a sidecar FITS file, maps HEALPix pixels (NESTED
+  scheme, see `vodf_schema.healpix`) to the sorted row numbers of the events
+  in that pixel, so a cone search only reads the rows of the pixels that
+  overlap the cone.
+
+`select_events` combines both and falls back to chunked scans when an event
+list has no index. Only the selected rows are copied from the memory map.
+"""
+
+import bisect
+from os import PathLike
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+from astropy.table import Table
+
+from .fitsblocks import HDULocation, find_hdu, memmap_rows, scan_hdus, table_columns
+from .healpix import ang2pix_nested, max_pixel_radius, pix2ang_nested
+from .rules import sort_keys
+
+__all__ = [
+    "DEFAULT_SKY_INDEX_ORDER",
+    "SkyIndex",
+    "angular_distance",
+    "is_time_sorted",
+    "select_events",
+    "time_range_rows",
+]
+
+#: HEALPix order of sky indexes, i.e. NSIDE=64 with pixels of about 0.9 deg
+DEFAULT_SKY_INDEX_ORDER = 6
+
+_CHUNK_SIZE = 1_000_000
+_PIXELS_EXTNAME = "SKY-INDEX"
+_ROWS_EXTNAME = "SKY-INDEX-ROWS"
+
+
+def angular_distance(lon1, lat1, lon2, lat2) -> np.ndarray:
+    """Great-circle distance in degrees, using the haversine formula."""
+    lon1, lat1, lon2, lat2 = (np.deg2rad(v) for v in (lon1, lat1, lon2, lat2))
+    hav = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    )
+    return np.rad2deg(2 * np.arcsin(np.sqrt(np.clip(hav, 0.0, 1.0))))
+
+
+def _event_location(path, hdu) -> HDULocation:
+    return find_hdu(scan_hdus(path), "EVENT-LIST" if hdu is None else hdu)
+
+
+def is_time_sorted(header: fits.Header) -> bool:
+    """Whether the header declares the rows as sorted by TIME."""
+    return sort_keys(header)[:1] == ["TIME"]
+
+
+def time_range_rows(
+    path: str | PathLike, location: HDULocation, start: float, stop: float
+) -> tuple[int, int]:
+    """Return the row range ``[first, last)`` of the events with start <= TIME < stop.
+
+    The event list must be declared time-ordered, see `is_time_sorted`.
+    Times are in the units of the TIME column, e.g. seconds of MET.
+    """
+    if not is_time_sorted(location.header):
+        raise ValueError("The event list is not declared sorted by TIME (TSORTKEY)")
+
+    column = next(c for c in table_columns(location.header) if c.name == "TIME")
+    times = memmap_rows(path, location)["TIME"]
+    # bisect only reads the O(log n) values it compares
+    first = bisect.bisect_left(times, start, key=column.physical)
+    last = bisect.bisect_left(times, stop, lo=first, key=column.physical)
+    return first, last
+
+
+def _column_values(rows: np.ndarray, columns: dict, name: str) -> np.ndarray:
+    values = columns[name].physical(rows[name])
+    return values.astype(values.dtype.newbyteorder("="), copy=False)
+
+
+class SkyIndex:
+    """HEALPix index mapping sky pixels to the rows of an event list.
+
+    The rows of each pixel are stored contiguously and sorted, i.e. in
+    compressed sparse row layout: the rows of ``pixels[i]`` are
+    ``rows[starts[i]:starts[i] + counts[i]]``.
+
+    Parameters
+    ----------
+    order : int
+        HEALPix order of the pixels.
+    pixels : numpy.ndarray
+        Sorted, unique pixel numbers that contain at least one event.
+    starts, counts : numpy.ndarray
+        Offset into ``rows`` and number of events of each pixel.
+    rows : numpy.ndarray
+        Row numbers, grouped by pixel.
+    n_rows : int
+        Number of rows of the indexed event list.
+    """
+
+    def __init__(self, order, pixels, starts, counts, rows, n_rows):
+        self.order = order
+        self.pixels = np.asarray(pixels, dtype=np.int64)
+        self.starts = np.asarray(starts, dtype=np.int64)
+        self.counts = np.asarray(counts, dtype=np.int64)
+        # not converted, so that memory-mapped rows are only read when needed
+        self.rows = np.asarray(rows)
+        self.n_rows = n_rows
+
+    @classmethod
+    def build(
+        cls,
+        path: str | PathLike,
+        hdu: int | str | tuple[str, int] | None = None,
+        order: int = DEFAULT_SKY_INDEX_ORDER,
+        chunk_size: int = _CHUNK_SIZE,
+    ) -> "SkyIndex":
+        """Index the RA/DEC columns of an event list, streaming them in chunks."""
+        location = _event_location(path, hdu)
+        columns = {c.name: c for c in table_columns(location.header)}
+        n_rows = location.header["NAXIS2"]
+
+        pixels = np.empty(n_rows, dtype=np.int64)
+        for start in range(0, n_rows, chunk_size):
+            chunk = memmap_rows(path, location, start, start + chunk_size)
+            ra = _column_values(chunk, columns, "RA")
+            dec = _column_values(chunk, columns, "DEC")
+            pixels[start : start + len(chunk)] = ang2pix_nested(order, ra, dec)
+            del chunk
+
+        # a stable sort keeps the rows of each pixel in ascending order
+        rows = np.argsort(pixels, kind="stable")
+        unique, starts, counts = np.unique(
+            pixels[rows], return_index=True, return_counts=True
+        )
+        return cls(order, unique, starts, counts, rows, n_rows)
+
+    def write(self, path: str | PathLike, overwrite: bool = False):
+        """Write the index as a sidecar FITS file."""
+        header = fits.Header()
+        header["PIXTYPE"] = ("HEALPIX", "HEALPix pixelization")
+        header["ORDERING"] = ("NESTED", "Pixel ordering scheme")
+        header["ORDER"] = (self.order, "HEALPix order, NSIDE = 2**ORDER")
+        header["INDXCOLS"] = ("RA,DEC", "Indexed columns")
+        header["NROWS"] = (self.n_rows, "Number of rows of the indexed event list")
+        pixels = fits.BinTableHDU.from_columns(
+            [
+                fits.Column("PIXEL", "K", array=self.pixels),
+                fits.Column("START", "K", array=self.starts),
+                fits.Column("COUNT", "K", array=self.counts),
+            ],
+            header=header,
+            name=_PIXELS_EXTNAME,
+        )
+        rows = fits.BinTableHDU.from_columns(
+            [fits.Column("ROW", "K", array=self.rows)], name=_ROWS_EXTNAME
+        )
+        fits.HDUList([fits.PrimaryHDU(), pixels, rows]).writeto(
+            path, overwrite=overwrite
+        )
+
+    @classmethod
+    def read(cls, path: str | PathLike) -> "SkyIndex":
+        """Read an index written by `write`."""
+        locations = scan_hdus(path)
+        pixels_location = find_hdu(locations, _PIXELS_EXTNAME)
+        header = pixels_location.header
+        if header.get("ORDERING") != "NESTED":
+            raise ValueError(f"Unsupported pixel ordering {header.get('ORDERING')}")
+
+        pixels = memmap_rows(path, pixels_location)
+        rows = memmap_rows(path, find_hdu(locations, _ROWS_EXTNAME))["ROW"]
+        return cls(
+            header["ORDER"],
+            pixels["PIXEL"],
+            pixels["START"],
+            pixels["COUNT"],
+            rows,
+            header["NROWS"],
+        )
+
+    def pixels_in_cone(self, ra: float, dec: float, radius: float) -> np.ndarray:
+        """Return the indices (into ``pixels``) of the pixels that may overlap a cone.
+
+        The selection is conservative, it may contain pixels that do not
+        overlap, but never misses one. All angles are in degrees.
+        """
+        lon, lat = pix2ang_nested(self.order, self.pixels)
+        distance = angular_distance(ra, dec, lon, lat)
+        return np.flatnonzero(distance <= radius + max_pixel_radius(self.order))
+
+    def candidate_rows(
+        self,
+        ra: float,
+        dec: float,
+        radius: float,
+        row_range: tuple[int, int] | None = None,
+    ) -> np.ndarray:
+        """Return the sorted rows of the events in pixels that may overlap a cone.
+
+        Parameters
+        ----------
+        ra, dec, radius : float
+            Center and radius of the cone in degrees.
+        row_range : tuple[int, int], optional
+            Only return rows in ``[first, last)``, e.g. a time range.
+        """
+        first, last = (0, self.n_rows) if row_range is None else row_range
+        selected = []
+        for i in self.pixels_in_cone(ra, dec, radius):
+            pixel_rows = self.rows[self.starts[i] : self.starts[i] + self.counts[i]]
+            # the rows of each pixel are sorted
+            lo, hi = np.searchsorted(pixel_rows, [first, last])
+            selected.append(np.asarray(pixel_rows[lo:hi]))
+
+        if not selected:
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate(selected))
+
+
+def _to_table(rows: np.ndarray, columns: dict) -> Table:
+    table = Table()
+    for name, column in columns.items():
+        values = column.physical(rows[name])
+        table[name] = values.astype(values.dtype.newbyteorder("="), copy=False)
+        if column.unit is not None:
+            table[name].unit = u.Unit(column.unit, format="fits", parse_strict="silent")
+    return table
+
+
+def select_events(
+    path: str | PathLike,
+    time_range: tuple[float, float] | None = None,
+    cone: tuple[float, float, float] | None = None,
+    sky_index: SkyIndex | str | PathLike | None = None,
+    hdu: int | str | tuple[str, int] | None = None,
+    chunk_size: int = _CHUNK_SIZE,
+) -> Table:
+    """Select the events in a time range and/or a cone on the sky.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The event-list file.
+    time_range : tuple[float, float], optional
+        ``(start, stop)`` in the units of the TIME column, selecting
+        start <= TIME < stop. Found by bisection for time-ordered event lists.
+    cone : tuple[float, float, float], optional
+        ``(ra, dec, radius)`` in degrees.
+    sky_index : SkyIndex or path, optional
+        Index used for the cone search, see `SkyIndex.build`. Without an
+        index, RA/DEC are scanned in chunks.
+    hdu : int, str or tuple, optional
+        The event-list HDU, by default the one with EXTNAME EVENT-LIST.
+    chunk_size : int
+        Number of rows read at once when scanning.
+
+    Returns
+    -------
+    astropy.table.Table
+        The selected events with physical values and units, in row order.
+    """
+    location = _event_location(path, hdu)
+    header = location.header
+    columns = {c.name: c for c in table_columns(header)}
+    n_rows = header["NAXIS2"]
+
+    first, last = 0, n_rows
+    time_filter = None
+    if time_range is not None:
+        if is_time_sorted(header):
+            first, last = time_range_rows(path, location, *time_range)
+        else:
+            time_filter = time_range
+
+    if isinstance(sky_index, str | PathLike):
+        sky_index = SkyIndex.read(sky_index)
+    if sky_index is not None and sky_index.n_rows != n_rows:
+        raise ValueError(
+            f"The sky index has {sky_index.n_rows} rows, the event list {n_rows}"
+        )
+
+    if cone is not None and sky_index is not None:
+        candidates = sky_index.candidate_rows(*cone, row_range=(first, last))
+        # fancy indexing only copies the candidate rows from the memory map
+        chunks = [memmap_rows(path, location)[candidates]]
+    else:
+        chunks = (
+            np.array(memmap_rows(path, location, start, min(start + chunk_size, last)))
+            for start in range(first, last, chunk_size)
+        )
+
+    selected = []
+    for rows in chunks:
+        mask = np.ones(len(rows), dtype=bool)
+        if time_filter is not None:
+            time = _column_values(rows, columns, "TIME")
+            mask &= (time >= time_filter[0]) & (time < time_filter[1])
+        if cone is not None:
+            ra = _column_values(rows, columns, "RA")
+            dec = _column_values(rows, columns, "DEC")
+            mask &= angular_distance(cone[0], cone[1], ra, dec) <= cone[2]
+        selected.append(rows[mask])
+
+    if not selected:
+        dtype = memmap_rows(path, location, 0, 0).dtype
+        return _to_table(np.empty(0, dtype=dtype), columns)
+    return _to_table(np.concatenate(selected), columns)
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+
+"""Long-running validation service that keeps the schemas warm.
+
+Starting a Python process per file spends most of its time importing
+astropy, fits_schema and the schema classes. `ValidationService` does this
+once per worker process of a `~concurrent.futures.ProcessPoolExecutor` and
+serves validation requests over HTTP/1.1 on a TCP port or a Unix socket,
+using only the standard library::
+
+    $ vodf-service --port 8080 --jobs 4
+    $ curl -X POST 'localhost:8080/validate?path=/data/events.fits&level=header'
+    $ curl -X POST --data-binary @events.fits 'localhost:8080/validate'
+
+Endpoints:
+
+``GET /health``
+    The version of the package and the number of pending requests.
+``POST /validate``
+    Validates the file given by the ``path`` query parameter or, without
+    it, the file sent as request body (with Content-Length or chunked
+    transfer encoding), which is spooled to a temporary file. Further query
+    parameters are ``level`` ("full", the default, or "header" for
+    `~vodf_schema.validation.validate_headers`, which answers in a few
+    milliseconds), ``compact``, ``profile``, ``max_errors`` and
+    ``first_error_per_rule``, see ``vodf-validate``. The response is the
+    json result of one file as in the report of ``vodf-validate``.
+
+Errors while validating, e.g. a crashed worker process or a full disk while
+spooling an upload, are answered with 500 and the error in the json body. A
+pool broken by a crashed worker is replaced by a new one for the next
+requests.
+
+Backpressure: at most ``max_pending`` requests are validated or uploaded at
+once, further ones are answered immediately with 503 and a Retry-After
+header, so that the memory and temporary disk space stay bounded, and
+uploads are read only as fast as they are spooled.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import suppress
+from http import HTTPStatus
+from os import PathLike
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+from .cli import _init_worker, _validate_one
+from .version import __version__
+
+__all__ = ["DEFAULT_PORT", "ValidationService", "main", "serve"]
+
+#: TCP port of the service if none is given
+DEFAULT_PORT = 8080
+
+#: maximum size of the request line and of each header line
+_MAX_LINE = 64 * 1024
+
+#: number of bytes read at once from uploads
+_READ_SIZE = 1024 * 1024
+
+_LEVELS = {"full", "header"}
+_TRUE = {"1", "true", "yes", "on"}
+
+
+class _HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str | None = None):
+        super().__init__(message or status.description)
+        self.status = status
+
+
+def _warm_worker():
+    # compile all schemas once per worker, see `ValidationService.start`
+    from .compiled import compile_table
+    from .validation import known_schemas
+
+    _init_worker()
+    for schema in known_schemas().values():
+        compile_table(schema)
+    return os.getpid()
+
+
+async def _read_request(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").split()
+    except ValueError:
+        raise _HTTPError(HTTPStatus.BAD_REQUEST, "Malformed request line") from None
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return method.upper(), target, version.upper(), headers
+
+
+async def _iter_body(reader: asyncio.StreamReader, headers: dict, max_size: int):
+    """Yield the request body in pieces, decoding chunked transfer encoding."""
+    n_read = 0
+
+    async def pieces(size):
+        nonlocal n_read
+        n_read += size
+        if n_read > max_size:
+            raise _HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+        while size > 0:
+            piece = await reader.read(min(size, _READ_SIZE))
+            if not piece:
+                raise _HTTPError(HTTPStatus.BAD_REQUEST, "Incomplete request body")
+            size -= len(piece)
+            yield piece
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            try:
+                size = int((await reader.readline()).split(b";")[0], 16)
+            except ValueError:
+                raise _HTTPError(HTTPStatus.BAD_REQUEST, "Malformed chunk") from None
+            if size == 0:
+                # skip the trailer
+                while await reader.readline() not in (b"\r\n", b"\n", b""):
+                    pass
+                return
+            async for piece in pieces(size):
+                yield piece
+            await reader.readline()
+    else:
+        try:
+            length = int(headers["content-length"])
+        except (KeyError, ValueError):
+            raise _HTTPError(HTTPStatus.LENGTH_REQUIRED) from None
+        async for piece in pieces(length):
+            yield piece
+
+
+def _response(
+    status: HTTPStatus, body: dict, keep_alive: bool, extra: dict | None = None
+) -> bytes:
+    content = json.dumps(body).encode()
+    headers = {
+        "Content-Type": "application/json",
+        "Content-Length": str(len(content)),
+        "Connection": "keep-alive" if keep_alive else "close",
+        **(extra or {}),
+    }
+    lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+    lines.extend(f"{k}: {v}" for k, v in headers.items())
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + content
+
+
+class ValidationService:
+    """Validates files on a pool of worker processes with warm schemas.
+
+    Parameters
+    ----------
+    n_jobs : int, optional
+        Number of worker processes, defaults to the number of CPUs.
+    max_pending : int, optional
+        Maximum number of requests validated or uploaded at once, further
+        ones are rejected with 503. Defaults to ``4 * n_jobs``.
+    chunk_size : int, optional
+        Number of table rows validated at once.
+    timeout : float, optional
+        Maximum time in seconds spent on a single file.
+    max_upload_size : int, optional
+        Maximum size in bytes of uploaded files, larger ones are rejected
+        with 413. No limit by default.
+    upload_dir : str or PathLike, optional
+        Directory of the temporary files of uploads.
+    roots : list[str or PathLike], optional
+        If given, only files within these directories are validated by path.
+    """
+
+    def __init__(
+        self,
+        n_jobs: int | None = None,
+        max_pending: int | None = None,
+        chunk_size: int | None = None,
+        timeout: float | None = None,
+        max_upload_size: int | None = None,
+        upload_dir: str | PathLike | None = None,
+        roots: list[str | PathLike] | None = None,
+    ):
+        from .validation import DEFAULT_CHUNK_SIZE
+
+        self.n_jobs = n_jobs or os.cpu_count() or 1
+        self.max_pending = 4 * self.n_jobs if max_pending is None else max_pending
+        if self.max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        self.timeout = timeout
+        self.max_upload_size = max_upload_size
+        self.upload_dir = upload_dir
+        self.roots = None if roots is None else [Path(r).resolve() for r in roots]
+        #: number of requests currently validated or uploaded
+        self.pending = 0
+        self._pool = None
+        self._server = None
+        # tasks serving the open connections
+        self._handlers = set()
+
+    async def start(
+        self,
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        unix: str | PathLike | None = None,
+    ) -> asyncio.AbstractServer:
+        """Start the workers, wait until their schemas are loaded and listen.
+
+        Listens on ``unix`` if given, otherwise on ``host`` and ``port``
+        (0 chooses a free port, see `address`).
+        """
+        self._pool = self._new_pool()
+        # one task per worker starts them all before the first request
+        await asyncio.gather(*(asyncio.wrap_future(w) for w in self._warm()))
+
+        limit = _MAX_LINE
+        if unix is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle, os.fspath(unix), limit=limit
+            )
+        else:
+            self._server = await asyncio.start_server(
+                self._handle, host, port, limit=limit
+            )
+        return self._server
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(self.n_jobs, initializer=_warm_worker)
+
+    def _warm(self) -> list:
+        return [self._pool.submit(os.getpid) for _ in range(self.n_jobs)]
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        # several requests may fail on the same broken pool, it is replaced once
+        if self._pool is not broken:
+            return
+        self._pool = self._new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+        # the new workers load the schemas before the next request
+        self._warm()
+
+    @property
+    def address(self):
+        """The address the service listens on, e.g. (host, port)."""
+        return self._server.sockets[0].getsockname()
+
+    async def close(self):
+        """Stop listening, close all connections and shut down the workers."""
+        if self._server is not None:
+            self._server.close()
+            for handler in self._handlers:
+                handler.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    async def __aenter__(self) -> "ValidationService":
+        """Start with the default arguments of `start`."""
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        """Close the service."""
+        await self.close()
+
+    async def validate(
+        self,
+        path: str | PathLike,
+        level: str = "full",
+        compact: bool = False,
+        profile: bool = False,
+        mode=None,
+    ) -> dict:
+        """Validate a file on the worker pool and return the json result.
+
+        ``level="header"`` only validates the headers. The result has the
+        format of the files in the report of ``vodf-validate``. If a worker
+        process crashed, `~concurrent.futures.process.BrokenProcessPool` is
+        raised and the pool is replaced for the next calls.
+        """
+        if level not in _LEVELS:
+            raise ValueError(f"Unknown level {level!r}, expected one of {_LEVELS}")
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+        try:
+            return await loop.run_in_executor(
+                pool,
+                _validate_one,
+                Path(path),
+                self.chunk_size,
+                self.timeout,
+                mode,
+                compact,
+                profile,
+                1,
+                level == "header",
+            )
+        except BrokenProcessPool:
+            self._replace_pool(pool)
+            raise
+
+    def _check_path(self, path: str) -> Path:
+        resolved = Path(path).resolve()
+        if self.roots is not None and not any(
+            resolved.is_relative_to(root) for root in self.roots
+        ):
+            raise _HTTPError(HTTPStatus.FORBIDDEN, f"{path} is not within the roots")
+        if not resolved.is_file():
+            raise _HTTPError(HTTPStatus.NOT_FOUND, f"No such file: {path}")
+        return resolved
+
+    async def _validate_request(self, query: dict, reader, headers) -> dict:
+        from .validation import ValidationMode
+
+        def option(name, default=None):
+            return query.get(name, [default])[-1]
+
+        level = option("level", "full")
+        if level not in _LEVELS:
+            raise _HTTPError(HTTPStatus.BAD_REQUEST, f"Unknown level {level!r}")
+        try:
+            max_errors = option("max_errors")
+            mode = ValidationMode(
+                max_errors=None if max_errors is None else int(max_errors),
+                first_error_per_rule=option("first_error_per_rule", "") in _TRUE,
+            )
+        except ValueError as e:
+            raise _HTTPError(HTTPStatus.BAD_REQUEST, str(e)) from None
+        options = {
+            "level": level,
+            "compact": option("compact", "") in _TRUE,
+            "profile": option("profile", "") in _TRUE,
+            "mode": mode,
+        }
+
+        path = option("path")
+        if path is not None:
+            return await self.validate(self._check_path(path), **options)
+
+        max_size = self.max_upload_size
+        body = _iter_body(
+            reader, headers, float("inf") if max_size is None else max_size
+        )
+        fd, tmp = tempfile.mkstemp(suffix=".fits", dir=self.upload_dir)
+        try:
+            with open(fd, "wb") as f:
+                async for piece in body:
+                    f.write(piece)
+            result = await self.validate(tmp, **options)
+        finally:
+            os.unlink(tmp)
+        # the temporary name means nothing to the client
+        name = option("name", "<upload>")
+        result["path"] = name
+        for report in result["reports"]:
+            report["path"] = name
+        return result
+
+    async def _respond(self, request, reader) -> tuple[HTTPStatus, dict, dict]:
+        method, target, _, headers = request
+        url = urlsplit(target)
+        if url.path == "/health":
+            if method != "GET":
+                raise _HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+            status = {
+                "status": "ok",
+                "vodf_schema_version": __version__,
+                "workers": self.n_jobs,
+                "pending": self.pending,
+                "max_pending": self.max_pending,
+            }
+            return HTTPStatus.OK, status, {}
+
+        if url.path != "/validate":
+            raise _HTTPError(HTTPStatus.NOT_FOUND, f"Unknown endpoint {url.path}")
+        if method != "POST":
+            raise _HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+        if self.pending >= self.max_pending:
+            return (
+                HTTPStatus.SERVICE_UNAVAILABLE,
+                {"error": f"{self.pending} requests pending, retry later"},
+                {"Retry-After": "1"},
+            )
+
+        self.pending += 1
+        try:
+            start = time.perf_counter()
+            result = await self._validate_request(parse_qs(url.query), reader, headers)
+            result["latency"] = time.perf_counter() - start
+            return HTTPStatus.OK, result, {}
+        finally:
+            self.pending -= 1
+
+    async def _handle(self, reader: asyncio.StreamReader, writer):
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    status, body, extra = await self._respond(request, reader)
+                    _, _, version, headers = request
+                    connection = headers.get("connection", "").lower()
+                    keep_alive = connection != "close" and (
+                        version == "HTTP/1.1" or connection == "keep-alive"
+                    )
+                except (_HTTPError, ValueError) as e:
+                    status = getattr(e, "status", HTTPStatus.BAD_REQUEST)
+                    body, extra = {"error": str(e)}, {}
+                    keep_alive = False
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    raise
+                except Exception as e:
+                    # e.g. a crashed worker or a full disk while spooling
+                    status = HTTPStatus.INTERNAL_SERVER_ERROR
+                    body, extra = {"error": f"{type(e).__name__}: {e}"}, {}
+                    keep_alive = False
+
+                # the body of a rejected upload is not read
+                keep_alive &= status != HTTPStatus.SERVICE_UNAVAILABLE
+                writer.write(_response(status, body, keep_alive, extra))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._handlers.discard(handler)
+            writer.close()
+            with suppress(ConnectionError):
+                await writer.wait_closed()
+
+
+async def serve(
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    unix: str | PathLike | None = None,
+    **kwargs,
+):
+    """Run a `ValidationService` until SIGINT or SIGTERM.
+
+    ``kwargs`` are passed to `ValidationService`.
+    """
+    service = ValidationService(**kwargs)
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    await service.start(host, port, unix)
+    print(f"vodf-service {__version__} listening on {service.address}", flush=True)
+    try:
+        await stop.wait()
+    finally:
+        await service.close()
+        if unix is not None:
+            with suppress(FileNotFoundError):
+                os.unlink(unix)
+
+
+def main(args=None):
+    """Entry point of ``vodf-service``."""
+    parser = argparse.ArgumentParser(
+        prog="vodf-service",
+        description="Serve the validation of FITS files against the VODF schemas.",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port")
+    parser.add_argument("--unix", help="Listen on this Unix socket instead of TCP")
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    parser.add_argument(
+        "--max-pending",
+        type=int,
+        default=None,
+        help="Requests validated at once, more are rejected (default: 4 * jobs)",
+    )
+    parser.add_argument(
+        "--timeout", type=float, default=None, help="Maximum seconds per file"
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=None,
+        help="Number of table rows validated at once",
+    )
+    parser.add_argument(
+        "--max-upload-size", type=int, default=None, help="Maximum bytes per upload"
+    )
+    parser.add_argument("--upload-dir", help="Directory for the uploaded files")
+    parser.add_argument(
+        "--root",
+        action="append",
+        dest="roots",
+        help="Only validate paths within this directory, can be repeated",
+    )
+    parser.add_argument("--version", action="version", version=__version__)
+    args = parser.parse_args(args)
+
+    asyncio.run(
+        serve(
+            args.host,
+            args.port,
+            args.unix,
+            n_jobs=args.jobs,
+            max_pending=args.max_pending,
+            chunk_size=args.chunk_size,
+            timeout=args.timeout,
+            max_upload_size=args.max_upload_size,
+            upload_dir=args.upload_dir,
+            roots=args.roots,
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+
+"""Out-of-core stacking of many event lists into one.
+
+`stack_eventlists` merges the `~vodf_schema.level1.EventList` HDUs of many
+files, e.g. all observations of a combined analysis, into a single event list
+sorted by TIME. The inputs may have different time references (MJDREFI,
+MJDREFF, TIMESYS): their times are moved to the common epoch with
+`~vodf_schema.temporal.TimeReference.to_reference`, in integer nanoseconds
+and without creating `astropy.time.Time` objects.
+
+The inputs have to be sorted by TIME, which is checked while reading. They are
+memory-mapped and read in buffers of ``chunk_size / n_inputs`` rows, and
+merged in rounds: all buffered events up to the last buffered time of the
+inputs with unread events are final, they are sorted and appended to the
+output with `~vodf_schema.writer.EventListWriter`. An input is only opened
+once the merge reaches its first event, so for observations that follow each
+other only a few inputs are mapped at a time. The memory used thus depends on
+``chunk_size``, not on the number or the length of the inputs.
+
+EVENT_ID is only unique within an observation. It is either renumbered (the
+events of each input get a block of consecutive IDs, in input order) or
+namespaced by OBS_ID, as ``OBS_ID * id_stride + EVENT_ID``. The grouping table
+appended after the events, an `~vodf_schema.level1.ObservationGroupingTable`,
+has one row per input with its location, OBS_ID, number of events, time
+reference and the offset added to its event IDs (to the row index when
+renumbering, to EVENT_ID when namespacing), so every stacked event can be
+traced back to its input.
+"""
+
+import os
+from collections.abc import Mapping, Sequence
+from functools import cached_property
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+from astropy.table import Table
+
+from .compiled import compile_table
+from .fitsblocks import find_hdu, memmap_rows, scan_hdus, table_columns
+from .temporal import TimeReference, time_reference
+from .writer import EventListWriter, _fixed_value
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "DEFAULT_ID_STRIDE",
+    "stack_eventlists",
+]
+
+#: default number of events buffered over all inputs
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+#: default factor of OBS_ID in namespaced event IDs
+DEFAULT_ID_STRIDE = 10**10
+
+_INT64_MAX = np.iinfo(np.int64).max
+# exposure keywords summed over the inputs, kept if all inputs have them
+_ADDITIVE = ("ONTIME", "LIVETIME", "EXPOSURE")
+# keywords set from the common time reference and the stacked events
+_DERIVED = (
+    "MJDREFI",
+    "MJDREFF",
+    "TIMESYS",
+    "TSTART",
+    "TSTOP",
+    "DATE-OBS",
+    "DATE-END",
+    "TSORTKEY",
+    "DATASUM",
+    "CHECKSUM",
+    *_ADDITIVE,
+)
+
+
+class _Input:
+    """Buffered reader of the events of one input, in the output conventions."""
+
+    def __init__(self, path: str | PathLike, hdu: int | str):
+        self.path = Path(path)
+        self.location = find_hdu(scan_hdus(self.path), hdu)
+        self.header = self.location.header
+        self.reference = time_reference(self.header)
+        self.columns = {c.name: c for c in table_columns(self.header)}
+        self.n_rows = self.header["NAXIS2"]
+        self.position = 0
+        # TIME of the last event read, i.e. of the end of the buffer
+        self.last_time = -np.inf
+        self.buffer = None
+        self._rows = None
+
+    def configure(
+        self,
+        target: TimeReference,
+        units: Mapping[str, u.UnitBase | None],
+        id_offset: int,
+        id_stride: int | None,
+    ):
+        """Set the output time reference, column units and event ID offset."""
+        self.target = target
+        self.id_offset = id_offset
+        self.id_stride = id_stride
+        self.factors = {}
+        for name, unit in units.items():
+            column = self.columns.get(name)
+            if column is None:
+                raise ValueError(f"{self.path} has no column {name}")
+            factor = 1.0
+            if unit is not None and column.unit is not None:
+                factor = u.Unit(column.unit, format="fits").to(unit)
+            self.factors[name] = factor
+
+    @property
+    def exhausted(self) -> bool:
+        """Whether all events have been read into the buffer."""
+        return self.position == self.n_rows
+
+    @cached_property
+    def start_time(self) -> float:
+        """TIME of the first event in the output reference."""
+        raw = memmap_rows(self.path, self.location, 0, 1)["TIME"]
+        met = self.columns["TIME"].physical(raw)
+        return float(
+            self.reference.to_reference(met, self.target, self.factors["TIME"])[0]
+        )
+
+    def _read(self, start: int, stop: int) -> dict[str, np.ndarray]:
+        raw = self._rows[start:stop]
+        chunk = {}
+        for name, factor in self.factors.items():
+            values = self.columns[name].physical(raw[name])
+            if name == "TIME":
+                values = self.reference.to_reference(values, self.target, factor)
+            elif name == "EVENT_ID":
+                values = self._event_ids(values, start, stop)
+            elif factor != 1.0:
+                values = values * factor
+            chunk[name] = values
+        return chunk
+
+    def _event_ids(self, values: np.ndarray, start: int, stop: int) -> np.ndarray:
+        if self.id_stride is None:
+            return np.arange(start + self.id_offset, stop + self.id_offset)
+        if len(values) and (values.min() < 0 or values.max() >= self.id_stride):
+            raise ValueError(
+                f"EVENT_ID of {self.path} is not within [0, {self.id_stride}),"
+                " it cannot be namespaced by OBS_ID"
+            )
+        return values.astype(np.int64) + self.id_offset
+
+    def fill(self, n_rows: int) -> bool:
+        """Read the next events into the empty buffer, False if there are none."""
+        if self.exhausted:
+            self.buffer = None
+            return False
+        if self._rows is None:
+            self._rows = memmap_rows(self.path, self.location)
+
+        start, stop = self.position, min(self.position + n_rows, self.n_rows)
+        self.buffer = self._read(start, stop)
+        times = self.buffer["TIME"]
+        if np.any(times[:-1] > times[1:]) or times[0] < self.last_time:
+            raise ValueError(f"Events of {self.path} are not sorted by TIME")
+        self.last_time = times[-1]
+        self.position = stop
+        if self.exhausted:
+            # release the memory map, inputs are only mapped while merged
+            self._rows = None
+        return True
+
+    def take(self, limit: float) -> dict[str, np.ndarray]:
+        """Remove and return the buffered events up to TIME ``limit``."""
+        n = np.searchsorted(self.buffer["TIME"], limit, side="right")
+        taken = {name: values[:n] for name, values in self.buffer.items()}
+        self.buffer = {name: values[n:] for name, values in self.buffer.items()}
+        return taken
+
+
+def _stacked_header(
+    inputs: list[_Input], target: TimeReference, schema, overrides: Mapping
+) -> dict:
+    compiled = compile_table(schema)
+    cards = {}
+    for keyword, card in compiled.header.cards.items():
+        schema_card = schema.__header__.__cards__[keyword]
+        if (
+            card.origin == "BinaryTableHeader"
+            or keyword in _DERIVED
+            or _fixed_value(schema_card.allowed_values) is not None
+        ):
+            continue
+        # cards that differ between the inputs, e.g. OBS_ID, are dropped
+        values = {repr(i.header.get(keyword)) for i in inputs}
+        if len(values) == 1 and keyword in inputs[0].header:
+            cards[keyword] = inputs[0].header[keyword]
+
+    cards["MJDREFI"] = target.mjdref_int
+    cards["MJDREFF"] = target.mjdref_frac
+    cards["TIMESYS"] = target.timesys
+    if target.trefpos is not None:
+        cards["TREFPOS"] = target.trefpos
+
+    starts = [i.reference.to_reference(i.header["TSTART"], target) for i in inputs]
+    stops = [i.reference.to_reference(i.header["TSTOP"], target) for i in inputs]
+    cards["TSTART"], cards["TSTOP"] = float(min(starts)), float(max(stops))
+    scale = "LOCAL" if target.timesys == "LOCAL" else "UTC"
+    for keyword, met in (("DATE-OBS", cards["TSTART"]), ("DATE-END", cards["TSTOP"])):
+        cards[keyword] = str(target.to_isot(met, scale))[:19].replace("T", " ")
+    for keyword in _ADDITIVE:
+        if all(keyword in i.header for i in inputs):
+            cards[keyword] = float(sum(i.header[keyword] for i in inputs))
+    cards["TSORTKEY"] = "TIME"
+    cards.update(overrides)
+    return cards
+
+
+def _grouping_hdu(inputs: list[_Input], output: Path) -> fits.BinTableHDU:
+    from .level1 import ObservationGroupingTable
+
+    locations = []
+    for i in inputs:
+        try:
+            # partial URIs are relative to the file of the grouping table
+            location = os.path.relpath(i.path.absolute(), output.absolute().parent)
+        except ValueError:
+            # e.g. on another drive on windows
+            location = str(i.path.absolute())
+        locations.append(Path(location).as_posix())
+
+    table = Table(
+        {
+            "MEMBER_NAME": [i.location.extname for i in inputs],
+            "MEMBER_VERSION": np.array([i.location.extver for i in inputs], np.int64),
+            "MEMBER_LOCATION": locations,
+            "MEMBER_URI_TYPE": ["URL"] * len(inputs),
+            "OBS_ID": np.array([i.header.get("OBS_ID", -1) for i in inputs], np.int64),
+            "N_EVENTS": np.array([i.n_rows for i in inputs], np.int64),
+            "EVENT_ID_OFFSET": np.array([i.id_offset for i in inputs], np.int64),
+            "MJDREFI": np.array([i.reference.mjdref_int for i in inputs], np.int64),
+            "MJDREFF": np.array([i.reference.mjdref_frac for i in inputs]),
+            "TIMESYS": [i.reference.timesys for i in inputs],
+        }
+    )
+    hdu = fits.table_to_hdu(table)
+    for keyword, card in ObservationGroupingTable.__header__.__cards__.items():
+        value = _fixed_value(card.allowed_values)
+        if card.required and value is not None and keyword not in hdu.header:
+            hdu.header[keyword] = value
+    hdu.header["EXTNAME"] = "GROUPING"
+    return hdu
+
+
+def _merge(parts: list[dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    parts = [p for p in parts if len(p["TIME"])] or parts[:1]
+    if len(parts) == 1:
+        return parts[0]
+    merged = {name: np.concatenate([p[name] for p in parts]) for name in parts[0]}
+    # stable, so that events at the same time keep the input order
+    order = np.argsort(merged["TIME"], kind="stable")
+    return {name: values[order] for name, values in merged.items()}
+
+
+def stack_eventlists(
+    inputs: Sequence[str | PathLike],
+    output: str | PathLike,
+    reference: TimeReference | Mapping | None = None,
+    event_ids: str = "renumber",
+    id_stride: int = DEFAULT_ID_STRIDE,
+    header: Mapping | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    hdu: int | str = "EVENT-LIST",
+    overwrite: bool = False,
+    profile: str | None = None,
+) -> Path:
+    """Merge the event lists of many files into one, sorted by TIME.
+
+    See the module documentation for the merge and the event IDs.
+
+    Parameters
+    ----------
+    inputs : Sequence[str or PathLike]
+        Files with a time-ordered event list.
+    output : str or PathLike
+        The output file, with the stacked event list and a GROUPING HDU of
+        the inputs.
+    reference : TimeReference or Mapping, optional
+        The common time reference, or a header with MJDREFI, MJDREFF and
+        TIMESYS. By default the one of the first input.
+    event_ids : str
+        "renumber" or "namespace", how EVENT_ID is made unique.
+    id_stride : int
+        Factor of OBS_ID in namespaced event IDs, all EVENT_IDs have to be
+        below it.
+    header : Mapping, optional
+        Cards of the output header. By default, the cards with the same value
+        in all inputs are kept, TSTART, TSTOP and the dates span all inputs
+        and ONTIME, LIVETIME and EXPOSURE are summed. Cards that differ, like
+        OBS_ID, have to be given if they are required by the schema.
+    chunk_size : int
+        Number of events buffered over all inputs.
+    hdu : int or str
+        Index or EXTNAME of the event list in the inputs.
+    overwrite : bool
+        Whether to replace an existing output file.
+    profile : str, optional
+        Storage profile of the output, see `~vodf_schema.writer.EventListWriter`.
+
+    Returns
+    -------
+    Path
+        The output file.
+    """
+    from .level1 import EventList
+
+    if event_ids not in ("renumber", "namespace"):
+        raise ValueError(
+            f"event_ids must be 'renumber' or 'namespace', not {event_ids!r}"
+        )
+    if not inputs:
+        raise ValueError("No event lists to stack")
+
+    readers = [_Input(path, hdu) for path in inputs]
+    if reference is None:
+        target = readers[0].reference
+    elif isinstance(reference, Mapping):
+        target = time_reference(reference)
+    else:
+        target = reference
+
+    compiled = compile_table(EventList)
+    units = {
+        name: column.unit
+        for name, column in compiled.columns.items()
+        if column.required or all(name in r.columns for r in readers)
+    }
+    if event_ids == "namespace":
+        obs_ids = [r.header.get("OBS_ID") for r in readers]
+        if any(not isinstance(o, int) or o < 0 for o in obs_ids):
+            raise ValueError("Namespacing EVENT_ID needs non-negative integer OBS_IDs")
+        if len(set(obs_ids)) != len(obs_ids):
+            raise ValueError("Namespacing EVENT_ID needs distinct OBS_IDs")
+        if (max(obs_ids) + 1) * id_stride - 1 > _INT64_MAX:
+            raise ValueError(f"OBS_ID * {id_stride} does not fit into 64-bit EVENT_IDs")
+        offsets, stride = [o * id_stride for o in obs_ids], id_stride
+    else:
+        offsets, stride = np.cumsum([0] + [r.n_rows for r in readers[:-1]]), None
+    for r, offset in zip(readers, offsets):
+        r.configure(target, units, int(offset), stride)
+
+    output = Path(output)
+    cards = _stacked_header(readers, target, EventList, header or {})
+    optional = [name for name in units if not compiled.columns[name].required]
+    buffer_rows = max(1, chunk_size // len(readers))
+    # inputs not opened yet, the one starting first at the end
+    pending = sorted((r for r in readers if r.n_rows), key=lambda r: r.start_time)[::-1]
+    active = []
+
+    with EventListWriter(
+        output, cards, EventList, optional, overwrite, profile
+    ) as writer:
+        while pending or active:
+            # open the inputs that start within the events buffered so far
+            while pending and (
+                not active
+                or pending[-1].start_time <= min(_limit(active), _end(active))
+            ):
+                reader = pending.pop()
+                reader.fill(buffer_rows)
+                active.append(reader)
+
+            limit = _limit(active)
+            if pending:
+                limit = min(limit, pending[-1].start_time)
+            chunk = _merge([r.take(limit) for r in active])
+            if len(chunk["TIME"]):
+                writer.write(chunk)
+            active = [r for r in active if len(r.buffer["TIME"]) or r.fill(buffer_rows)]
+        writer.close(tstop=cards["TSTOP"])
+
+    grouping = _grouping_hdu(readers, output)
+    fits.append(output, grouping.data, grouping.header, checksum=True)
+    return output
+
+
+def _limit(active: list[_Input]) -> float:
+    # later events of inputs with unread events may precede their next events
+    return min((r.last_time for r in active if not r.exhausted), default=np.inf)
+
+
+def _end(active: list[_Input]) -> float:
+    return max(r.last_time for r in active)
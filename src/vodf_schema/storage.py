@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+"""Storage profiles: compact on-disk representations of table columns.
+
+A schema declares the columns with their logical type, e.g. TIME as Double.
+Storage profiles, attached to a `~fits_schema.BinaryTable` as a
+``__storage_profiles__`` tuple, declare cheaper representations of some
+columns, e.g. ENERGY as single-precision float or RA as a 32-bit integer
+scaled with TSCALn/TZEROn. FITS readers (astropy, and
+`~vodf_schema.fitsblocks.TableColumn.physical` here) apply TSCALn/TZEROn, so
+the logical values are returned transparently.
+
+The precision a column needs is declared separately by a
+`~vodf_schema.rules.Precision` rule of the schema: validation checks that the
+format of each file resolves the values within the tolerance, and
+`ColumnStorage.encode` checks the actual rounding error when writing.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+
+from .fitsblocks import TableColumn, _cell_dtype
+from .rules import Precision
+
+__all__ = [
+    "ColumnStorage",
+    "StorageProfile",
+    "storage_profile",
+]
+
+
+@dataclass(frozen=True)
+class ColumnStorage:
+    """On-disk representation of a column, the value is ``stored * scale + zero``.
+
+    Parameters
+    ----------
+    tform : str
+        The TFORM code of the stored values, e.g. "E" or "J".
+    scale : float, optional
+        The TSCALn value.
+    zero : float or str, optional
+        The TZEROn value, or the header keyword holding it, e.g. "TSTART" to
+        store times as offsets from a per-file epoch.
+    """
+
+    tform: str
+    scale: float | None = None
+    zero: float | str | None = None
+
+    def zero_value(self, header: Mapping) -> float | None:
+        """Return TZEROn, reading it from ``header`` if given as a keyword."""
+        if not isinstance(self.zero, str):
+            return self.zero
+        if header.get(self.zero) is None:
+            raise KeyError(f"Header keyword {self.zero} needed as TZERO is missing")
+        return float(header[self.zero])
+
+    def fits_column(self, name: str, unit: str | None, header: Mapping) -> fits.Column:
+        """Return the column definition, with TSCALn/TZEROn."""
+        return fits.Column(
+            name=name,
+            format=self.tform,
+            unit=unit,
+            bscale=self.scale,
+            bzero=self.zero_value(header),
+        )
+
+    def encode(
+        self,
+        values: np.ndarray,
+        header: Mapping,
+        precision: Precision | None = None,
+        unit: u.UnitBase | str | None = None,
+    ) -> np.ndarray:
+        """Convert logical values to stored values.
+
+        Integers are rounded to the nearest value. Raises a `ValueError` if a
+        value does not fit into the stored type, or if the rounding error
+        exceeds the tolerance of ``precision``. The absolute tolerance is
+        converted to ``unit``, the unit of the values.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        code, dtype = _cell_dtype(self.tform, None)
+        dtype = dtype.newbyteorder("=")
+        zero = self.zero_value(header)
+        scale = 1.0 if self.scale is None else self.scale
+
+        stored = (values - (zero or 0.0)) / scale
+        if dtype.kind in "iu":
+            stored = np.round(stored)
+            info = np.iinfo(dtype)
+            finite = stored[np.isfinite(stored)]
+            if len(finite) != len(stored.ravel()) or np.any(
+                (finite < info.min) | (finite > info.max)
+            ):
+                raise ValueError(
+                    f"Values do not fit into TFORM {self.tform} with scale {scale}"
+                    f" and zero {zero}"
+                )
+        stored = stored.astype(dtype)
+
+        if precision is not None:
+            column = TableColumn("", code, dtype, scale=self.scale, zero=zero)
+            error = np.abs(column.physical(stored) - values)
+            atol = precision.atol_quantity
+            if unit is not None and atol.unit != u.dimensionless_unscaled:
+                atol = atol.to(unit)
+            tolerance = atol.value + precision.rtol * np.abs(values)
+            # NaN errors of NaN values pass
+            if np.any(error > tolerance):
+                raise ValueError(
+                    f"Storing {precision.columns[0]} as {self.tform} loses up to"
+                    f" {np.nanmax(error):g}, more than {precision.description!r}"
+                    " allows"
+                )
+        return stored
+
+
+@dataclass(frozen=True)
+class StorageProfile:
+    """Named set of column representations of a table schema.
+
+    Columns not listed are stored as declared by the schema.
+    """
+
+    name: str
+    columns: Mapping[str, ColumnStorage] = field(default_factory=dict)
+    description: str = ""
+
+
+def storage_profile(schema, name: str) -> StorageProfile:
+    """Return the storage profile ``name`` declared by a table schema."""
+    profiles = {p.name: p for p in getattr(schema, "__storage_profiles__", ())}
+    if name not in profiles:
+        raise KeyError(
+            f"{schema.__name__} has no storage profile {name!r},"
+            f" only {sorted(profiles)}"
+        )
+    return profiles[name]
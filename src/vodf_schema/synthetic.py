@@ -0,0 +1,633 @@
+#!/usr/bin/env python3
+
+"""Generation of synthetic, schema-valid VODF files for load tests.
+
+The files are derived from the schema classes: the columns, their TFORM codes
+and units come from the table schema, the header cards from the
+``allowed_values`` and ``examples`` of the header schema, and the column
+values are drawn so that they satisfy the semantic rules of the schema (see
+`vodf_schema.rules`), e.g. unique and time-ordered columns or values within
+header ranges. Violations of the rules can be injected on purpose to exercise
+validators.
+
+Rows are generated in vectorized chunks in a pool of threads (NumPy releases
+the GIL while filling arrays with random numbers) and written directly after
+the header, so the output speed is bound by the disk. Each chunk has its own
+random stream spawned from the seed, so the files only depend on the seed and
+not on the number of threads or the chunk scheduling.
+"""
+
+import argparse
+import os
+from collections import deque
+from collections.abc import Callable, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+from astropy.table import Table
+from astropy.time import Time
+
+from .compiled import compile_table
+from .fitsblocks import _cell_dtype, padded_size
+from .rules import InRange, Rule, SortedBy, Unique, WithinHeaderRange
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "ColumnGenerator",
+    "generate_eventlist",
+    "generate_observations",
+    "main",
+    "synthetic_header",
+]
+
+#: default number of rows generated at once
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+#: signature of column generators: (rng, first row, stop row, header) -> values
+ColumnGenerator = Callable[[np.random.Generator, int, int, fits.Header], np.ndarray]
+
+# reference of the mission elapsed time (MET), 2001-01-01 00:00:00 TT
+_MJDREFI = 51910
+_MJDREFF = 7.428703703703703e-4
+_DEADTIME_CORRECTION = 0.95
+_OBSERVATION_GAP = 600.0
+# spread of the event positions around the pointing in degrees
+_POSITION_SPREAD = 2.0
+_ENERGY_MIN = 0.03 * u.TeV
+_SPECTRAL_INDEX = 2.5
+# TFORM codes of the columns that can be generated
+_NUMERIC_CODES = frozenset("BIJKED")
+
+
+def _card_value(card, types):
+    allowed = card.allowed_values
+    if allowed is not None:
+        if isinstance(allowed, str | int | float):
+            return allowed
+        if isinstance(allowed, list | tuple | range):
+            return allowed[0]
+        return sorted(allowed)[0]
+
+    examples = getattr(card, "examples", None)
+    if examples:
+        return examples[0]
+
+    type_ = float if types is None else types[0]
+    return {bool: False, int: 0, float: 0.0, str: "UNKNOWN"}.get(type_, 0.0)
+
+
+def _date(header: fits.Header, met: float) -> str:
+    mjd = header["MJDREFI"] + header["MJDREFF"]
+    return Time(mjd + met / 86400, format="mjd", scale="tt").iso[:19]
+
+
+def synthetic_header(
+    schema,
+    obs_id: int = 1,
+    tstart: float = 0.0,
+    duration: float = 1800.0,
+    overrides: Mapping | None = None,
+) -> fits.Header:
+    """Return the header cards of a synthetic HDU of a table schema.
+
+    The required cards of the schema get their first allowed value or first
+    example, or a neutral value of their type. The observation cards (OBS_ID,
+    TSTART, TSTOP, ONTIME, LIVETIME, DATE-OBS, DATE-END) are consistent with
+    ``tstart`` and ``duration``, and TSORTKEY is set for schemas with a
+    `~vodf_schema.rules.SortedBy` rule. The structural cards of the binary
+    table (NAXIS, TFORMn, ...) are not included.
+
+    Parameters
+    ----------
+    schema : type[BinaryTable]
+        The table schema, e.g. `vodf_schema.level1.EventList`.
+    obs_id : int
+        Value of OBS_ID.
+    tstart, duration : float
+        Start in seconds of MET and duration in seconds of the observation.
+    overrides : Mapping, optional
+        Cards to set after the generated ones, a value of None removes the
+        card, e.g. to produce invalid headers.
+    """
+    compiled = compile_table(schema)
+    header = fits.Header()
+    for keyword, card in compiled.header.cards.items():
+        if card.origin == "BinaryTableHeader" and keyword != "EXTNAME":
+            continue
+        if card.required:
+            schema_card = schema.__header__.__cards__[keyword]
+            header[keyword] = _card_value(schema_card, card.types)
+
+    if "OBS_ID" not in compiled.header.cards:
+        observation = {}
+    else:
+        header["TIMESYS"] = "TT"
+        header["MJDREFI"] = _MJDREFI
+        header["MJDREFF"] = _MJDREFF
+        observation = {
+            "OBS_ID": obs_id,
+            "TSTART": float(tstart),
+            "TSTOP": float(tstart + duration),
+            "ONTIME": float(duration),
+            "LIVETIME": float(duration * _DEADTIME_CORRECTION),
+            "DEADC": _DEADTIME_CORRECTION,
+            "DATE-OBS": _date(header, tstart),
+            "DATE-END": _date(header, tstart + duration),
+        }
+    for keyword, value in observation.items():
+        if keyword in compiled.header.cards:
+            header[keyword] = value
+
+    sorted_by = [r for r in getattr(schema, "__rules__", ()) if isinstance(r, SortedBy)]
+    if sorted_by:
+        header[sorted_by[0].keyword] = ",".join(r.columns[0] for r in sorted_by)
+
+    for keyword, value in (overrides or {}).items():
+        if value is None:
+            header.remove(keyword, ignore_missing=True)
+        else:
+            header[keyword] = value
+    return header
+
+
+def _rules_by_column(schema) -> dict[str, list[Rule]]:
+    rules = {}
+    for rule in getattr(schema, "__rules__", ()):
+        rules.setdefault(rule.columns[0], []).append(rule)
+    return rules
+
+
+def _sequential(rng, start, stop, header):
+    return np.arange(start, stop)
+
+
+def _arrival_times(low_keyword: str, high_keyword: str, n_rows: int):
+    # a Poisson process: the times of each chunk are the normalized cumulative
+    # sum of exponential gaps within the chunk's share of the time range
+    def generate(rng, start, stop, header):
+        low, high = header[low_keyword], header[high_keyword]
+        step = (high - low) / n_rows
+        gaps = rng.standard_exponential(stop - start + 1)
+        times = np.cumsum(gaps)
+        return low + step * start + times[:-1] * (step * (stop - start) / times[-1])
+
+    return generate
+
+
+def _uniform(low: float, high: float):
+    def generate(rng, start, stop, header):
+        return rng.uniform(low, high, stop - start)
+
+    return generate
+
+
+def _header_uniform(low_keyword: str, high_keyword: str):
+    def generate(rng, start, stop, header):
+        return rng.uniform(header[low_keyword], header[high_keyword], stop - start)
+
+    return generate
+
+
+def _above(low: float):
+    def generate(rng, start, stop, header):
+        return low + rng.standard_exponential(stop - start) + np.finfo(float).eps
+
+    return generate
+
+
+def _normal(rng, start, stop, header):
+    return rng.standard_normal(stop - start)
+
+
+def _right_ascension(center: float, spread: float):
+    def generate(rng, start, stop, header):
+        ra = rng.normal(center, spread, stop - start)
+        # the spread is small, so wrapping once is enough and cheaper than np.mod
+        ra[ra < 0.0] += 360.0
+        ra[ra >= 360.0] -= 360.0
+        return ra
+
+    return generate
+
+
+def _declination(center: float, spread: float):
+    def generate(rng, start, stop, header):
+        return np.clip(center + rng.normal(0, spread, stop - start), -90.0, 90.0)
+
+    return generate
+
+
+def _power_law(minimum: float, index: float):
+    def generate(rng, start, stop, header):
+        return minimum * (1.0 + rng.pareto(index - 1.0, stop - start))
+
+    return generate
+
+
+def _ucd_generator(schema_column, unit, pointing) -> ColumnGenerator | None:
+    ucd = getattr(schema_column, "ucd", None) or ""
+    ra, dec = pointing
+    spread = _POSITION_SPREAD
+    if ucd.startswith("pos.eq.ra"):
+        return _right_ascension(ra, spread / max(np.cos(np.deg2rad(dec)), 0.1))
+    if ucd.startswith("pos.eq.dec"):
+        return _declination(dec, spread)
+    if ucd.startswith("phys.energy") and unit is not None:
+        return _power_law(_ENERGY_MIN.to_value(unit), _SPECTRAL_INDEX)
+    return None
+
+
+def _column_generator(
+    name, compiled_column, schema_column, rules, dtype, n_rows, pointing
+) -> ColumnGenerator:
+    kinds = {type(r): r for r in rules}
+    unique = kinds.get(Unique)
+    within = kinds.get(WithinHeaderRange)
+    if unique is not None and dtype.kind in "iu":
+        return _sequential
+    if within is not None:
+        if SortedBy in kinds:
+            return _arrival_times(*within.keywords, n_rows)
+        return _header_uniform(*within.keywords)
+
+    generator = _ucd_generator(schema_column, compiled_column.unit, pointing)
+    if generator is not None:
+        return generator
+
+    in_range = kinds.get(InRange)
+    if in_range is not None:
+        low, high, _, _ = in_range.bounds
+        if np.isfinite(low) and np.isfinite(high):
+            return _uniform(low, high)
+        if np.isfinite(low):
+            return _above(low)
+
+    if dtype.kind in "iu":
+        return _sequential
+    if dtype.kind == "f":
+        return _normal
+    raise ValueError(f"No default generator for column {name} of type {dtype}")
+
+
+def _inject(rule: Rule, values: np.ndarray, rows: np.ndarray):
+    # ``rows`` are local, odd and > 0, so the pairs (row - 1, row) are disjoint
+    if isinstance(rule, InRange):
+        low, high, _, _ = rule.bounds
+        values[rows] = low - 1.0 if np.isfinite(low) else high + 1.0
+    elif isinstance(rule, Unique):
+        values[rows] = values[rows - 1]
+    elif isinstance(rule, SortedBy):
+        values[rows - 1], values[rows] = values[rows].copy(), values[rows - 1].copy()
+    else:
+        raise ValueError(f"Cannot inject violations of rule {rule.name}")
+
+
+class _Plan:
+    """Everything needed to generate one chunk of rows independently."""
+
+    def __init__(self, schema, header, n_rows, seeds, pointing, generators, violations):
+        compiled = compile_table(schema)
+        rules = _rules_by_column(schema)
+        self.header = header
+        self.n_rows = n_rows
+        self.columns = {}
+        for name, column in compiled.columns.items():
+            if not column.required and name not in generators:
+                continue
+            if column.ndim or column.tform not in _NUMERIC_CODES:
+                raise ValueError(f"Column {name} cannot be generated")
+            _, dtype = _cell_dtype(column.tform, None)
+            generator = generators.get(name) or _column_generator(
+                name,
+                column,
+                schema.__columns__[name],
+                rules.get(name, []),
+                dtype,
+                n_rows,
+                pointing,
+            )
+            self.columns[name] = (column, dtype, generator)
+
+        self.dtype = np.dtype([(name, c[1]) for name, c in self.columns.items()])
+
+        by_name = {r.name: r for r in getattr(schema, "__rules__", ())}
+        unknown = set(violations) - set(by_name)
+        if unknown:
+            raise ValueError(
+                f"Unknown rules {sorted(unknown)}, the rules of {schema.__name__}"
+                f" are {sorted(by_name)}"
+            )
+        # out-of-range values of a header range are the last rows, so that
+        # they do not break the order of the column
+        self.tail = {}
+        self.violations = {}
+        for name, count in violations.items():
+            rule = by_name[name]
+            if isinstance(rule, WithinHeaderRange):
+                self.tail[rule] = count
+            else:
+                self.violations[rule] = count
+        self.n_tail = max(self.tail.values(), default=0)
+        if self.n_tail > n_rows:
+            raise ValueError(f"Cannot inject {self.n_tail} violations in {n_rows} rows")
+
+        self.seeds = seeds
+        self.chunk_violations = {}
+
+    def schedule(
+        self, chunk_size: int
+    ) -> list[tuple[int, int, np.random.SeedSequence]]:
+        starts = list(range(0, self.n_rows, chunk_size))
+        stops = [min(s + chunk_size, self.n_rows) for s in starts]
+        seeds = self.seeds.spawn(len(starts) + 1)
+
+        # candidates are odd local rows, before the tail of header range violations
+        rng = np.random.default_rng(seeds[-1])
+        limit = self.n_rows - self.n_tail
+        capacity = np.array(
+            [
+                max(min(stop, limit) - start, 0) // 2
+                for start, stop in zip(starts, stops)
+            ]
+        )
+        for rule, count in self.violations.items():
+            if count > capacity.sum():
+                raise ValueError(f"Cannot inject {count} violations of {rule.name}")
+            counts = np.zeros(len(starts), dtype=np.int64)
+            remaining = count
+            # draw the chunks proportional to their capacity, without overflowing
+            while remaining:
+                free = capacity - counts
+                drawn = rng.multinomial(remaining, free / free.sum())
+                drawn = np.minimum(drawn, free)
+                counts += drawn
+                remaining -= drawn.sum()
+            self.chunk_violations[rule] = counts
+        return list(zip(starts, stops, seeds))
+
+    def chunk(self, index: int, start: int, stop: int, seed) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        rows = np.empty(stop - start, dtype=self.dtype)
+        for name, (_, _, generator) in self.columns.items():
+            rows[name] = generator(rng, start, stop, self.header)
+
+        for rule, counts in self.chunk_violations.items():
+            if counts[index]:
+                limit = min(stop, self.n_rows - self.n_tail) - start
+                local = 1 + 2 * rng.choice(limit // 2, counts[index], replace=False)
+                values = rows[rule.columns[0]]
+                _inject(rule, values, np.sort(local))
+
+        for rule, count in self.tail.items():
+            first = self.n_rows - count
+            if stop > first:
+                column = rule.columns[0]
+                high = self.header[rule.keywords[1]]
+                tail = np.arange(max(start, first), stop)
+                rows[column][tail - start] = high + 1.0 + (tail - first)
+        return rows
+
+    def table_header(self) -> fits.Header:
+        """Return the complete header of the binary table HDU."""
+        columns = [
+            fits.Column(
+                name=name,
+                format=column.tform,
+                unit=None if column.unit is None else column.unit.to_string("fits"),
+            )
+            for name, (column, _, _) in self.columns.items()
+        ]
+        header = fits.BinTableHDU.from_columns(columns, nrows=0).header
+        header["NAXIS2"] = self.n_rows
+        header.update(self.header)
+        return header
+
+
+def _generate_chunks(plan: _Plan, chunk_size: int, n_threads: int | None):
+    schedule = plan.schedule(chunk_size)
+    n_threads = n_threads or min(4, os.cpu_count() or 1)
+    with ThreadPoolExecutor(n_threads) as pool:
+        # at most two chunks per thread are kept in memory
+        pending = deque()
+        for index, (start, stop, seed) in enumerate(schedule):
+            pending.append(pool.submit(plan.chunk, index, start, stop, seed))
+            if len(pending) >= 2 * n_threads:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def generate_eventlist(
+    path: str | PathLike,
+    n_events: int,
+    seed: int | np.random.SeedSequence = 0,
+    obs_id: int = 1,
+    tstart: float = 0.0,
+    duration: float = 1800.0,
+    pointing: tuple[float, float] | None = None,
+    violations: Mapping[str, int] | None = None,
+    header: Mapping | None = None,
+    generators: Mapping[str, ColumnGenerator] | None = None,
+    schema=None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    n_threads: int | None = None,
+    overwrite: bool = False,
+) -> Path:
+    """Write a synthetic event list with ``n_events`` rows.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The output file, with an empty primary HDU and the event list.
+    n_events : int
+        Number of rows.
+    seed : int or numpy.random.SeedSequence
+        Seed of the random numbers, the file only depends on the seed and the
+        other parameters.
+    obs_id : int
+        Value of OBS_ID.
+    tstart, duration : float
+        Start in seconds of MET and duration in seconds of the observation.
+    pointing : tuple[float, float], optional
+        RA and Dec in degrees around which the event positions are drawn,
+        random by default.
+    violations : Mapping[str, int], optional
+        Number of rows violating each rule, keyed by rule name, e.g.
+        ``{"Unique(EVENT_ID)": 10, "InRange(ENERGY)": 3}``. See the
+        ``__rules__`` of the schema for the rule names.
+    header : Mapping, optional
+        Header cards overriding the generated ones, see `synthetic_header`.
+    generators : Mapping[str, ColumnGenerator], optional
+        Generators replacing the default of the given columns, or adding
+        optional columns.
+    schema : type[BinaryTable], optional
+        The table schema, by default `vodf_schema.level1.EventList`.
+    chunk_size : int
+        Number of rows generated at once.
+    n_threads : int, optional
+        Number of threads generating chunks.
+    overwrite : bool
+        Whether to replace an existing file.
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the written file.
+    """
+    if schema is None:
+        from .level1 import EventList
+
+        schema = EventList
+
+    path = Path(path)
+    if path.exists() and not overwrite:
+        raise FileExistsError(f"File {path} already exists")
+
+    seeds = np.random.SeedSequence(seed) if isinstance(seed, int) else seed
+    header_seed, rows_seed = seeds.spawn(2)
+    if pointing is None:
+        rng = np.random.default_rng(header_seed)
+        pointing = (rng.uniform(0, 360), np.rad2deg(np.arcsin(rng.uniform(-1, 1))))
+
+    cards = synthetic_header(schema, obs_id, tstart, duration, header)
+    plan = _Plan(
+        schema,
+        cards,
+        n_events,
+        rows_seed,
+        pointing,
+        generators or {},
+        violations or {},
+    )
+
+    with open(path, "wb") as f:
+        f.write(fits.PrimaryHDU().header.tostring().encode("ascii"))
+        f.write(plan.table_header().tostring().encode("ascii"))
+        size = 0
+        for rows in _generate_chunks(plan, chunk_size, n_threads):
+            f.write(rows.data)
+            size += rows.nbytes
+        f.write(bytes(padded_size(size) - size))
+    return path
+
+
+def generate_observations(
+    directory: str | PathLike,
+    n_observations: int,
+    n_events: int,
+    seed: int = 0,
+    tstart: float = 0.0,
+    duration: float = 1800.0,
+    **kwargs,
+) -> Path:
+    """Write several synthetic observations linked by a grouping table.
+
+    Each observation is written with `generate_eventlist` to
+    ``obs_<OBS_ID>.fits``, with consecutive OBS_IDs starting at 1 and
+    separated by gaps of ten minutes. The file ``observations.fits`` contains
+    an `~vodf_schema.level1.ObservationGroupingTable` with one row per event
+    list, with locations relative to the directory.
+
+    Parameters
+    ----------
+    directory : str or PathLike
+        Output directory, created if needed.
+    n_observations : int
+        Number of observations.
+    n_events : int or sequence of int
+        Number of events of all or of each observation.
+    seed : int
+        Seed, each observation gets an independent stream spawned from it.
+    tstart, duration : float
+        Start of the first observation and duration of each, in seconds.
+    **kwargs
+        Passed to `generate_eventlist`.
+
+    Returns
+    -------
+    pathlib.Path
+        The path of the grouping table file.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    n_events = np.broadcast_to(n_events, n_observations)
+    seeds = np.random.SeedSequence(seed).spawn(n_observations)
+
+    locations = []
+    for i in range(n_observations):
+        obs_id = i + 1
+        location = f"obs_{obs_id:06d}.fits"
+        generate_eventlist(
+            directory / location,
+            int(n_events[i]),
+            seed=seeds[i],
+            obs_id=obs_id,
+            tstart=tstart + i * (duration + _OBSERVATION_GAP),
+            duration=duration,
+            **kwargs,
+        )
+        locations.append(location)
+
+    grouping = _grouping_hdu(locations)
+    path = directory / "observations.fits"
+    fits.HDUList([fits.PrimaryHDU(), grouping]).writeto(
+        path, overwrite=kwargs.get("overwrite", False)
+    )
+    return path
+
+
+def _grouping_hdu(locations: list[str]) -> fits.BinTableHDU:
+    from .level1 import EventList, ObservationGroupingTable
+
+    extname = _card_value(EventList.__header__.__cards__["EXTNAME"], None)
+    table = Table(
+        {
+            "MEMBER_NAME": [extname] * len(locations),
+            "MEMBER_VERSION": np.ones(len(locations), dtype=np.int64),
+            "MEMBER_LOCATION": locations,
+            "MEMBER_URI_TYPE": ["URL"] * len(locations),
+        }
+    )
+    hdu = fits.table_to_hdu(table)
+    header = synthetic_header(ObservationGroupingTable)
+    hdu.header.update(header)
+    hdu.header["EXTNAME"] = "GROUPING"
+    return hdu
+
+
+def main(args=None):
+    """Generate synthetic observations, see `generate_observations`."""
+    parser = argparse.ArgumentParser(
+        prog="python -m vodf_schema.synthetic",
+        description="Write synthetic, schema-valid VODF event lists.",
+    )
+    parser.add_argument("directory", help="Output directory")
+    parser.add_argument("-n", "--observations", type=int, default=1)
+    parser.add_argument(
+        "-e", "--events", type=float, default=1e6, help="Events per observation"
+    )
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument("-j", "--threads", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args(args)
+
+    path = generate_observations(
+        args.directory,
+        args.observations,
+        int(args.events),
+        seed=args.seed,
+        n_threads=args.threads,
+        chunk_size=args.chunk_size,
+        overwrite=args.overwrite,
+    )
+    print(f"Wrote {args.observations} observations, grouped in {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
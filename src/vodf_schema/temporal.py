@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+
+"""Fast conversion of mission elapsed times (MET) to absolute times.
+
+Time columns like ``EventList.TIME`` hold seconds since the reference epoch
+of the `~vodf_schema.metadata.TemporalReferenceHeader` (MJDREFI + MJDREFF in
+the time scale TIMESYS). `time_reference` parses these keywords once per
+distinct set of values and returns a cached `TimeReference`, which converts
+whole columns (or memory-mapped chunks, see `iter_event_times`) without
+creating an `astropy.time.Time` per event.
+
+Internally, times are integer nanoseconds since 1970-01-01T00:00:00 of the
+respective time scale. A MET is split into whole seconds and the exact
+remaining fraction, so the conversion adds no error beyond rounding to the
+nanosecond, and conversions between the uniform scales TT, TAI and GPS are
+integer additions. UTC is supported with the leap second table of ERFA, from
+1972 on. Results are available as ``datetime64[ns]``, ISO strings, MJD split
+into day and day fraction (two doubles, like the ``jd1``/``jd2`` of
+astropy) or `~astropy.time.Time`, which also gives access to the scales that
+need Earth orientation or ephemeris data (UT1, TDB, TCG, TCB).
+`TimeReference.to_reference` moves METs to the epoch of another reference,
+e.g. to stack observations, see `vodf_schema.stacking`.
+
+The location TREFPOS is kept, but not corrected for: barycentric times need
+the barycentric corrections of astropy.
+"""
+
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
+from functools import cache, lru_cache
+from os import PathLike
+
+import erfa
+import numpy as np
+from astropy import units as u
+from astropy.coordinates import EarthLocation
+from astropy.time import Time
+
+from .fitsblocks import find_hdu, memmap_rows, scan_hdus, table_columns
+
+__all__ = [
+    "TimeReference",
+    "iter_event_times",
+    "time_reference",
+]
+
+_NS_PER_SECOND = 1_000_000_000
+_NS_PER_DAY = 86_400 * _NS_PER_SECOND
+#: MJD of 1970-01-01, the epoch of datetime64
+_MJD_EPOCH = 40587
+#: reading of each uniform time scale minus the reading of TAI
+_TAI_OFFSETS = {"TAI": 0, "TT": 32_184_000_000, "GPS": -19 * _NS_PER_SECOND}
+_ASTROPY_SCALES = ("UT1", "TDB", "TCG", "TCB")
+_KEYWORDS = (
+    "MJDREFI",
+    "MJDREFF",
+    "TIMESYS",
+    "TREFPOS",
+    "OBSGEO-L",
+    "OBSGEO-B",
+    "OBSGEO-H",
+)
+_CHUNK_SIZE = 1_000_000
+#: number of values converted at once, the temporaries stay in the CPU cache
+_BLOCK_SIZE = 16_384
+
+
+@cache
+def _leap_seconds() -> tuple[np.ndarray, np.ndarray]:
+    # UTC midnights (ns since 1970) at which TAI - UTC changes, and the new
+    # TAI - UTC in ns, since leap seconds are integer (1972)
+    table = erfa.leap_seconds.get()
+    table = table[table["year"] >= 1972]
+    dates = np.array(
+        [f"{y:04d}-{m:02d}-01" for y, m in zip(table["year"], table["month"])],
+        dtype="datetime64[ns]",
+    )
+    offsets = np.round(table["tai_utc"] * _NS_PER_SECOND).astype(np.int64)
+    return dates.astype(np.int64), offsets
+
+
+def _tai_minus_utc(ns: np.ndarray, is_tai: bool) -> np.ndarray:
+    midnights, offsets = _leap_seconds()
+    if is_tai:
+        # the changes in TAI readings
+        midnights = midnights + offsets
+    index = np.searchsorted(midnights, ns, side="right") - 1
+    if np.any(index < 0):
+        raise ValueError("UTC conversion is only supported from 1972 on")
+    return offsets[index]
+
+
+def _normalize_scale(scale: str) -> str:
+    scale = scale.upper()
+    if scale not in {*_TAI_OFFSETS, "UTC", "LOCAL", *_ASTROPY_SCALES}:
+        raise ValueError(f"Unsupported time scale {scale!r}")
+    return scale
+
+
+def _met_ns(met, offset: int, unit_factor: float, to_utc: bool) -> np.ndarray:
+    # MET in seconds to ns + offset; whole seconds and their fraction are
+    # converted separately, which is exact. Blocks that fit into the CPU cache
+    # avoid streaming every temporary through memory.
+    met = np.asarray(met, dtype=np.float64)
+    out = np.empty(met.shape, dtype=np.int64)
+    flat_met, flat_out = met.reshape(-1), out.reshape(-1)
+    block = min(_BLOCK_SIZE, flat_met.size)
+    fraction = np.empty(block)
+    ns = np.empty(block, dtype=np.int64)
+
+    for start in range(0, flat_met.size, block):
+        values = flat_met[start : start + block]
+        result = flat_out[start : start + block]
+        f, n = fraction[: len(values)], ns[: len(values)]
+        if unit_factor != 1.0:
+            values = values * unit_factor
+        np.trunc(values, out=f)
+        np.copyto(result, f, casting="unsafe")
+        np.subtract(values, f, out=f)
+        f *= _NS_PER_SECOND
+        np.rint(f, out=f)
+        np.copyto(n, f, casting="unsafe")
+        result *= _NS_PER_SECOND
+        result += n
+        result += offset
+        if to_utc:
+            low, high = _tai_minus_utc(np.array([result.min(), result.max()]), True)
+            # leap seconds are rare, most blocks have a single offset
+            result -= low if low == high else _tai_minus_utc(result, is_tai=True)
+    return out
+
+
+@dataclass(frozen=True)
+class TimeReference:
+    """Reference epoch and time scale of the time columns of an HDU.
+
+    Use `time_reference` to get the cached instance for a header. All
+    methods take times in seconds since the reference epoch (MET) and an
+    optional target ``scale`` ("TT", "TAI", "GPS", "UTC", "LOCAL" or, for
+    `to_time` only, "UT1", "TDB", "TCG" and "TCB"), by default TIMESYS.
+
+    Parameters
+    ----------
+    mjdref_int : int
+        MJDREFI, the integer part of the reference epoch in MJD.
+    mjdref_frac : float
+        MJDREFF, the fractional part of the reference epoch in MJD.
+    timesys : str
+        The time scale TIMESYS.
+    trefpos : str, optional
+        The location TREFPOS at which the times are valid.
+    location : tuple[float, float, float], optional
+        Geodetic longitude and latitude in degrees and height in meters of
+        the observatory (OBSGEO-L/B/H), used for TDB.
+    """
+
+    mjdref_int: int
+    mjdref_frac: float
+    timesys: str
+    trefpos: str | None = None
+    location: tuple[float, float, float] | None = None
+
+    def __post_init__(self):
+        """Check the time scale and compute the epoch in TAI."""
+        timesys = _normalize_scale(self.timesys)
+        if timesys in _ASTROPY_SCALES:
+            raise ValueError(f"TIMESYS {timesys} is not supported")
+        object.__setattr__(self, "timesys", timesys)
+
+        epoch = (self.mjdref_int - _MJD_EPOCH) * _NS_PER_DAY + round(
+            self.mjdref_frac * _NS_PER_DAY
+        )
+        if timesys == "UTC":
+            epoch += int(_tai_minus_utc(np.array([epoch]), is_tai=False)[0])
+        elif timesys in _TAI_OFFSETS:
+            epoch -= _TAI_OFFSETS[timesys]
+        # nanoseconds since 1970 of the epoch in TAI (in TIMESYS for LOCAL)
+        object.__setattr__(self, "_epoch", epoch)
+
+    @property
+    def epoch(self) -> Time:
+        """The reference epoch as `~astropy.time.Time`."""
+        return self.to_time(0.0)
+
+    def to_nanoseconds(
+        self, met, scale: str | None = None, unit_factor: float = 1.0
+    ) -> np.ndarray:
+        """Return times as int64 nanoseconds since 1970-01-01 of ``scale``.
+
+        ``unit_factor`` converts ``met`` to seconds, e.g. 86400 for days.
+        UTC times within a leap second repeat the last second of the day.
+        """
+        scale = self.timesys if scale is None else _normalize_scale(scale)
+        offset = self._epoch
+        if self.timesys == "LOCAL" or scale == "LOCAL":
+            if scale != self.timesys:
+                raise ValueError(f"Cannot convert between {self.timesys} and {scale}")
+        elif scale in _TAI_OFFSETS:
+            offset += _TAI_OFFSETS[scale]
+        elif scale != "UTC":
+            raise ValueError(f"Scale {scale} is only supported by to_time")
+        return _met_ns(met, offset, unit_factor, to_utc=scale == "UTC")
+
+    def to_reference(
+        self, met, reference: "TimeReference", unit_factor: float = 1.0
+    ) -> np.ndarray:
+        """Return times as seconds since the epoch of another ``reference``.
+
+        MET counts elapsed seconds, so between TT, TAI, GPS and UTC this
+        only shifts the epoch. The shift is applied to int64 nanoseconds,
+        the result is exact up to the rounding of the returned doubles.
+        With the same epoch and time scale, ``met`` is only scaled by
+        ``unit_factor``.
+        """
+        met = np.asarray(met, dtype=np.float64)
+        if self._epoch == reference._epoch and self.timesys == reference.timesys:
+            return met * unit_factor if unit_factor != 1.0 else met.copy()
+
+        local = "LOCAL" in (self.timesys, reference.timesys)
+        ns = self.to_nanoseconds(met, "LOCAL" if local else "TAI", unit_factor)
+        ns -= reference._epoch
+        seconds = np.floor_divide(ns, _NS_PER_SECOND)
+        ns -= seconds * _NS_PER_SECOND
+        # both parts convert to double exactly, only the sum is rounded
+        out = seconds.astype(np.float64)
+        out += ns * 1e-9
+        return out
+
+    def to_datetime64(self, met, scale: str | None = None) -> np.ndarray:
+        """Return times as ``datetime64[ns]`` in ``scale``."""
+        return self.to_nanoseconds(met, scale).view("datetime64[ns]")
+
+    def to_isot(self, met, scale: str | None = None) -> np.ndarray:
+        """Return times as ISO 8601 strings with nanoseconds in ``scale``."""
+        return np.datetime_as_string(self.to_datetime64(met, scale), unit="ns")
+
+    def to_mjd(self, met, scale: str | None = None) -> tuple[np.ndarray, np.ndarray]:
+        """Return times as MJD in ``scale``, split into whole days and fraction.
+
+        The sum of both is the MJD, the fraction is in [0, 1) and resolves
+        nanoseconds, unlike the MJD as single double.
+        """
+        ns = self.to_nanoseconds(met, scale).reshape(-1)
+        days = np.empty(ns.shape)
+        fraction = np.empty(ns.shape)
+        buffer = np.empty(min(_BLOCK_SIZE, ns.size), dtype=np.int64)
+        for start in range(0, ns.size, len(buffer)):
+            block = ns[start : start + len(buffer)]
+            whole = buffer[: len(block)]
+            np.floor_divide(block, _NS_PER_DAY, out=whole)
+            np.add(whole, _MJD_EPOCH, out=days[start : start + len(block)])
+            whole *= _NS_PER_DAY
+            np.subtract(block, whole, out=whole)
+            np.divide(whole, _NS_PER_DAY, out=fraction[start : start + len(block)])
+        shape = np.shape(met)
+        return days.reshape(shape), fraction.reshape(shape)
+
+    def to_time(self, met, scale: str | None = None) -> Time:
+        """Return times as `~astropy.time.Time` in ``scale``.
+
+        The Time is created once for all values, from the two-double MJD.
+        """
+        scale = self.timesys if scale is None else _normalize_scale(scale)
+        location = None
+        if self.location is not None:
+            lon, lat, height = self.location
+            location = EarthLocation.from_geodetic(lon, lat, height)
+
+        if scale in _ASTROPY_SCALES:
+            days, fraction = self.to_mjd(met, "TT")
+            time = Time(days, fraction, format="mjd", scale="tt", location=location)
+            return getattr(time, scale.lower())
+
+        # astropy has no GPS scale, its readings are TAI - 19 s
+        days, fraction = self.to_mjd(met, "TAI" if scale == "GPS" else scale)
+        astropy_scale = "tai" if scale == "GPS" else scale.lower()
+        return Time(
+            days, fraction, format="mjd", scale=astropy_scale, location=location
+        )
+
+
+@lru_cache(maxsize=256)
+def _cached_reference(cards: tuple) -> TimeReference:
+    mjdref_int, mjdref_frac, timesys, trefpos, lon, lat, height = cards
+    location = None if None in (lon, lat, height) else (lon, lat, height)
+    return TimeReference(
+        int(mjdref_int), float(mjdref_frac), timesys, trefpos, location
+    )
+
+
+def time_reference(header: Mapping) -> TimeReference:
+    """Return the cached `TimeReference` of the time keywords in ``header``.
+
+    Headers with the same MJDREFI, MJDREFF, TIMESYS, TREFPOS and OBSGEO
+    values share the instance, so the epoch is parsed once per observation
+    set, not once per file or chunk.
+    """
+    missing = [k for k in ("MJDREFI", "MJDREFF", "TIMESYS") if k not in header]
+    if missing:
+        raise KeyError(f"Header has no time reference, missing {missing}")
+    return _cached_reference(tuple(header.get(k) for k in _KEYWORDS))
+
+
+def iter_event_times(
+    path: str | PathLike,
+    hdu: int | str | tuple[str, int] = "EVENT-LIST",
+    scale: str | None = None,
+    column: str = "TIME",
+    chunk_size: int = _CHUNK_SIZE,
+) -> Iterator[tuple[int, np.ndarray]]:
+    """Yield ``(start, times)`` for memory-mapped chunks of a time column.
+
+    The times are ``datetime64[ns]`` in ``scale`` (default TIMESYS), the
+    column may have any time unit and TSCAL/TZERO, e.g. stored with the
+    compact profile of `vodf_schema.storage`.
+    """
+    location = find_hdu(scan_hdus(path), hdu)
+    reference = time_reference(location.header)
+    time_column = next(c for c in table_columns(location.header) if c.name == column)
+    unit_factor = 1.0
+    if time_column.unit is not None:
+        unit_factor = u.Unit(time_column.unit, format="fits").to(u.s)
+
+    n_rows = location.header["NAXIS2"]
+    for start in range(0, n_rows, chunk_size):
+        raw = memmap_rows(path, location, start, start + chunk_size)[column]
+        met = time_column.physical(raw)
+        ns = reference.to_nanoseconds(met, scale, unit_factor)
+        yield start, ns.view("datetime64[ns]")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""Common fixtures for the vodf_schema tests."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.table import Table
+
+
+def eventlist_header(**overrides) -> dict:
+    """Header cards of a valid level-1 event list."""
+    from vodf_schema.metadata import URL
+    from vodf_schema.version import __version__
+
+    cards = {
+        "EXTNAME": "event-list",
+        "EXTLEVEL": 1,
+        "HDUCLASS": "VODF",
+        "HDUDOC": URL,
+        "HDUVERS": __version__,
+        "HDUCLAS1": "OGIP",
+        "HDUCLAS2": "EVENTS",
+        "TREFPOS": "TOPOCENTER",
+        "OBSGEO-B": -24.6272,
+        "OBSGEO-L": -70.4039,
+        "OBSGEO-H": 2147.0,
+        "MJDREFI": 51910,
+        "MJDREFF": 7.428703703703703e-4,
+        "TIMESYS": "TT",
+        "OBS_ID": 1,
+        "DATE-OBS": "2025-01-01 15:34:21",
+        "DATE-END": "2025-01-01 15:44:21",
+        "TELESCOP": "CTAO",
+        "TSTART": 0.0,
+        "TSTOP": 600.0,
+        "ONTIME": 600.0,
+        "LIVETIME": 570.0,
+    }
+    cards.update(overrides)
+    return {k: v for k, v in cards.items() if v is not None}
+
+
+def eventlist_table(n_rows: int, seed: int = 0, **header) -> Table:
+    """A valid, time-ordered event list table with ``n_rows`` events."""
+    rng = np.random.default_rng(seed)
+    meta = eventlist_header(**header)
+    table = Table(
+        {
+            "EVENT_ID": np.arange(n_rows, dtype=np.int64),
+            "TIME": np.sort(rng.uniform(meta["TSTART"], meta["TSTOP"], n_rows)),
+            "RA": rng.uniform(0, 360, n_rows),
+            "DEC": rng.uniform(-90, 90, n_rows),
+            "ENERGY": rng.pareto(1.5, n_rows) + 0.03,
+        },
+        meta=meta,
+    )
+    table["TIME"].unit = "s"
+    table["RA"].unit = "deg"
+    table["DEC"].unit = "deg"
+    table["ENERGY"].unit = "TeV"
+    return table
+
+
+def write_eventlist(path, table: Table):
+    """Write an event list table as the first extension of a FITS file."""
+    hdu = fits.table_to_hdu(table)
+    fits.HDUList([fits.PrimaryHDU(), hdu]).writeto(path)
+    return path
+
+
+@pytest.fixture
+def eventlist_file(tmp_path):
+    """A small, valid event list file."""
+    return write_eventlist(tmp_path / "events.fits", eventlist_table(1000))
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+"""Tests for the Apache Arrow bridge."""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyarrow")
+
+
+def test_round_trip(tmp_path):
+    import pyarrow as pa
+    from astropy.table import Table
+
+    from vodf_schema.arrow import arrow_to_fits, fits_to_arrow
+
+    table = pa.table(
+        {
+            "U16": pa.array([0, 65535, 7], pa.uint16()),
+            "I8": pa.array([-128, 5, 127], pa.int8()),
+            "FLAG": [True, False, True],
+            "NAME": ["a", "", "xyz"],
+            "VEC": pa.array([[1, 2], [3, 4], [5, 6]], pa.list_(pa.float32(), 2)),
+            "MAT": pa.array(
+                [[[1, 2, 3], [4, 5, 6]]] * 3, pa.list_(pa.list_(pa.int32(), 3), 2)
+            ),
+        },
+        metadata={"EXTNAME": '"TEST"', "OBS_ID": "3", "pandas": "{}"},
+    )
+    path = arrow_to_fits(table, tmp_path / "table.fits", chunk_size=2)
+
+    read = Table.read(path)
+    assert read.meta["EXTNAME"] == "TEST"
+    assert read.meta["OBS_ID"] == 3
+    assert "PANDAS" not in read.meta
+    assert read["U16"].dtype == np.uint16
+    assert read["MAT"].shape == (3, 2, 3)
+
+    converted = fits_to_arrow(path, chunk_size=2)
+    assert converted.schema.metadata[b"OBS_ID"] == b"3"
+    assert converted.to_pydict() == table.to_pydict()
+
+
+def test_validate_arrow(tmp_path):
+    import pyarrow as pa
+
+    from vodf_schema.arrow import fits_to_arrow, validate_arrow
+    from vodf_schema.level1 import EventList
+    from vodf_schema.synthetic import generate_eventlist
+    from vodf_schema.validation import validate_streaming
+
+    path = generate_eventlist(tmp_path / "events.fits", 1000)
+    table = fits_to_arrow(path, "EVENT-LIST")
+    report = validate_arrow(table, chunk_size=300)
+    assert report.valid, report.issues
+    assert report.schema == "EventList"
+
+    path = generate_eventlist(
+        tmp_path / "broken.fits", 1000, violations={"Unique(EVENT_ID)": 4}
+    )
+    table = fits_to_arrow(path)
+    # units are read from the field metadata
+    energy = table.schema.field("ENERGY").with_metadata({"unit": "GeV"})
+    table = table.set_column(
+        table.schema.get_field_index("ENERGY"),
+        energy,
+        pa.compute.multiply(table["ENERGY"], 1000.0),
+    )
+    report = validate_arrow(table, EventList, chunk_size=300)
+    expected = validate_streaming(path, EventList, chunk_size=300)
+    assert [r.n_violations for r in report.rules] == [
+        r.n_violations for r in expected.rules
+    ]
+    assert not report.valid
+
+
+def test_validate_arrow_nulls():
+    import pyarrow as pa
+
+    from vodf_schema.arrow import validate_arrow
+    from vodf_schema.level1 import EventList
+
+    table = pa.table({"EVENT_ID": pa.array([1, None, 3], pa.int64())})
+    report = validate_arrow(table, EventList)
+    kinds = {issue.kind for issue in report.issues}
+    assert "NullValues" in kinds
+    assert "RequiredMissing" in kinds
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+"""Tests for the command-line tools."""
+
+import json
+
+from .conftest import eventlist_table, write_eventlist
+
+
+def test_validate_directory(tmp_path):
+    from vodf_schema.cli import main
+
+    data = tmp_path / "data"
+    (data / "nested").mkdir(parents=True)
+    write_eventlist(data / "obs1.fits", eventlist_table(10))
+    write_eventlist(data / "nested" / "obs2.fits", eventlist_table(10, OBS_ID=2))
+    write_eventlist(data / "broken.fits", eventlist_table(10, TIMESYS="FOO"))
+    (data / "not_fits.fits").write_text("this is not a FITS file")
+
+    output = tmp_path / "report.json"
+    assert main([str(data), "--jobs", "2", "--output", str(output)]) == 1
+
+    result = json.loads(output.read_text())
+    assert result["n_files"] == 4
+    assert result["n_valid"] == 2
+    assert result["n_invalid"] == 1
+    assert result["n_failed"] == 1
+
+    by_name = {f["path"].rsplit("/", 1)[-1]: f for f in result["files"]}
+    assert by_name["obs1.fits"]["reports"][0]["schema"] == "EventList"
+    assert not by_name["broken.fits"]["valid"]
+    assert by_name["not_fits.fits"]["error"] is not None
+
+
+def test_validate_glob(tmp_path, capsys):
+    from vodf_schema.cli import main
+
+    write_eventlist(tmp_path / "obs1.fits", eventlist_table(10))
+    write_eventlist(tmp_path / "obs2.fits", eventlist_table(10, OBS_ID=2))
+
+    assert main([str(tmp_path / "obs*.fits"), "-j", "1", "--timeout", "60"]) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result["n_valid"] == 2
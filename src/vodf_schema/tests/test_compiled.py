@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+"""Tests for the precompiled header validators."""
+
+import pytest
+from astropy import units as u
+from astropy.io import fits
+
+from .conftest import eventlist_header, eventlist_table
+
+
+def _header(**overrides):
+    table = eventlist_table(3, **overrides)
+    return fits.table_to_hdu(table).header
+
+
+def test_compile_cached():
+    from vodf_schema.compiled import compile_header
+    from vodf_schema.level1 import EventList
+
+    compiled = compile_header(EventList.__header__)
+    assert compile_header(EventList.__header__) is compiled
+    assert compile_header(EventList.__header__, refresh=True) is not compiled
+
+    card = compiled.cards["TIMESYS"]
+    assert isinstance(card.allowed, frozenset)
+    assert compiled.cards["OBSGEO-B"].unit == u.deg
+    assert "OBS_ID" in compiled.required
+
+
+def test_compile_origin():
+    from fits_schema import Header, HeaderCard
+
+    from vodf_schema.compiled import compile_header
+    from vodf_schema.metadata import ObservationHeader, TemporalReferenceHeader
+
+    class Composed(TemporalReferenceHeader, ObservationHeader):
+        TIMESYS = HeaderCard(allowed_values=["TT"])
+
+    compiled = compile_header(Composed)
+    assert compiled.cards["TIMESYS"].origin == "Composed"
+    assert compiled.cards["TIMESYS"].allowed == frozenset({"TT"})
+    assert compiled.cards["MJDREFI"].origin == "TemporalReferenceHeader"
+    assert compiled.cards["OBS_ID"].origin == "ObservationHeader"
+    assert issubclass(Composed, Header)
+
+
+def test_compiled_valid():
+    from vodf_schema.compiled import compile_header
+    from vodf_schema.level1 import EventList
+
+    issues = compile_header(EventList.__header__).validate(_header())
+    assert [i for i in issues if i.severity == "error"] == []
+
+
+@pytest.mark.parametrize(
+    ("overrides", "kind", "keyword"),
+    [
+        ({"TIMESYS": "FOO"}, "WrongValue", "TIMESYS"),
+        ({"EXTLEVEL": 42}, "WrongValue", "EXTLEVEL"),
+        ({"MJDREFI": "51910"}, "WrongType", "MJDREFI"),
+        ({"OBS_ID": None}, "RequiredMissing", None),
+        ({"FOO": "bar"}, "AdditionalHeaderCard", "FOO"),
+    ],
+)
+def test_compiled_matches_schema(overrides, kind, keyword):
+    """The compiled validator reports the same problems as the HeaderCards."""
+    from fits_schema.exceptions import ValidationError
+
+    from vodf_schema.compiled import compile_header
+    from vodf_schema.level1 import EventList
+
+    header = _header(**overrides)
+    issues = compile_header(EventList.__header__).validate(header)
+    assert (kind, keyword) in {(i.kind, i.context) for i in issues}
+
+    if keyword is not None and kind != "AdditionalHeaderCard":
+        schema_card = EventList.__header__.__cards__[keyword]
+        position = list(header.keys()).index(keyword)
+        with pytest.raises(ValidationError) as excinfo:
+            schema_card.validate(header.cards[keyword], position, onerror="raise")
+        assert type(excinfo.value).__name__ == kind
+
+
+def test_quantity():
+    from vodf_schema.compiled import compile_header
+    from vodf_schema.level1 import EventList
+
+    compiled = compile_header(EventList.__header__)
+    header = fits.Header(eventlist_header())
+
+    assert compiled.quantity(header, "OBSGEO-H") == 2147 * u.m
+    assert u.isclose(compiled.quantity(header, "OBSGEO-H", "km"), 2.147 * u.km)
+    with pytest.raises(ValueError, match="no unit"):
+        compiled.quantity(header, "TELESCOP")
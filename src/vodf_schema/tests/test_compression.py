@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""Tests for tile-compressed binary tables."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+
+@pytest.mark.parametrize("algorithm", ["GZIP_1", "GZIP_2", "RICE_1", "NOCOMPRESS"])
+def test_round_trip(tmp_path, algorithm):
+    from vodf_schema.compression import (
+        compress_table,
+        is_compressed_table,
+        iter_tiles,
+        uncompressed_header,
+    )
+    from vodf_schema.fitsblocks import memmap_rows, scan_hdus
+    from vodf_schema.synthetic import generate_eventlist
+
+    path = generate_eventlist(tmp_path / "events.fits", 1000)
+    output = compress_table(
+        path, tmp_path / "events.fits.fz", tile_length=300, algorithm=algorithm
+    )
+
+    (_, original) = scan_hdus(path)
+    (_, location) = scan_hdus(output)
+    assert is_compressed_table(location.header)
+    assert not is_compressed_table(original.header)
+    assert location.header["NAXIS2"] == 4
+    # 64-bit descriptors, the heap may exceed 2 GiB
+    assert location.header["TFORM1"].startswith("1QB(")
+    assert location.header["NAXIS1"] == 16 * location.header["TFIELDS"]
+    header = uncompressed_header(location.header)
+    assert list(header.items()) == list(original.header.items())
+
+    rows = memmap_rows(path, original)
+    tiles = list(iter_tiles(output, location, ["TIME", "EVENT_ID"], n_threads=2))
+    assert [start for start, _ in tiles] == [0, 300, 600, 900]
+    for name in ("TIME", "EVENT_ID"):
+        values = np.concatenate([tile[name] for _, tile in tiles])
+        np.testing.assert_array_equal(values, rows[name])
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_validate_compressed(tmp_path, n_jobs):
+    from vodf_schema.compression import compress_table
+    from vodf_schema.level1 import EventList
+    from vodf_schema.synthetic import generate_eventlist
+    from vodf_schema.validation import validate_file, validate_streaming
+
+    violations = {"Unique(EVENT_ID)": 3, "SortedBy(TIME)": 2, "InRange(RA)": 1}
+    path = generate_eventlist(tmp_path / "events.fits", 2000, violations=violations)
+    output = compress_table(path, tmp_path / "events.fits.fz", tile_length=128)
+
+    expected = validate_streaming(path, EventList, chunk_size=500)
+    (report,) = validate_file(output, chunk_size=500, n_jobs=n_jobs)
+    assert report.n_rows == 2000
+    assert report.issues == expected.issues
+    assert report.rules == expected.rules
+
+
+def test_rice(tmp_path):
+    from vodf_schema.compression import compress_table, iter_tiles
+    from vodf_schema.fitsblocks import memmap_rows, scan_hdus
+    from vodf_schema.validation import validate_file
+    from vodf_schema.writer import EventListWriter
+
+    from .conftest import eventlist_header
+
+    header = eventlist_header(TSORTKEY="TIME", TSTART=1e9)
+    del header["TSTOP"]
+    rng = np.random.default_rng(0)
+    path = tmp_path / "events.fits"
+    with EventListWriter(path, header, profile="compact") as writer:
+        writer.write(
+            {
+                "EVENT_ID": np.arange(1000),
+                "TIME": 1e9 + np.sort(rng.uniform(0, 1000, 1000)),
+                "RA": rng.uniform(0, 360, 1000),
+                "DEC": rng.uniform(-90, 90, 1000),
+                "ENERGY": rng.uniform(0.1, 100, 1000),
+            }
+        )
+    output = compress_table(
+        path, tmp_path / "events.fits.fz", tile_length=300, algorithm="RICE_1"
+    )
+
+    (_, location) = scan_hdus(output)
+    algorithms = [location.header[f"ZCTYP{i}"] for i in range(1, 6)]
+    # EVENT_ID (K) and ENERGY (E) cannot be Rice-coded
+    assert algorithms == ["GZIP_2", "RICE_1", "RICE_1", "RICE_1", "GZIP_2"]
+    rows = memmap_rows(path, scan_hdus(path)[1])
+    tiles = [tile for _, tile in iter_tiles(output, location)]
+    for name in ("TIME", "RA", "DEC"):
+        assert tiles[0][name].dtype == rows[name].dtype
+        values = np.concatenate([tile[name] for tile in tiles])
+        np.testing.assert_array_equal(values, rows[name])
+
+    (report,) = validate_file(output)
+    assert report.valid, report.issues
+    assert report.rules
+
+
+def test_unsupported_compression(tmp_path):
+    from vodf_schema.compression import compress_table, iter_tiles
+    from vodf_schema.fitsblocks import scan_hdus
+    from vodf_schema.synthetic import generate_eventlist
+    from vodf_schema.validation import validate_file
+
+    path = generate_eventlist(tmp_path / "events.fits", 10)
+    output = compress_table(path, tmp_path / "events.fits.fz")
+    with fits.open(output, mode="update") as hdus:
+        # EVENT_ID is a 64-bit integer column
+        hdus[1].header["ZCTYP1"] = "RICE_1"
+        hdus[1].header["ZCTYP2"] = "HCOMPRESS_1"
+
+    (report,) = validate_file(output)
+    assert report.valid
+    assert report.rules == []
+    assert {(i.kind, i.context) for i in report.warnings} == {
+        ("UnsupportedCompression", "EVENT_ID"),
+        ("UnsupportedCompression", "TIME"),
+    }
+    (_, location) = scan_hdus(output)
+    with pytest.raises(ValueError, match="HCOMPRESS_1"):
+        next(iter_tiles(output, location))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+"""Tests for the interpolated transformation to horizontal coordinates."""
+
+import numpy as np
+import pytest
+from astropy import units as u
+
+from .conftest import eventlist_header
+
+
+@pytest.fixture(autouse=True)
+def no_iers_download():
+    """Use the IERS-B table shipped with astropy, the test times are covered."""
+    from astropy.utils import iers
+
+    with iers.conf.set_temp("auto_download", False):
+        yield
+
+
+def _exact(transform, ra, dec, met):
+    from astropy.coordinates import AltAz, SkyCoord
+
+    frame = AltAz(obstime=transform.reference.to_time(met), location=transform.location)
+    return SkyCoord(ra, dec, unit=u.deg).transform_to(frame)
+
+
+def test_transform():
+    from vodf_schema.coordinates import HorizontalTransform
+    from vodf_schema.selection import angular_distance
+
+    header = eventlist_header(TSTART=0.0, TSTOP=7200.0)
+    transform = HorizontalTransform(header)
+    assert transform.max_error <= 1 * u.mas
+
+    rng = np.random.default_rng(0)
+    ra = rng.uniform(0, 360, 1000)
+    dec = rng.uniform(-90, 90, 1000)
+    met = rng.uniform(0, 7200, 1000)
+    alt, az = transform.transform(ra, dec, met)
+    exact = _exact(transform, ra, dec, met)
+    error = angular_distance(exact.az.deg, exact.alt.deg, az, alt)
+    assert np.all(error * u.deg <= transform.max_error)
+
+    with pytest.raises(ValueError, match="outside of the time range"):
+        transform.transform(0.0, 0.0, 7201.0)
+
+
+def test_grid_refinement():
+    from vodf_schema.coordinates import HorizontalTransform
+
+    header = eventlist_header(TSTART=0.0, TSTOP=7200.0)
+    coarse = HorizontalTransform(header, time_step=7200 * u.s, tolerance=1 * u.arcsec)
+    assert coarse.time_step == 7200 * u.s
+    fine = HorizontalTransform(header, time_step=7200 * u.s, tolerance=0.1 * u.mas)
+    assert fine.time_step < 1000 * u.s
+    assert fine.max_error <= 0.1 * u.mas
+
+
+def test_observatory_location():
+    from vodf_schema.coordinates import observatory_location
+
+    location = observatory_location(eventlist_header())
+    assert observatory_location(eventlist_header()) is location
+    assert u.isclose(location.lat, -24.6272 * u.deg)
+
+    with pytest.raises(KeyError, match="OBSGEO-H"):
+        observatory_location(eventlist_header(**{"OBSGEO-H": None}))
+
+
+@pytest.mark.parametrize("n_jobs", [1, 2])
+def test_horizontal_coordinates(eventlist_file, n_jobs):
+    from astropy.table import Table
+
+    from vodf_schema.coordinates import HorizontalTransform, horizontal_coordinates
+
+    alt, az = horizontal_coordinates(eventlist_file, n_jobs=n_jobs, chunk_size=300)
+    assert alt.shape == az.shape == (1000,)
+
+    table = Table.read(eventlist_file)
+    transform = HorizontalTransform(table.meta)
+    exact = _exact(transform, table["RA"], table["DEC"], table["TIME"])
+    assert np.allclose(alt, exact.alt.deg, rtol=0, atol=1e-6)
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+
+"""Tests for the header-only FITS scanning helpers."""
+
+import numpy as np
+from astropy.io import fits
+from astropy.table import Table
+
+from vodf_schema.fitsblocks import find_hdu, memmap_rows, scan_hdus, table_columns
+
+
+def test_scan_matches_astropy(tmp_path):
+    path = tmp_path / "test.fits"
+    table = Table({"a": np.arange(1000), "b": np.linspace(0, 1, 1000)})
+    hdus = [fits.PrimaryHDU(np.zeros((3, 5)))]
+    hdus += [fits.table_to_hdu(table), fits.BinTableHDU(table, name="SECOND", ver=2)]
+    fits.HDUList(hdus).writeto(path)
+
+    locations = scan_hdus(path)
+    with fits.open(path) as hdul:
+        assert len(locations) == len(hdul)
+        for location, hdu in zip(locations, hdul):
+            info = hdu.fileinfo()
+            assert location.header_offset == info["hdrLoc"]
+            assert location.data_offset == info["datLoc"]
+            assert location.data_size == hdu.size
+
+    assert find_hdu(locations, ("SECOND", 2)).index == 2
+    rows = memmap_rows(path, locations[1], 10, 20)
+    np.testing.assert_array_equal(rows["a"], np.arange(10, 20))
+    np.testing.assert_array_equal(rows["b"], table["b"][10:20])
+
+
+def test_physical_values(tmp_path):
+    path = tmp_path / "test.fits"
+    table = Table(
+        {
+            "unsigned": np.array([0, 1, 65535], dtype=np.uint16),
+            "flag": [True, False, True],
+            "scaled": [1.0, 2.0, 3.0],
+        }
+    )
+    hdu = fits.table_to_hdu(table)
+    hdu.columns["scaled"].bscale = 0.5
+    hdu.columns["scaled"].bzero = 10.0
+    fits.HDUList([fits.PrimaryHDU(), hdu]).writeto(path)
+
+    location = scan_hdus(path)[1]
+    rows = memmap_rows(path, location)
+    with fits.open(path) as hdul:
+        expected = hdul[1].data
+        for column in table_columns(location.header):
+            values = column.physical(rows[column.name])
+            np.testing.assert_array_equal(values, expected[column.name])
+            assert values.dtype == expected[column.name].dtype
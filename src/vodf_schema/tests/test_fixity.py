@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""Tests for the DATASUM/CHECKSUM computation."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.table import Table
+
+
+def _write(path, checksum):
+    table = Table({"a": np.arange(5000), "b": np.linspace(0, 1, 5000)})
+    hdus = [fits.PrimaryHDU(np.arange(12.0).reshape(3, 4)), fits.table_to_hdu(table)]
+    fits.HDUList(hdus).writeto(path, checksum=checksum)
+    return path
+
+
+def test_encode_checksum():
+    from vodf_schema.fixity import encode_checksum
+
+    # example from the appendix J of the FITS standard
+    assert encode_checksum(~868229149 & 0xFFFFFFFF) == "hcHjjc9ghcEghc9g"
+
+
+def test_ones_complement_sum():
+    from vodf_schema.fixity import ones_complement_sum
+
+    words = np.array([0xFFFFFFFF, 2], dtype=">u4")
+    assert ones_complement_sum(words) == 2
+    assert ones_complement_sum(words[1:], initial=0xFFFFFFFF) == 2
+    assert ones_complement_sum(b"") == 0
+
+
+@pytest.mark.parametrize("block_size", [4, 2880, 2**20])
+def test_verify_matches_astropy(tmp_path, block_size):
+    from vodf_schema.fixity import verify_file
+
+    path = _write(tmp_path / "test.fits", checksum=True)
+    results = verify_file(path, n_threads=4, block_size=block_size)
+
+    with fits.open(path, checksum=True) as hdul:
+        assert len(results) == len(hdul)
+        for result, hdu in zip(results, hdul):
+            assert result.valid
+            assert result.datasum_valid
+            assert result.checksum_valid
+            assert result.datasum == int(hdu.header["DATASUM"])
+
+
+def test_verify_corrupted(tmp_path):
+    from vodf_schema.fixity import verify_file
+
+    path = _write(tmp_path / "test.fits", checksum=True)
+    with fits.open(path) as hdul:
+        offset = hdul[1].fileinfo()["datLoc"]
+    with open(path, "r+b") as f:
+        f.seek(offset + 100)
+        f.write(b"\x01")
+
+    primary, table = verify_file(path)
+    assert primary.valid
+    assert table.datasum_valid is False
+    assert table.checksum_valid is False
+
+
+def test_write_checksums(tmp_path):
+    from vodf_schema.fixity import verify_file, write_checksums
+
+    path = _write(tmp_path / "test.fits", checksum=False)
+    assert all(r.datasum_valid is None for r in verify_file(path))
+    size = path.stat().st_size
+
+    written = write_checksums(path)
+
+    assert path.stat().st_size == size
+    assert written == verify_file(path)
+    # astropy raises warnings on checksum mismatch, which the tests turn into errors
+    with fits.open(path, checksum=True) as hdul:
+        for result, hdu in zip(written, hdul):
+            assert hdu.header["CHECKSUM"] == result.stored_checksum
+            assert hdu.verify_checksum() == 1
+
+
+def test_write_checksums_no_space(tmp_path):
+    from vodf_schema.fixity import write_checksums
+
+    path = tmp_path / "test.fits"
+    header = fits.Header([(f"KEY{i}", i) for i in range(31)])
+    fits.PrimaryHDU(header=header).writeto(path)
+
+    with pytest.raises(ValueError, match="No space left"):
+        write_checksums(path)
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+
+"""Tests for the resolution of grouping table members."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.table import Table
+
+
+def _write_members(path, n_versions=3):
+    hdus = [fits.PrimaryHDU()]
+    for version in range(1, n_versions + 1):
+        table = Table({"x": np.arange(10) * version})
+        hdus.append(fits.BinTableHDU(table, name="EFFECTIVE-AREA", ver=version))
+    hdus.append(fits.ImageHDU(np.ones((2, 3)), name="PSF"))
+    fits.HDUList(hdus).writeto(path)
+    return path
+
+
+def _write_grouping(path, rows):
+    names, versions, locations = zip(*rows)
+    table = Table(
+        {
+            "MEMBER_NAME": names,
+            "MEMBER_VERSION": versions,
+            "MEMBER_LOCATION": locations,
+            "MEMBER_URI_TYPE": ["URL"] * len(rows),
+        }
+    )
+    hdus = [fits.PrimaryHDU(), fits.BinTableHDU(table, name="GROUPING")]
+    hdus.append(fits.BinTableHDU(Table({"y": [1.0, 2.0]}), name="LOCAL"))
+    fits.HDUList(hdus).writeto(path)
+    return path
+
+
+def test_resolve_table(tmp_path, monkeypatch):
+    from vodf_schema import fitsblocks
+    from vodf_schema.grouping import MemberResolver
+
+    (tmp_path / "irfs").mkdir()
+    _write_members(tmp_path / "irfs" / "a.fits")
+    _write_members(tmp_path / "b.fits")
+    rows = [
+        ("EFFECTIVE-AREA", 2, "irfs/a.fits"),
+        ("EFFECTIVE-AREA", 3, f"file://{tmp_path}/b.fits"),
+        ("psf", 1, "irfs/a.fits"),
+        ("LOCAL", 1, ""),
+    ] * 50
+    grouping = _write_grouping(tmp_path / "group.fits", rows)
+
+    scanned = []
+    iter_hdus = fitsblocks.iter_hdus
+    monkeypatch.setattr(
+        "vodf_schema.grouping.iter_hdus", lambda p: scanned.append(p) or iter_hdus(p)
+    )
+
+    with MemberResolver(max_open_files=2) as resolver:
+        members = resolver.resolve_table(grouping)
+
+        # one scan per file, regardless of the number of members
+        assert len(scanned) == 3
+        assert len(members) == len(rows)
+        assert members[0].header["EXTVER"] == 2
+        assert members[1].path == (tmp_path / "b.fits").resolve()
+
+        np.testing.assert_array_equal(members[1].to_hdu().data["x"], np.arange(10) * 3)
+        np.testing.assert_array_equal(members[2].to_hdu().data, np.ones((2, 3)))
+        np.testing.assert_array_equal(members[3].memmap_rows()["y"], [1.0, 2.0])
+        assert members[3].to_hdu().data["y"][1] == 2.0
+        assert resolver.n_open_files == 2
+
+    assert resolver.n_open_files == 0
+
+
+def test_resolve_errors(tmp_path):
+    from vodf_schema.grouping import MemberResolver
+
+    path = _write_members(tmp_path / "a.fits")
+    resolver = MemberResolver()
+
+    assert resolver.resolve("EFFECTIVE-AREA", location=str(path)).header["EXTVER"] == 1
+    with pytest.raises(KeyError, match="No HDU"):
+        resolver.resolve("EFFECTIVE-AREA", 4, location=str(path))
+    with pytest.raises(ValueError, match="URN"):
+        resolver.resolve("PSF", location="urn:foo", uri_type="URN")
+    with pytest.raises(ValueError, match="Only local"):
+        resolver.resolve("PSF", location="https://example.org/a.fits")
+
+
+def test_changed_file_is_rescanned(tmp_path):
+    import os
+
+    from vodf_schema.grouping import MemberResolver
+
+    path = _write_members(tmp_path / "a.fits", n_versions=1)
+    resolver = MemberResolver()
+    with pytest.raises(KeyError):
+        resolver.resolve("EFFECTIVE-AREA", 2, location=str(path))
+
+    path.unlink()
+    _write_members(path, n_versions=2)
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert resolver.resolve("EFFECTIVE-AREA", 2, location=str(path)).location.index == 2
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+
+"""Tests for the lazy imports.
+
+The cold-start import time is measured in ``benchmarks/test_import.py``,
+against the base branch on the same machine.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+
+def _run(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+@pytest.mark.parametrize(
+    "statement",
+    ["import vodf_schema", "import vodf_schema.level1", "import vodf_schema.utilities"],
+)
+def test_lazy_imports(statement):
+    code = f"{statement}; import sys; print(sorted(sys.modules))"
+    modules = _run(code).stdout
+
+    for heavy in ("astropy", "fits_schema", "IPython", "vodf_schema.metadata"):
+        assert f"'{heavy}'" not in modules
+
+
+def test_lazy_attributes():
+    import vodf_schema
+
+    assert vodf_schema.level1.EventList.__name__ == "EventList"
+    assert "level1" in dir(vodf_schema)
+    assert "EventList" in dir(vodf_schema.level1)
+    with pytest.raises(AttributeError, match="no attribute 'foo'"):
+        vodf_schema.foo  # noqa: B018
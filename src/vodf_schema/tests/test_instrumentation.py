@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+"""Tests for the profiling of the validation."""
+
+import json
+
+import pytest
+from astropy.io import fits
+
+from .conftest import eventlist_table, write_eventlist
+
+
+def _find(span: dict, category: str) -> list[dict]:
+    found = [span] if span["category"] == category else []
+    for child in span["children"]:
+        found.extend(_find(child, category))
+    return found
+
+
+def test_profile_validate_file(eventlist_file):
+    from vodf_schema.instrumentation import Profiler, active_profiler
+    from vodf_schema.validation import validate_file
+
+    events = []
+    with Profiler(callbacks=[events.append]) as profiler:
+        assert active_profiler() is profiler
+        validate_file(eventlist_file, chunk_size=300)
+    assert active_profiler() is None
+
+    profile = profiler.to_dict()
+    (file,) = _find(profile, "file")
+    (hdu,) = _find(profile, "hdu")
+    assert hdu["name"] == "1:event-list"
+    assert hdu["n_rows"] == 1000
+    assert 0 < hdu["seconds"] <= file["seconds"] <= profile["seconds"]
+
+    (read,) = _find(profile, "read")
+    assert read["count"] == 4
+    assert read["n_rows"] == 1000
+    assert read["bytes_read"] == 1000 * 40
+    assert hdu["bytes_read"] == file["bytes_read"] > read["bytes_read"]
+
+    columns = {c["name"]: c for c in _find(profile, "column")}
+    assert columns["ENERGY"]["n_rows"] == 1000
+    assert columns["ENERGY"]["bytes_read"] == 8000
+    assert columns["ENERGY"]["count"] == 4
+
+    classes = {c["name"]: c["count"] for c in _find(profile, "header-class")}
+    assert classes["TemporalReferenceHeader"] == 1
+    assert classes["VODFFormatHeader"] == 3
+    assert sum(classes.values()) == len(fits.getheader(eventlist_file, 1))
+    assert {r["name"] for r in _find(profile, "rule")} >= {"SortedBy(TIME)"}
+
+    assert len(events) > len(columns) * 4
+    assert events[-1].name == str(eventlist_file)
+    assert [e.path for e in events if e.name == "ENERGY"][0] == (
+        str(eventlist_file),
+        "1:event-list",
+    )
+
+
+def test_exports(eventlist_file):
+    from vodf_schema.instrumentation import Profiler
+    from vodf_schema.validation import validate_file
+
+    with Profiler() as profiler:
+        validate_file(eventlist_file)
+    assert json.loads(profiler.to_json())["name"] == "validation"
+
+    trace = profiler.to_trace()["traceEvents"]
+    assert {e["ph"] for e in trace} == {"X"}
+    by_name = {e["name"]: e for e in trace}
+    hdu, column = by_name["1:event-list"], by_name["ENERGY"]
+    # children are drawn within their parent
+    assert hdu["ts"] <= column["ts"]
+    assert column["ts"] + column["dur"] <= hdu["ts"] + hdu["dur"] + 1e-6
+
+    stacks = profiler.to_folded().splitlines()
+    assert any(s.startswith("validation;file:") for s in stacks)
+    assert all(int(s.rsplit(" ", 1)[1]) > 0 for s in stacks)
+
+
+def test_disabled(eventlist_file):
+    from vodf_schema.instrumentation import Profiler, record_io, span
+    from vodf_schema.validation import validate_file
+
+    profiler = Profiler()
+    validate_file(eventlist_file)
+    assert profiler.root.children == {}
+    with span("column", "TIME") as node:
+        assert node is None
+    record_io(10)
+
+    with profiler, pytest.raises(RuntimeError, match="already active"):
+        profiler.__enter__()
+
+
+def test_profile_shards(tmp_path):
+    from vodf_schema.instrumentation import Profiler
+    from vodf_schema.validation import validate_file
+
+    path = write_eventlist(tmp_path / "events.fits", eventlist_table(2000))
+    with Profiler() as profiler:
+        validate_file(path, chunk_size=500, n_jobs=2)
+
+    (shards,) = _find(profiler.to_dict(), "shards")
+    assert shards["name"] == "4 shards"
+    (read,) = _find(shards, "read")
+    assert read["n_rows"] == 2000
+    assert read["count"] == 4
+    (hdu,) = _find(profiler.to_dict(), "hdu")
+    assert hdu["bytes_read"] > read["bytes_read"]
+
+
+def test_cli_profile(tmp_path, capsys):
+    from vodf_schema.cli import main
+
+    path = write_eventlist(tmp_path / "obs1.fits", eventlist_table(10))
+    assert main([str(path), "-j", "1", "--profile"]) == 0
+    (file,) = json.loads(capsys.readouterr().out)["files"]
+    assert _find(file["profile"], "hdu")[0]["n_rows"] == 10
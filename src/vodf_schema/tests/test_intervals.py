@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+
+"""Tests for the time interval engine and the exposure checks."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.table import Table
+
+from .conftest import eventlist_header, eventlist_table
+
+
+def _random_intervals(rng, n):
+    from vodf_schema.intervals import TimeIntervals
+
+    start = rng.integers(0, 100, n).astype(float)
+    return TimeIntervals(start, start + rng.integers(1, 10, n))
+
+
+def _covered(intervals, grid):
+    # brute force membership, for the midpoints between integer times
+    return np.array(
+        [np.any((intervals.start <= t) & (t <= intervals.stop)) for t in grid]
+    )
+
+
+def test_normalize():
+    from vodf_schema.intervals import TimeIntervals
+
+    intervals = TimeIntervals([5, 0, 1, 8, 10], [6, 2, 3, 10, 11])
+    assert intervals.start.tolist() == [0, 5, 8]
+    assert intervals.stop.tolist() == [3, 6, 11]
+    assert intervals.duration == 7
+    assert len(intervals) == 3
+
+    with pytest.raises(ValueError, match="1 intervals stop before they start"):
+        TimeIntervals([0, 2], [1, 1])
+
+
+def test_set_operations():
+    rng = np.random.default_rng(0)
+    grid = np.arange(0, 120) + 0.5
+    for _ in range(20):
+        a, b, c = (_random_intervals(rng, 10) for _ in range(3))
+        in_a, in_b, in_c = (_covered(x, grid) for x in (a, b, c))
+
+        union = a.union(b, c)
+        assert np.array_equal(_covered(union, grid), in_a | in_b | in_c)
+        assert np.all(union.start[1:] > union.stop[:-1])
+
+        intersection = a.intersection(b, c)
+        assert np.array_equal(_covered(intersection, grid), in_a & in_b & in_c)
+
+        difference = a.difference(b)
+        assert np.array_equal(_covered(difference, grid), in_a & ~in_b)
+        assert difference.union(a.intersection(b)) == a
+
+
+def test_index():
+    from vodf_schema.intervals import TimeIntervals
+
+    intervals = TimeIntervals([0, 10], [5, 20])
+    times = np.array([-1, 0, 3, 5, 7, 10, 20, 21])
+    assert intervals.index(times).tolist() == [-1, 0, 0, 0, -1, 1, 1, -1]
+    assert intervals.contains(times).sum() == 5
+
+
+def test_check_exposure():
+    from vodf_schema.intervals import TimeIntervals, check_exposure
+    from vodf_schema.report import ValidationReport
+
+    gti = TimeIntervals([0, 400], [300, 700])
+    header = {"ONTIME": 600.0, "LIVETIME": 540.0, "DEADC": 0.9}
+    report = ValidationReport(schema="EventList")
+    check_exposure(header, gti, report)
+    assert report.valid
+
+    header = {"ONTIME": 650.0, "LIVETIME": 660.0, "DEADC": 0.9}
+    check_exposure(header, gti, report)
+    assert [i.context for i in report.errors] == ["ONTIME", "LIVETIME", "LIVETIME"]
+    assert all(i.kind == "ExposureMismatch" for i in report.errors)
+
+    # EXPOSURE may be corrected below the live time, but not exceed it
+    report = ValidationReport(schema="EventList")
+    check_exposure({"LIVETIME": 540.0, "EXPOSURE": 500.0}, gti, report)
+    check_exposure({"DEADC": 0.9, "EXPOSURE": 540.0}, gti, report)
+    assert report.valid
+    # a wrong LIVETIME is only reported once, EXPOSURE is checked with the GTIs
+    check_exposure({"LIVETIME": 500.0, "DEADC": 0.9, "EXPOSURE": 540.0}, gti, report)
+    assert [i.context for i in report.errors] == ["LIVETIME"]
+
+    report = ValidationReport(schema="EventList")
+    check_exposure({"DEADC": 0.9, "EXPOSURE": 560.0}, gti, report)
+    check_exposure({"LIVETIME": 540.0, "EXPOSURE": 610.0}, gti, report)
+    check_exposure({"EXPOSURE": 650.0}, gti, report)
+    assert [i.context for i in report.errors] == ["EXPOSURE"] * 3
+    assert "GTIs, 540.0" in report.errors[0].message
+    assert "GTIs, 600.0" in report.errors[1].message
+
+
+def _write_with_gti(path, ontime, start=(0.0, 400.0), stop=(300.0, 600.0)):
+    events = eventlist_table(100, ONTIME=ontime, LIVETIME=0.9 * ontime)
+    gti = Table({"START": start, "STOP": stop}, meta=eventlist_header())
+    gti.meta.update(EXTNAME="GTI", HDUCLAS1="GTI", HDUCLAS2="STANDARD")
+    gti["START"].unit = gti["STOP"].unit = "s"
+    hdus = [fits.PrimaryHDU(), fits.table_to_hdu(events), fits.table_to_hdu(gti)]
+    fits.HDUList(hdus).writeto(path)
+    return path
+
+
+def test_validate_file_exposure(tmp_path):
+    from vodf_schema.intervals import TimeIntervals
+    from vodf_schema.validation import validate_file
+
+    path = _write_with_gti(tmp_path / "good.fits", ontime=500.0)
+    events, gti = validate_file(path)
+    assert gti.schema == "GoodTimeIntervals"
+    assert gti.valid, gti.issues
+    assert events.valid, events.issues
+    assert TimeIntervals.read(path).duration == 500.0
+
+    path = _write_with_gti(tmp_path / "bad.fits", ontime=600.0)
+    events, _ = validate_file(path)
+    assert [i.context for i in events.errors] == ["ONTIME", "LIVETIME"]
+
+    path = _write_with_gti(tmp_path / "overlap.fits", 500.0, (0, 200), (300, 600))
+    _, gti = validate_file(path)
+    (result,) = [r for r in gti.rules if r.rule == "OrderedIntervals(START, STOP)"]
+    assert result.samples == [1]
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+"""Tests for the in-place migration of headers between HDUVERS releases."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from .conftest import eventlist_table
+
+
+def _migrations():
+    from vodf_schema.migration import HeaderMigration
+
+    return (
+        HeaderMigration(
+            "0.1",
+            "0.2",
+            renamed={"TREFPOS": "TIMEREF"},
+            values={"TIMESYS": {"TT": "TAI"}},
+            removed=("LIVETIME",),
+        ),
+        HeaderMigration(
+            "0.2",
+            "0.3",
+            extnames=frozenset({"EVENT-LIST"}),
+            added={"ORIGIN": ("VODF", "organization creating the file")},
+        ),
+    )
+
+
+def _write(path, n_rows=1000, **header):
+    from vodf_schema.fixity import write_checksums
+
+    table = eventlist_table(n_rows, HDUVERS="0.1", **header)
+    events = fits.table_to_hdu(table)
+    second = fits.table_to_hdu(eventlist_table(10, HDUVERS="0.1", **header))
+    second.header["EXTNAME"] = "OTHER"
+    fits.HDUList([fits.PrimaryHDU(), events, second]).writeto(path)
+    write_checksums(path)
+    return table
+
+
+def test_migration_chain():
+    from vodf_schema.migration import migration_chain
+
+    migrations = _migrations()
+    assert migration_chain("0.1", "0.3", migrations) == list(migrations)
+    assert migration_chain("0.2", "0.2", migrations) == []
+    with pytest.raises(ValueError, match="No migration from HDUVERS '0.3'"):
+        migration_chain("0.3", "0.1", migrations)
+
+
+def test_migrate_in_place(tmp_path):
+    from vodf_schema.fixity import verify_file
+    from vodf_schema.migration import migrate_file
+
+    path = tmp_path / "events.fits"
+    table = _write(path)
+    size = path.stat().st_size
+
+    results = migrate_file(path, "0.3", _migrations(), dry_run=True)
+    assert [r.index for r in results] == [1, 2]
+    assert fits.getheader(path, 1)["HDUVERS"] == "0.1"
+
+    results = migrate_file(path, "0.3", _migrations())
+    assert all(r.in_place and r.checksum_updated for r in results)
+    assert "renamed TREFPOS to TIMEREF" in results[0].changes
+    assert "added ORIGIN" in results[0].changes
+    assert "added ORIGIN" not in results[1].changes
+    assert path.stat().st_size == size
+
+    with fits.open(path) as hdul:
+        header = hdul[1].header
+        assert header["HDUVERS"] == "0.3"
+        assert header["TIMEREF"] == "TOPOCENTER"
+        assert "TREFPOS" not in header
+        assert header["TIMESYS"] == "TAI"
+        assert "LIVETIME" not in header
+        assert header["ORIGIN"] == "VODF"
+        assert "ORIGIN" not in hdul[2].header
+        assert np.array_equal(hdul[1].data["TIME"], table["TIME"])
+
+    assert all(r.datasum_valid and r.checksum_valid for r in verify_file(path))
+    assert migrate_file(path, "0.3", _migrations()) == []
+
+
+def test_migrate_grow(tmp_path):
+    from vodf_schema.fitsblocks import BLOCK_SIZE
+    from vodf_schema.fixity import verify_file
+    from vodf_schema.migration import HeaderMigration, migrate_file
+
+    path = tmp_path / "events.fits"
+    table = _write(path)
+    size = path.stat().st_size
+
+    added = {f"NEW{i}": i for i in range(40)}
+    migrations = (HeaderMigration("0.1", "0.2", added=added),)
+    results = migrate_file(path, "0.2", migrations, reserve_cards=0)
+    assert [r.in_place for r in results] == [False, False]
+    assert path.stat().st_size == size + 2 * BLOCK_SIZE
+
+    with fits.open(path) as hdul:
+        assert hdul[1].header["NEW39"] == 39
+        assert hdul[2].header["NEW0"] == 0
+        assert np.array_equal(hdul[1].data["ENERGY"], table["ENERGY"])
+        assert len(hdul[2].data) == 10
+    assert all(r.datasum_valid and r.checksum_valid for r in verify_file(path))
+
+
+def test_migrate_without_checksums(tmp_path):
+    from vodf_schema.fixity import verify_file
+    from vodf_schema.migration import migrate_file
+
+    path = tmp_path / "events.fits"
+    fits.table_to_hdu(eventlist_table(10, HDUVERS="0.1")).writeto(path)
+    (result,) = migrate_file(path, "0.2", _migrations())
+    assert not result.checksum_updated
+    assert "CHECKSUM" not in fits.getheader(path, 1)
+
+    # DATASUM alone is kept and no CHECKSUM is added
+    hdu = fits.table_to_hdu(eventlist_table(10, HDUVERS="0.1"))
+    hdu.add_datasum()
+    hdu.writeto(path, overwrite=True)
+    (result,) = migrate_file(path, "0.2", _migrations())
+    assert not result.checksum_updated
+    assert "CHECKSUM" not in fits.getheader(path, 1)
+    assert verify_file(path)[1].datasum_valid
+
+
+def test_migrate_continue_cards(tmp_path):
+    from vodf_schema.fitsblocks import BLOCK_SIZE
+    from vodf_schema.fixity import verify_file
+    from vodf_schema.migration import HeaderMigration, migrate_file
+
+    path = tmp_path / "events.fits"
+    table = _write(path)
+
+    # written as about 30 CONTINUE cards
+    migrations = (HeaderMigration("0.1", "0.2", added={"COMMENTS": "x" * 2000}),)
+    results = migrate_file(path, "0.2", migrations, reserve_cards=0)
+    assert [r.in_place for r in results] == [False, False]
+    assert path.stat().st_size % BLOCK_SIZE == 0
+
+    with fits.open(path) as hdul:
+        assert hdul[1].header["COMMENTS"] == "x" * 2000
+        assert np.array_equal(hdul[1].data["TIME"], table["TIME"])
+        assert len(hdul[2].data) == 10
+    assert all(r.datasum_valid and r.checksum_valid for r in verify_file(path))
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+
+"""Tests for the observation index."""
+
+import os
+
+import numpy as np
+import pytest
+from astropy.time import Time
+
+from .conftest import eventlist_table, write_eventlist
+
+
+@pytest.fixture
+def datastore(tmp_path):
+    paths = []
+    for obs_id, telescop, tstart in [
+        (1, "CTAO", 0),
+        (2, "CTAO", 1e4),
+        (3, "SWGO", 2e4),
+    ]:
+        table = eventlist_table(
+            5, OBS_ID=obs_id, TELESCOP=telescop, TSTART=tstart, TSTOP=tstart + 600
+        )
+        path = tmp_path / f"obs_{obs_id}.fits"
+        paths.append(write_eventlist(path, table))
+    return paths
+
+
+@pytest.mark.parametrize("suffix", [".fits", ".parquet"])
+def test_index_query(datastore, tmp_path, suffix):
+    from vodf_schema.obsindex import ObservationIndex
+
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+
+    index = ObservationIndex()
+    assert index.update(datastore) == {"scanned": 3, "skipped": 0, "removed": 0}
+    assert len(index) == 3
+
+    path = tmp_path / f"index{suffix}"
+    index.write(path)
+    index = ObservationIndex.read(path)
+    assert len(index) == 3
+
+    assert list(index.query(obs_id=2)["OBS_ID"]) == [2]
+    assert list(index.query(obs_id=[1, 3])["OBS_ID"]) == [1, 3]
+    assert list(index.query(telescop="ctao")["OBS_ID"]) == [1, 2]
+
+    mjdref = 51910 + 7.428703703703703e-4
+    selected = index.query(time_range=(mjdref + 500 / 86400, mjdref + 1.01e4 / 86400))
+    assert list(selected["OBS_ID"]) == [1, 2]
+
+    start = Time(mjdref + 1.5e4 / 86400, format="mjd")
+    stop = Time(start.mjd + 1, format="mjd")
+    selected = index.query(time_range=(start, stop), telescop="SWGO")
+    assert list(selected["OBS_ID"]) == [3]
+    np.testing.assert_allclose(selected["MJD_START"], mjdref + 2e4 / 86400)
+
+
+def test_index_incremental(datastore):
+    from vodf_schema.obsindex import ObservationIndex
+
+    index = ObservationIndex()
+    index.update(datastore)
+
+    stat = os.stat(datastore[0])
+    os.utime(datastore[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert index.update(datastore) == {"scanned": 1, "skipped": 2, "removed": 0}
+    assert len(index) == 3
+
+    os.remove(datastore[1])
+    assert index.update(datastore[2:], prune=True)["removed"] == 1
+    assert sorted(index.table["OBS_ID"]) == [1, 3]
+
+
+def test_index_without_time_reference(datastore, tmp_path):
+    from vodf_schema.obsindex import ObservationIndex
+
+    table = eventlist_table(5, OBS_ID=4, MJDREFI=None, TSTART=3e4, TSTOP=3.06e4)
+    path = write_eventlist(tmp_path / "obs_4.fits", table)
+    index = ObservationIndex()
+    index.update([*datastore, path])
+
+    row = index.query(obs_id=4)
+    assert np.isnan(row["MJD_START"][0])
+    assert np.isnan(row["MJD_STOP"][0])
+    # the unknown times match no time range
+    selected = index.query(time_range=(0.0, 1e6))
+    assert list(selected["OBS_ID"]) == [1, 2, 3]
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+
+"""Tests for the serialized schema registry."""
+
+import json
+import subprocess
+import sys
+
+import pytest
+from astropy.io import fits
+
+from .conftest import eventlist_header, eventlist_table
+
+
+def _assert_matches_live(registry):
+    from vodf_schema.compiled import compile_header, compile_table
+    from vodf_schema.registry import _schema_classes
+
+    tables, headers = _schema_classes()
+    for header_cls in headers:
+        loaded = registry.headers[header_cls.__name__]
+        assert loaded.cards == compile_header(header_cls).cards
+
+    for table_cls in tables:
+        loaded = registry.tables[table_cls.__name__]
+        compiled = compile_table(table_cls)
+        assert loaded.columns == compiled.columns
+        assert loaded.header.name == compiled.header.name
+        assert loaded.header.cards == compiled.header.cards
+
+
+def test_round_trip(tmp_path):
+    from vodf_schema.registry import load_registry, write_registry
+    from vodf_schema.version import __version__
+
+    path = write_registry(tmp_path / "registry.json")
+    registry = load_registry(path=path)
+
+    assert registry.hdu_version == __version__
+    assert load_registry(path=path) is registry
+    _assert_matches_live(registry)
+
+    data = json.loads(path.read_text())
+    ref = data["versions"][__version__]["tables"]["EventList"]["columns"]["RA"]
+    assert ref["ucd"] == "pos.eq.ra;stat.fit"
+    assert registry.references[ref["reference"]].startswith("I. George")
+
+
+def test_keeps_other_versions(tmp_path):
+    from vodf_schema.registry import REGISTRY_FORMAT, load_registry, write_registry
+
+    path = tmp_path / "registry.json"
+    old = {"references": [], "headers": {}, "tables": {}, "extnames": {}}
+    path.write_text(json.dumps({"format": REGISTRY_FORMAT, "versions": {"0.1": old}}))
+
+    write_registry(path)
+
+    assert load_registry("0.1", path).tables == {}
+    assert "EventList" in load_registry(path=path).tables
+    with pytest.raises(KeyError, match="no schemas for HDUVERS '0.0'"):
+        load_registry("0.0", path)
+
+
+def test_validate_header(tmp_path):
+    from vodf_schema.registry import load_registry, write_registry
+
+    registry = load_registry(path=write_registry(tmp_path / "registry.json"))
+    table = eventlist_table(10)
+    table["RA"].unit = "s"
+    del table["DEC"]
+    header = fits.table_to_hdu(table).header
+
+    schema = registry.table_for_header(header)
+    assert schema.name == "EventList"
+    issues = {(i.kind, i.context) for i in schema.validate_header(header)}
+    assert ("WrongUnit", "RA") in issues
+    assert ("RequiredMissing", None) in issues
+    assert registry.table_for_header(fits.Header({"EXTNAME": "FOO"})) is None
+
+
+def test_storage_profiles(tmp_path):
+    from vodf_schema.registry import load_registry, write_registry
+    from vodf_schema.writer import EventListWriter
+
+    registry = load_registry(path=write_registry(tmp_path / "registry.json"))
+    schema = registry.tables["EventList"]
+    assert dict(schema.columns["TIME"].storage)["compact"].zero == "TSTART"
+
+    path = tmp_path / "events.fits"
+    with EventListWriter(path, eventlist_header(), profile="compact"):
+        pass
+    header = fits.getheader(path, 1)
+    issues = schema.validate_header(header)
+    assert [i for i in issues if i.severity == "error"] == []
+
+    # a scale or zero of no profile is not accepted
+    header["TSCAL2"] = 1e-3
+    header["TZERO3"] = 0.0
+    issues = schema.validate_header(header)
+    errors = {(i.kind, i.context) for i in issues if i.severity == "error"}
+    assert errors == {("WrongType", "TIME"), ("WrongType", "RA")}
+
+
+def test_load_without_schema_classes(tmp_path):
+    from vodf_schema.registry import write_registry
+    from vodf_schema.version import __version__
+
+    path = write_registry(tmp_path / "registry.json")
+    code = (
+        "import sys; from vodf_schema.registry import load_registry; "
+        f"load_registry({__version__!r}, {str(path)!r}); "
+        "print('fits_schema' in sys.modules, 'vodf_schema.level1.eventlist' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.split() == ["False", "False"]
+
+
+def test_packaged_registry():
+    """The registry generated at build time matches the schema classes."""
+    from vodf_schema.registry import REGISTRY_PATH, load_registry
+
+    if not REGISTRY_PATH.exists():
+        pytest.skip("The registry was not generated")
+    try:
+        registry = load_registry()
+    except KeyError:
+        pytest.skip("The registry was generated for another version")
+    _assert_matches_live(registry)
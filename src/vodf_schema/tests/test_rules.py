@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+"""Tests for the semantic table rules."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from .conftest import eventlist_table, write_eventlist
+
+
+def test_in_range():
+    from vodf_schema.rules import InRange
+
+    rule = InRange("X", 0.0, np.inf, low_inclusive=False, high_inclusive=False)
+    checker = rule.checker(fits.Header())
+    checker.update({"X": np.array([1.0, 0.0, np.nan, np.inf, 2.0])}, start=10)
+    result = checker.result()
+
+    assert result.n_checked == 5
+    assert result.n_violations == 3
+    assert result.samples == [11, 12, 13]
+    assert "(0.0, inf)" in result.description
+
+
+def test_within_header_range():
+    from vodf_schema.rules import WithinHeaderRange
+
+    rule = WithinHeaderRange("TIME", "TSTART", "TSTOP")
+    header = fits.Header({"TSTART": 0.0, "TSTOP": 10.0})
+    checker = rule.checker(header)
+    checker.update({"TIME": np.array([-1.0, 0.0, 10.0, 11.0])}, start=0)
+    assert checker.result().samples == [0, 3]
+
+    result = rule.checker(fits.Header({"TSTART": 0.0})).result()
+    assert result.ok
+    assert "TSTOP" in result.skipped
+
+
+@pytest.mark.parametrize("max_in_memory", [2, 1000])
+def test_unique(tmp_path, max_in_memory):
+    from vodf_schema.rules import Unique
+
+    rule = Unique("ID", max_in_memory=max_in_memory, block_size=3, tmpdir=tmp_path)
+    checker = rule.checker(fits.Header(), max_samples=2)
+    values = np.array([5, 3, 8, 1, 3, 9, 0, 5, 5, 7], dtype=">i8")
+    for start in range(0, len(values), 3):
+        checker.update({"ID": values[start : start + 3]}, start)
+
+    result = checker.result()
+    assert result.n_checked == 10
+    # the second and third occurrences of 5 and the second 3
+    assert result.n_violations == 3
+    assert result.samples == [4, 7]
+    # spilled runs are removed
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unique_block_edges():
+    from vodf_schema.rules import Unique
+
+    checker = Unique("ID", block_size=2).checker(fits.Header())
+    checker.update({"ID": np.array([1, 5, 5])}, 0)
+    assert checker.result().n_violations == 1
+
+    # duplicates on both sides of the edges of the merged blocks
+    rng = np.random.default_rng(0)
+    values = rng.integers(0, 300, 1000)
+    checker = Unique("ID", block_size=16).checker(fits.Header())
+    for start in range(0, len(values), 10):
+        checker.update({"ID": values[start : start + 10]}, start)
+    blocks = list(checker._merged_blocks())
+    # 100 runs of 10 values, read one value ahead each
+    assert max(len(values) for values, _ in blocks) <= 100
+    assert np.array_equal(np.concatenate([v for v, _ in blocks]), np.sort(values))
+
+    checker = Unique("ID", block_size=16).checker(fits.Header())
+    for start in range(0, len(values), 10):
+        checker.update({"ID": values[start : start + 10]}, start)
+    result = checker.result()
+    assert result.n_violations == len(values) - len(np.unique(values))
+
+    checker = Unique("ID", block_size=64).checker(fits.Header())
+    for start in range(0, len(values), 100):
+        checker.update({"ID": values[start : start + 100]}, start)
+    assert max(len(v) for v, _ in checker._merged_blocks()) <= 64
+
+
+def test_merge():
+    from vodf_schema.rules import InRange, Unique
+
+    values = np.array([1, 2, -1, 2, -3, 4])
+    for rule in (InRange("X", 0), Unique("X")):
+        full = rule.checker(fits.Header())
+        full.update({"X": values}, 0)
+
+        first, second = (rule.checker(fits.Header()) for _ in range(2))
+        first.update({"X": values[:3]}, 0)
+        second.update({"X": values[3:]}, 3)
+        first.merge(second)
+
+        assert first.result() == full.result()
+
+
+def test_precision():
+    from astropy import units as u
+
+    from vodf_schema.rules import Precision
+
+    def header(tform, **cards):
+        return fits.Header({"TFIELDS": 1, "TTYPE1": "X", "TFORM1": tform, **cards})
+
+    values = {"X": np.array([1.0, 1e3, np.nan])}
+    rule = Precision("X", rtol=1e-6)
+    for tform, n_violations in (("D", 0), ("E", 0), ("J", 2)):
+        checker = rule.checker(header(tform))
+        checker.update(values, start=0)
+        assert checker.result().n_violations == n_violations
+
+    # half of TSCAL, converted from the column unit
+    rule = Precision("X", atol=1 * u.mas)
+    checker = rule.checker(header("J", TUNIT1="deg", TSCAL1=1e-7))
+    checker.update(values, start=0)
+    assert checker.result().ok
+    checker = rule.checker(header("I", TUNIT1="deg", TSCAL1=1e-3))
+    checker.update(values, start=0)
+    assert checker.result().n_violations == 2
+
+    assert rule.checker(header("A")).result().skipped
+    assert "missing" in rule.checker(fits.Header({"TFIELDS": 0})).result().skipped
+
+
+def test_ordered_intervals():
+    from vodf_schema.rules import OrderedIntervals
+
+    rule = OrderedIntervals("START", "STOP")
+    start = np.array([0.0, 2.0, 5.0, 4.0, 9.0, 12.0])
+    stop = np.array([1.0, 4.0, 6.0, 8.0, 8.5, np.nan])
+    checkers = []
+    for chunk_start in (0, 3):
+        checker = rule.checker(fits.Header())
+        rows = slice(chunk_start, chunk_start + 3)
+        checker.update({"START": start[rows], "STOP": stop[rows]}, chunk_start)
+        checkers.append(checker)
+
+    # row 3 overlaps row 2 across the shards
+    assert checkers[1].result().samples == [4, 5]
+    checkers[0].merge(checkers[1])
+    assert checkers[0].result().samples == [3, 4, 5]
+
+
+def test_eventlist_rules(tmp_path):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_streaming, validate_table
+
+    table = eventlist_table(100)
+    table["EVENT_ID"][[10, 20]] = 5
+    table["RA"][3] = 360.0
+    table["ENERGY"][[7, 8]] = [0.0, np.nan]
+    table["TIME"][-1] = 601.0
+    path = write_eventlist(tmp_path / "events.fits", table)
+
+    report = validate_streaming(path, EventList, chunk_size=16)
+    with fits.open(path) as hdul:
+        assert validate_table(hdul["EVENT-LIST"], EventList).issues == report.issues
+
+    violations = {r.columns: r for r in report.rules if not r.ok}
+    assert violations[("EVENT_ID",)].samples == [10, 20]
+    assert violations[("RA",)].samples == [3]
+    assert violations[("ENERGY",)].samples == [7, 8]
+    assert violations[("TIME",)].samples == [99]
+    assert "DEC" not in {c for r in violations.values() for c in r.columns}
+    assert not report.valid
+    assert {i.context for i in report.errors} == {"EVENT_ID", "RA", "ENERGY", "TIME"}
+
+
+def test_reservoir_sampling():
+    from vodf_schema.rules import InRange
+
+    rule = InRange("X", 0.0, 1.0)
+    values = np.full(10_000, 2.0)
+    counts = np.zeros(len(values))
+    for seed in range(200):
+        first, second = rule.checker(fits.Header(), 10), rule.checker(fits.Header(), 10)
+        first.use_reservoir(np.random.default_rng([seed, 0]))
+        second.use_reservoir(np.random.default_rng([seed, 1]))
+        for start in range(0, 5000, 1000):
+            first.update({"X": values[start : start + 1000]}, start)
+        for start in range(5000, 10_000, 1000):
+            second.update({"X": values[start : start + 1000]}, start)
+        first.merge(second)
+
+        result = first.result()
+        assert result.n_violations == 10_000
+        assert len(set(result.samples)) == 10
+        counts[result.samples] += 1
+
+    # each row is sampled with probability 10 / 10_000, i.e. 200 times per decile
+    deciles = counts.reshape(10, -1).sum(axis=1)
+    assert np.all(np.abs(deciles - 200) < 60)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""Tests for the time and sky indexes of event lists."""
+
+import numpy as np
+import pytest
+
+from .conftest import eventlist_table, write_eventlist
+
+
+@pytest.fixture
+def sorted_events(tmp_path):
+    table = eventlist_table(5000, TSORTKEY="TIME")
+    return table, write_eventlist(tmp_path / "events.fits", table)
+
+
+def test_healpix_round_trip():
+    from vodf_schema.healpix import ang2pix_nested, pix2ang_nested
+
+    for order in range(5):
+        pixels = np.arange(12 * 4**order)
+        lon, lat = pix2ang_nested(order, pixels)
+        np.testing.assert_array_equal(ang2pix_nested(order, lon, lat), pixels)
+
+    # the centers of the 12 base pixels
+    lon, lat = pix2ang_nested(0, [0, 4, 8])
+    np.testing.assert_allclose(lon, [45, 0, 45])
+    np.testing.assert_allclose(lat, [41.8103149, 0, -41.8103149])
+
+
+def test_time_range_rows(sorted_events):
+    from vodf_schema.fitsblocks import scan_hdus
+    from vodf_schema.selection import time_range_rows
+
+    table, path = sorted_events
+    location = scan_hdus(path)[1]
+    first, last = time_range_rows(path, location, 100.0, 200.0)
+
+    time = np.asarray(table["TIME"])
+    assert first == np.searchsorted(time, 100.0)
+    assert last == np.searchsorted(time, 200.0)
+
+
+def test_time_range_needs_sorted(eventlist_file):
+    from vodf_schema.fitsblocks import scan_hdus
+    from vodf_schema.selection import time_range_rows
+
+    with pytest.raises(ValueError, match="TSORTKEY"):
+        time_range_rows(eventlist_file, scan_hdus(eventlist_file)[1], 0, 1)
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+@pytest.mark.parametrize("tsortkey", ["TIME", None])
+def test_select_events(tmp_path, use_index, tsortkey):
+    from vodf_schema.selection import SkyIndex, angular_distance, select_events
+
+    table = eventlist_table(5000, TSORTKEY=tsortkey)
+    path = write_eventlist(tmp_path / "events.fits", table)
+    sky_index = None
+    if use_index:
+        SkyIndex.build(path, order=4, chunk_size=700).write(tmp_path / "index.fits")
+        sky_index = tmp_path / "index.fits"
+
+    cone = (120.0, 30.0, 20.0)
+    selected = select_events(
+        path, time_range=(100.0, 400.0), cone=cone, sky_index=sky_index, chunk_size=999
+    )
+
+    distance = angular_distance(cone[0], cone[1], table["RA"], table["DEC"])
+    time = table["TIME"]
+    expected = (distance <= cone[2]) & (time >= 100.0) & (time < 400.0)
+    assert np.count_nonzero(expected) > 0
+    np.testing.assert_array_equal(selected["EVENT_ID"], table["EVENT_ID"][expected])
+    assert selected["RA"].unit == "deg"
+
+
+def test_sky_index(sorted_events, tmp_path):
+    from vodf_schema.selection import SkyIndex
+
+    _, path = sorted_events
+    index = SkyIndex.build(path, order=3)
+    assert index.counts.sum() == 5000
+    assert np.all(np.diff(index.pixels) > 0)
+
+    index.write(tmp_path / "index.fits")
+    read = SkyIndex.read(tmp_path / "index.fits")
+    np.testing.assert_array_equal(read.rows, index.rows)
+
+    # a small cone only needs the rows of a few pixels
+    candidates = read.candidate_rows(10.0, 10.0, 1.0, row_range=(1000, 2000))
+    assert len(candidates) < 500
+    assert np.all((candidates >= 1000) & (candidates < 2000))
+    assert np.all(np.diff(candidates) > 0)
+
+
+def test_sorted_rule(tmp_path):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_streaming
+
+    table = eventlist_table(100, TSORTKEY="TIME")
+    table["TIME"][[10, 50]] = table["TIME"][[50, 10]]
+    path = write_eventlist(tmp_path / "events.fits", table)
+
+    report = validate_streaming(path, EventList, chunk_size=30)
+    result = next(r for r in report.rules if r.rule == "SortedBy(TIME)")
+    assert result.samples == [11, 50]
+
+    unsorted = validate_streaming(
+        write_eventlist(tmp_path / "unsorted.fits", eventlist_table(100)), EventList
+    )
+    result = next(r for r in unsorted.rules if r.rule == "SortedBy(TIME)")
+    assert result.skipped
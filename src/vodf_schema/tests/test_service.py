@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+
+"""Tests for the asyncio validation service."""
+
+import asyncio
+import json
+
+import pytest
+
+from .conftest import eventlist_table, write_eventlist
+
+
+async def _request(address, method, target, body=None, chunked=False, headers=()):
+    if isinstance(address, str):
+        reader, writer = await asyncio.open_unix_connection(address)
+    else:
+        reader, writer = await asyncio.open_connection(*address[:2])
+
+    lines = [f"{method} {target} HTTP/1.1", "Host: localhost", *headers]
+    if body is not None and chunked:
+        lines.append("Transfer-Encoding: chunked")
+        chunks = [body[i : i + 1000] for i in range(0, len(body), 1000)]
+        payload = b"".join(b"%x\r\n%s\r\n" % (len(c), c) for c in chunks) + b"0\r\n\r\n"
+    elif body is not None:
+        lines.append(f"Content-Length: {len(body)}")
+        payload = body
+    else:
+        payload = b""
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + payload)
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    response_headers = {}
+    while (line := await reader.readline()) != b"\r\n":
+        name, _, value = line.decode().partition(":")
+        response_headers[name.lower()] = value.strip()
+    content = await reader.readexactly(int(response_headers["content-length"]))
+    writer.close()
+    await writer.wait_closed()
+    return status, json.loads(content), response_headers
+
+
+def _run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_validate_path(tmp_path):
+    from vodf_schema.service import ValidationService
+
+    valid = write_eventlist(tmp_path / "valid.fits", eventlist_table(100))
+    broken = write_eventlist(
+        tmp_path / "broken.fits", eventlist_table(100, TIMESYS="FOO")
+    )
+
+    async def main():
+        service = ValidationService(n_jobs=1)
+        await service.start(port=0)
+        try:
+            address = service.address
+            status, health, _ = await _request(address, "GET", "/health")
+            assert status == 200
+            assert health["status"] == "ok"
+
+            status, result, _ = await _request(
+                address, "POST", f"/validate?path={valid}&level=header"
+            )
+            assert status == 200
+            assert result["valid"]
+            assert result["reports"][0]["schema"] == "EventList"
+            assert result["reports"][0]["rules"] == []
+
+            status, result, _ = await _request(
+                address, "POST", f"/validate?path={broken}&compact=1"
+            )
+            assert status == 200
+            assert not result["valid"]
+            assert result["reports"][0]["rules"]
+
+            status, result, _ = await _request(
+                address, "POST", f"/validate?path={tmp_path / 'missing.fits'}"
+            )
+            assert status == 404
+            status, result, _ = await _request(address, "GET", "/validate")
+            assert status == 405
+            status, result, _ = await _request(address, "POST", "/validate?level=x")
+            assert status == 400
+        finally:
+            await service.close()
+
+    _run(main())
+
+
+def test_worker_crash(tmp_path):
+    import os
+    import signal
+
+    from vodf_schema.service import ValidationService
+
+    path = write_eventlist(tmp_path / "events.fits", eventlist_table(100))
+
+    async def main():
+        service = ValidationService(n_jobs=1)
+        await service.start(port=0)
+        try:
+            # e.g. killed by the OOM killer
+            for pid in service._pool._processes:
+                os.kill(pid, signal.SIGKILL)
+            target = f"/validate?path={path}"
+            status, result, _ = await _request(service.address, "POST", target)
+            assert status == 500
+            assert result["error"].startswith("BrokenProcessPool")
+
+            # the pool is replaced for the next requests
+            status, result, _ = await _request(service.address, "POST", target)
+            assert status == 200
+            assert result["valid"]
+        finally:
+            await service.close()
+
+    _run(main())
+
+
+def test_upload_error(tmp_path):
+    from vodf_schema.service import ValidationService
+
+    async def main():
+        # the spooled upload cannot be written
+        service = ValidationService(n_jobs=1, upload_dir=tmp_path / "missing")
+        await service.start(port=0)
+        try:
+            status, result, _ = await _request(
+                service.address, "POST", "/validate", b" " * 2880
+            )
+            assert status == 500
+            assert result["error"].startswith("FileNotFoundError")
+            status, _, _ = await _request(service.address, "GET", "/health")
+            assert status == 200
+        finally:
+            await service.close()
+
+    _run(main())
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_validate_upload(tmp_path, chunked):
+    from vodf_schema.service import ValidationService
+
+    path = write_eventlist(tmp_path / "events.fits", eventlist_table(100))
+    data = path.read_bytes()
+    upload_dir = tmp_path / "uploads"
+    upload_dir.mkdir()
+
+    async def main():
+        service = ValidationService(
+            n_jobs=1, upload_dir=upload_dir, max_upload_size=len(data)
+        )
+        await service.start(port=0)
+        try:
+            target = "/validate?name=events.fits&profile=true"
+            status, result, _ = await _request(
+                service.address, "POST", target, data, chunked
+            )
+            assert status == 200
+            assert result["valid"], result
+            assert result["path"] == "events.fits"
+            assert result["profile"]["children"]
+
+            status, _, _ = await _request(
+                service.address, "POST", "/validate", data + b" " * 2880, chunked
+            )
+            assert status == 413
+        finally:
+            await service.close()
+        assert list(upload_dir.iterdir()) == []
+
+    _run(main())
+
+
+def test_backpressure(tmp_path):
+    from vodf_schema.service import ValidationService
+
+    path = write_eventlist(tmp_path / "events.fits", eventlist_table(100))
+
+    async def main():
+        service = ValidationService(n_jobs=1, max_pending=1)
+        await service.start(unix=tmp_path / "service.sock")
+        try:
+            address = str(tmp_path / "service.sock")
+            # an upload that never finishes holds the only slot
+            reader, writer = await asyncio.open_unix_connection(address)
+            writer.write(b"POST /validate HTTP/1.1\r\nContent-Length: 100\r\n\r\n")
+            await writer.drain()
+            while service.pending == 0:
+                await asyncio.sleep(0.01)
+
+            status, body, headers = await _request(
+                address, "POST", f"/validate?path={path}"
+            )
+            assert status == 503
+            assert headers["retry-after"] == "1"
+
+            writer.close()
+            await writer.wait_closed()
+            while service.pending:
+                await asyncio.sleep(0.01)
+            status, _, _ = await _request(address, "POST", f"/validate?path={path}")
+            assert status == 200
+        finally:
+            await service.close()
+
+    _run(main())
+
+
+def test_roots(tmp_path):
+    from vodf_schema.service import ValidationService
+
+    path = write_eventlist(tmp_path / "events.fits", eventlist_table(10))
+
+    async def main():
+        service = ValidationService(n_jobs=1, roots=[tmp_path / "allowed"])
+        await service.start(port=0)
+        try:
+            status, result, _ = await _request(
+                service.address, "POST", f"/validate?path={path}"
+            )
+            assert status == 403
+        finally:
+            await service.close()
+
+    _run(main())
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+
+"""Tests for the stacking of event lists."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+from astropy.table import QTable, Table
+
+from .conftest import eventlist_table, write_eventlist
+
+
+def _inputs(tmp_path):
+    first = eventlist_table(1000, seed=1, OBS_ID=1)
+    # a day later, overlapping with the first in time and in UTC
+    second = eventlist_table(
+        700, seed=2, OBS_ID=2, MJDREFI=51911, MJDREFF=0.0, TIMESYS="UTC"
+    )
+    second["TIME"] -= 86400 - 300
+    second.meta["TSTART"] -= 86400 - 300
+    second.meta["TSTOP"] -= 86400 - 300
+    second["ENERGY"] = second["ENERGY"].to("GeV")
+    return [
+        write_eventlist(tmp_path / "obs1.fits", first),
+        write_eventlist(tmp_path / "obs2.fits", second),
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 64, 10_000])
+def test_stack_eventlists(tmp_path, chunk_size):
+    from vodf_schema.grouping import MemberResolver
+    from vodf_schema.level1 import EventList
+    from vodf_schema.stacking import stack_eventlists
+    from vodf_schema.temporal import time_reference
+    from vodf_schema.validation import validate_streaming
+
+    paths = _inputs(tmp_path)
+    (tmp_path / "stacked").mkdir()
+    output = stack_eventlists(
+        paths,
+        tmp_path / "stacked/events.fits",
+        header={"OBS_ID": 0},
+        chunk_size=chunk_size,
+    )
+    assert validate_streaming(output, EventList, "EVENT-LIST").errors == []
+
+    events = Table.read(output, hdu="EVENT-LIST")
+    header = events.meta
+    assert header["TIMESYS"] == "TT"
+    assert header["ONTIME"] == 1200.0
+    assert header["TSORTKEY"] == "TIME"
+    assert np.all(np.diff(events["TIME"]) >= 0)
+    assert sorted(events["EVENT_ID"]) == list(range(1700))
+    assert events["ENERGY"].unit == "TeV"
+
+    target = time_reference(fits.getheader(paths[0], 1))
+    expected = []
+    for path in paths:
+        table = Table.read(path)
+        met = time_reference(table.meta).to_time(table["TIME"].value)
+        expected.append((met - target.epoch).to_value("s"))
+    # the events overlap, the leap second of 2001 does not exist
+    assert np.allclose(events["TIME"], np.sort(np.concatenate(expected)), atol=1e-7)
+    assert header["TSTART"] == pytest.approx(0.0)
+    assert header["TSTOP"] == pytest.approx(900.0)
+    energies = [QTable.read(path)["ENERGY"].to_value("TeV") for path in paths]
+    assert np.allclose(np.sort(events["ENERGY"]), np.sort(np.concatenate(energies)))
+
+    grouping = Table.read(output, hdu="GROUPING")
+    assert list(grouping["MEMBER_LOCATION"]) == ["../obs1.fits", "../obs2.fits"]
+    assert list(grouping["OBS_ID"]) == [1, 2]
+    assert list(grouping["N_EVENTS"]) == [1000, 700]
+    assert list(grouping["EVENT_ID_OFFSET"]) == [0, 1000]
+    assert list(grouping["TIMESYS"]) == ["TT", "UTC"]
+    with MemberResolver() as resolver:
+        members = resolver.resolve_table(output)
+    assert [m.path.name for m in members] == ["obs1.fits", "obs2.fits"]
+    assert fits.getheader(output, "GROUPING")["CHECKSUM"]
+
+
+def test_namespace_event_ids(tmp_path):
+    from vodf_schema.stacking import stack_eventlists
+
+    paths = _inputs(tmp_path)
+    output = stack_eventlists(
+        paths,
+        tmp_path / "events.fits",
+        reference={"MJDREFI": 51900, "MJDREFF": 0.0, "TIMESYS": "TAI"},
+        event_ids="namespace",
+        id_stride=10_000,
+        header={"OBS_ID": 0},
+    )
+    events = fits.getdata(output, "EVENT-LIST")
+    first = events["EVENT_ID"] < 20_000
+    assert sorted(events["EVENT_ID"][first]) == list(range(10_000, 11_000))
+    assert sorted(events["EVENT_ID"][~first]) == list(range(20_000, 20_700))
+    header = fits.getheader(output, "EVENT-LIST")
+    assert (header["MJDREFI"], header["TIMESYS"]) == (51900, "TAI")
+    assert header["TSTART"] == pytest.approx(10 * 86400 + 32.0)
+
+    with pytest.raises(ValueError, match="not within"):
+        stack_eventlists(
+            paths,
+            tmp_path / "small.fits",
+            event_ids="namespace",
+            id_stride=100,
+            header={"OBS_ID": 0},
+        )
+    with pytest.raises(ValueError, match="distinct OBS_IDs"):
+        stack_eventlists(
+            [paths[0], paths[0]], tmp_path / "d.fits", event_ids="namespace"
+        )
+
+
+def test_stack_errors(tmp_path):
+    from vodf_schema.stacking import stack_eventlists
+
+    paths = _inputs(tmp_path)
+    # OBS_ID differs between the inputs and is required
+    with pytest.raises(ValueError, match="OBS_ID"):
+        stack_eventlists(paths, tmp_path / "events.fits")
+
+    table = eventlist_table(100)
+    table["TIME"] = table["TIME"][::-1]
+    unsorted = write_eventlist(tmp_path / "unsorted.fits", table)
+    with pytest.raises(ValueError, match="not sorted by TIME"):
+        stack_eventlists(
+            [paths[0], unsorted], tmp_path / "out.fits", header={"OBS_ID": 0}
+        )
+    # the incomplete output is not finished
+    assert not (tmp_path / "out.fits").exists()
+    assert (tmp_path / "out.fits.partial").exists()
+    with pytest.raises(ValueError, match="event_ids"):
+        stack_eventlists(paths, tmp_path / "out.fits", event_ids="keep")
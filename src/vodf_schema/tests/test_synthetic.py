@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+"""Tests for the synthetic data generator."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+
+def test_generate_eventlist_is_valid(tmp_path):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.synthetic import generate_eventlist
+    from vodf_schema.validation import validate_streaming
+
+    path = generate_eventlist(tmp_path / "events.fits", 10_000, chunk_size=999)
+    report = validate_streaming(path, EventList, chunk_size=1234)
+    assert report.valid, report.to_dict()
+    assert report.n_rows == 10_000
+
+    with fits.open(path) as hdus:
+        header = hdus[1].header
+        data = hdus[1].data
+        assert header["TSORTKEY"] == "TIME"
+        assert header["HDUCLAS2"] == "EVENTS"
+        assert np.all(np.diff(data["TIME"]) > 0)
+        np.testing.assert_array_equal(data["EVENT_ID"], np.arange(10_000))
+        assert data["ENERGY"].min() >= 0.03
+
+
+def test_generate_is_reproducible(tmp_path):
+    from vodf_schema.synthetic import generate_eventlist
+
+    a = generate_eventlist(tmp_path / "a.fits", 5000, seed=3, chunk_size=1000)
+    b = generate_eventlist(
+        tmp_path / "b.fits", 5000, seed=3, chunk_size=1000, n_threads=1
+    )
+    c = generate_eventlist(tmp_path / "c.fits", 5000, seed=4, chunk_size=1000)
+    assert a.read_bytes() == b.read_bytes()
+    assert a.read_bytes() != c.read_bytes()
+
+
+def test_inject_violations(tmp_path):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.synthetic import generate_eventlist
+    from vodf_schema.validation import validate_streaming
+
+    violations = {
+        "Unique(EVENT_ID)": 7,
+        "SortedBy(TIME)": 5,
+        "WithinHeaderRange(TIME)": 3,
+        "InRange(ENERGY)": 11,
+    }
+    path = generate_eventlist(
+        tmp_path / "events.fits",
+        20_000,
+        violations=violations,
+        header={"HDUCLAS2": "SPECTRUM"},
+        chunk_size=3000,
+    )
+    report = validate_streaming(path, EventList)
+    found = {r.rule: r.n_violations for r in report.rules}
+    assert found["Unique(EVENT_ID)"] == 7
+    assert found["SortedBy(TIME)"] == 5
+    assert found["WithinHeaderRange(TIME)"] == 3
+    assert found["InRange(ENERGY)"] == 11
+    assert found["InRange(RA)"] == 0
+    assert any(e.context == "HDUCLAS2" for e in report.errors)
+
+    with pytest.raises(ValueError, match="Unknown rules"):
+        generate_eventlist(tmp_path / "x.fits", 10, violations={"foo": 1})
+
+
+def test_generate_observations(tmp_path):
+    from vodf_schema.grouping import MemberResolver
+    from vodf_schema.synthetic import generate_observations
+    from vodf_schema.validation import validate_file
+
+    grouping = generate_observations(tmp_path / "obs", 3, [100, 200, 300], seed=1)
+    with MemberResolver() as resolver:
+        members = resolver.resolve_table(grouping)
+
+    assert [m.header["OBS_ID"] for m in members] == [1, 2, 3]
+    assert [m.header["NAXIS2"] for m in members] == [100, 200, 300]
+    assert members[1].header["TSTART"] > members[0].header["TSTOP"]
+    for member in members:
+        assert all(r.valid for r in validate_file(member.path))
+
+
+def test_main(tmp_path, capsys):
+    from vodf_schema.synthetic import main
+
+    assert main([str(tmp_path), "-n", "2", "-e", "1e3"]) == 0
+    assert "2 observations" in capsys.readouterr().out
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "obs_000001.fits",
+        "obs_000002.fits",
+        "observations.fits",
+    ]
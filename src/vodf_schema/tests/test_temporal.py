@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+"""Tests for the conversion of mission elapsed times."""
+
+import numpy as np
+import pytest
+from astropy.time import Time, TimeDelta
+
+from .conftest import eventlist_header
+
+
+@pytest.mark.parametrize("timesys", ["TT", "UTC", "TAI"])
+@pytest.mark.parametrize("scale", ["TT", "UTC", "TAI"])
+def test_against_astropy(timesys, scale):
+    from vodf_schema.temporal import time_reference
+
+    header = eventlist_header(TIMESYS=timesys)
+    reference = time_reference(header)
+    # around the leap second at the end of 2016, with nanoseconds
+    met = 5.04e8 + np.linspace(-1e5, 1e5, 1001) + 0.123456789
+
+    epoch = Time(
+        header["MJDREFI"], header["MJDREFF"], format="mjd", scale=timesys.lower()
+    )
+    expected = getattr(epoch + TimeDelta(met, format="sec"), scale.lower())
+    result = reference.to_time(met, scale)
+    assert result.scale == scale.lower()
+    # the doubles of met resolve about 60 ns
+    assert np.all(np.abs((result - expected).to_value("s")) < 1e-7)
+
+    days, fraction = reference.to_mjd(met, scale)
+    assert np.all(days == np.floor(days))
+    assert np.all((fraction >= 0) & (fraction < 1))
+    assert np.allclose(days + fraction, expected.mjd, rtol=0, atol=1e-9)
+
+    isot = reference.to_isot(met[:1], scale)[0]
+    assert isot[:23] == expected[0].isot
+    assert len(isot) == 29
+
+
+def test_nanoseconds():
+    from vodf_schema.temporal import time_reference
+
+    reference = time_reference(eventlist_header(MJDREFI=40587, MJDREFF=0.0))
+    ns = reference.to_nanoseconds(np.array([0.0, 1.5, -1.25, 1e-9, 1e6 + 2**-20]))
+    assert list(ns) == [0, 1_500_000_000, -1_250_000_000, 1, 1_000_000_000_000_954]
+    # GPS readings are behind TAI, TT ahead
+    assert reference.to_nanoseconds(0.0, "GPS") == -51_184_000_000
+    assert str(reference.to_datetime64(86400.0)) == "1970-01-02T00:00:00.000000000"
+
+
+def test_to_reference():
+    from vodf_schema.temporal import time_reference
+
+    tt = time_reference(eventlist_header())
+    utc = time_reference(eventlist_header(MJDREFI=57754, MJDREFF=0.25, TIMESYS="UTC"))
+    # across the leap second at the end of 2016
+    met = np.linspace(-1e5, 1e5, 1001) + 0.123456789
+    result = utc.to_reference(met, tt)
+    expected = (utc.epoch + TimeDelta(met, format="sec") - tt.epoch).to_value("s")
+    assert np.all(np.abs(result - expected) < 1e-7)
+    assert np.allclose(tt.to_reference(result, utc), met, rtol=0, atol=1e-7)
+
+    # the same reference only scales
+    assert tt.to_reference(met, tt) is not met
+    assert np.all(tt.to_reference(met / 1e3, tt, 1e3) == met / 1e3 * 1e3)
+
+
+def test_time_reference_cache():
+    from vodf_schema.temporal import time_reference
+
+    header = eventlist_header()
+    reference = time_reference(header)
+    assert time_reference(dict(header)) is reference
+    assert time_reference(eventlist_header(MJDREFI=51911)) is not reference
+    assert reference.location == (-70.4039, -24.6272, 2147.0)
+    assert reference.epoch.isot == "2001-01-01T00:01:04.184"
+
+    with pytest.raises(KeyError, match="MJDREFI"):
+        time_reference({"TIMESYS": "TT"})
+
+
+def test_unsupported():
+    from vodf_schema.temporal import time_reference
+
+    local = time_reference(eventlist_header(TIMESYS="LOCAL"))
+    assert local.to_mjd(86400.0)[0] == 51911
+    with pytest.raises(ValueError, match="Cannot convert"):
+        local.to_datetime64(0.0, "TT")
+
+    reference = time_reference(eventlist_header())
+    with pytest.raises(ValueError, match="only supported by to_time"):
+        reference.to_mjd(0.0, "TDB")
+    with pytest.raises(ValueError, match="1972"):
+        reference.to_mjd(-1e9, "UTC")
+
+
+def test_iter_event_times(tmp_path):
+    from vodf_schema.temporal import iter_event_times, time_reference
+    from vodf_schema.writer import EventListWriter
+
+    header = eventlist_header(TSTART=1e8, TSTOP=1e8 + 600)
+    times = 1e8 + np.sort(np.random.default_rng(0).uniform(0, 600, 1000))
+    path = tmp_path / "events.fits"
+    with EventListWriter(path, header, profile="compact") as writer:
+        writer.write(
+            {
+                "EVENT_ID": np.arange(1000),
+                "TIME": times,
+                "RA": np.full(1000, 83.6),
+                "DEC": np.full(1000, 22.0),
+                "ENERGY": np.ones(1000),
+            }
+        )
+
+    chunks = list(iter_event_times(path, scale="UTC", chunk_size=300))
+    assert [start for start, _ in chunks] == [0, 300, 600, 900]
+    result = np.concatenate([values for _, values in chunks])
+    expected = time_reference(header).to_datetime64(times, "UTC")
+    # the compact profile stores TIME in steps of 10 µs
+    assert np.all(np.abs(result - expected) <= np.timedelta64(5, "us"))
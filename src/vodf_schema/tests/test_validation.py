@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+"""Tests for the validation reports and streaming validation."""
+
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from .conftest import eventlist_table, write_eventlist
+
+
+def test_streaming_valid(eventlist_file):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_streaming
+
+    report = validate_streaming(eventlist_file, EventList, chunk_size=128)
+
+    assert report.valid, report.errors
+    assert report.hdu == 1
+    assert report.n_rows == 1000
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 1000, 10_000])
+def test_streaming_matches_table(tmp_path, chunk_size):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_streaming, validate_table
+
+    table = eventlist_table(100, TIMESYS="NOT-A-SCALE")
+    table["ENERGY"] = table["ENERGY"].astype(np.int64)
+    table["RA"].unit = "s"
+    del table["DEC"]
+    path = write_eventlist(tmp_path / "events.fits", table)
+
+    streamed = validate_streaming(path, EventList, chunk_size=chunk_size)
+    with fits.open(path) as hdul:
+        in_memory = validate_table(hdul["EVENT-LIST"], EventList)
+
+    assert not streamed.valid
+    assert streamed.issues == in_memory.issues
+    kinds = {(i.kind, i.context) for i in streamed.errors}
+    assert ("WrongValue", "TIMESYS") in kinds
+    assert ("WrongUnit", "RA") in kinds
+    assert any(
+        i.kind == "RequiredMissing" and "DEC" in i.message for i in streamed.errors
+    )
+
+
+def test_streaming_empty_table(tmp_path):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_streaming
+
+    path = write_eventlist(tmp_path / "events.fits", eventlist_table(0))
+    report = validate_streaming(path, EventList)
+
+    assert report.valid, report.errors
+    assert report.n_rows == 0
+
+
+def test_report_to_dict(eventlist_file):
+    import json
+
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_streaming
+
+    report = validate_streaming(eventlist_file, EventList, hdu="EVENT-LIST")
+    result = json.loads(json.dumps(report.to_dict()))
+
+    assert result["valid"] is True
+    assert result["schema"] == "EventList"
+
+
+@pytest.mark.parametrize("n_jobs", [2, 3])
+def test_sharded_validation(tmp_path, monkeypatch, n_jobs):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.synthetic import generate_eventlist
+    from vodf_schema.validation import validate_streaming
+
+    violations = {
+        "Unique(EVENT_ID)": 9,
+        "SortedBy(TIME)": 4,
+        "InRange(DEC)": 2,
+    }
+    path = generate_eventlist(tmp_path / "events.fits", 20_000, violations=violations)
+
+    # small Unique runs, so that the shards spill to disk
+    monkeypatch.setattr(EventList.__rules__[0], "max_in_memory", 1000)
+    streamed = validate_streaming(path, EventList, chunk_size=700)
+    sharded = validate_streaming(path, EventList, chunk_size=700, n_jobs=n_jobs)
+
+    assert sharded.to_dict() == streamed.to_dict()
+    found = {r.rule: r.n_violations for r in sharded.rules}
+    assert found["Unique(EVENT_ID)"] == 9
+    assert found["SortedBy(TIME)"] == 4
+    assert found["InRange(DEC)"] == 2
+
+
+def test_sorted_across_shards(tmp_path):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.validation import validate_streaming
+
+    # only the first row of the second half is out of order
+    table = eventlist_table(4000, TSORTKEY="TIME")
+    table["TIME"][2000] = table["TIME"][0]
+    table["EVENT_ID"][3000] = 10
+    path = write_eventlist(tmp_path / "events.fits", table)
+
+    report = validate_streaming(path, EventList, chunk_size=1000, n_jobs=2)
+    results = {r.rule: r for r in report.rules}
+    assert results["SortedBy(TIME)"].samples == [2000]
+    assert results["Unique(EVENT_ID)"].samples == [3000]
+
+
+def test_max_errors(tmp_path):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.synthetic import generate_eventlist
+    from vodf_schema.validation import FAIL_FAST, ValidationMode, validate_streaming
+
+    path = generate_eventlist(
+        tmp_path / "events.fits", 10_000, violations={"InRange(DEC)": 3000}
+    )
+
+    report = validate_streaming(path, EventList, chunk_size=1000, mode=FAIL_FAST)
+    assert report.truncated
+    assert not report.valid
+    result = next(r for r in report.rules if r.rule == "InRange(DEC)")
+    assert result.truncated
+    assert result.n_checked < 10_000
+
+    mode = ValidationMode(max_errors=10**6)
+    report = validate_streaming(path, EventList, chunk_size=1000, mode=mode)
+    assert not report.truncated
+    assert report.n_errors == 3000
+
+
+def test_shards_cleanup(tmp_path, monkeypatch):
+    import tempfile
+    import time
+
+    from vodf_schema.level1 import EventList
+    from vodf_schema.synthetic import generate_eventlist
+    from vodf_schema.validation import ValidationMode, validate_streaming
+
+    path = generate_eventlist(
+        tmp_path / "events.fits", 10_000, violations={"InRange(DEC)": 3000}
+    )
+    spill_dir = tmp_path / "tmp"
+    spill_dir.mkdir()
+    # the workers are forked and inherit the temporary directory
+    monkeypatch.setenv("TMPDIR", str(spill_dir))
+    monkeypatch.setattr(tempfile, "tempdir", str(spill_dir))
+
+    mode = ValidationMode(max_errors=1)
+    report = validate_streaming(path, EventList, chunk_size=500, n_jobs=4, mode=mode)
+    assert report.truncated
+    # shards that are still running clean up when they finish
+    deadline = time.monotonic() + 30
+    while any(spill_dir.iterdir()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert list(spill_dir.iterdir()) == []
+
+
+def test_first_error_per_rule(tmp_path):
+    from vodf_schema.level1 import EventList
+    from vodf_schema.synthetic import generate_eventlist
+    from vodf_schema.validation import ValidationMode, validate_streaming
+
+    violations = {"InRange(DEC)": 3000, "Unique(EVENT_ID)": 5}
+    path = generate_eventlist(tmp_path / "events.fits", 10_000, violations=violations)
+
+    mode = ValidationMode(first_error_per_rule=True, sampling="reservoir")
+    report = validate_streaming(path, EventList, chunk_size=1000, mode=mode)
+    assert not report.truncated
+    results = {r.rule: r for r in report.rules}
+    assert results["InRange(DEC)"].truncated
+    assert 0 < results["InRange(DEC)"].n_violations < 3000
+    # duplicates are only found after reading all rows
+    assert not results["Unique(EVENT_ID)"].truncated
+    assert results["Unique(EVENT_ID)"].n_violations == 5
+
+
+def test_compact_report():
+    from vodf_schema.report import Issue, ValidationReport
+
+    report = ValidationReport(schema="EventList")
+    for i in range(100):
+        report.add(Issue("WrongType", f"Row {i} is wrong", context="TIME"))
+    report.add(Issue("WrongType", "Row 0 is wrong", context="TIME"))
+
+    assert len(report.issues) == 100
+    issues = report.to_dict(compact=True)["issues"]
+    assert issues == [
+        {
+            "kind": "WrongType",
+            "message": "Row 0 is wrong",
+            "severity": "error",
+            "context": "TIME",
+            "count": 100,
+        }
+    ]
+
+
+def test_validate_headers(tmp_path):
+    from vodf_schema.validation import validate_headers
+
+    table = eventlist_table(100, TIMESYS="FOO")
+    table["DEC"][0] = 100.0
+    path = write_eventlist(tmp_path / "events.fits", table)
+
+    (report,) = validate_headers(path)
+    assert report.schema == "EventList"
+    assert report.n_rows == 100
+    # the header is invalid, the data are not read
+    assert [i.context for i in report.errors] == ["TIMESYS"]
+    assert report.rules == []
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+"""Tests for the incremental event-list writer."""
+
+import numpy as np
+import pytest
+from astropy import units as u
+from astropy.io import fits
+
+from .conftest import eventlist_header
+
+
+def _chunk(start, n, t0):
+    return {
+        "EVENT_ID": np.arange(start, start + n),
+        "TIME": t0 + np.arange(n, dtype=float),
+        "RA": np.full(n, 83.6),
+        "DEC": np.full(n, 22.0),
+        "ENERGY": np.full(n, 1000.0) * u.GeV,
+    }
+
+
+def test_write_eventlist(tmp_path):
+    from astropy.table import Table
+
+    from vodf_schema.fixity import verify_file
+    from vodf_schema.validation import validate_file
+    from vodf_schema.writer import EventListWriter
+
+    header = eventlist_header(TSORTKEY="TIME")
+    for keyword in ("EXTNAME", "HDUCLASS", "HDUVERS", "TSTOP"):
+        del header[keyword]
+
+    path = tmp_path / "events.fits"
+    with EventListWriter(path, header) as writer:
+        for i in range(5):
+            writer.write(_chunk(100 * i, 100, 100.0 * i))
+    assert writer.closed
+
+    results = verify_file(path)
+    assert results[1].datasum_valid
+    assert results[1].checksum_valid
+
+    (report,) = validate_file(path)
+    assert report.valid, report.issues
+    assert report.n_rows == 500
+
+    table = Table.read(path)
+    assert table.meta["TSTOP"] == 499.0
+    assert np.all(table["ENERGY"] == 1.0)
+
+
+def test_unaligned_rows(tmp_path):
+    from fits_schema import BinaryTable, BinaryTableHeader, HeaderCard, Int16
+
+    from vodf_schema.fixity import verify_file
+    from vodf_schema.writer import EventListWriter
+
+    class Counts(BinaryTable):
+        class __header__(BinaryTableHeader):
+            EXTNAME = HeaderCard(allowed_values=["COUNTS"])
+
+        COUNTS = Int16()
+
+    # rows of 2 bytes, so chunks end in the middle of 32-bit words
+    path = tmp_path / "counts.fits"
+    with EventListWriter(path, {}, schema=Counts) as writer:
+        for n in (3, 1, 0, 5, 2):
+            writer.write({"COUNTS": np.arange(n, dtype=np.int16) + 1000})
+
+    (_, result) = verify_file(path)
+    assert result.valid
+    assert result.datasum_valid
+
+
+def test_invalid_input(tmp_path):
+    from vodf_schema.writer import EventListWriter
+
+    with pytest.raises(ValueError, match="Invalid header"):
+        EventListWriter(tmp_path / "bad.fits", eventlist_header(TIMESYS="FOO"))
+
+    header = eventlist_header(TSORTKEY="TIME")
+    with EventListWriter(tmp_path / "events.fits", header) as writer:
+        writer.write(_chunk(0, 10, 100.0))
+        with pytest.raises(ValueError, match="not in order"):
+            writer.write(_chunk(10, 10, 0.0))
+        with pytest.raises(KeyError, match="TIME"):
+            writer.write({"EVENT_ID": [1]})
+    assert writer.n_rows == 10
+
+    with pytest.raises(FileExistsError):
+        EventListWriter(tmp_path / "events.fits", header)
+
+
+def test_abort(tmp_path):
+    from vodf_schema.writer import EventListWriter
+
+    path = tmp_path / "events.fits"
+    header = eventlist_header(TSORTKEY="TIME")
+
+    def write():
+        with EventListWriter(path, header) as writer:
+            writer.write(_chunk(0, 10, 100.0))
+            writer.write(_chunk(10, 10, 0.0))
+        return writer
+
+    with pytest.raises(ValueError, match="not in order"):
+        write()
+
+    assert not path.exists()
+    partial = tmp_path / "events.fits.partial"
+    header = fits.getheader(partial, 1)
+    assert header["NAXIS2"] == 0
+    assert header["DATASUM"] == "0"
+
+
+def test_compact_profile(tmp_path):
+    from astropy.table import Table
+
+    from vodf_schema.fixity import verify_file
+    from vodf_schema.validation import validate_file, validate_headers
+    from vodf_schema.writer import EventListWriter
+
+    header = eventlist_header(TSORTKEY="TIME", TSTART=1e9)
+    del header["TSTOP"]
+    rng = np.random.default_rng(0)
+    chunk = {
+        "EVENT_ID": np.arange(1000),
+        "TIME": 1e9 + np.sort(rng.uniform(0, 1000, 1000)),
+        "RA": rng.uniform(0, 360, 1000),
+        "DEC": rng.uniform(-90, 90, 1000),
+        "ENERGY": rng.uniform(0.1, 100, 1000),
+    }
+
+    compact = tmp_path / "compact.fits"
+    with EventListWriter(compact, header, profile="compact") as writer:
+        writer.write(chunk)
+    full = tmp_path / "full.fits"
+    with EventListWriter(full, header) as writer:
+        writer.write(chunk)
+    assert compact.stat().st_size < full.stat().st_size
+
+    assert verify_file(compact)[1].checksum_valid
+    (report,) = validate_file(compact)
+    assert report.valid, report.issues
+    # the header-only checks accept the formats of the profile
+    (report,) = validate_headers(compact)
+    assert report.valid, report.issues
+
+    table = Table.read(compact)
+    assert table.meta["TSTOP"] == chunk["TIME"].max()
+    np.testing.assert_allclose(table["TIME"], chunk["TIME"], rtol=0, atol=1e-5)
+    np.testing.assert_allclose(table["RA"], chunk["RA"], rtol=0, atol=1e-6)
+    np.testing.assert_allclose(table["DEC"], chunk["DEC"], rtol=0, atol=1e-6)
+    np.testing.assert_allclose(table["ENERGY"], chunk["ENERGY"], rtol=1e-6)
+
+
+def test_compact_profile_overflow(tmp_path):
+    from vodf_schema.writer import EventListWriter
+
+    header = eventlist_header(TSTART=0.0)
+    with EventListWriter(tmp_path / "events.fits", header, profile="compact") as w:
+        # one day after TSTART does not fit into 32-bit steps of 10 µs
+        with pytest.raises(ValueError, match="do not fit"):
+            w.write(_chunk(0, 2, 86400.0))
+
+    with pytest.raises(KeyError, match="no storage profile"):
+        EventListWriter(tmp_path / "other.fits", header, profile="tiny")
+
+
+def test_storage_precision_units():
+    from vodf_schema.rules import Precision
+    from vodf_schema.storage import ColumnStorage
+
+    storage = ColumnStorage("J", scale=1e-5)
+    values = np.array([0.0, 1.2345649])
+    # 4.9 µs are lost in steps of 10 µs
+    assert storage.encode(values, {}, Precision("X", atol=5 * u.us), u.s)[1] == 123456
+    with pytest.raises(ValueError, match="loses up to"):
+        storage.encode(values, {}, Precision("X", atol=4 * u.us), u.s)
+
+    # 0.49e-7 deg, i.e. 0.18 mas, are lost in steps of 1e-7 deg
+    storage = ColumnStorage("J", scale=1e-7)
+    values = np.array([0.0, 1.234567849])
+    storage.encode(values, {}, Precision("X", atol=0.2 * u.mas), u.deg)
+    with pytest.raises(ValueError, match="loses up to"):
+        storage.encode(values, {}, Precision("X", atol=0.1 * u.mas), u.deg)
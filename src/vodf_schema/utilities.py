@@ -1,13 +1,17 @@
 #!/usr/bin/env python3
 
-"""Some helpers for working with schemas using astropy Tables and Jupyter Notebooks."""
+"""Some helpers for working with schemas using astropy Tables and Jupyter Notebooks.
+
+astropy, fits_schema and IPython are only imported when the helpers are called.
+"""
 
 import re
 from collections import defaultdict
+from typing import TYPE_CHECKING
 
-from astropy.table import Table
-from fits_schema import BinaryTable, Header, HeaderCard
-from fits_schema.schema_element import _REFERENCE_SET
+if TYPE_CHECKING:
+    from astropy.table import Table
+    from fits_schema import BinaryTable, Header, HeaderCard
 
 __all__ = [
     "display_bintable",
@@ -20,6 +24,9 @@ __all__ = [
 
 def get_references(as_dict=False):
     """Retucrn the reference list from all currently imported schemas."""
+    from astropy.table import Table
+    from fits_schema.schema_element import _REFERENCE_SET
+
     references = {r: i for i, r in enumerate(_REFERENCE_SET)}
 
     if as_dict:
@@ -30,15 +37,17 @@ def get_references(as_dict=False):
     )
 
 
-def _extract_references(table: BinaryTable):
+def _extract_references(table: "Table"):
     references = get_references(as_dict=True)
     table["citation"] = [references.get(r, None) for r in table["reference"]]
     del table["reference"]
     return table
 
 
-def columns_to_table(bintable: BinaryTable) -> Table:
+def columns_to_table(bintable: "BinaryTable") -> "Table":
     """Make a table of the columns of a BinaryTable schema."""
+    from astropy.table import Table
+
     output_cols = [
         "name",
         "required",
@@ -60,8 +69,12 @@ def columns_to_table(bintable: BinaryTable) -> Table:
     return _extract_references(table)
 
 
-def headers_to_table(header: Header, cards: list[HeaderCard] | None = None) -> Table:
+def headers_to_table(
+    header: "Header", cards: list["HeaderCard"] | None = None
+) -> "Table":
     """Make a table of the cards of a header."""
+    from astropy.table import Table
+
     if not cards:
         cards = header.__cards__.values()
 
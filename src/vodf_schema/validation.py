@@ -0,0 +1,711 @@
+#!/usr/bin/env python3
+
+"""Validation of FITS files against VODF schemas.
+
+In contrast to ``BinaryTable.validate_hdu``, which stops at the first problem
+and needs the whole table in memory, the functions here collect all problems
+into a `ValidationReport` and can stream the table data through memory maps in
+fixed-size chunks of rows.
+"""
+
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from os import PathLike
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+from astropy.table import Table
+from fits_schema import BinaryTable, Header
+from fits_schema.exceptions import ValidationError
+
+from .compiled import compile_header, compile_table
+from .compression import (
+    is_compressed_table,
+    iter_tiles,
+    uncompressed_header,
+    unsupported_columns,
+)
+from .fitsblocks import HDULocation, find_hdu, memmap_rows, scan_hdus, table_columns
+from .instrumentation import Profiler, active_profiler, record_io, span
+from .intervals import TimeIntervals, check_exposure
+from .report import Issue, ValidationReport
+from .rules import DEFAULT_MAX_SAMPLES, Checker
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "FAIL_FAST",
+    "Issue",
+    "ValidationMode",
+    "ValidationReport",
+    "known_schemas",
+    "schema_for_header",
+    "validate_file",
+    "validate_header",
+    "validate_headers",
+    "validate_streaming",
+    "validate_table",
+]
+
+#: default number of rows validated at once when streaming
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+
+@dataclass(frozen=True)
+class ValidationMode:
+    """Limits that bound the time and memory of validating broken files.
+
+    The number of issues of a report never depends on the number of rows:
+    identical issues of different chunks are stored once, and rules only
+    store violation counts and up to ``max_samples`` offending rows. These
+    limits additionally stop the validation early.
+    """
+
+    #: stop after this many errors, counting each row violating a rule;
+    #: the report is then marked as truncated. None checks all rows.
+    max_errors: int | None = None
+    #: stop checking each rule after the chunk with its first violation
+    #: (not possible for `~vodf_schema.rules.Unique`, which only finds
+    #: duplicates after all rows were read)
+    first_error_per_rule: bool = False
+    #: number of offending rows stored per rule
+    max_samples: int = DEFAULT_MAX_SAMPLES
+    #: "first" to store the first offending rows, "reservoir" for a uniform
+    #: random sample of all of them
+    sampling: str = "first"
+    #: seed of the reservoir sampling
+    seed: int = 0
+
+    def __post_init__(self):
+        """Check the sampling method."""
+        if self.sampling not in {"first", "reservoir"}:
+            raise ValueError(f"Unknown sampling {self.sampling!r}")
+
+
+#: validation mode that stops at the first error
+FAIL_FAST = ValidationMode(max_errors=1)
+
+
+def _schema_extnames(schema: type[BinaryTable]) -> set[str]:
+    card = schema.__header__.__cards__.get("EXTNAME")
+    if card is None or card.allowed_values is None:
+        return set()
+    return {v.upper() for v in card.allowed_values}
+
+
+def validate_header(
+    header_schema: type[Header], header: fits.Header, report: ValidationReport
+):
+    """Check ``header`` card by card, adding all problems to ``report``.
+
+    Uses the cached `~vodf_schema.compiled.CompiledHeader` of ``header_schema``.
+    """
+    compiled = compile_header(header_schema)
+    profiler = active_profiler()
+    if profiler is None:
+        issues = compiled.validate(header)
+    else:
+        with profiler.span("header", compiled.name):
+            timings = {}
+            issues = compiled.validate(header, timings)
+            for origin, (duration, n_cards) in timings.items():
+                profiler.add("header-class", origin, duration, count=n_cards)
+    for issue in issues:
+        report.add(issue)
+
+
+def _validate_column(column, data, report: ValidationReport):
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always")
+        try:
+            column.validate_data(data, onerror="raise")
+        except ValidationError as e:
+            report.add(Issue.from_exception(e, column.name))
+
+    for w in caught:
+        report.add(Issue.from_exception(w.message, column.name))
+
+
+def _check_required_columns(schema, present: set[str], report: ValidationReport):
+    required = {c.name for c in schema.__columns__.values() if c.required}
+    missing = required - present
+    if missing:
+        report.add(
+            Issue(
+                "RequiredMissing",
+                f"The following required columns are missing {missing}",
+            )
+        )
+
+
+def _rule_checkers(
+    schema,
+    header: fits.Header,
+    present: set[str],
+    mode: "ValidationMode",
+    shard: int = 0,
+) -> list[Checker]:
+    # rules on missing columns are skipped, the missing columns are already reported
+    checkers = [
+        rule.checker(header, mode.max_samples)
+        for rule in getattr(schema, "__rules__", ())
+        if set(rule.columns) <= present
+    ]
+    for checker in checkers:
+        checker.stop_at_first = mode.first_error_per_rule
+        if mode.sampling == "reservoir":
+            # independent streams per shard, the merge keeps the sample uniform
+            checker.use_reservoir(np.random.default_rng([mode.seed, shard]))
+    return checkers
+
+
+def _budget_spent(mode: "ValidationMode", report, checkers) -> bool:
+    if mode.max_errors is None:
+        return False
+    n_errors = len(report.errors) + sum(c.n_violations for c in checkers)
+    return n_errors >= mode.max_errors
+
+
+def _truncate(report: ValidationReport, checkers: list[Checker]):
+    report.truncated = True
+    for checker in checkers:
+        checker.truncated = True
+
+
+def _unit_factor(schema, name: str, unit: u.UnitBase | None) -> float | None:
+    # rules are defined in the units of the schema, None means not convertible
+    schema_column = schema.__columns__.get(name)
+    target = None if schema_column is None else schema_column.unit
+    if unit is None or target is None:
+        return 1.0
+    try:
+        return unit.to(target)
+    except u.UnitConversionError:
+        return None
+
+
+def _scaled(values: np.ndarray, factor: float) -> np.ndarray:
+    return values if factor == 1.0 else values * factor
+
+
+def validate_table(
+    hdu: fits.BinTableHDU,
+    schema: type[BinaryTable],
+    mode: ValidationMode | None = None,
+) -> ValidationReport:
+    """Validate an in-memory binary table HDU, reading the whole table at once.
+
+    Of the ``mode``, only the sampling of offending rows applies, all rows
+    are checked at once.
+    """
+    mode = mode or ValidationMode()
+    report = ValidationReport(schema=schema.__name__, n_rows=hdu.header["NAXIS2"])
+    validate_header(schema.__header__, hdu.header, report)
+
+    table = Table.read(hdu)
+    _check_required_columns(schema, set(table.colnames), report)
+    for name, column in schema.__columns__.items():
+        if name in table.colnames:
+            _validate_column(column, table[name], report)
+
+    factors = {n: _unit_factor(schema, n, table[n].unit) for n in table.colnames}
+    convertible = {n for n, f in factors.items() if f is not None}
+    checkers = _rule_checkers(schema, hdu.header, convertible, mode)
+    if checkers:
+        chunk = {
+            name: _scaled(np.asarray(table[name]), factors[name])
+            for name in {c for checker in checkers for c in checker.rule.columns}
+        }
+        for checker in checkers:
+            checker.update(chunk, 0)
+            report.add_rule_result(checker.result())
+
+    return report
+
+
+def _select_hdu(locations: list[HDULocation], schema, hdu) -> HDULocation:
+    if hdu is not None:
+        return find_hdu(locations, hdu)
+
+    extnames = _schema_extnames(schema)
+    for location in locations:
+        if location.extname is not None and location.extname.upper() in extnames:
+            return location
+
+    raise KeyError(f"No HDU with EXTNAME in {extnames} found for {schema.__name__}")
+
+
+def _parse_unit(unit: str | None, name: str, report: ValidationReport):
+    if unit is None:
+        return None
+
+    parsed = u.Unit(unit, format="fits", parse_strict="silent")
+    if isinstance(parsed, u.UnrecognizedUnit):
+        report.add(
+            Issue("WrongUnit", f"Unit {unit!r} is not a valid FITS unit", context=name)
+        )
+        return None
+    return parsed
+
+
+def validate_streaming(
+    path: str | PathLike,
+    schema: type[BinaryTable],
+    hdu: int | str | tuple[str, int] | None = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    n_jobs: int | None = 1,
+    mode: ValidationMode | None = None,
+) -> ValidationReport:
+    """Validate a binary table HDU of a FITS file, streaming its rows in chunks.
+
+    The header is located with a header-only scan and the table data are
+    memory-mapped ``chunk_size`` rows at a time, so the memory needed does not
+    depend on the size of the file. The resulting report contains the same
+    issues as `validate_table` on the fully loaded HDU.
+
+    Tile-compressed tables (``.fits.fz``, see `vodf_schema.compression`) are
+    validated against their original header, which needs no data, and their
+    tiles are decompressed one after the other. If a column of the schema
+    cannot be decompressed, e.g. because of an unsupported ZCTYPn, only the
+    header is validated and an "UnsupportedCompression" warning is reported.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The FITS file to validate.
+    schema : type[BinaryTable]
+        The schema to validate against, e.g. `vodf_schema.level1.EventList`.
+    hdu : int, str or tuple, optional
+        Index, EXTNAME or (EXTNAME, EXTVER) of the HDU to validate. By default,
+        the first HDU with an EXTNAME allowed by the schema is used.
+    chunk_size : int
+        Number of rows validated at once.
+    n_jobs : int, optional
+        Number of worker processes. With more than one, the rows are split
+        into contiguous shards, each worker memory-maps only the rows of its
+        shard, and the partial results are merged in row order, including the
+        checks across shard boundaries like uniqueness and sort order. None
+        uses all CPUs. The tiles of compressed tables are instead
+        decompressed by ``n_jobs`` threads.
+    mode : ValidationMode, optional
+        Limits to stop early on broken files, e.g. `FAIL_FAST`. By default,
+        all rows are checked.
+
+    Returns
+    -------
+    ValidationReport
+        All issues found in the header and columns of the HDU.
+    """
+    location = _select_hdu(scan_hdus(path), schema, hdu)
+    return _validate_location(path, location, schema, chunk_size, n_jobs, mode)
+
+
+def _validate_location(
+    path,
+    location: HDULocation,
+    schema,
+    chunk_size: int,
+    n_jobs: int | None = 1,
+    mode: ValidationMode | None = None,
+):
+    mode = mode or ValidationMode()
+    header = location.header
+    compressed = is_compressed_table(header)
+    if compressed:
+        header = uncompressed_header(header)
+    n_rows = header["NAXIS2"]
+
+    name = f"{location.index}:{location.extname or schema.__name__}"
+    with span("hdu", name, n_rows=n_rows):
+        record_io(location.data_offset - location.header_offset)
+        report = ValidationReport(
+            schema=schema.__name__, path=str(path), hdu=location.index, n_rows=n_rows
+        )
+        validate_header(schema.__header__, header, report)
+
+        columns = {c.name: c for c in table_columns(header)}
+        _check_required_columns(schema, set(columns), report)
+
+        unsupported = {}
+        if compressed:
+            unsupported = unsupported_columns(location.header, schema.__columns__)
+        for column, message in unsupported.items():
+            report.add(
+                Issue(
+                    "UnsupportedCompression",
+                    f"{message}, only the header is validated",
+                    "warning",
+                    context=column,
+                )
+            )
+        if unsupported:
+            return report
+
+        n_jobs = n_jobs or os.cpu_count() or 1
+        if _budget_spent(mode, report, []):
+            # e.g. fail-fast on a broken header, no rows are read
+            report.truncated = True
+            return report
+
+        args = (path, location, schema, chunk_size, report, mode)
+        if compressed:
+            checkers = _validate_tiles(*args, n_threads=n_jobs)
+        elif n_jobs == 1 or n_rows <= chunk_size:
+            checkers = _validate_rows(*args, start=0, stop=n_rows)
+        else:
+            checkers = _validate_shards(*args, n_jobs=n_jobs)
+
+        for checker in checkers:
+            report.add_rule_result(checker.result())
+
+        return report
+
+
+def _validate_rows(
+    path,
+    location: HDULocation,
+    schema,
+    chunk_size: int,
+    report: ValidationReport,
+    mode: ValidationMode,
+    start: int,
+    stop: int,
+    shard: int = 0,
+) -> list[Checker]:
+    """Validate the rows ``[start, stop)`` and return the rule checkers."""
+    columns = {c.name: c for c in table_columns(location.header)}
+
+    def chunks(names):
+        # a zero-row table still gets one (empty) chunk, to check dtypes and units
+        for chunk_start in range(start, max(stop, start + 1), chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            with span("read", "rows", n_rows=chunk_stop - chunk_start):
+                chunk = memmap_rows(path, location, chunk_start, chunk_stop)
+                record_io(chunk.nbytes)
+                values = {n: columns[n].physical(chunk[n]) for n in names}
+            yield chunk_start, values
+            # unmap the chunk so that the resident memory stays bounded
+            del chunk
+
+    units = {name: column.unit for name, column in columns.items()}
+    return _validate_chunks(schema, location.header, units, chunks, report, mode, shard)
+
+
+def _validate_tiles(
+    path,
+    location: HDULocation,
+    schema,
+    chunk_size: int,
+    report: ValidationReport,
+    mode: ValidationMode,
+    n_threads: int,
+) -> list[Checker]:
+    """Validate a tile-compressed table, tiles are joined to chunks of rows."""
+    header = uncompressed_header(location.header)
+    columns = {c.name: c for c in table_columns(header)}
+
+    def physical(tiles, names):
+        return {
+            n: columns[n].physical(np.concatenate([t[n] for t in tiles])) for n in names
+        }
+
+    def decompressed(names):
+        tiles = iter_tiles(path, location, names, n_threads)
+        while True:
+            with span("read", "tiles"):
+                _, tile = next(tiles, (None, None))
+                if tile is not None:
+                    record_io(sum(v.nbytes for v in tile.values()))
+            if tile is None:
+                return
+            yield tile
+
+    def chunks(names):
+        start, tiles, n_pending = 0, [], 0
+        for tile in decompressed(names):
+            tiles.append(tile)
+            n_pending += len(next(iter(tile.values()), ()))
+            if n_pending >= chunk_size:
+                yield start, physical(tiles, names)
+                start, tiles, n_pending = start + n_pending, [], 0
+        if tiles or start == 0:
+            # a zero-row table still gets one (empty) chunk, to check dtypes
+            empty = {n: np.empty(0, dtype=columns[n].dtype) for n in names}
+            yield start, physical([*tiles, empty], names)
+
+    units = {name: column.unit for name, column in columns.items()}
+    return _validate_chunks(schema, header, units, chunks, report, mode)
+
+
+def _validate_chunks(
+    schema,
+    header: fits.Header,
+    units: dict[str, str | None],
+    chunks,
+    report: ValidationReport,
+    mode: ValidationMode,
+    shard: int = 0,
+) -> list[Checker]:
+    """Validate the columns and rules of a table given in chunks of rows.
+
+    ``units`` maps the names of all columns of the table to their unit
+    strings, and ``chunks(names)`` yields ``(start, values)`` for consecutive
+    row ranges, where ``values`` maps each of ``names`` to physical values.
+    Returns the rule checkers.
+    """
+    with span("units", "parse"):
+        parsed = {name: _parse_unit(unit, name, report) for name, unit in units.items()}
+        factors = {
+            name: _unit_factor(schema, name, unit) for name, unit in parsed.items()
+        }
+    to_check = [
+        (schema_column, parsed[name])
+        for name, schema_column in schema.__columns__.items()
+        if name in parsed
+    ]
+
+    convertible = {n for n, f in factors.items() if f is not None}
+    checkers = _rule_checkers(schema, header, convertible, mode, shard)
+    rule_columns = {c for checker in checkers for c in checker.rule.columns}
+    names = {c.name for c, _ in to_check} | rule_columns
+
+    try:
+        for chunk_start, values in chunks(names):
+            if _budget_spent(mode, report, checkers):
+                _truncate(report, checkers)
+                break
+
+            for schema_column, unit in to_check:
+                data = values[schema_column.name]
+                with span("column", schema_column.name, len(data), data.nbytes):
+                    if unit is not None:
+                        data = data << unit
+                    _validate_column(schema_column, data, report)
+
+            if checkers:
+                scaled = {
+                    name: _scaled(values[name], factors[name]) for name in rule_columns
+                }
+                n_rows = len(next(iter(scaled.values()), ()))
+                for checker in checkers:
+                    if checker.finished:
+                        checker.truncated = True
+                    else:
+                        with span("rule", checker.rule.name, n_rows):
+                            checker.update(scaled, chunk_start)
+    except BaseException:
+        # e.g. spilled runs of checkers that are never merged
+        for checker in checkers:
+            checker.cleanup()
+        raise
+
+    return checkers
+
+
+def _validate_shard(
+    path, location, schema, chunk_size, mode, start, stop, shard, profile=False
+):
+    report = ValidationReport(schema=schema.__name__)
+    # the spans of the worker are returned and merged into the parent profile
+    profiler = Profiler() if profile else None
+    with profiler or nullcontext():
+        checkers = _validate_rows(
+            path, location, schema, chunk_size, report, mode, start, stop, shard
+        )
+    for checker in checkers:
+        checker.detach()
+    spans = None if profiler is None else profiler.root
+    return report.issues, report.truncated, checkers, spans
+
+
+def _validate_shards(
+    path,
+    location: HDULocation,
+    schema,
+    chunk_size: int,
+    report: ValidationReport,
+    mode: ValidationMode,
+    n_jobs: int,
+) -> list[Checker]:
+    n_rows = location.header["NAXIS2"]
+    # several shards per worker balance the load, but each has at least one chunk
+    n_shards = max(1, min(4 * n_jobs, n_rows // chunk_size))
+    bounds = np.linspace(0, n_rows, n_shards + 1).astype(np.int64).tolist()
+
+    profiler = active_profiler()
+    pool = ProcessPoolExecutor(min(n_jobs, n_shards))
+    futures, n_used, merged = [], 0, None
+    try:
+        args = (path, location, schema, chunk_size, mode)
+        futures = [
+            pool.submit(
+                _validate_shard, *args, start, stop, shard, profiler is not None
+            )
+            for shard, (start, stop) in enumerate(zip(bounds[:-1], bounds[1:]))
+        ]
+        # merged in row order, which the checkers of e.g. sorted columns need
+        for i, future in enumerate(futures):
+            n_used = i + 1
+            with span("shards", f"{n_shards} shards"):
+                issues, truncated, checkers, spans = future.result()
+                if spans is not None:
+                    profiler.merge(spans)
+            for issue in issues:
+                report.add(issue)
+            report.truncated |= truncated
+            if merged is None:
+                merged = checkers
+            else:
+                for checker, other in zip(merged, checkers):
+                    checker.merge(other)
+
+            if i + 1 < len(futures) and _budget_spent(mode, report, merged):
+                _truncate(report, merged)
+                break
+    except BaseException:
+        for checker in merged or ():
+            checker.cleanup()
+        raise
+    finally:
+        # the shards that are not merged clean up whenever they finish, e.g.
+        # on a timeout, the remaining shards are not waited for
+        for future in futures[n_used:]:
+            future.add_done_callback(_discard_shard)
+        pool.shutdown(wait=False, cancel_futures=True)
+    return merged
+
+
+def _discard_shard(future):
+    if future.cancelled() or future.exception() is not None:
+        return
+    _, _, checkers, _ = future.result()
+    for checker in checkers:
+        checker.cleanup()
+
+
+def known_schemas() -> dict[str, type[BinaryTable]]:
+    """Return the schemas recognised by `validate_file`, keyed by upper-case EXTNAME."""
+    from .level1 import EventList, GoodTimeIntervals, ObservationGroupingTable
+
+    # ObservationGroupingTable and IRFGroupingTable currently share the same
+    # definition, so all GROUPING HDUs are checked against the former.
+    return {
+        "EVENT-LIST": EventList,
+        "GTI": GoodTimeIntervals,
+        "GROUPING": ObservationGroupingTable,
+    }
+
+
+def schema_for_header(header: fits.Header) -> type[BinaryTable] | None:
+    """Return the schema for an HDU with the given header, or None if unknown."""
+    extname = header.get("EXTNAME")
+    if extname is None or header.get("XTENSION") != "BINTABLE":
+        return None
+    return known_schemas().get(extname.upper())
+
+
+def validate_file(
+    path: str | PathLike,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    n_jobs: int | None = 1,
+    mode: ValidationMode | None = None,
+) -> list[ValidationReport]:
+    """Validate all HDUs of a FITS file that have a known schema.
+
+    HDUs are recognised by their EXTNAME, see `known_schemas`, and validated
+    with `validate_streaming`, sharded over ``n_jobs`` processes and with
+    the limits of ``mode``, which apply to each HDU. Other HDUs are skipped.
+    The exposure keywords of HDUs with ONTIME, e.g. event lists, are checked
+    against the GTI HDU of the same file and observation, see
+    `vodf_schema.intervals.check_exposure`.
+
+    Returns
+    -------
+    list[ValidationReport]
+        One report per recognised HDU, in file order.
+    """
+    reports = []
+    locations = []
+    with span("file", os.fspath(path)):
+        for location in scan_hdus(path):
+            schema = schema_for_header(location.header)
+            if schema is not None:
+                reports.append(
+                    _validate_location(path, location, schema, chunk_size, n_jobs, mode)
+                )
+                locations.append(location)
+        with span("exposure", "GTI"):
+            _check_exposures(path, locations, reports)
+    return reports
+
+
+def validate_headers(path: str | PathLike) -> list[ValidationReport]:
+    """Validate only the headers of all HDUs of a file that have a known schema.
+
+    Like `validate_file`, but no data are read: the header cards, the
+    presence of the required columns and their types and units are checked
+    with the compiled schemas, see `vodf_schema.compiled.CompiledTable`. This
+    takes about a millisecond per file, independent of its size.
+
+    Returns
+    -------
+    list[ValidationReport]
+        One report per recognised HDU, in file order.
+    """
+    reports = []
+    for location in scan_hdus(path):
+        schema = schema_for_header(location.header)
+        if schema is None:
+            continue
+        header = _plain_header(location)
+        report = ValidationReport(
+            schema=schema.__name__,
+            path=str(path),
+            hdu=location.index,
+            n_rows=header["NAXIS2"],
+        )
+        for issue in compile_table(schema).validate_header(header):
+            report.add(issue)
+        reports.append(report)
+    return reports
+
+
+def _plain_header(location: HDULocation) -> fits.Header:
+    header = location.header
+    return uncompressed_header(header) if is_compressed_table(header) else header
+
+
+def _check_exposures(
+    path, locations: list[HDULocation], reports: list[ValidationReport]
+):
+    """Compare ONTIME and LIVETIME with the GTIs stored in the same file.
+
+    A header is matched with the GTI HDU of the same OBS_ID, or with the only
+    GTI HDU of the file if that has no OBS_ID.
+    """
+    gtis = [loc for loc in locations if str(loc.header.get("EXTNAME")).upper() == "GTI"]
+    if not gtis:
+        return
+
+    for location, report in zip(locations, reports):
+        header = _plain_header(location)
+        if any(location is gti for gti in gtis) or header.get("ONTIME") is None:
+            continue
+        matching = [
+            gti
+            for gti in gtis
+            if gti.header.get("OBS_ID") == header.get("OBS_ID")
+            or (len(gtis) == 1 and gti.header.get("OBS_ID") is None)
+        ]
+        if len(matching) != 1:
+            continue
+        try:
+            intervals = TimeIntervals.read(path, matching[0])
+        except ValueError as e:
+            # e.g. intervals that stop before they start, reported for the GTI
+            report.add(Issue("InvalidGTI", str(e), "warning", context="ONTIME"))
+            continue
+        check_exposure(header, intervals, report)
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+"""Incremental writing of event lists of unbounded length.
+
+`EventListWriter` writes the complete header of a table schema when it is
+opened and appends chunks of rows directly to the file, so the memory used
+does not depend on the length of the observation. The DATASUM of the data
+unit is accumulated while the chunks are written (the ones' complement sum
+does not depend on how the data is split, see `vodf_schema.fixity`), and on
+`~EventListWriter.close` the cards that are only known at the end (NAXIS2,
+TSTOP, DATASUM and CHECKSUM) are patched in place. The header has a fixed
+number of cards, so patching never moves the data.
+
+Until the writer is closed, the file declares zero rows. A writer used as
+context manager is aborted instead of closed if an exception is raised, and
+the incomplete file is renamed to ``<name>.partial``.
+
+With a storage profile of the schema (see `vodf_schema.storage`), columns are
+written in their compact representation, e.g. scaled 32-bit integers, and
+the rounding error of every value is checked against the
+`~vodf_schema.rules.Precision` rules of the schema.
+"""
+
+import datetime
+from collections.abc import Mapping, Sequence
+from os import PathLike
+from pathlib import Path
+
+import numpy as np
+from astropy import units as u
+from astropy.io import fits
+
+from .compiled import compile_table
+from .fitsblocks import padded_size, table_dtype
+from .fixity import _MASK, _ZERO_CHECKSUM, encode_checksum, ones_complement_sum
+from .report import ValidationReport
+from .rules import Precision, sort_keys
+from .storage import StorageProfile, storage_profile
+from .validation import validate_header
+
+__all__ = ["EventListWriter"]
+
+
+def _fixed_value(allowed):
+    # the value of cards with a single allowed value, e.g. HDUCLASS
+    if isinstance(allowed, str | int | float):
+        return allowed
+    if isinstance(allowed, list | tuple | set | frozenset) and len(allowed) == 1:
+        return next(iter(allowed))
+    return None
+
+
+class EventListWriter:
+    """Write an event list chunk by chunk.
+
+    Parameters
+    ----------
+    path : str or PathLike
+        The output file, with an empty primary HDU and the table.
+    header : Mapping
+        Cards of the table header, e.g. the values of the
+        `~vodf_schema.metadata.ObservationHeader` and
+        `~vodf_schema.metadata.TemporalReferenceHeader` (OBS_ID, TSTART,
+        MJDREFI, TIMESYS, ...). Required cards with a single allowed value,
+        like HDUCLASS and EXTNAME, are added. The complete header is
+        validated against the schema up front, TSTOP defaults to TSTART and
+        is set on `close`.
+    schema : type[BinaryTable], optional
+        The table schema, by default `vodf_schema.level1.EventList`.
+    optional_columns : Sequence[str]
+        Optional columns of the schema to write, besides the required ones.
+    overwrite : bool
+        Whether to replace an existing file.
+    profile : str or StorageProfile, optional
+        Storage profile of the schema for compact columns, e.g. "compact".
+        Values are given as logical values, a `ValueError` is raised if they
+        cannot be stored within the precision required by the schema.
+
+    Notes
+    -----
+    If the header declares the rows as sorted (TSORTKEY), the first sort
+    column of every chunk is checked to continue the order of the previous
+    chunks, a `ValueError` is raised otherwise.
+    """
+
+    def __init__(
+        self,
+        path: str | PathLike,
+        header: Mapping,
+        schema=None,
+        optional_columns: Sequence[str] = (),
+        overwrite: bool = False,
+        profile: str | StorageProfile | None = None,
+    ):
+        if schema is None:
+            from .level1 import EventList
+
+            schema = EventList
+        if isinstance(profile, str):
+            profile = storage_profile(schema, profile)
+
+        self.path = Path(path)
+        if self.path.exists() and not overwrite:
+            raise FileExistsError(f"File {self.path} already exists")
+
+        compiled = compile_table(schema)
+        unknown = set(optional_columns) - set(compiled.columns)
+        if unknown:
+            raise ValueError(f"Unknown columns {sorted(unknown)} of {schema.__name__}")
+        self.columns = {
+            name: column
+            for name, column in compiled.columns.items()
+            if column.required or name in optional_columns
+        }
+        self.storage = {} if profile is None else dict(profile.columns)
+        unknown = set(self.storage) - set(self.columns)
+        if unknown:
+            raise ValueError(f"Storage profile has unknown columns {sorted(unknown)}")
+        self.precision = {
+            rule.columns[0]: rule
+            for rule in getattr(schema, "__rules__", ())
+            if isinstance(rule, Precision)
+        }
+        self.header = self._build_header(schema, header)
+        self.dtype = table_dtype(self.header)
+        sort_columns = sort_keys(self.header)
+        self._sort_column = sort_columns[0] if sort_columns else None
+        self._last_sorted = -np.inf
+
+        self.n_rows = 0
+        self.time_max = -np.inf
+        self._datasum = 0
+        # bytes at the end of the data that do not complete a 32-bit word yet
+        self._carry = b""
+
+        self._file = open(self.path, "wb")
+        self._file.write(fits.PrimaryHDU().header.tostring().encode("ascii"))
+        self._header_offset = self._file.tell()
+        self._header_size = self._write_header()
+
+    def _build_header(self, schema, cards: Mapping) -> fits.Header:
+        columns = []
+        for name, column in self.columns.items():
+            unit = None if column.unit is None else column.unit.to_string("fits")
+            if name in self.storage:
+                columns.append(self.storage[name].fits_column(name, unit, cards))
+                continue
+            columns.append(
+                fits.Column(
+                    name=name,
+                    format=column.tform,
+                    unit=unit,
+                    dim=None
+                    if column.shape is None or len(column.shape) < 2
+                    else f"({','.join(map(str, reversed(column.shape)))})",
+                )
+            )
+        header = fits.BinTableHDU.from_columns(columns, nrows=0).header
+        for keyword, card in schema.__header__.__cards__.items():
+            value = _fixed_value(card.allowed_values)
+            if card.required and value is not None and keyword not in header:
+                header[keyword] = value
+        header.update(cards)
+        if "TSTOP" not in header and "TSTART" in header:
+            header["TSTOP"] = header["TSTART"]
+
+        report = ValidationReport(schema=schema.__name__)
+        validate_header(schema.__header__, header, report)
+        if report.errors:
+            messages = "\n".join(f"  {issue.message}" for issue in report.errors)
+            raise ValueError(f"Invalid header for {schema.__name__}:\n{messages}")
+
+        # reserve the cards patched on close, so that the header size is fixed
+        header["DATASUM"] = ("0", "data unit checksum")
+        header["CHECKSUM"] = (_ZERO_CHECKSUM, "HDU checksum")
+        return header
+
+    def _write_header(self) -> int:
+        raw = self.header.tostring().encode("ascii")
+        self._file.seek(self._header_offset)
+        self._file.write(raw)
+        return len(raw)
+
+    def __enter__(self):
+        """Return the writer, which is closed at the end of the block."""
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        """Close the writer, or `abort` it if an exception occurred."""
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def closed(self) -> bool:
+        """Whether the file is finished."""
+        return self._file.closed
+
+    def _to_rows(self, chunk) -> np.ndarray:
+        if isinstance(chunk, np.ndarray) and chunk.dtype == self.dtype:
+            if self.storage:
+                raise TypeError("Rows must be given as logical values with a profile")
+            return chunk
+
+        names = chunk.dtype.names if isinstance(chunk, np.ndarray) else chunk.keys()
+        missing = set(self.columns) - set(names)
+        if missing:
+            raise KeyError(f"Chunk is missing the columns {sorted(missing)}")
+
+        lengths = {len(chunk[name]) for name in self.columns}
+        if len(lengths) > 1:
+            raise ValueError(f"Columns of the chunk have different lengths {lengths}")
+
+        rows = np.empty(lengths.pop(), dtype=self.dtype)
+        for name, column in self.columns.items():
+            values = chunk[name]
+            # quantities and table columns with units
+            if getattr(values, "unit", None) is not None and column.unit is not None:
+                values = u.Quantity(values, copy=False).to_value(column.unit)
+            if name in self.storage:
+                if name == "TIME" and len(values) > 0:
+                    # TSTOP is set from the logical values
+                    self.time_max = max(self.time_max, float(np.max(values)))
+                values = self.storage[name].encode(
+                    values, self.header, self.precision.get(name), column.unit
+                )
+            rows[name] = values
+        return rows
+
+    def _check_order(self, rows: np.ndarray):
+        values = rows[self._sort_column]
+        if np.any(values[:-1] > values[1:]) or values[0] < self._last_sorted:
+            raise ValueError(
+                f"Rows are declared sorted by {self._sort_column} (TSORTKEY),"
+                " but the chunk is not in order"
+            )
+        self._last_sorted = values[-1]
+
+    def _add_to_datasum(self, data: memoryview):
+        if self._carry:
+            n = min(4 - len(self._carry), len(data))
+            self._carry += bytes(data[:n])
+            data = data[n:]
+            if len(self._carry) < 4:
+                return
+            self._datasum = ones_complement_sum(self._carry, self._datasum)
+            self._carry = b""
+
+        n_words = len(data) // 4
+        self._datasum = ones_complement_sum(data[: 4 * n_words], self._datasum)
+        self._carry = bytes(data[4 * n_words :])
+
+    def write(self, chunk):
+        """Append rows to the table.
+
+        Parameters
+        ----------
+        chunk : Mapping or numpy.ndarray
+            The values of all written columns, e.g. a dict of arrays, an
+            `astropy.table.Table` or a structured array. Values with units
+            are converted to the units of the schema.
+        """
+        if self.closed:
+            raise ValueError("Writer is already closed")
+
+        rows = self._to_rows(chunk)
+        if len(rows) == 0:
+            return
+        if self._sort_column is not None:
+            self._check_order(rows)
+        if "TIME" in self.columns and "TIME" not in self.storage:
+            self.time_max = max(self.time_max, float(rows["TIME"].max()))
+
+        data = memoryview(rows).cast("B")
+        self._file.write(data)
+        self._add_to_datasum(data)
+        self.n_rows += len(rows)
+
+    def abort(self):
+        """Stop writing without finishing the file.
+
+        The incomplete file is renamed to ``<name>.partial``, it keeps
+        declaring zero rows and has no valid checksums, so it is never taken
+        for a complete event list.
+        """
+        if self.closed:
+            return
+        self._file.close()
+        self.path.replace(self.path.with_name(f"{self.path.name}.partial"))
+
+    def close(self, tstop: float | None = None):
+        """Pad the data unit and patch NAXIS2, TSTOP, DATASUM and CHECKSUM.
+
+        Parameters
+        ----------
+        tstop : float, optional
+            Stop time of the observation, by default the time of the last
+            event if later than the TSTOP given when opening.
+        """
+        if self.closed:
+            return
+
+        size = self.n_rows * self.dtype.itemsize
+        self._file.write(bytes(padded_size(size) - size))
+        if self._carry:
+            # the padding completes the last word with zeros
+            self._datasum = ones_complement_sum(
+                self._carry.ljust(4, b"\0"), self._datasum
+            )
+            self._carry = b""
+
+        self.header["NAXIS2"] = self.n_rows
+        if tstop is None and "TSTOP" in self.header and self.time_max > -np.inf:
+            tstop = max(self.header["TSTOP"], self.time_max)
+        if tstop is not None:
+            self.header["TSTOP"] = float(tstop)
+
+        timestamp = datetime.datetime.now().isoformat(timespec="seconds")
+        self.header["DATASUM"] = (
+            str(self._datasum),
+            f"data unit checksum updated {timestamp}",
+        )
+        comment = f"HDU checksum updated {timestamp}"
+        self.header["CHECKSUM"] = (_ZERO_CHECKSUM, comment)
+        raw = self.header.tostring().encode("ascii")
+        checksum = ~ones_complement_sum(raw, self._datasum) & _MASK
+        self.header["CHECKSUM"] = (encode_checksum(checksum), comment)
+
+        if self._write_header() != self._header_size:
+            raise RuntimeError("The size of the header changed while writing")
+        self._file.close()